@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+from data_handler import BarSeries, FIELDS
+
+# fields stored for tick archives (one trade per row)
+TICK_FIELDS = ('price', 'volume')
+
+
+class BarArchive:
+    def __init__(self, directory: str) -> None:
+        """Constructor. A local archive of bars or ticks in `directory`, one subdirectory per symbol.
+
+        Each symbol is stored as one raw binary file per column (`index.bin`, datetime64[ns] UTC, then one float64 file
+        per field) and `meta.json` (number of rows, fields, timezone, whether the rows are sorted). Columns are only
+        appended to, so archives larger than memory are converted chunk by chunk, and `open` maps them into memory
+        without reading them: opening is instant, and only the pages of the bars actually used are loaded.
+        """
+        self.directory = directory
+
+    def _path(self, symbol: str, name: str) -> str:
+        """Returns the path of one of the files of `symbol`."""
+        return os.path.join(self.directory, symbol.replace(os.sep, '_'), name)
+
+    def meta(self, symbol: str) -> dict | None:
+        """Returns the metadata of `symbol`, None if it is not in the archive."""
+        try:
+            with open(self._path(symbol, 'meta.json')) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, symbol: str, meta: dict) -> None:
+        """Writes the metadata of `symbol` through a temporary file and `os.replace`, after the columns it describes."""
+        path = self._path(symbol, 'meta.json')
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump(meta, file)
+        os.replace(temporary, path)
+
+    def symbols(self) -> list[str]:
+        """Returns the symbols of the archive, sorted."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(entry.name for entry in os.scandir(self.directory) if entry.is_dir() and os.path.exists(os.path.join(entry.path, 'meta.json')))
+
+    def _columns(self, symbol: str, meta: dict, mode: str = 'r') -> tuple[np.ndarray, dict]:
+        """Maps the index and the field columns of `symbol` into memory."""
+        length = meta['length']
+        if length == 0:
+            return np.array([], dtype='datetime64[ns]'), {field: np.array([]) for field in meta['fields']}
+        index = np.memmap(self._path(symbol, 'index.bin'), dtype='datetime64[ns]', mode=mode, shape=(length,))
+        columns = {field: np.memmap(self._path(symbol, f"{field}.bin"), dtype=np.float64, mode=mode, shape=(length,)) for field in meta['fields']}
+        return index, columns
+
+    def open(self, symbol: str) -> BarSeries:
+        """Returns the bars of `symbol` as a `BarSeries` of memory-mapped columns (no data is read until used).
+
+        Tick archives are returned as one bar per trade (see `BarSeries.from_ticks`), to be aggregated with `resample`.
+
+        Raises:
+            ValueError: If the symbol is not in the archive.
+        """
+        meta = self.meta(symbol)
+        if meta is None:
+            raise ValueError(f"{symbol} is not in the archive {self.directory}")
+        if not meta['sorted']:
+            self.sort(symbol)
+            meta = self.meta(symbol)
+        index, columns = self._columns(symbol, meta)
+        if meta['fields'] == list(TICK_FIELDS):
+            return BarSeries.from_ticks(index, columns['price'], columns['volume'], meta['timezone'])
+        return BarSeries(index, columns, meta['timezone'])
+
+    def append(self, symbol: str, index: np.ndarray, columns: dict, timezone: str | None = None) -> None:
+        """Appends rows to `symbol` (created with the fields of `columns`, `FIELDS` or `TICK_FIELDS`, if new), `index` being datetime64[ns] UTC.
+
+        Rows should come in time order; otherwise the symbol is sorted the next time it is opened (see `sort`). The
+        metadata is written after the columns, so an interrupted append leaves the symbol as it was before it.
+
+        Raises:
+            ValueError: If the fields differ from the ones of the stored rows.
+        """
+        meta = self.meta(symbol)
+        if meta is None:
+            os.makedirs(self._path(symbol, ''), exist_ok=True)
+            meta = {'length': 0, 'fields': list(columns), 'timezone': timezone, 'sorted': True, 'last': None}
+        if list(columns) != meta['fields']:
+            raise ValueError(f"Fields {list(columns)} don't match the fields {meta['fields']} of {symbol}")
+        index = np.asarray(index, dtype='datetime64[ns]')
+        if len(index) == 0:
+            return
+        values = index.view(np.int64)
+        if meta['sorted'] and ((meta['last'] is not None and values[0] < meta['last']) or np.any(values[1:] < values[:-1])):
+            meta['sorted'] = False
+        # rows past the recorded length were left by an interrupted append
+        size = meta['length'] * 8
+        for name, column in [('index', values), *columns.items()]:
+            with open(self._path(symbol, f"{name}.bin"), 'ab') as file:
+                file.truncate(size)
+                np.ascontiguousarray(column, dtype=np.int64 if name == 'index' else np.float64).tofile(file)
+        meta['length'] += len(index)
+        last = int(values.max())
+        meta['last'] = last if meta['last'] is None else max(meta['last'], last)
+        if timezone is not None:
+            meta['timezone'] = timezone
+        self._write_meta(symbol, meta)
+
+    def sort(self, symbol: str) -> None:
+        """Sorts the rows of `symbol` by time (stable, so rows with the same timestamp keep their order).
+
+        Only the index and one column at a time are held in memory.
+        """
+        meta = self.meta(symbol)
+        if meta is None or meta['sorted']:
+            return
+        index, columns = self._columns(symbol, meta)
+        order = np.argsort(index, kind='stable')
+        for name, column in [('index', index), *columns.items()]:
+            path = self._path(symbol, f"{name}.bin")
+            temporary = f"{path}.{os.getpid()}.tmp"
+            column[order].tofile(temporary)
+            os.replace(temporary, path)
+        del index, columns
+        meta['sorted'] = True
+        self._write_meta(symbol, meta)
+
+    def ingest_csv(self, path: str, symbol: str | None = None, symbol_column: str | None = None, date_column: str = 'Date', date_unit: str | None = None,
+                   ticks: bool = False, timezone: str | None = None, chunk_size: int = 1_000_000) -> dict:
+        """Converts a CSV file into the archive, reading `chunk_size` rows at a time, and returns `symbol -> rows added`.
+
+        The file holds either one symbol (`symbol`, default: the file name without extension) or several, named in
+        `symbol_column`. Dates are ISO strings (offsets included) in `date_column`, or numbers in `date_unit`
+        (`s`, `ms`, `us`, `ns`) since the epoch. The fields are `Open`, `High`, `Low`, `Close`, `Volume` columns (any
+        capitalization), or `Price` and `Volume` with `ticks`. `timezone` (a name, e.g. `America/New_York`) is the
+        timezone the bars are displayed and resampled in. Memory use is bounded by the chunk size.
+
+        Raises:
+            ValueError: If a field column is missing, or the fields differ from the ones already stored for a symbol.
+        """
+        import pandas as pd
+        fields = TICK_FIELDS if ticks else FIELDS
+        if symbol_column is None:
+            symbol = symbol or os.path.splitext(os.path.basename(path))[0]
+        added = {}
+        header = pd.read_csv(path, nrows=0).columns
+        names = {column.lower(): column for column in header}
+        missing = [field for field in fields if field not in names]
+        if missing:
+            raise ValueError(f"{path} has no {', '.join(missing)} column")
+        usecols = [date_column] + [names[field] for field in fields] + ([symbol_column] if symbol_column else [])
+        dtypes = {names[field]: np.float64 for field in fields}
+        # the default parser can be one unit in the last place off, the archive keeps the numbers of the file
+        for frame in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunk_size, float_precision='round_trip'):
+            dates = frame[date_column]
+            if date_unit is not None:
+                index = pd.to_datetime(dates.to_numpy(), unit=date_unit, utc=True)
+            else:
+                try:
+                    index = pd.to_datetime(dates, utc=True, format='ISO8601')
+                except ValueError:
+                    index = pd.to_datetime(dates, utc=True)
+            index = pd.DatetimeIndex(index).tz_localize(None).to_numpy(dtype='datetime64[ns]')
+            columns = {field: frame[names[field]].to_numpy() for field in fields}
+            if symbol_column is None:
+                groups = [(symbol, slice(None))]
+            else:
+                codes, uniques = pd.factorize(frame[symbol_column].astype(str))
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                groups = [(name, order[bounds[code]:bounds[code + 1]]) for code, name in enumerate(uniques)]
+            for name, rows in groups:
+                self.append(name, index[rows], {field: values[rows] for field, values in columns.items()}, timezone)
+                added[name] = added.get(name, 0) + len(index[rows])
+        return added
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """Command line entry point (`python archive.py FILE... --archive DIRECTORY`), converts CSV files into an archive."""
+    parser = argparse.ArgumentParser(description="Converts CSV bars or ticks into a memory-mappable columnar archive.")
+    parser.add_argument('files', nargs='+', help="CSV files")
+    parser.add_argument('--archive', required=True, help="archive directory")
+    parser.add_argument('--symbol', help="symbol of the rows (default: the file name), for files of a single symbol")
+    parser.add_argument('--symbol-column', help="column naming the symbol of every row, for files of several symbols")
+    parser.add_argument('--date-column', default='Date')
+    parser.add_argument('--date-unit', choices=['s', 'ms', 'us', 'ns'], help="dates are numbers of this unit since the epoch")
+    parser.add_argument('--ticks', action='store_true', help="rows are trades with Price and Volume columns")
+    parser.add_argument('--timezone', help="timezone of the bars, e.g. America/New_York")
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help="rows read at a time")
+    options = parser.parse_args(arguments)
+
+    archive = BarArchive(options.archive)
+    for path in options.files:
+        try:
+            added = archive.ingest_csv(path, options.symbol, options.symbol_column, options.date_column, options.date_unit, options.ticks, options.timezone, options.chunk_size)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}")
+            return 1
+        for symbol, rows in added.items():
+            print(f"{path}: {rows} rows added to {symbol}")
+    # sorting now spares the first `open`
+    for symbol in archive.symbols():
+        archive.sort(symbol)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,49 +1,237 @@
+import contextlib
+import numpy as np
 from broker import Broker
 from strategy import TradingStrategy
+from data_handler import BarSeries, to_columns
+from history import BarHistory
+from indicators.streaming import IndicatorCache
+from profiler import Profiler
+from metrics import METRICS, EquityCurve, performance_metrics
+from ledger import TradeSide, TradeStatus
+from costs import CommissionModel, SlippageModel
+
+# stats of `run_backtest`, and the ones needing the equity curve of the run
+CURVE_STATS = METRICS + ('equity_curve',)
+STATS = ('initial_balance', 'final_balance', 'final_balance_with_stocks', 'profit', 'profit_with_stocks', 'trades', 'transaction_history') + CURVE_STATS
 
 class Backtester:
-    def __init__(self, initial_balance: float) -> None:
-        """Constructor, creates an internal `Broker` instance"""
-        self.broker = Broker(initial_balance)
+    def __init__(self, initial_balance: float, profile: bool = False, periods_per_year: float = 252, commission: CommissionModel | None = None, slippage: SlippageModel | None = None, volume_limit: float | None = None) -> None:
+        """Constructor, creates an internal `Broker` instance
+
+        With `profile`, runs record the wall and CPU time of every phase, strategy and child strategy in `self.profiler`
+        (see `Profiler.report` and `Profiler.write_collapsed`). Without it, nothing is timed.
+        `periods_per_year` is the number of bars per year (252 daily bars), used to annualize the Sharpe and Sortino ratios.
+        `commission`, `slippage` and `volume_limit` configure the brokers' trading costs and partial fills (see `Broker`).
+        """
+        self.initial_balance = initial_balance
+        self.periods_per_year = periods_per_year
+        self.broker_options = {'commission': commission, 'slippage': slippage, 'volume_limit': volume_limit}
+        self.broker = Broker(initial_balance, **self.broker_options)
+        self.profiler = Profiler() if profile else None
 
-    def run_backtest(self, strategy: TradingStrategy, data: list, symbol="ABCDEF", multiplier = 10) -> dict:
+    def run_backtest(self, strategy: TradingStrategy, data: list, symbol="ABCDEF", multiplier = 10, vectorized: bool = False) -> dict:
         """Simulates the backtest on given historical data and strategy and returns a dictionary of stats (total profit, number of trades, etc), using an internal `Broker` instance.
 
         Iterates through each data point, executes the trading strategy, updates balance using `Broker`, and returns stats.
-        Keeps track of all trades and results in the internal broker and returns stats
+        Keeps track of all trades and results in the internal broker and returns stats, the account value after every bar
+        (`equity_curve`, an `EquityCurve`) and the performance metrics computed from it (see `metrics.performance_metrics`).
+
+        `data` can be any iterable of data points (e.g. `BarSeries.iter_bars` or `CSVSource.iter_bars` replaying a file chunk
+        by chunk); if the strategy declares its `lookback`, only that many bars are kept (see `_history`), so memory does
+        not grow with the number of bars.
+        With `vectorized=True` the strategy computes all its signals at once (`TradingStrategy.generate_signals`) and the broker
+        applies them in a single batch, see `run_vectorized_backtest`.
+
+        Raises:
+            ValueError: If `data` is empty.
+        """
+        if vectorized:
+            return self.run_vectorized_backtest(strategy, data, symbol=symbol, multiplier=multiplier)
+
+        # children of composite strategies computing the same indicator share it
+        strategy.share_indicators(IndicatorCache())
+        data_point = None
+        broker = self.broker
+        curve = EquityCurve(self.initial_balance, len(data) if hasattr(data, '__len__') else 1024)
+        first = len(broker.transaction_history)
+        with self._profiling([strategy], [broker]):
+            historical_data = self._history([strategy])
+            for data_point in data:
+                historical_data.append(data_point)
+                self._step(strategy, broker, historical_data, data_point, symbol, multiplier)
+                held = broker.portfolio.get(symbol, 0)
+                curve.append(broker.balance + held * data_point['close'], held)
+
+        if data_point is None:
+            raise ValueError("No data to backtest")
+        return self._collect_results(data_point['close'], symbol, curve=curve, first=first)
+
+    async def run_backtest_async(self, strategy: TradingStrategy, data, symbol="ABCDEF", multiplier = 10) -> dict:
+        """Same as `run_backtest` (per-bar loop) for an async iterable of data points, e.g. bars received from a network stream.
+
+        Raises:
+            ValueError: If `data` is empty.
+        """
+        strategy.share_indicators(IndicatorCache())
+        data_point = None
+        broker = self.broker
+        curve = EquityCurve(self.initial_balance)
+        first = len(broker.transaction_history)
+        with self._profiling([strategy], [broker]):
+            historical_data = self._history([strategy])
+            async for data_point in data:
+                historical_data.append(data_point)
+                self._step(strategy, broker, historical_data, data_point, symbol, multiplier)
+                held = broker.portfolio.get(symbol, 0)
+                curve.append(broker.balance + held * data_point['close'], held)
+
+        if data_point is None:
+            raise ValueError("No data to backtest")
+        return self._collect_results(data_point['close'], symbol, curve=curve, first=first)
+
+    def run_backtests(self, strategies: list[TradingStrategy], data: list, symbol="ABCDEF", multiplier = 10) -> list[dict]:
+        """Runs several strategies over the same data (any iterable of data points) in a single pass and returns one dictionary of stats per strategy (like `run_backtest`).
+
+        Every strategy trades with its own new `Broker`, but they all share one `IndicatorCache`, so an indicator used by
+        several strategies (e.g. the same ADX in a basic and in a composite strategy) is computed once per bar.
+
+        Raises:
+            ValueError: If `data` is empty.
         """
-        historical_data = []
-        for i, data_point in enumerate(data):
-            historical_data.append(data_point)
-            strategy.update_historical_data(historical_data)
-            should_buy = strategy.should_buy(data_point)
-            should_sell = strategy.should_sell(data_point)
-            #print(f"{i}: Data point: {data_point}, Buy: {should_buy}, Sell: {should_sell}")
-            if should_buy > 0:
-                self.broker.execute_trade('buy', symbol, data_point['close'], multiplier * should_buy // 1)
-            elif should_sell > 0:
-               self.broker.execute_trade('sell', symbol, data_point['close'], multiplier * should_sell // 1)
+        cache = IndicatorCache()
+        brokers = [Broker(self.initial_balance, **self.broker_options) for _ in strategies]
+        capacity = len(data) if hasattr(data, '__len__') else 1024
+        curves = [EquityCurve(self.initial_balance, capacity) for _ in strategies]
+        for strategy in strategies:
+            strategy.share_indicators(cache)
+
+        data_point = None
+        with self._profiling(strategies, brokers):
+            historical_data = self._history(strategies)
+            for data_point in data:
+                historical_data.append(data_point)
+                for strategy, broker, curve in zip(strategies, brokers, curves):
+                    self._step(strategy, broker, historical_data, data_point, symbol, multiplier)
+                    held = broker.portfolio.get(symbol, 0)
+                    curve.append(broker.balance + held * data_point['close'], held)
 
+        if data_point is None:
+            raise ValueError("No data to backtest")
+        return [self._collect_results(data_point['close'], symbol, broker, curve) for broker, curve in zip(brokers, curves)]
+
+    @staticmethod
+    def _history(strategies: list[TradingStrategy]) -> list | BarHistory:
+        """Returns the container for the bars seen by `strategies`: a `BarHistory` of their longest lookback, or a list growing with every bar if one of them needs the whole history."""
+        lookbacks = [strategy.lookback for strategy in strategies]
+        if None in lookbacks:
+            return []
+        return BarHistory(max(lookbacks + [1]))
+
+    def _step(self, strategy: TradingStrategy, broker: Broker, historical_data: list, data_point: dict, symbol: str, multiplier: float) -> None:
+        """Feeds one new bar to the strategy and executes its decision with `broker`.
+
+        Pending orders reached by the bar are filled first, the orders the strategy places on this bar wait for the next ones.
+        """
+        if broker.order_book.orders:
+            broker.process_bar(symbol, data_point, data_point.get('date'))
+        strategy.update_historical_data(historical_data)
+        should_buy = strategy.should_buy(data_point)
+        should_sell = strategy.should_sell(data_point)
+        #print(f"Data point: {data_point}, Buy: {should_buy}, Sell: {should_sell}")
+        if should_buy > 0:
+            broker.execute_trade('buy', symbol, data_point['close'], multiplier * should_buy // 1, data_point.get('date'))
+        elif should_sell > 0:
+           broker.execute_trade('sell', symbol, data_point['close'], multiplier * should_sell // 1, data_point.get('date'))
+        for order in strategy.orders(data_point):
+            broker.place_order(order, symbol)
+
+    def run_vectorized_backtest(self, strategy: TradingStrategy, data: list | dict | BarSeries, symbol="ABCDEF", multiplier = 10, start: int = 0, stats: tuple | None = None) -> dict:
+        """Runs the same backtest as `run_backtest` on whole NumPy columns and returns the same dictionary of stats.
+
+        `data` is either a list of data points, a `BarSeries` or a dictionary of columns (see `data_handler.to_columns`), passing
+        columns avoids converting the same data again for every strategy but trades are then recorded without their bar date.
+        Only bars with a signal reach the broker, and trades are identical to the per-bar loop. Pending orders
+        (`TradingStrategy.orders`) are not simulated in this mode.
+        With `start`, trading begins at that bar: the earlier bars only warm the indicators up (e.g. an out-of-sample window
+        preceded by its training window).
+        With `stats`, only these stats are returned, and the equity curve and the performance metrics are only computed if
+        one of them is asked for (e.g. a parameter sweep scoring the combinations by profit).
+
+        Raises:
+            NotImplementedError: If the strategy has no vectorized mode.
+            ValueError: If a stat of `stats` is unknown.
+        """
+        if stats is not None and not set(stats) <= set(STATS):
+            raise ValueError(f"Unknown stats: {sorted(set(stats) - set(STATS))}")
+        with self._profiling([strategy], [self.broker], vectorized=True):
+            columns = data if isinstance(data, dict) else to_columns(data)
+            close = columns['close']
+            buy, sell = strategy.generate_signals(columns)
+
+            buying = buy > 0
+            bars = np.flatnonzero(buying | (sell > 0))
+            bars = bars[bars >= start]
+            volumes = np.where(buying, multiplier * buy // 1, multiplier * sell // 1)[bars]
+            trade_types = np.where(buying[bars], 'buy', 'sell').tolist()
+            if isinstance(data, BarSeries):
+                times = data.index[bars]
+            elif isinstance(data, list):
+                times = [data[bar].get('date') for bar in bars.tolist()]
+            else:
+                times = None
+            ledger = self.broker.transaction_history
+            first = len(ledger)
+            self.broker.execute_trades(trade_types, symbol, close[bars].tolist(), volumes.tolist(), times)
+            if stats is not None and not set(stats) & set(CURVE_STATS):
+                return self._collect_results(close[-1], symbol, stats=stats)
+
+            # the ledger has one transaction per bar traded, in bar order, with the fill price and fee
+            rows = slice(first, len(ledger))
+            succeeded = ledger.columns['status'][rows] == TradeStatus.SUCCESS
+            buys = ledger.columns['side'][rows][succeeded] == TradeSide.BUY
+            signed = np.where(buys, volumes[succeeded], -volumes[succeeded])
+            value = ledger.columns['price'][rows][succeeded] * volumes[succeeded]
+            fees = ledger.columns['fee'][rows][succeeded]
+            curve = EquityCurve.from_trades(self.initial_balance, close, bars[succeeded], np.where(buys, -(value + fees), value - fees), signed)
+
+        return self._collect_results(close[-1], symbol, curve=curve, first=first, stats=stats)
+
+    def _profiling(self, strategies: list[TradingStrategy], brokers: list[Broker], vectorized: bool = False):
+        """Returns a context manager timing the run of `strategies` with `self.profiler`, or doing nothing when profiling is off."""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.instrument(self, strategies, brokers, vectorized)
+
+    def _collect_results(self, stock_price: float, symbol: str, broker: Broker | None = None, curve: EquityCurve | None = None, first: int = 0, stats: tuple | None = None) -> dict:
+        """Returns the dictionary of stats of `broker` (the internal one by default), valuing owned stocks at `stock_price`.
+
+        With the `curve` of the run, the stats include it and its performance metrics, computed with the transactions
+        of the run (from position `first` of the broker's history). With `stats`, only these stats are returned.
+        """
+        broker = self.broker if broker is None else broker
         #Calculate statistics
-        final_balance = self.broker.get_balance()
-        initial_balance = 10000 #TODO - make it configurable
+        final_balance = broker.get_balance()
+        initial_balance = self.initial_balance
         profit = final_balance - initial_balance
-        trades = len(self.broker.get_transaction_history())
+        trades = len(broker.get_transaction_history())
 
         #current value of owned stocks:
-        stock_price = data[-1]['close']
-        owned_stocks = self.broker.portfolio[symbol] if symbol in self.broker.portfolio else 0
+        owned_stocks = broker.portfolio[symbol] if symbol in broker.portfolio else 0
         stock_value = owned_stocks * stock_price
 
         final_balance_with_stocks = final_balance + stock_value
         profit_with_stocks = final_balance_with_stocks - initial_balance
 
-        return {
+        metrics = METRICS if stats is None else tuple(stat for stat in stats if stat in METRICS)
+        results = {
             'initial_balance': initial_balance,
             'final_balance': final_balance,
             'final_balance_with_stocks': final_balance_with_stocks,
             'profit': profit,
             'profit_with_stocks': profit_with_stocks,
             'trades': trades,
-            'transaction_history': self.broker.get_transaction_history()
+            **(performance_metrics(curve, broker.transaction_history.to_numpy()[first:], self.periods_per_year, metrics) if curve is not None and metrics else {}),
+            'transaction_history': broker.get_transaction_history(),
+            **({'equity_curve': curve} if curve is not None else {}),
         }
+        return results if stats is None else {stat: results[stat] for stat in stats}
@@ -0,0 +1,90 @@
+import argparse
+import json
+import platform
+import sys
+
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.synthetic import generate_bars
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# memory differences below this are noise (interpreter caches, small lists growing)
+MEMORY_SLACK = 256 * 1024
+
+
+def run_benchmarks(sizes=SIZES, names=None, seed: int = 0, repeat: int = 1, memory: bool = True, log=print) -> dict:
+    """Measures every scenario (or the ones in `names`) on synthetic bars of every size and returns `scenario -> size (str) -> measurements`."""
+    results = {}
+    for size in sizes:
+        bars = generate_bars(size, seed=seed)
+        for scenario in SCENARIOS:
+            if names and scenario.name not in names:
+                continue
+            measurements = scenario.measure(bars, repeat=repeat, memory=memory)
+            results.setdefault(scenario.name, {})[str(size)] = measurements
+            peak = measurements['peak_memory']
+            memory_text = '-' if peak is None else f"{peak / 2 ** 20:,.1f} MiB"
+            log(f"{scenario.name.ljust(24)} {size:>9} bars  {measurements['bars_per_second']:>12,.0f} bars/s  {memory_text.rjust(12)}")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns the regressions of `results` against `baseline`: throughput more than `tolerance` (fraction) below it, or peak memory more than `tolerance` above it."""
+    regressions = []
+    for name, sizes in results.items():
+        for size, measurements in sizes.items():
+            reference = baseline.get(name, {}).get(size)
+            if reference is None:
+                continue
+            if measurements['bars_per_second'] < reference['bars_per_second'] * (1 - tolerance):
+                regressions.append(f"{name} ({size} bars): {measurements['bars_per_second']:,.0f} bars/s, baseline {reference['bars_per_second']:,.0f}")
+            peak, reference_peak = measurements['peak_memory'], reference.get('peak_memory')
+            if peak is not None and reference_peak is not None and peak > max(reference_peak * (1 + tolerance), reference_peak + MEMORY_SLACK):
+                regressions.append(f"{name} ({size} bars): peak memory {peak:,} bytes, baseline {reference_peak:,}")
+    return regressions
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """Command line entry point (`python -m benchmarks.run`), returns 1 if a regression against the baseline is found or there is no baseline (unless `--save-baseline`)."""
+    parser = argparse.ArgumentParser(description="Benchmarks the strategies, broker and data storage on synthetic bars (no network access).")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help="history lengths in bars")
+    parser.add_argument('--scenarios', nargs='+', help="scenarios to run (default: all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per measurement, the best one is kept")
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory measurement")
+    parser.add_argument('--baseline', default='benchmarks/baseline.json', help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline instead of checking them")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    options = parser.parse_args(arguments)
+
+    unknown = set(options.scenarios or []) - {scenario.name for scenario in SCENARIOS}
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if not options.save_baseline:
+        # without a baseline nothing can be checked, which must not pass for a successful check
+        try:
+            with open(options.baseline) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            print(f"No baseline at {options.baseline}, run with --save-baseline to create one")
+            return 1
+
+    results = run_benchmarks(options.sizes, options.scenarios, options.seed, options.repeat, not options.no_memory)
+
+    if options.save_baseline:
+        with open(options.baseline, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'seed': options.seed, 'results': results}, file, indent=2)
+        print(f"Baseline saved to {options.baseline}")
+        return 0
+
+    regressions = compare(results, baseline['results'], options.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regression against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
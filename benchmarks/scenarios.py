@@ -0,0 +1,93 @@
+import gc
+import time
+import tracemalloc
+
+from backtester import Backtester
+from broker import Broker
+from data_handler import BarSeries, DataStorage
+
+from strategies.basic.moving_average import MovingAverageStrategy
+from strategies.basic.RSI import RSIStrategy
+from strategies.basic.bollinger_bands import BollingerBandsStrategy
+from strategies.basic.stochastic_oscillator import StochasticOscillatorStrategy
+from strategies.basic.macd import MACDStrategy
+from strategies.basic.ichimoku_cloud import IchimokuCloudStrategy
+from strategies.basic.adx import ADXStrategy
+
+from strategies.hybrid.basic import HybridStrategy
+from strategies.hybrid.custom import CustomStrategy
+
+
+class Scenario:
+    def __init__(self, name: str, run: callable, prepare: callable = None) -> None:
+        """Constructor. `prepare(bars)` builds the input of `run` (not measured), `run(input)` is the measured work."""
+        self.name = name
+        self.run = run
+        self.prepare = prepare if prepare is not None else (lambda bars: bars)
+
+    def measure(self, bars: BarSeries, repeat: int = 1, memory: bool = True) -> dict:
+        """Runs the scenario on `bars` and returns `seconds` (best of `repeat` runs), `bars_per_second` and `peak_memory` (bytes allocated at the peak of one more run traced by `tracemalloc`, None without `memory`)."""
+        best = None
+        for _ in range(repeat):
+            data = self.prepare(bars)
+            gc.collect()
+            start = time.perf_counter()
+            self.run(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        peak = None
+        if memory:
+            # traced separately, tracing slows down allocations
+            data = self.prepare(bars)
+            gc.collect()
+            tracemalloc.start()
+            try:
+                self.run(data)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return {'seconds': best, 'bars_per_second': len(bars) / best if best else float('inf'), 'peak_memory': peak}
+
+
+def backtest(strategy_factory: callable, multiplier: float = 2) -> callable:
+    """Returns a scenario run backtesting a new strategy from `strategy_factory` on a list of data points."""
+    return lambda data: Backtester(10000).run_backtest(strategy_factory(), data, multiplier=multiplier)
+
+
+def trade(data: tuple) -> None:
+    """Alternates buys and sells of one share at every close, with the bar dates."""
+    prices, dates = data
+    broker = Broker(10000)
+    for i, (price, date) in enumerate(zip(prices, dates)):
+        broker.execute_trade('buy' if i % 2 == 0 else 'sell', 'SYN', price, 1, date)
+
+
+def store_and_read(bars) -> None:
+    """Stores the bars (a `BarSeries` or a dictionary of data points), slices the second half and reads it back as data points."""
+    storage = DataStorage()
+    storage.store_data('SYN', bars)
+    series = storage.get_bars('SYN')
+    storage.get_bars('SYN', start=series.index[len(series) // 2])
+    storage.get_data('SYN', time_frame=len(series) // 2)
+
+
+def to_data_points(bars: BarSeries) -> list:
+    """Returns the bars as the list of data points the backtester iterates on."""
+    return bars.to_list()
+
+
+SCENARIOS = [
+    Scenario('moving_average', backtest(lambda: MovingAverageStrategy(short_window=5, long_window=40)), to_data_points),
+    Scenario('rsi', backtest(lambda: RSIStrategy(period=14, overbought=70, oversold=30)), to_data_points),
+    Scenario('bollinger_bands', backtest(lambda: BollingerBandsStrategy(period=20, std_dev=2)), to_data_points),
+    Scenario('stochastic_oscillator', backtest(lambda: StochasticOscillatorStrategy(period=20, overbought=80, oversold=20)), to_data_points),
+    Scenario('macd', backtest(lambda: MACDStrategy(short_window=12, long_window=26, signal_window=9)), to_data_points),
+    Scenario('ichimoku_cloud', backtest(IchimokuCloudStrategy), to_data_points),
+    Scenario('adx', backtest(lambda: ADXStrategy(period=20)), to_data_points),
+    Scenario('hybrid', backtest(lambda: HybridStrategy([IchimokuCloudStrategy(), ADXStrategy(period=20)], weights=[0.5, 0.5])), to_data_points),
+    Scenario('custom', backtest(lambda: CustomStrategy([IchimokuCloudStrategy(), ADXStrategy(period=20)], buy_merging_function=lambda x: x[0] * x[1], sell_merging_function=lambda x: x[0] * x[1])), to_data_points),
+    Scenario('broker_execute_trade', trade, lambda bars: (bars['close'].tolist(), bars.dates())),
+    Scenario('data_storage', store_and_read),
+    Scenario('data_storage_records', store_and_read, lambda bars: bars.to_dict()),
+]
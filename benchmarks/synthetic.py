@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from data_handler import BarSeries
+
+
+def generate_bars(count: int, seed: int = 0, start_price: float = 100.0, drift: float = 0.0002, volatility: float = 0.02,
+                  start: str = '2000-01-03', frequency: str = '1min') -> BarSeries:
+    """Returns `count` synthetic bars following a geometric Brownian motion, the same for a given `seed`.
+
+    Closes follow `close[i] = close[i - 1] * exp(N(drift, volatility))`, each open is the previous close with a small gap,
+    high and low extend the open/close range by a random fraction, and volumes are log-normal.
+    Bars are spaced by `frequency` from `start` (minutes by default, so that a million bars fit in the `datetime64[ns]` range).
+    """
+    generator = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(generator.normal(drift, volatility, count)))
+    previous = np.concatenate(([start_price], close[:-1]))
+    open_ = previous * np.exp(generator.normal(0, volatility / 4, count))
+    high = np.maximum(open_, close) * (1 + np.abs(generator.normal(0, volatility / 2, count)))
+    low = np.minimum(open_, close) * (1 - np.abs(generator.normal(0, volatility / 2, count)))
+    volume = np.round(generator.lognormal(11, 0.5, count))
+    index = np.datetime64(start, 'ns') + np.arange(count) * pd.Timedelta(frequency).to_timedelta64()
+    return BarSeries(index, {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
@@ -1,67 +1,165 @@
+import math
+import numpy as np
+from costs import CommissionModel, SlippageModel
+from ledger import TradeSide, TradeStatus, TransactionLedger
+from orders import Order, OrderBook
+
 
 class Broker:
-    def __init__(self, initial_balance: float) -> None:
-        """Constructor."""
+    def __init__(self, initial_balance: float, commission: CommissionModel | None = None, slippage: SlippageModel | None = None, volume_limit: float | None = None) -> None:
+        """Constructor.
+
+        `commission` (see `costs`) charges a fee on every successful trade, paid from the cash: on top of the cost of a buy,
+        out of the proceeds of a sell. `slippage` moves the price of market fills against the trade (immediate trades,
+        market and stop orders; limit orders fill at their price or better). Without them trades are free and exact.
+        `volume_limit` caps the pending orders filled on a bar at this fraction of the bar's volume, shared by the orders
+        in the order they are matched, the rest of an order waiting for the next bars (partial fills).
+        Pending orders wait in `order_book` (see `orders.OrderBook`) until `process_bar` fills them.
+        """
         self.balance = initial_balance
         self.portfolio = {}
-        self.transaction_history = []
+        self.transaction_history = TransactionLedger()
+        self.commission = commission
+        self.slippage = slippage
+        self.volume_limit = volume_limit
+        self.order_book = OrderBook()
 
-    def execute_trade(self, trade_type: str, symbol: str, price: float, volume: float) -> bool:
+    def execute_trade(self, trade_type: str, symbol: str, price: float, volume: float, time=None) -> bool:
         """Simulates the execution of a trade, returns True if success, False if failed, logs the transaction in the `transaction_history`.
 
-        Handles buying, selling, and insufficient funds cases.
+        Handles buying, selling, and insufficient funds cases. `time` is the date of the bar the trade happens on.
+        The trade fills at `price` moved by the slippage model, if any.
         """
         if trade_type == 'buy':
-            cost = price * volume
+            side = TradeSide.BUY
+        elif trade_type == 'sell':
+            side = TradeSide.SELL
+        else:
+            return False
+        if self.slippage is not None:
+            price = float(self.slippage(side, price, volume))
+        return self._fill(side, symbol, price, volume, time)
+
+    def _fill(self, side: TradeSide, symbol: str, price: float, volume: float, time=None) -> bool:
+        """Trades `volume` stocks at `price` (slippage already applied) and pays the commission, returns True if success."""
+        fee = float(self.commission(price, volume)) if self.commission is not None else 0.0
+        if side == TradeSide.BUY:
+            cost = price * volume + fee
             if self.balance >= cost:
                 self.balance -= cost
                 if symbol in self.portfolio:
                   self.portfolio[symbol] += volume
                 else:
                   self.portfolio[symbol] = volume
-                self.transaction_history.append({
-                    'time': 'now',  # Placeholder for actual time
-                    'type': 'buy',
-                    'symbol': symbol,
-                    'price': price,
-                    'volume': volume,
-                    'status': 'success'
-                })
+                self.transaction_history.append(TradeSide.BUY, symbol, price, volume, TradeStatus.SUCCESS, time, fee)
                 return True
             else:
-                self.transaction_history.append({
-                    'time': 'now',  # Placeholder for actual time
-                    'type': 'buy',
-                    'symbol': symbol,
-                    'price': price,
-                    'volume': volume,
-                    'status': 'failure (insufficient funds)'
-                })
+                self.transaction_history.append(TradeSide.BUY, symbol, price, volume, TradeStatus.INSUFFICIENT_FUNDS, time)
                 return False
-        elif trade_type == 'sell':
+        else:
           if symbol in self.portfolio and self.portfolio[symbol] >= volume:
-            self.balance += price * volume
+            self.balance += price * volume - fee
             self.portfolio[symbol] -= volume
-            self.transaction_history.append({
-                'time': 'now',  # Placeholder for actual time
-                'type': 'sell',
-                'symbol': symbol,
-                'price': price,
-                'volume': volume,
-                'status': 'success'
-            })
+            self.transaction_history.append(TradeSide.SELL, symbol, price, volume, TradeStatus.SUCCESS, time, fee)
             return True
           else:
-            self.transaction_history.append({
-                'time': 'now',  # Placeholder for actual time
-                'type': 'sell',
-                'symbol': symbol,
-                'price': price,
-                'volume': volume,
-                 'status': 'failure (not enough assets)'
-            })
+            self.transaction_history.append(TradeSide.SELL, symbol, price, volume, TradeStatus.NOT_ENOUGH_ASSETS, time)
             return False
-        return False
+
+    def execute_trades(self, trade_types: list, symbol: str, prices: list, volumes: list, times=None) -> int:
+        """Executes a batch of trades in order, exactly like consecutive `execute_trade` calls, returns the number of successful trades.
+
+        Balance and position are kept in local variables and written back once, this is the broker kernel of the vectorized backtest.
+        Slippage and commissions are computed for the whole batch at once.
+        `times` holds the bar date of every trade (see `TransactionLedger.extend`), None if unknown.
+        """
+        fees = [0.0] * len(prices)
+        if len(prices) and (self.slippage is not None or self.commission is not None):
+            price_array, volume_array = np.asarray(prices, dtype=float), np.asarray(volumes, dtype=float)
+            if self.slippage is not None:
+                sides = np.where(np.asarray(trade_types) == 'buy', TradeSide.BUY, TradeSide.SELL)
+                price_array = self.slippage(sides, price_array, volume_array)
+                prices = price_array.tolist()
+            if self.commission is not None:
+                fees = np.broadcast_to(self.commission(price_array, volume_array), price_array.shape).tolist()
+        balance = self.balance
+        held = symbol in self.portfolio
+        position = self.portfolio[symbol] if held else 0
+        kept, sides, statuses, paid = [], [], [], []
+        for row, (trade_type, price, volume, fee) in enumerate(zip(trade_types, prices, volumes, fees)):
+            if trade_type == 'buy':
+                side = TradeSide.BUY
+                cost = price * volume + fee
+                if balance >= cost:
+                    balance -= cost
+                    position = position + volume if held else volume
+                    held = True
+                    status = TradeStatus.SUCCESS
+                else:
+                    status = TradeStatus.INSUFFICIENT_FUNDS
+            elif trade_type == 'sell':
+                side = TradeSide.SELL
+                if held and position >= volume:
+                    balance += price * volume - fee
+                    position -= volume
+                    status = TradeStatus.SUCCESS
+                else:
+                    status = TradeStatus.NOT_ENOUGH_ASSETS
+            else:
+                continue
+            kept.append(row)
+            sides.append(side)
+            statuses.append(status)
+            paid.append(fee if status == TradeStatus.SUCCESS else 0.0)
+
+        self.balance = balance
+        if held:
+            self.portfolio[symbol] = position
+        if len(kept) < len(prices):
+            # unknown trade types are not recorded
+            prices, volumes = [prices[row] for row in kept], [volumes[row] for row in kept]
+            times = None if times is None else np.asarray(times)[kept]
+        self.transaction_history.extend(sides, symbol, prices, volumes, statuses, times, paid)
+        return statuses.count(TradeStatus.SUCCESS)
+
+    def place_order(self, order: Order, symbol: str) -> int:
+        """Places a pending order on `symbol` and returns its id, it fills from the next bar given to `process_bar`."""
+        return self.order_book.add(order, symbol)
+
+    def cancel_order(self, order_id: int) -> bool:
+        """Cancels a pending order (its unfilled part), returns False if it is not pending."""
+        return self.order_book.cancel(order_id)
+
+    def process_bar(self, symbol: str, bar: dict, time=None) -> int:
+        """Fills the pending orders of `symbol` reached by a new bar (a data point with `open`, `high`, `low` and `volume`), returns the number of fills.
+
+        Only the triggered orders are visited (see `OrderBook.match`). An order that fails (insufficient funds, not
+        enough assets) is cancelled; one limited by `volume_limit` is partially filled and keeps waiting for the rest.
+        Volumes are whole stocks.
+        """
+        matched = self.order_book.match(symbol, bar['open'], bar['high'], bar['low'])
+        if not matched:
+            return 0
+        available = self.volume_limit * bar['volume'] // 1 if self.volume_limit is not None else math.inf
+        fills = 0
+        for order, price, market in matched:
+            volume = min(order.remaining, available)
+            if volume <= 0:
+                self.order_book.restore(order)
+                continue
+            if market and self.slippage is not None:
+                price = float(self.slippage(order.side, price, volume))
+            if not self._fill(order.side, symbol, price, volume, time):
+                self.order_book.remove(order)
+                continue
+            fills += 1
+            available -= volume
+            order.remaining -= volume
+            if order.remaining > 0:
+                self.order_book.restore(order)
+            else:
+                self.order_book.remove(order)
+        return fills
 
     def get_balance(self) -> float:
         """Returns current balance."""
@@ -71,6 +169,6 @@ class Broker:
         """Returns current portfolio."""
         return self.portfolio
 
-    def get_transaction_history(self) -> list:
-        """Returns transaction history"""
+    def get_transaction_history(self) -> TransactionLedger:
+        """Returns transaction history (a `TransactionLedger`, a sequence of transaction dictionaries)"""
         return self.transaction_history
@@ -0,0 +1,81 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+from ledger import TradeSide
+
+
+class CommissionModel(ABC):
+    @abstractmethod
+    def __call__(self, price, volume):
+        """Abstract method, returns the fee of trading `volume` stocks at `price` (scalars, or NumPy arrays of trades)."""
+        pass
+
+
+class FixedCommission(CommissionModel):
+    def __init__(self, amount: float) -> None:
+        """Constructor. Every trade costs `amount`."""
+        self.amount = amount
+
+    def __call__(self, price, volume):
+        """Returns the fixed fee of every trade."""
+        return np.full(np.shape(price), float(self.amount))
+
+
+class PercentageCommission(CommissionModel):
+    def __init__(self, rate: float, minimum: float = 0) -> None:
+        """Constructor. Every trade costs `rate` times its value (e.g. 0.001 for 0.1%), at least `minimum`."""
+        self.rate = rate
+        self.minimum = minimum
+
+    def __call__(self, price, volume):
+        """Returns the fee proportional to the value of the trade."""
+        return np.maximum(self.rate * price * volume, self.minimum)
+
+
+class PerShareCommission(CommissionModel):
+    def __init__(self, per_share: float, minimum: float = 0) -> None:
+        """Constructor. Every trade costs `per_share` per stock traded, at least `minimum`."""
+        self.per_share = per_share
+        self.minimum = minimum
+
+    def __call__(self, price, volume):
+        """Returns the fee proportional to the number of stocks traded."""
+        return np.maximum(self.per_share * volume, self.minimum)
+
+
+class SlippageModel(ABC):
+    @abstractmethod
+    def __call__(self, side, price, volume):
+        """Abstract method, returns the price a market order of `side` (a `TradeSide`) for `volume` stocks gets when the quoted price is `price` (scalars, or NumPy arrays of trades)."""
+        pass
+
+
+class FixedSlippage(SlippageModel):
+    def __init__(self, amount: float) -> None:
+        """Constructor. Buys pay `amount` more than the quoted price, sells get `amount` less."""
+        self.amount = amount
+
+    def __call__(self, side, price, volume):
+        """Returns the price moved against the trade by a fixed amount."""
+        return np.where(np.equal(side, TradeSide.BUY), price + self.amount, price - self.amount)
+
+
+class PercentageSlippage(SlippageModel):
+    def __init__(self, rate: float) -> None:
+        """Constructor. Buys pay `rate` (e.g. 0.0005 for 5 basis points) more than the quoted price, sells get `rate` less."""
+        self.rate = rate
+
+    def __call__(self, side, price, volume):
+        """Returns the price moved against the trade by a fraction of it."""
+        return np.where(np.equal(side, TradeSide.BUY), price * (1 + self.rate), price * (1 - self.rate))
+
+
+class VolumeImpactSlippage(SlippageModel):
+    def __init__(self, impact: float) -> None:
+        """Constructor. The price moves against the trade by `impact` (a fraction of the price) per stock traded, so larger orders fill worse."""
+        self.impact = impact
+
+    def __call__(self, side, price, volume):
+        """Returns the price moved against the trade in proportion to its volume."""
+        moved = price * self.impact * volume
+        return np.where(np.equal(side, TradeSide.BUY), price + moved, price - moved)
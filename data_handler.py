@@ -1,51 +1,573 @@
-import yfinance as yf
+import numpy as np
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import TYPE_CHECKING
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+# pandas (and yfinance) are imported by the functions using them, runs on cached bars don't load them
+if TYPE_CHECKING:
+    import pandas as pd
 
-class DataFetcher:
-    def __init__(self, source_type: str = 'yfinance') -> None:
-        """Constructor, sets the data source."""
-        self.source_type = source_type
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
 
-    def fetch_historical_data(self, symbol: str, start_date: str, end_date: str) -> dict:
-        """Fetches historical data for a given stock symbol, start date, and end date and returns a dictionary where keys are timestamps (or days) and values are dictionaries with fields like `open`, `high`, `low`, `close`, `volume`.
+UTC = ZoneInfo('UTC')
+
+
+def zone_info(timezone) -> ZoneInfo | None:
+    """Returns the `ZoneInfo` of a timezone name (like the ones stored by `BarCache`), None if `timezone` is not one (pandas handles it then)."""
+    if not isinstance(timezone, str):
+        return None
+    try:
+        return ZoneInfo(timezone)
+    except (ValueError, ZoneInfoNotFoundError):
+        return None
+
+
+def to_columns(data) -> dict:
+    """Returns a dictionary with one NumPy array per field (`open`, `high`, `low`, `close`, `volume`).
+
+    `data` is a `BarSeries` (its columns are returned without copying), a dictionary of columns (returned as is)
+    or a list of data points (dictionaries like the values from `DataFetcher`).
+    """
+    if isinstance(data, BarSeries):
+        return data.columns
+    if isinstance(data, dict):
+        return data
+    return {field: np.array([d[field] for d in data], dtype=float) for field in FIELDS}
+
+
+class BarSeries:
+    def __init__(self, index: np.ndarray, columns: dict, timezone=None, labels: np.ndarray | None = None) -> None:
+        """Constructor. `index` is a sorted `datetime64[ns]` array of UTC timestamps and `columns` maps each field to a float array of the same length.
+
+        `timezone` is only used to render the `date` strings of the list-of-dicts view, `labels` optionally overrides
+        those strings (series created from data points keep their original dates).
+        Contiguous float64 arrays are kept as they are, so slices of another `BarSeries` stay views.
+        """
+        self.index = np.asarray(index, dtype='datetime64[ns]')
+        self.columns = {field: np.ascontiguousarray(values, dtype=float) for field, values in columns.items()}
+        self.timezone = timezone
+        self.labels = labels
+
+    @classmethod
+    def from_dataframe(cls, frame: 'pd.DataFrame') -> 'BarSeries':
+        """Creates a series from a DataFrame with a DatetimeIndex and `Open`, `High`, `Low`, `Close`, `Volume` columns (like `yf.Ticker.history`)."""
+        import pandas as pd
+        if len(frame) == 0:
+            return cls(np.array([], dtype='datetime64[ns]'), {field: np.array([]) for field in FIELDS})
+        index = pd.DatetimeIndex(frame.index)
+        timezone = index.tz
+        if timezone is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        columns = {field: frame[field.capitalize()].to_numpy(dtype=float) for field in FIELDS}
+        return cls(index.to_numpy(dtype='datetime64[ns]'), columns, timezone)
+
+    @classmethod
+    def from_records(cls, data: dict | list) -> 'BarSeries':
+        """Creates a series from data points, either a dictionary keyed by date (like `DataFetcher.fetch_historical_data`) or a list of dictionaries with a `date` field."""
+        if isinstance(data, dict):
+            dates, records = list(data.keys()), list(data.values())
+        else:
+            dates, records = [d['date'] for d in data], data
+        import pandas as pd
+        index = pd.DatetimeIndex(pd.to_datetime(dates, utc=True)).tz_localize(None)
+        columns = {field: np.array([d[field] for d in records], dtype=float) for field in FIELDS}
+        return cls(index.to_numpy(dtype='datetime64[ns]'), columns, labels=np.array(dates, dtype=object))
+
+    @classmethod
+    def from_ticks(cls, index: np.ndarray, price: np.ndarray, volume: np.ndarray, timezone=None) -> 'BarSeries':
+        """Creates a series with one bar per trade (`open`, `high`, `low` and `close` all being the trade price), to be aggregated with `resample`."""
+        price = np.asarray(price, dtype=float)
+        columns = {field: price for field in FIELDS}
+        columns['volume'] = np.asarray(volume, dtype=float)
+        return cls(index, columns, timezone)
+
+    def __len__(self) -> int:
+        """Returns the number of bars."""
+        return len(self.index)
+
+    def __getitem__(self, key: str | slice) -> 'np.ndarray | BarSeries':
+        """Returns the column of a field (`bars['close']`), or the bars of a slice of positions (`bars[100:200]`) as a series.
+
+        Slices without a step share memory with this series.
+        """
+        if isinstance(key, slice):
+            labels = None if self.labels is None else self.labels[key]
+            return BarSeries(self.index[key], {field: values[key] for field, values in self.columns.items()}, self.timezone, labels)
+        return self.columns[key]
+
+    def _to_datetime64(self, value) -> np.datetime64:
+        """Converts a date (string, datetime or datetime64) to a UTC datetime64, naive dates being in the series' timezone.
+
+        ISO strings are parsed without pandas when the timezone is None or a name.
+        """
+        zone = zone_info(self.timezone)
+        if isinstance(value, str) and (self.timezone is None or zone is not None):
+            try:
+                moment = datetime.fromisoformat(value)
+            except ValueError:
+                moment = None
+            if moment is not None:
+                if moment.tzinfo is None and zone is not None:
+                    moment = moment.replace(tzinfo=zone)
+                if moment.tzinfo is not None:
+                    moment = moment.astimezone(UTC).replace(tzinfo=None)
+                return np.datetime64(moment, 'ns')
+        import pandas as pd
+        timestamp = pd.Timestamp(value)
+        if timestamp.tzinfo is None and self.timezone is not None:
+            timestamp = timestamp.tz_localize(self.timezone)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+        return timestamp.to_datetime64()
+
+    def wall_clock(self) -> np.ndarray:
+        """Returns the local time of the bars in the series' timezone (UTC if it has none) as int64 nanoseconds."""
+        if self.timezone is None:
+            return self.index.view(np.int64)
+        import pandas as pd
+        return pd.DatetimeIndex(self.index).tz_localize('UTC').tz_convert(self.timezone).tz_localize(None).asi8
+
+    def resample(self, frequency: str) -> 'BarSeries':
+        """Aggregates the bars (or ticks, see `from_ticks`) into bars of a fixed-length `frequency` (e.g. `5min`, `1h`, `1D`).
+
+        Bars are grouped by the multiple of `frequency` their local time falls in (so days start at midnight in the series'
+        timezone) and labelled with the start of their group. Groups are contiguous runs of the sorted index, reduced at once
+        with `np.ufunc.reduceat`: first open, highest high, lowest low, last close, total volume. Empty groups have no bar.
+        """
+        if len(self) == 0:
+            return self
+        import pandas as pd
+        step = pd.Timedelta(frequency).value
+        wall = self.wall_clock()
+        buckets = wall // step
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        ends = np.append(starts[1:], len(self)) - 1
+        columns = {
+            'open': self.columns['open'][starts],
+            'high': np.maximum.reduceat(self.columns['high'], starts),
+            'low': np.minimum.reduceat(self.columns['low'], starts),
+            'close': self.columns['close'][ends],
+            'volume': np.add.reduceat(self.columns['volume'], starts),
+        }
+        # the group start in UTC, with the UTC offset of the group's first bar
+        index = buckets[starts] * step - (wall[starts] - self.index[starts].view(np.int64))
+        return BarSeries(index.view('datetime64[ns]'), columns, self.timezone)
+
+    def between(self, start=None, end=None) -> 'BarSeries':
+        """Returns the bars with `start <= date < end` (None for an open bound) as a view, found by binary search in O(log n)."""
+        first = 0 if start is None else int(np.searchsorted(self.index, self._to_datetime64(start), side='left'))
+        last = len(self) if end is None else int(np.searchsorted(self.index, self._to_datetime64(end), side='left'))
+        return self[first:max(first, last)]
+
+    def tail(self, count: int) -> 'BarSeries':
+        """Returns the last `count` bars as a view."""
+        return self[max(len(self) - count, 0):]
+
+    def dates(self) -> list[str]:
+        """Returns the date strings of the bars, formatted like the keys of `DataFetcher.fetch_historical_data`."""
+        if self.labels is not None:
+            return self.labels.tolist()
+        zone = zone_info(self.timezone)
+        if (self.timezone is None or zone is not None) and not (self.index.view(np.int64) % 1000).any():
+            # whole microseconds convert to datetimes, printed like pandas timestamps
+            moments = self.index.astype('datetime64[us]').tolist()
+            if zone is not None:
+                moments = [moment.replace(tzinfo=UTC).astimezone(zone) for moment in moments]
+            return [str(moment) for moment in moments]
+        import pandas as pd
+        index = pd.DatetimeIndex(self.index)
+        if self.timezone is not None:
+            index = index.tz_localize('UTC').tz_convert(self.timezone)
+        return [str(timestamp) for timestamp in index]
+
+    def to_list(self) -> list:
+        """Returns the bars as a list of dictionaries with fields like `open`, `high`, `low`, `close`, `volume`, `date`."""
+        fields = list(self.columns)
+        rows = zip(*(self.columns[field].tolist() for field in fields), self.dates())
+        return [dict(zip(fields, row[:-1]), date=row[-1]) for row in rows]
+
+    def iter_bars(self, chunk_size: int = 65536):
+        """Yields the bars as data points like `to_list`, creating them `chunk_size` at a time so that memory does not grow with the series."""
+        for start in range(0, len(self), chunk_size):
+            yield from self[start:start + chunk_size].to_list()
+
+    def to_dict(self) -> dict:
+        """Returns the bars as a dictionary keyed by date, like `DataFetcher.fetch_historical_data`."""
+        return {data_point['date']: data_point for data_point in self.to_list()}
+
+
+class BarCache:
+    def __init__(self, directory: str, source: callable) -> None:
+        """Constructor. Bars are cached in `directory`, `source(symbol, start_date, end_date)` fetches the missing ones as a `BarSeries`.
+
+        Each symbol is stored as `<symbol>.bars.npy` (one row per field), `<symbol>.index.npy` (datetime64[ns] UTC) and
+        `<symbol>.json` (the date ranges already fetched and the timezone). The arrays are opened memory-mapped.
+        """
+        self.directory = directory
+        self.source = source
+
+    def get(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Returns the bars of `symbol` with `start_date <= date < end_date` (`%Y-%m-%d`), fetching only the date ranges that were never fetched."""
+        bars, ranges = self.load(symbol)
+        start, end = np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D')
+        gaps = self.missing_ranges(ranges, start, end)
+        if gaps:
+            fetched = [self.source(symbol, str(gap_start), str(gap_end)) for gap_start, gap_end in gaps]
+            # the current day may still get new bars, so it is never marked as fetched
+            today = np.datetime64('today', 'D')
+            ranges = self.merge_ranges(ranges + [(gap_start, min(gap_end, today)) for gap_start, gap_end in gaps if gap_start < today])
+            bars = self.merge_bars([bars] + fetched)
+            self.save(symbol, bars, ranges)
+        return bars.between(start_date, end_date)
+
+    def _path(self, symbol: str, suffix: str) -> str:
+        """Returns the path of one of the files of `symbol`."""
+        return os.path.join(self.directory, symbol.replace(os.sep, '_') + suffix)
+
+    def load(self, symbol: str) -> tuple[BarSeries, list]:
+        """Returns the cached bars of `symbol` (memory-mapped) and the list of fetched `(start, end)` date ranges, empty if nothing is cached."""
+        empty = BarSeries(np.array([], dtype='datetime64[ns]'), {field: np.array([]) for field in FIELDS})
+        try:
+            with open(self._path(symbol, '.json')) as file:
+                meta = json.load(file)
+            if meta['length'] == 0:
+                bars = empty
+            else:
+                values = np.load(self._path(symbol, '.bars.npy'), mmap_mode='r')
+                index = np.load(self._path(symbol, '.index.npy'), mmap_mode='r')
+                if len(index) != meta['length'] or values.shape != (len(FIELDS), meta['length']):
+                    return empty, []
+                bars = BarSeries(index, dict(zip(FIELDS, values)), meta['timezone'])
+        except (OSError, ValueError, KeyError):
+            return empty, []
+        ranges = [(np.datetime64(start, 'D'), np.datetime64(end, 'D')) for start, end in meta['ranges']]
+        return bars, ranges
+
+    def save(self, symbol: str, bars: BarSeries, ranges: list) -> None:
+        """Writes the bars and fetched date ranges of `symbol`, each file being replaced atomically (the metadata last)."""
+        os.makedirs(self.directory, exist_ok=True)
+        if len(bars) > 0:
+            self._write(self._path(symbol, '.bars.npy'), lambda file: np.save(file, np.stack([bars[field] for field in FIELDS])))
+            self._write(self._path(symbol, '.index.npy'), lambda file: np.save(file, bars.index))
+        meta = {
+            'length': len(bars),
+            'timezone': None if bars.timezone is None else str(bars.timezone),
+            'ranges': [[str(start), str(end)] for start, end in ranges],
+        }
+        self._write(self._path(symbol, '.json'), lambda file: file.write(json.dumps(meta).encode()))
+
+    def _write(self, path: str, write: callable) -> None:
+        """Writes a file through a temporary file and `os.replace`, so readers never see a partial file."""
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            write(file)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def missing_ranges(ranges: list, start: np.datetime64, end: np.datetime64) -> list:
+        """Returns the parts of `[start, end)` not covered by the sorted, disjoint `ranges`."""
+        gaps = []
+        cursor = start
+        for range_start, range_end in ranges:
+            if range_end <= cursor:
+                continue
+            if range_start >= end:
+                break
+            if range_start > cursor:
+                gaps.append((cursor, range_start))
+            cursor = max(cursor, range_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    @staticmethod
+    def merge_ranges(ranges: list) -> list:
+        """Returns the union of date ranges as a sorted list of disjoint ranges (touching ranges are joined)."""
+        merged = []
+        for start, end in sorted(ranges):
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def merge_bars(series: list) -> BarSeries:
+        """Merges several series into one sorted by date, later series winning for duplicated timestamps."""
+        series = [bars for bars in series if len(bars) > 0]
+        timezone = next((bars.timezone for bars in reversed(series) if bars.timezone is not None), None)
+        if not series:
+            return BarSeries(np.array([], dtype='datetime64[ns]'), {field: np.array([]) for field in FIELDS}, timezone)
+        # reversed so that `np.unique` (which keeps the first occurrence) keeps the most recent fetch
+        index = np.concatenate([bars.index for bars in reversed(series)])
+        index, positions = np.unique(index, return_index=True)
+        columns = {field: np.concatenate([bars[field] for bars in reversed(series)])[positions] for field in FIELDS}
+        return BarSeries(index, columns, timezone)
+
+
+class DataSource(ABC):
+    @abstractmethod
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Abstract method, returns the bars of `symbol` with `start_date <= date < end_date` (`%Y-%m-%d`).
 
         Raises:
-            ValueError: If the source type is invalid or if there is an error with the data.
+            ValueError: If the data cannot be fetched.
+        """
+        pass
+
+
+class YFinanceSource(DataSource):
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Downloads the bars from Yahoo Finance.
+
+        Raises:
+            ValueError: If there is an error with the data.
         """
-        if self.source_type != 'yfinance':
-            raise ValueError(f"Invalid source type: {self.source_type}")
         try:
+            import yfinance as yf
             start = datetime.strptime(start_date, '%Y-%m-%d')
             end = datetime.strptime(end_date, '%Y-%m-%d')
-            
+
             yf_ticker = yf.Ticker(symbol)
             yf_history = yf_ticker.history(start=start, end=end)
-            
-            data = {}
-            for index, row in yf_history.iterrows():
-                data[str(index)] = {
-                    'open': row['Open'],
-                    'high': row['High'],
-                    'low': row['Low'],
-                    'close': row['Close'],
-                    'volume': row['Volume'],
-                    'date': str(index)
-                }
-            return data
+
+            return BarSeries.from_dataframe(yf_history)
         except Exception as e:
             raise ValueError(f"Error fetching data: {e}")
 
 
+class FileSource(DataSource):
+    def __init__(self, directory: str, pattern: str) -> None:
+        """Constructor. The bars of a symbol are read from `directory/pattern`, `{symbol}` in `pattern` being replaced by the symbol."""
+        self.directory = directory
+        self.pattern = pattern
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Reads the file of `symbol` and returns the requested date range.
+
+        Raises:
+            ValueError: If the file is missing or cannot be read.
+        """
+        path = os.path.join(self.directory, self.pattern.format(symbol=symbol))
+        try:
+            frame = self.read(path)
+        except FileNotFoundError:
+            raise ValueError(f"No data file for {symbol}: {path}")
+        except Exception as e:
+            raise ValueError(f"Error reading {path}: {e}")
+        return BarSeries.from_dataframe(frame.sort_index()).between(start_date, end_date)
+
+    @abstractmethod
+    def read(self, path: str) -> 'pd.DataFrame':
+        """Abstract method, returns the bars stored in `path` as a DataFrame indexed by date with `Open`, `High`, `Low`, `Close`, `Volume` columns (like yfinance)."""
+        pass
+
+
+class CSVSource(FileSource):
+    def __init__(self, directory: str, pattern: str = '{symbol}.csv', date_column: str = 'Date') -> None:
+        """Constructor. Files have a `date_column` column and the fields as columns (any capitalization)."""
+        super().__init__(directory, pattern)
+        self.date_column = date_column
+
+    def read(self, path: str) -> 'pd.DataFrame':
+        """Reads a CSV file."""
+        import pandas as pd
+        return self._index(pd.read_csv(path))
+
+    def iter_bars(self, symbol: str, chunk_size: int = 65536):
+        """Yields the bars of `symbol` as data points (like `BarSeries.to_list`), reading the file `chunk_size` rows at a time.
+
+        Memory does not grow with the file, which must be sorted by date. Can be passed to `Backtester.run_backtest`.
+        """
+        import pandas as pd
+        path = os.path.join(self.directory, self.pattern.format(symbol=symbol))
+        for frame in pd.read_csv(path, chunksize=chunk_size):
+            yield from BarSeries.from_dataframe(self._index(frame)).to_list()
+
+    def _index(self, frame: 'pd.DataFrame') -> 'pd.DataFrame':
+        """Indexes the rows of a CSV file by their date and capitalizes the field columns."""
+        import pandas as pd
+        dates = frame.pop(self.date_column)
+        try:
+            # exported bars usually have ISO dates, with offsets changing at DST
+            frame.index = pd.to_datetime(dates, utc=True, format='ISO8601')
+        except ValueError:
+            frame.index = pd.to_datetime(dates, utc=True)
+        return frame.rename(columns=str.capitalize)
+
+
+class ParquetSource(FileSource):
+    def __init__(self, directory: str, pattern: str = '{symbol}.parquet') -> None:
+        """Constructor. Files hold a DataFrame indexed by date with the fields as columns (any capitalization), needs `pyarrow` or `fastparquet`."""
+        super().__init__(directory, pattern)
+
+    def read(self, path: str) -> 'pd.DataFrame':
+        """Reads a Parquet file."""
+        import pandas as pd
+        return pd.read_parquet(path).rename(columns=str.capitalize)
+
+
+class ArchiveSource(DataSource):
+    def __init__(self, directory: str, frequency: str | None = None) -> None:
+        """Constructor. Serves the bars of a `BarArchive` (see `archive.py`) as memory-mapped views, without copying them.
+
+        With `frequency` (e.g. `1min` for a tick archive), the requested bars are aggregated into bars of that timeframe.
+        The archive is already on disk, so the fetcher needs no `cache_dir`.
+        """
+        from archive import BarArchive
+        self.archive = BarArchive(directory)
+        self.frequency = frequency
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Returns the archived bars in the requested date range.
+
+        Raises:
+            ValueError: If the symbol is not in the archive.
+        """
+        bars = self.archive.open(symbol).between(start_date, end_date)
+        return bars if self.frequency is None else bars.resample(self.frequency)
+
+
+class MemorySource(DataSource):
+    def __init__(self, bars: dict, latency: float = 0, failures: dict | None = None) -> None:
+        """Constructor. Serves `bars` (`symbol -> BarSeries`) from memory, to run and test without network access.
+
+        Every fetch waits `latency` seconds, and `failures` (`symbol -> count`) makes the first fetches of a symbol fail.
+        """
+        self.bars = bars
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Returns the stored bars in the requested date range.
+
+        Raises:
+            ValueError: If the symbol is unknown or a failure is simulated.
+        """
+        with self.lock:
+            self.calls[symbol] = self.calls.get(symbol, 0) + 1
+            failing = self.calls[symbol] <= self.failures.get(symbol, 0)
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise ValueError(f"Error fetching data: simulated failure for {symbol}")
+        if symbol not in self.bars:
+            raise ValueError(f"Error fetching data: unknown symbol {symbol}")
+        return self.bars[symbol].between(start_date, end_date)
+
+
+SOURCES = {
+    'yfinance': YFinanceSource,
+    'csv': CSVSource,
+    'parquet': ParquetSource,
+    'archive': ArchiveSource,
+    'memory': MemorySource,
+}
+
+
+class DataFetcher:
+    def __init__(self, source_type: str | DataSource = 'yfinance', cache_dir: str | None = None, **source_options) -> None:
+        """Constructor, sets the data source: a `DataSource` or the name of one in `SOURCES` created with `source_options`
+        (e.g. `DataFetcher('csv', directory='data')`). With `cache_dir`, bars are cached on disk (see `BarCache`) and only
+        missing date ranges are fetched.
+        """
+        if isinstance(source_type, DataSource):
+            self.source_type, self.source = type(source_type).__name__, source_type
+        else:
+            self.source_type = source_type
+            self.source = SOURCES[source_type](**source_options) if source_type in SOURCES else None
+        self.cache = None if cache_dir is None else BarCache(cache_dir, self._download)
+
+    def fetch_bars(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Fetches historical data for a given stock symbol, start date, and end date and returns it as a columnar `BarSeries`.
+
+        Raises:
+            ValueError: If the source type is invalid or if there is an error with the data.
+        """
+        if self.source is None:
+            raise ValueError(f"Invalid source type: {self.source_type}")
+        if self.cache is not None:
+            return self.cache.get(symbol, start_date, end_date)
+        return self._download(symbol, start_date, end_date)
+
+    def _download(self, symbol: str, start_date: str, end_date: str) -> BarSeries:
+        """Fetches historical data from the data source.
+
+        Raises:
+            ValueError: If there is an error with the data.
+        """
+        return self.source.fetch(symbol, start_date, end_date)
+
+    def fetch_many(self, symbols: list[str], start_date: str, end_date: str, max_workers: int = 8, retries: int = 3,
+                   backoff: float = 0.5, max_backoff: float = 8) -> tuple[dict, dict]:
+        """Fetches the bars of many symbols concurrently, returns `(symbol -> BarSeries, symbol -> error message)`.
+
+        At most `max_workers` fetches run at once, in threads, so the total time is about the time of the slowest fetches
+        rather than their sum. A failing fetch is retried up to `retries` times, waiting `backoff * 2 ** attempt` seconds
+        (at most `max_backoff`, with random jitter) in between. A symbol that still fails is reported in the errors and
+        does not affect the others. Both dictionaries follow the order of `symbols`.
+        """
+        def fetch(symbol: str) -> BarSeries:
+            for attempt in range(retries + 1):
+                try:
+                    return self.fetch_bars(symbol, start_date, end_date)
+                except ValueError:
+                    if attempt == retries or self.source is None:
+                        raise
+                    delay = min(backoff * 2 ** attempt, max_backoff)
+                    time.sleep(delay * random.uniform(0.5, 1))
+
+        bars, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as executor:
+            futures = {symbol: executor.submit(fetch, symbol) for symbol in dict.fromkeys(symbols)}
+            for symbol, future in futures.items():
+                try:
+                    bars[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = str(e)
+        return bars, errors
+
+    def fetch_historical_data(self, symbol: str, start_date: str, end_date: str) -> dict:
+        """Fetches historical data for a given stock symbol, start date, and end date and returns a dictionary where keys are timestamps (or days) and values are dictionaries with fields like `open`, `high`, `low`, `close`, `volume`.
+
+        Raises:
+            ValueError: If the source type is invalid or if there is an error with the data.
+        """
+        return self.fetch_bars(symbol, start_date, end_date).to_dict()
+
+
 class DataStorage:
     def __init__(self) -> None:
         """Constructor."""
         self.data = {}
 
-    def store_data(self, symbol: str, data: dict) -> None:
-        """Stores the fetched data for a given symbol."""
+    def store_data(self, symbol: str, data: BarSeries | dict) -> None:
+        """Stores the fetched data for a given symbol, either a `BarSeries` or a dictionary of data points keyed by date (converted to a `BarSeries`)."""
+        if not isinstance(data, BarSeries):
+            data = BarSeries.from_records(data)
         self.data[symbol] = data
 
+    def get_bars(self, symbol: str, start=None, end=None, frequency: str | None = None) -> BarSeries | None:
+        """Returns the bars of a given symbol with `start <= date < end` as a zero-copy `BarSeries` view (None if no data is found).
+
+        With `frequency` (e.g. `1h`), the bars are aggregated into bars of that timeframe (see `BarSeries.resample`).
+        """
+        if symbol not in self.data:
+            return None
+        bars = self.data[symbol].between(start, end)
+        return bars if frequency is None else bars.resample(frequency)
+
     def get_data(self, symbol: str, time_frame: int = 0) -> list:
         """Returns a list of data points for a given symbol and timeframe (0 for all available data, or number of historical data points to get). Each element in the list is a dictionary like the values from `DataFetcher`.
 
@@ -54,9 +576,9 @@ class DataStorage:
         """
         if symbol not in self.data:
             return []
-        
-        all_data = list(self.data[symbol].values())
+
+        bars = self.data[symbol]
         if time_frame == 0:
-            return all_data
+            return bars.to_list()
         else:
-            return all_data[-time_frame:]
+            return bars.tail(time_frame).to_list()
@@ -0,0 +1,414 @@
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+from backtester import Backtester
+from data_handler import DataFetcher
+from experiment import Checkpoint, ExperimentRunner, build_strategy, load_experiment
+
+# settings of the experiment a worker needs to run a unit (the ones its id depends on)
+TASK_SETTINGS = ('start', 'end', 'initial_balance', 'vectorized', 'source', 'source_options')
+
+
+class Coordinator:
+    def __init__(self, settings: dict, checkpoint: Checkpoint, lease_seconds: float = 60, max_attempts: int = 3, save_interval: float = 5, log=print) -> None:
+        """Constructor. Hands out the work units of an experiment (`experiment.load_experiment` settings) that `checkpoint` doesn't hold yet to workers.
+
+        A unit is leased to one worker for `lease_seconds`, renewed by the worker's heartbeats while it runs. A lease that
+        runs out (the worker died or lost the network) puts the unit back in the queue for another worker, as does a
+        failure reported by the worker, up to `max_attempts` leases per unit; the unit is then reported as failed.
+        Results are recorded in the checkpoint as they arrive (the first one wins if an expired lease completes late),
+        which is saved at most every `save_interval` seconds and when the experiment is done, so a stopped coordinator
+        resumes where it stopped.
+        """
+        self.settings = settings
+        self.checkpoint = checkpoint
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.save_interval = save_interval
+        self.log = log
+        units = ExperimentRunner(settings, checkpoint).units()
+        self.units = {unit.id: unit for unit in units}
+        self.pending = collections.deque(unit.id for unit in units if unit not in checkpoint)
+        self.leases = {}
+        self.attempts = collections.Counter()
+        self.failed = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.saved = time.monotonic()
+        self.server = None
+        if not self.pending:
+            self.finished.set()
+
+    def lease(self, worker: str) -> dict:
+        """Leases the next pending unit to `worker`: returns `{'task': ..., 'lease': seconds}`, `{'wait': seconds}` if all the units are leased, or `{'done': True}`."""
+        with self.lock:
+            self._expire()
+            if not self.pending:
+                return {'wait': min(self.lease_seconds / 4, 1.0)} if self.leases else {'done': True}
+            unit = self.units[self.pending.popleft()]
+            self.attempts[unit.id] += 1
+            self.leases[unit.id] = (worker, time.monotonic() + self.lease_seconds)
+        task = {
+            'id': unit.id,
+            'symbol': unit.symbol,
+            'strategy': unit.strategy,
+            'multiplier': unit.multiplier,
+            'settings': {setting: self.settings[setting] for setting in TASK_SETTINGS},
+        }
+        return {'task': task, 'lease': self.lease_seconds}
+
+    def renew(self, worker: str, task_id: str) -> bool:
+        """Extends the lease of `worker` on a unit, returns False if the worker doesn't hold it anymore."""
+        with self.lock:
+            if self.leases.get(task_id, (None,))[0] != worker:
+                return False
+            self.leases[task_id] = (worker, time.monotonic() + self.lease_seconds)
+            return True
+
+    def complete(self, worker: str, task_id: str, results: dict) -> bool:
+        """Records the results of a unit, returns False if they were already recorded (or the unit is unknown)."""
+        with self.lock:
+            unit = self.units.get(task_id)
+            if unit is None or unit in self.checkpoint:
+                return False
+            self.checkpoint.add(unit, results)
+            self.leases.pop(task_id, None)
+            self.failed.pop(task_id, None)
+            # the unit may be queued again after its lease expired
+            if task_id in self.pending:
+                self.pending.remove(task_id)
+            self._update()
+            return True
+
+    def fail(self, worker: str, task_id: str, error: str) -> None:
+        """Records a unit `worker` could not run: it is leased again, or failed after `max_attempts` leases."""
+        with self.lock:
+            if self.leases.get(task_id, (None,))[0] != worker:
+                return
+            del self.leases[task_id]
+            self._release(task_id, f"{worker}: {error}")
+            self._update()
+
+    def status(self) -> dict:
+        """Returns the number of units completed, pending, leased and failed, and the leases per worker."""
+        with self.lock:
+            workers = collections.Counter(worker for worker, _ in self.leases.values())
+            completed = sum(unit in self.checkpoint for unit in self.units.values())
+            return {'completed': completed, 'pending': len(self.pending), 'leased': len(self.leases), 'failed': len(self.failed), 'workers': dict(workers)}
+
+    def _release(self, task_id: str, error: str) -> None:
+        """Queues a unit whose lease ended without results again, or fails it after `max_attempts` leases (lock held)."""
+        unit = self.units[task_id]
+        if self.attempts[task_id] < self.max_attempts:
+            self.log(f"{unit} released ({error}), leasing it again")
+            self.pending.append(task_id)
+        else:
+            self.log(f"{unit} failed after {self.attempts[task_id]} attempts ({error})")
+            self.failed[task_id] = error
+
+    def _expire(self) -> None:
+        """Releases the units whose lease ran out (lock held)."""
+        now = time.monotonic()
+        for task_id, (worker, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[task_id]
+                self._release(task_id, f"lease of {worker} expired")
+        self._update()
+
+    def _update(self) -> None:
+        """Saves the checkpoint if it is due, and sets `finished` once no unit is pending or leased (lock held)."""
+        done = not self.pending and not self.leases
+        if done or time.monotonic() - self.saved >= self.save_interval:
+            self.checkpoint.save()
+            self.saved = time.monotonic()
+        if done:
+            self.finished.set()
+
+    def start(self, host: str = '127.0.0.1', port: int = 8765) -> tuple[str, int]:
+        """Starts serving the workers over HTTP in a background thread and returns the address listened to (`port` 0 picks a free port)."""
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.coordinator = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[:2]
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Waits until every unit is completed or failed (expiring leases meanwhile), returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.finished.wait(1.0 if deadline is None else min(1.0, max(deadline - time.monotonic(), 0))):
+            with self.lock:
+                self._expire()
+            if deadline is not None and time.monotonic() >= deadline:
+                return self.finished.is_set()
+        return True
+
+    def abandon(self, reason: str) -> None:
+        """Fails every unit still pending or leased (e.g. no worker is left to run them), which finishes the experiment."""
+        with self.lock:
+            for task_id in [*self.pending, *self.leases]:
+                self.log(f"{self.units[task_id]} failed ({reason})")
+                self.failed[task_id] = reason
+            self.pending.clear()
+            self.leases.clear()
+            self._update()
+
+    def stop(self) -> None:
+        """Stops serving and saves the checkpoint."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.lock:
+            self.checkpoint.save()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON over HTTP: `POST /lease`, `/renew`, `/complete`, `/fail` with a `worker` name (and `task` id), `GET /status`."""
+
+    def do_GET(self) -> None:
+        if self.path != '/status':
+            self._reply(404, {'error': f"Unknown path: {self.path}"})
+            return
+        self._reply(200, self.server.coordinator.status())
+
+    def do_POST(self) -> None:
+        coordinator = self.server.coordinator
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            worker = str(request['worker'])
+            if self.path == '/lease':
+                reply = coordinator.lease(worker)
+            elif self.path == '/renew':
+                reply = {'renewed': coordinator.renew(worker, request['task'])}
+            elif self.path == '/complete':
+                reply = {'recorded': coordinator.complete(worker, request['task'], request['results'])}
+            elif self.path == '/fail':
+                coordinator.fail(worker, request['task'], str(request['error']))
+                reply = {}
+            else:
+                self._reply(404, {'error': f"Unknown path: {self.path}"})
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {'error': f"Invalid request: {e}"})
+            return
+        self._reply(200, reply)
+
+    def _reply(self, code: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        # one line per request would drown the coordinator's log
+        pass
+
+
+class Worker:
+    def __init__(self, url: str, name: str | None = None, cache_dir: str | None = '.cache/bars', patience: float = 30, log=print) -> None:
+        """Constructor. Pulls units from the coordinator at `url` (e.g. `http://host:8765`), runs them and sends their results back one by one.
+
+        The worker fetches the bars itself (through its own cache in `cache_dir`, keeping the bars of the last symbols
+        in memory) and renews its lease while a unit runs. It stops when the coordinator has no units left, or when the
+        coordinator cannot be reached for `patience` seconds.
+        """
+        self.url = url.rstrip('/')
+        self.name = name or f"{os.uname().nodename}-{os.getpid()}"
+        self.cache_dir = cache_dir
+        self.patience = patience
+        self.log = log
+        self.fetchers = {}
+        self.bars = collections.OrderedDict()
+
+    def _call(self, path: str, payload: dict) -> dict:
+        """Posts `payload` (with the worker name) to the coordinator, retrying connection errors for up to `patience` seconds.
+
+        Raises:
+            ConnectionError: If the coordinator cannot be reached.
+        """
+        data = json.dumps({'worker': self.name, **payload}).encode()
+        deadline = time.monotonic() + self.patience
+        delay = 0.1
+        while True:
+            request = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return json.load(response)
+            except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+                if time.monotonic() + delay > deadline:
+                    raise ConnectionError(f"Coordinator {self.url} unreachable: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 5)
+
+    def run(self) -> int:
+        """Runs units until the coordinator has none left, returns the number of units run."""
+        done = 0
+        try:
+            while True:
+                reply = self._call('/lease', {})
+                if reply.get('done'):
+                    break
+                if 'wait' in reply:
+                    time.sleep(reply['wait'])
+                    continue
+                task = reply['task']
+                renewing = threading.Event()
+                heartbeat = threading.Thread(target=self._heartbeat, args=(task['id'], reply['lease'] / 3, renewing), daemon=True)
+                heartbeat.start()
+                try:
+                    results = self._execute(task)
+                except Exception as e:
+                    self.log(f"{self.name}: {task['symbol']} {task['strategy']['strategy']} failed: {e}")
+                    self._call('/fail', {'task': task['id'], 'error': str(e)})
+                    continue
+                finally:
+                    renewing.set()
+                    heartbeat.join()
+                self._call('/complete', {'task': task['id'], 'results': results})
+                done += 1
+        except ConnectionError as e:
+            self.log(f"{self.name}: {e}")
+        return done
+
+    def _heartbeat(self, task_id: str, interval: float, stopped: threading.Event) -> None:
+        """Renews the lease of a unit every `interval` seconds until `stopped` is set."""
+        while not stopped.wait(interval):
+            try:
+                self._call('/renew', {'task': task_id})
+            except ConnectionError:
+                return
+
+    def _fetch(self, symbol: str, settings: dict):
+        """Returns the bars of `symbol` for the task settings, from memory if a recent task used them."""
+        key = (symbol, settings['start'], settings['end'], settings['source'], json.dumps(settings['source_options'], sort_keys=True))
+        if key in self.bars:
+            self.bars.move_to_end(key)
+            return self.bars[key]
+        source = key[3:]
+        if source not in self.fetchers:
+            self.fetchers[source] = DataFetcher(settings['source'], cache_dir=self.cache_dir, **settings['source_options'])
+        bars = self.fetchers[source].fetch_bars(symbol, settings['start'], settings['end'])
+        if len(bars) == 0:
+            raise ValueError("no data")
+        self.bars[key] = bars
+        if len(self.bars) > 8:
+            self.bars.popitem(last=False)
+        return bars
+
+    def _execute(self, task: dict) -> dict:
+        """Runs the backtest of a unit in its own context (new strategy and `Backtester`) and returns its stats as JSON values."""
+        settings = task['settings']
+        bars = self._fetch(task['symbol'], settings)
+        strategy = build_strategy(task['strategy'])
+        backtester = Backtester(settings['initial_balance'])
+        data = bars if settings['vectorized'] else bars.iter_bars()
+        results = backtester.run_backtest(strategy, data, symbol=task['symbol'], multiplier=task['multiplier'], vectorized=settings['vectorized'])
+        return {name: value.item() if isinstance(value, np.generic) else value for name, value in results.items() if name not in ('transaction_history', 'equity_curve')}
+
+
+def _report(coordinator: Coordinator, output: str | None, path: str) -> int:
+    """Prints the failed units, writes the results to `output` (CSV) if given, returns 1 if some units are not completed."""
+    for task_id, error in coordinator.failed.items():
+        print(f"Error running {coordinator.units[task_id]}: {error}")
+    units = coordinator.units.values()
+    completed = [coordinator.checkpoint.completed[unit.id] for unit in units if unit in coordinator.checkpoint]
+    if output:
+        import pandas as pd
+        pd.DataFrame(completed).to_csv(output, index=False)
+    print(f"{len(completed)}/{len(units)} units completed, checkpoint in {path}")
+    return 0 if len(completed) == len(units) else 1
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """Command line entry point.
+
+    `python distributed.py coordinate experiment.yaml --host 0.0.0.0 --port 8765` serves the units of an experiment,
+    `python distributed.py work http://host:8765` runs a worker (as many as wanted, on any machine that has the
+    strategies and can fetch the bars), and `python distributed.py local experiment.yaml --workers 4` runs a coordinator
+    and several workers on this machine.
+    """
+    parser = argparse.ArgumentParser(description="Runs the backtests of a YAML experiment matrix on workers pulling them from a coordinator over HTTP.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ('coordinate', 'local'):
+        subparser = commands.add_parser(command, help="serve the units of an experiment" if command == 'coordinate' else "run a coordinator and workers on this machine")
+        subparser.add_argument('experiment', help="experiment file (YAML, see experiment.py)")
+        subparser.add_argument('--checkpoint', help="checkpoint file (default: the experiment file with a .checkpoint.json extension)")
+        subparser.add_argument('--output', help="CSV file receiving the results of every completed unit")
+        subparser.add_argument('--restart', action='store_true', help="ignore the checkpoint and run every unit again")
+        subparser.add_argument('--lease', type=float, default=60, help="seconds a worker holds a unit without renewing its lease")
+        subparser.add_argument('--attempts', type=int, default=3, help="leases of a unit before it is reported as failed")
+    coordinate, local = commands.choices['coordinate'], commands.choices['local']
+    coordinate.add_argument('--host', default='127.0.0.1', help="address to listen on (0.0.0.0 for workers on other machines)")
+    coordinate.add_argument('--port', type=int, default=8765)
+    coordinate.add_argument('--linger', type=float, default=5, help="seconds to keep answering once done, so idle workers learn it")
+    local.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    local.add_argument('--cache-dir', default='.cache/bars')
+    work = commands.add_parser('work', help="run a worker")
+    work.add_argument('url', help="coordinator URL, e.g. http://host:8765")
+    work.add_argument('--name', help="worker name (default: host name and process id)")
+    work.add_argument('--cache-dir', default='.cache/bars')
+    work.add_argument('--patience', type=float, default=30, help="seconds to wait for an unreachable coordinator before stopping")
+    options = parser.parse_args(arguments)
+
+    if options.command == 'work':
+        done = Worker(options.url, options.name, options.cache_dir, options.patience).run()
+        print(f"{options.name or 'worker'}: {done} units run")
+        return 0
+
+    try:
+        settings = load_experiment(options.experiment)
+        path = options.checkpoint or os.path.splitext(options.experiment)[0] + '.checkpoint.json'
+        checkpoint = Checkpoint(path)
+        if options.restart:
+            checkpoint.completed = {}
+        coordinator = Coordinator(settings, checkpoint, options.lease, options.attempts)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    status = coordinator.status()
+    print(f"{status['pending']} units to run, {status['completed']} already completed")
+    if options.command == 'coordinate':
+        host, port = coordinator.start(options.host, options.port)
+        print(f"Serving on http://{host}:{port}")
+        try:
+            coordinator.wait()
+            time.sleep(options.linger)
+        finally:
+            coordinator.stop()
+        return _report(coordinator, options.output, path)
+
+    host, port = coordinator.start('127.0.0.1', 0)
+    workers = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'work', f"http://{host}:{port}", '--name', f"local-{number}", '--cache-dir', options.cache_dir])
+        for number in range(options.workers)
+    ]
+    try:
+        # units left when every worker has exited (crashed or killed) would otherwise wait forever
+        while not coordinator.wait(timeout=1.0):
+            if all(process.poll() is not None for process in workers):
+                coordinator.abandon("every worker exited")
+        for process in workers:
+            process.wait()
+    finally:
+        for process in workers:
+            if process.poll() is None:
+                process.terminate()
+        coordinator.stop()
+    return _report(coordinator, options.output, path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import numpy as np
+import yaml
+
+from data_handler import DataFetcher
+from registry import STRATEGIES
+from result_store import ResultStore
+from runner import ParallelBacktester
+from strategy import TradingStrategy
+
+# settings of an experiment file, with their defaults (`symbols` and `strategies` are required)
+DEFAULTS = {
+    'start': '2024-01-01',
+    'end': '2024-05-30',
+    'initial_balance': 10000,
+    'multiplier': 10,
+    'vectorized': False,
+    'source': 'yfinance',
+    'source_options': {},
+    'cache_dir': '.cache/bars',
+    'store': None,
+    'batch_size': None,
+}
+
+
+def load_experiment(path: str) -> dict:
+    """Reads an experiment file (YAML) and returns its settings, completed with `DEFAULTS`.
+
+    Example:
+
+        symbols: [AAPL, MSFT]
+        start: 2024-01-01
+        end: 2024-05-30
+        multiplier: [2, 10]            # a list is an axis of the matrix
+        strategies:
+          - strategy: rsi              # a name known to the registry (see `registry.StrategyRegistry.resolve`)
+            parameters: {overbought: 70}
+            grid: {period: [7, 14, 21]}
+          - strategy: hybrid
+            parameters:
+              strategies: [{strategy: ichimoku_cloud}, {strategy: adx, parameters: {period: 20}}]
+              weights: [0.5, 0.5]
+
+    Raises:
+        ValueError: If the file is not a valid experiment, or one of its strategies cannot be created.
+    """
+    with open(path) as file:
+        settings = yaml.safe_load(file)
+    if not isinstance(settings, dict):
+        raise ValueError(f"Invalid experiment file: {path}")
+    unknown = set(settings) - set(DEFAULTS) - {'symbols', 'strategies'}
+    if unknown:
+        raise ValueError(f"Unknown experiment settings: {', '.join(sorted(unknown))}")
+    settings = {**DEFAULTS, **settings}
+    if not settings.get('symbols') or not settings.get('strategies'):
+        raise ValueError("An experiment needs `symbols` and `strategies`")
+    # YAML reads unquoted dates as dates
+    settings['start'], settings['end'] = str(settings['start']), str(settings['end'])
+    settings['symbols'] = [str(symbol) for symbol in settings['symbols']]
+    for entry in settings['strategies']:
+        if not isinstance(entry, dict) or 'strategy' not in entry or set(entry) - {'strategy', 'parameters', 'grid'}:
+            raise ValueError(f"Invalid strategy entry: {entry} (expected `strategy` and optional `parameters` and `grid`)")
+    # every spec is built once here, so that a wrong name or parameter fails before any bars are fetched
+    for spec in expand_strategies(settings['strategies']):
+        build_strategy(spec)
+    return settings
+
+
+def expand_strategies(entries: list[dict]) -> list[dict]:
+    """Returns one `{'strategy': name, 'parameters': {...}}` spec per combination of the `grid` values of every entry (fixed `parameters` included)."""
+    specs = []
+    for entry in entries:
+        grid = entry.get('grid') or {}
+        for values in itertools.product(*grid.values()):
+            specs.append({'strategy': entry['strategy'], 'parameters': {**(entry.get('parameters') or {}), **dict(zip(grid, values))}})
+    return specs
+
+
+def build_strategy(spec: dict) -> TradingStrategy:
+    """Creates the strategy of a spec, parameters that are specs themselves (or lists of them) becoming strategies too.
+
+    Raises:
+        ValueError: If a strategy is unknown or its parameters don't match its constructor.
+    """
+    def value(parameter):
+        if isinstance(parameter, dict) and 'strategy' in parameter:
+            return build_strategy(parameter)
+        if isinstance(parameter, list):
+            return [value(item) for item in parameter]
+        return parameter
+
+    parameters = {name: value(parameter) for name, parameter in (spec.get('parameters') or {}).items()}
+    try:
+        return STRATEGIES.create(spec['strategy'], **parameters)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for {spec['strategy']}: {e}")
+
+
+class WorkUnit:
+    def __init__(self, symbol: str, strategy: dict, multiplier: float, settings: dict) -> None:
+        """Constructor. One backtest of an experiment: a strategy spec (see `expand_strategies`) on a symbol with a multiplier.
+
+        Its `id` is a hash of everything the results depend on (the dates, balance and mode of the experiment included),
+        so a completed unit is recognized even if the experiment file was edited in between.
+        """
+        self.symbol = symbol
+        self.strategy = strategy
+        self.multiplier = multiplier
+        inputs = {
+            'symbol': symbol,
+            'strategy': strategy,
+            'multiplier': multiplier,
+            **{setting: settings[setting] for setting in ('start', 'end', 'initial_balance', 'vectorized', 'source', 'source_options')},
+        }
+        self.id = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+    @property
+    def label(self) -> str:
+        """Short description of the strategy spec, e.g. `rsi(overbought=70, period=14)`."""
+        parameters = ', '.join(f"{name}={json.dumps(value, sort_keys=True, default=str)}" for name, value in sorted(self.strategy['parameters'].items()))
+        return f"{self.strategy['strategy']}({parameters})"
+
+    def __repr__(self) -> str:
+        return f"WorkUnit({self.symbol}, {self.label}, multiplier={self.multiplier})"
+
+
+class Checkpoint:
+    def __init__(self, path: str) -> None:
+        """Constructor. The completed units of an experiment and their results, kept in the JSON file at `path` (loaded if it exists).
+
+        The file is replaced atomically on every `save` (written to a temporary file, synced, then renamed over it), so
+        it always holds the units completed at the last save, whenever the process is stopped.
+        """
+        self.path = path
+        self.completed = {}
+        try:
+            with open(path) as file:
+                self.completed = json.load(file)['completed']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Invalid checkpoint {path}: {e}")
+
+    def __contains__(self, unit: WorkUnit) -> bool:
+        """True if the unit is completed."""
+        return unit.id in self.completed
+
+    def add(self, unit: WorkUnit, results: dict) -> None:
+        """Records the results of a completed unit (written at the next `save`)."""
+        stats = {name: value.item() if isinstance(value, np.generic) else value for name, value in results.items() if name not in ('transaction_history', 'equity_curve')}
+        self.completed[unit.id] = {'symbol': unit.symbol, 'strategy': unit.label, 'multiplier': unit.multiplier, **stats}
+
+    def save(self) -> None:
+        """Writes the completed units, replacing the file atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump({'completed': self.completed}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+
+class ExperimentRunner:
+    def __init__(self, settings: dict, checkpoint: Checkpoint, max_workers: int | None = None, log=print) -> None:
+        """Constructor. Runs the work units of an experiment (`load_experiment` settings) that `checkpoint` doesn't hold yet.
+
+        Units run by batches of `batch_size` symbols (default: one per worker process), every batch through a
+        `ParallelBacktester` (with the experiment's `store`, if any), and the checkpoint is saved after each batch: a
+        stopped run loses at most the batch in progress.
+        """
+        self.settings = settings
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.log = log
+
+    def units(self) -> list[WorkUnit]:
+        """Returns the work units of the experiment matrix: symbols x multipliers x expanded strategies."""
+        multipliers = self.settings['multiplier'] if isinstance(self.settings['multiplier'], list) else [self.settings['multiplier']]
+        specs = expand_strategies(self.settings['strategies'])
+        return [WorkUnit(symbol, spec, multiplier, self.settings) for symbol in self.settings['symbols'] for multiplier in multipliers for spec in specs]
+
+    def run(self) -> tuple[int, dict]:
+        """Runs the pending units, returns the number of units run and `symbol -> error` for the symbols whose bars could not be fetched (their units stay pending)."""
+        pending = [unit for unit in self.units() if unit not in self.checkpoint]
+        symbols = list(dict.fromkeys(unit.symbol for unit in pending))
+        self.log(f"{len(pending)} units to run on {len(symbols)} symbols, {len(self.checkpoint.completed)} already completed")
+
+        settings = self.settings
+        fetcher = DataFetcher(settings['source'], cache_dir=settings['cache_dir'], **settings['source_options'])
+        store = ResultStore(settings['store']) if settings['store'] else None
+        batch_size = settings['batch_size'] or self.max_workers
+        done, errors = 0, {}
+        try:
+            for start in range(0, len(symbols), batch_size):
+                batch = symbols[start:start + batch_size]
+                fetched, failed = fetcher.fetch_many(batch, settings['start'], settings['end'])
+                errors.update(failed)
+                bars = {symbol: series for symbol, series in fetched.items() if len(series) > 0}
+                errors.update({symbol: "no data" for symbol in fetched if symbol not in bars})
+                units = [unit for unit in pending if unit.symbol in bars]
+                for multiplier in dict.fromkeys(unit.multiplier for unit in units):
+                    done += self._run_units([unit for unit in units if unit.multiplier == multiplier], bars, multiplier, store)
+                self.checkpoint.save()
+                self.log(f"{done}/{len(pending)} units done")
+        finally:
+            if store is not None:
+                store.close()
+        return done, errors
+
+    def _run_units(self, units: list[WorkUnit], bars: dict, multiplier: float, store: ResultStore | None) -> int:
+        """Runs units sharing a multiplier on their symbols and records their results, returns the number of units run."""
+        specs = {unit.label: unit.strategy for unit in units}
+        strategies = []
+        for label, spec in specs.items():
+            strategy = build_strategy(spec)
+            # results are keyed by strategy name, so every spec gets its own
+            strategy.name = label
+            strategies.append(strategy)
+        backtester = ParallelBacktester(strategies, initial_balance=self.settings['initial_balance'], multiplier=multiplier,
+                                        vectorized=self.settings['vectorized'], max_workers=self.max_workers, store=store)
+        results = backtester.run({symbol: bars[symbol] for symbol in dict.fromkeys(unit.symbol for unit in units)})
+        for unit in units:
+            self.checkpoint.add(unit, results[unit.label][unit.symbol])
+        return len(units)
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """Command line entry point (`python experiment.py experiment.yaml`), returns 1 if some units could not run."""
+    parser = argparse.ArgumentParser(description="Runs the backtests of a YAML experiment matrix, resuming from its checkpoint.")
+    parser.add_argument('experiment', help="experiment file (YAML)")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: the experiment file with a .checkpoint.json extension)")
+    parser.add_argument('--output', help="CSV file receiving the results of every completed unit")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and run every unit again")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default: number of CPUs)")
+    options = parser.parse_args(arguments)
+
+    try:
+        settings = load_experiment(options.experiment)
+        path = options.checkpoint or os.path.splitext(options.experiment)[0] + '.checkpoint.json'
+        checkpoint = Checkpoint(path)
+        if options.restart:
+            checkpoint.completed = {}
+        runner = ExperimentRunner(settings, checkpoint, options.workers)
+        # units removed from the experiment may stay in the checkpoint, only the current ones are reported
+        units = runner.units()
+        _, errors = runner.run()
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    for symbol, error in errors.items():
+        print(f"Error fetching data for {symbol}: {error}")
+    completed = [checkpoint.completed[unit.id] for unit in units if unit in checkpoint]
+    if options.output:
+        import pandas as pd
+        pd.DataFrame(completed).to_csv(options.output, index=False)
+    print(f"{len(completed)}/{len(units)} units completed, checkpoint in {path}")
+    return 0 if len(completed) == len(units) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
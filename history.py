@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+class BarHistory:
+    def __init__(self, capacity: int) -> None:
+        """Constructor. Keeps the last `capacity` bars appended in a ring buffer, read like a list of the retained bars (oldest first).
+
+        `total` counts every bar ever appended, so streaming indicators can tell which bars are new (see `Indicator.sync`).
+
+        Raises:
+            ValueError: If `capacity` is not positive.
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid history capacity: {capacity}")
+        self.capacity = capacity
+        self.bars = []
+        self.start = 0
+        self.total = 0
+
+    def append(self, data_point: dict) -> None:
+        """Adds a bar, dropping the oldest one when the buffer is full."""
+        if len(self.bars) < self.capacity:
+            self.bars.append(data_point)
+        else:
+            self.bars[self.start] = data_point
+            self.start = (self.start + 1) % self.capacity
+        self.total += 1
+
+    def __len__(self) -> int:
+        """Returns the number of retained bars."""
+        return len(self.bars)
+
+    def __getitem__(self, position: int | slice) -> dict | list[dict]:
+        """Returns the retained bar at `position` (negative positions count from the latest bar), a list of them for a slice."""
+        length = len(self.bars)
+        if isinstance(position, slice):
+            return [self.bars[(self.start + i) % length] for i in range(*position.indices(length))]
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("history index out of range")
+        return self.bars[(self.start + position) % length]
+
+    def __iter__(self):
+        """Iterates over the retained bars, oldest first."""
+        yield from self.bars[self.start:]
+        yield from self.bars[:self.start]
+
+
+# origin of the timeframe grid (local time)
+EPOCH = datetime(1970, 1, 1)
+
+
+def wall_clock(date) -> tuple[int, object]:
+    """Returns the local time of a bar date (ISO string, datetime or anything `pd.Timestamp` takes) as int64 nanoseconds, with its tzinfo."""
+    if isinstance(date, str):
+        try:
+            moment = datetime.fromisoformat(date)
+        except ValueError:
+            moment = None
+    elif isinstance(date, datetime):
+        moment = date
+    else:
+        moment = None
+    if moment is None:
+        import pandas as pd
+        moment = pd.Timestamp(date).to_pydatetime()
+    return (moment.replace(tzinfo=None) - EPOCH) // MICROSECOND * 1000, moment.tzinfo
+
+
+class BarResampler:
+    def __init__(self, frequency: str, capacity: int | None = None) -> None:
+        """Constructor. Aggregates bars one at a time into bars of a fixed-length `frequency` (e.g. `1h`), like `BarSeries.resample`.
+
+        Completed bars are appended to `self.bars`, a `BarHistory` of `capacity` bars (a list if None). Each one is
+        labelled with the start of its period, in the timezone of the bars.
+        """
+        import pandas as pd
+        self.frequency = frequency
+        self.step = pd.Timedelta(frequency).value
+        self.capacity = capacity
+        self.reset()
+
+    def update(self, data_point: dict) -> dict | None:
+        """Adds a finer bar (with a `date`), returns the bar it completed (None if it belongs to the bar being formed).
+
+        A bar is completed by the first finer bar of a later period, so it never includes data from the future.
+        """
+        wall, tzinfo = wall_clock(data_point['date'])
+        bucket = wall // self.step
+        current = self.current
+        if bucket == self.bucket:
+            current['high'] = max(current['high'], data_point['high'])
+            current['low'] = min(current['low'], data_point['low'])
+            current['close'] = data_point['close']
+            current['volume'] += data_point['volume']
+            return None
+
+        self.bucket = bucket
+        start = EPOCH + timedelta(microseconds=bucket * self.step // 1000)
+        self.current = {
+            'open': data_point['open'],
+            'high': data_point['high'],
+            'low': data_point['low'],
+            'close': data_point['close'],
+            'volume': data_point['volume'],
+            'date': str(start.replace(tzinfo=tzinfo)),
+        }
+        if current is not None:
+            self.bars.append(current)
+        return current
+
+    def reset(self) -> None:
+        """Forgets all the bars."""
+        self.bars = [] if self.capacity is None else BarHistory(self.capacity)
+        self.current = None
+        self.bucket = None
@@ -0,0 +1,571 @@
+from collections import deque
+import math
+import numpy as np
+
+from indicators import vectorized
+from indicators.vectorized import EPSILON
+
+
+class RollingMean:
+    def __init__(self, window: int) -> None:
+        """Constructor, `window` is the number of most recent values averaged."""
+        self.window = window
+        # see `update`: twice the number of roundings of partial sums, per unit of magnitude and of mean
+        self.error_scale = 4 * (window + 1) * EPSILON / window
+        self.reset()
+
+    def update(self, value: float) -> float | None:
+        """Adds a value in O(1) and returns the mean of the last `window` values (None until the window is full).
+
+        The running sum is recomputed from the buffer (correctly rounded, `math.fsum`) once every `window` updates,
+        which keeps the floating-point drift bounded at an amortized O(1) cost. `error` bounds the difference between
+        the mean and the mean of the window summed in any order (`sum(values) / window`, `np.mean(values)`...): since the
+        last resync, the running sum went through at most `2 * window` roundings of partial sums no larger than
+        `magnitude` (the absolute values summed since then), and any summation of the window goes through `window`.
+        """
+        values = self.values
+        if len(values) == self.window:
+            oldest = values[0]
+            self.total -= oldest
+            if oldest != 0:
+                self.nonzero -= 1
+        values.append(value)
+        self.total += value
+        self.magnitude += abs(value)
+        if value != 0:
+            self.nonzero += 1
+
+        self.updates_since_resync += 1
+        if self.updates_since_resync >= self.window:
+            self.total = math.fsum(values)
+            self.magnitude = math.fsum(map(abs, values))
+            self.updates_since_resync = 0
+        elif self.nonzero == 0:
+            self.total = 0.0
+
+        if len(values) == self.window:
+            self.value = self.total / self.window
+            self.error = self.magnitude * self.error_scale if self.nonzero else 0.0
+        return self.value
+
+    def reset(self) -> None:
+        """Resets the rolling mean to its initial state."""
+        self.values = deque(maxlen=self.window)
+        self.total = 0.0
+        self.magnitude = 0.0
+        self.nonzero = 0
+        self.updates_since_resync = 0
+        self.value = None
+        self.error = 0.0
+
+
+class RollingMeanStd:
+    def __init__(self, window: int) -> None:
+        """Constructor, `window` is the number of most recent values used (population standard deviation)."""
+        self.window = window
+        self.error_scale = 4 * (window + 1) * EPSILON / window
+        self.reset()
+
+    def update(self, value: float) -> tuple[float, float] | None:
+        """Adds a value in O(1) and returns `(mean, std)` of the last `window` values (None until the window is full).
+
+        Sums are kept around a shift (the window mean at the last resync) to avoid cancellation and are
+        recomputed from the buffer once every `window` updates. `mean_error` and `std_error` bound the differences
+        with `np.mean(values)` and `np.std(values)`, like the `error` of `RollingMean`, from the magnitudes of the shifted
+        values and of their squares summed since the last resync; the standard deviation error follows from the variance
+        error (`|sqrt(a) - sqrt(b)| <= |a - b| / sqrt(a)`).
+        """
+        values = self.values
+        if len(values) == self.window:
+            oldest = values[0] - self.shift
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        values.append(value)
+        shifted = value - self.shift
+        squared = shifted * shifted
+        self.total += shifted
+        self.total_sq += squared
+        self.magnitude += abs(shifted)
+        self.magnitude_sq += squared
+
+        self.updates_since_resync += 1
+        if self.updates_since_resync >= self.window:
+            self._resync()
+
+        if len(values) == self.window:
+            mean = self.total / self.window
+            variance = max(self.total_sq / self.window - mean * mean, 0.0)
+            std = math.sqrt(variance)
+            self.value = (self.shift + mean, std)
+
+            scale = self.error_scale
+            shifted_error = scale * self.magnitude
+            mean_error = self.mean_error = shifted_error + scale * self.window * (abs(self.shift) + abs(self.shift + mean))
+            variance_error = 2 * (scale * self.magnitude_sq + 2 * abs(mean) * shifted_error + shifted_error * shifted_error + 2 * mean_error * mean_error)
+            std_error = math.sqrt(variance_error)
+            if std > 0:
+                std_error = min(std_error, variance_error / std)
+            self.std_error = std_error + 4 * EPSILON * std
+        return self.value
+
+    def _resync(self) -> None:
+        """Recomputes the shifted sums from the buffer."""
+        self.shift = math.fsum(self.values) / len(self.values)
+        self.total = 0.0
+        self.total_sq = 0.0
+        for value in self.values:
+            shifted = value - self.shift
+            self.total += shifted
+            self.total_sq += shifted * shifted
+        self.magnitude = math.fsum(abs(value - self.shift) for value in self.values)
+        self.magnitude_sq = self.total_sq
+        self.updates_since_resync = 0
+
+    def reset(self) -> None:
+        """Resets the rolling statistics to their initial state."""
+        self.values = deque(maxlen=self.window)
+        self.shift = 0.0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.magnitude = 0.0
+        self.magnitude_sq = 0.0
+        self.updates_since_resync = 0
+        self.value = None
+        self.mean_error = self.std_error = 0.0
+
+
+class RollingMax:
+    def __init__(self, window: int) -> None:
+        """Constructor, `window` is the number of most recent values considered."""
+        self.window = window
+        self.reset()
+
+    def update(self, value: float) -> float | None:
+        """Adds a value in amortized O(1) (monotonic deque) and returns the max of the last `window` values (None until the window is full)."""
+        candidates = self.candidates
+        while candidates and self._dominates(value, candidates[-1][1]):
+            candidates.pop()
+        candidates.append((self.count, value))
+        if candidates[0][0] <= self.count - self.window:
+            candidates.popleft()
+        self.count += 1
+        if self.count >= self.window:
+            self.value = candidates[0][1]
+        return self.value
+
+    def _dominates(self, value: float, other: float) -> bool:
+        """Returns True if `other` can never be the extreme again once `value` is in the window."""
+        return value >= other
+
+    def reset(self) -> None:
+        """Resets the rolling extreme to its initial state."""
+        self.candidates = deque()
+        self.count = 0
+        self.value = None
+
+
+class RollingMin(RollingMax):
+    def _dominates(self, value: float, other: float) -> bool:
+        """Returns True if `other` can never be the extreme again once `value` is in the window."""
+        return value <= other
+
+
+class ExponentialMovingAverage:
+    def __init__(self, window: int, alpha: float | None = None) -> None:
+        """Constructor, the average is seeded with the mean of the first `window` values. `alpha` defaults to `2 / (window + 1)`."""
+        self.window = window
+        self.alpha = 2 / (window + 1) if alpha is None else alpha
+        self.reset()
+
+    def update(self, value: float) -> float | None:
+        """Adds a value in O(1) and returns the current average (None until `window` values were seen).
+
+        The first `window` positions all carry the seed, so `previous` equals the seed right after seeding.
+        """
+        if self.value is None:
+            self.seed_values.append(value)
+            if len(self.seed_values) == self.window:
+                self.seed = np.mean(self.seed_values)
+                self.previous = self.value = self.seed
+                self.seed_values = []
+            return self.value
+        self.previous = self.value
+        self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+    def reset(self) -> None:
+        """Resets the average to its initial state."""
+        self.seed_values = []
+        self.seed = None
+        self.previous = None
+        self.value = None
+
+
+class WilderSmoothing(ExponentialMovingAverage):
+    def __init__(self, window: int) -> None:
+        """Constructor, Wilder's smoothed moving average (`alpha = 1 / window`)."""
+        super().__init__(window, alpha=1 / window)
+
+
+class Indicator:
+    """Base class for streaming indicators consuming bar dictionaries (`open`, `high`, `low`, `close`, `volume`)."""
+
+    def __init__(self, *params) -> None:
+        """Constructor, `params` are the parameters the indicator was created with (two indicators of the same class and parameters fed the same bars are equal)."""
+        self.params = params
+        self.reset()
+
+    @property
+    def key(self) -> tuple:
+        """Identifies the indicator by class and parameters."""
+        return type(self), self.params
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar, updating the indicator state in O(1)."""
+        self.count += 1
+
+    def sync(self, data: list) -> None:
+        """Consumes the bars of `data` that were not seen yet.
+
+        `data` is expected to be the same list growing between calls (as in `Backtester.run_backtest`), or a `BarHistory`
+        whose `total` counts the bars appended, including the ones it no longer holds; a different or shorter list restarts
+        the indicator from scratch.
+
+        Raises:
+            ValueError: If bars were dropped from a `BarHistory` before the indicator saw them.
+        """
+        total = getattr(data, 'total', len(data))
+        if data is not self.source or total < self.count:
+            self.reset()
+            self.source = data
+        new_bars = total - self.count
+        if new_bars > len(data):
+            raise ValueError(f"{new_bars} new bars but only the last {len(data)} are available")
+        if new_bars > 0:
+            for data_point in data[len(data) - new_bars:]:
+                self.update(data_point)
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        self.source = None
+        self.count = 0
+
+
+class MovingAverage(Indicator):
+    def __init__(self, window: int) -> None:
+        """Constructor, simple moving average of the close price."""
+        self.mean = RollingMean(window)
+        super().__init__(window)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar."""
+        super().update(data_point)
+        self.mean.update(data_point['close'])
+
+    @property
+    def value(self) -> float | None:
+        """Current moving average (None until the window is full)."""
+        return self.mean.value
+
+    @property
+    def error(self) -> float:
+        """Bound on the difference between `value` and `recompute()` (see `RollingMean.update`)."""
+        return self.mean.error
+
+    def recompute(self) -> float:
+        """Returns the moving average recomputed from the window in O(window) as `sum(closes) / window`, the last close while the window is not full.
+
+        This is the formula of `MovingAverageStrategy`, rounding included.
+        """
+        closes = self.mean.values
+        if len(closes) < self.mean.window:
+            return closes[-1]
+        return sum(closes) / self.mean.window
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        self.mean.reset()
+
+
+class RSI(Indicator):
+    def __init__(self, period: int) -> None:
+        """Constructor. Averages the gains and losses of the last `period - 1` price changes once `period + 1` bars were seen."""
+        self.period = period
+        self.gains = RollingMean(period - 1) if period > 1 else None
+        self.losses = RollingMean(period - 1) if period > 1 else None
+        super().__init__(period)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar."""
+        close = data_point['close']
+        if self.count > 0 and self.gains is not None:
+            delta = close - self.previous_close
+            self.gains.update(delta if delta >= 0 else 0)
+            self.losses.update(-delta if delta < 0 else 0)
+        self.previous_close = close
+        super().update(data_point)
+        self.rsi_error = None
+
+        if self.count < self.period + 1:
+            self.value = None
+        elif self.gains is None:
+            self.value = float('nan')
+        elif self.losses.value == 0:
+            self.value = 100
+        else:
+            rs = self.gains.value / self.losses.value
+            self.value = 100 - (100 / (1 + rs))
+
+    @property
+    def error(self) -> float:
+        """Bound on the difference between `value` and `recompute()`, computed once per bar.
+
+        `100 * gain / (gain + loss)` moves by at most `100 * (gain error + loss error) / (gain + loss)`, plus the roundings of the formula.
+        """
+        if self.rsi_error is None:
+            if self.gains is None or self.losses.nonzero == 0:
+                self.rsi_error = 0.0
+            else:
+                errors = self.gains.error + self.losses.error
+                total = self.gains.value + self.losses.value - errors
+                self.rsi_error = 100 * errors / total + 1000 * EPSILON if total > 0 else math.inf
+        return self.rsi_error
+
+    def recompute(self) -> float:
+        """Returns the RSI recomputed from the gains and losses of the window in O(period), with the formula of `RSIStrategy` (`np.mean`), rounding included."""
+        if self.gains is None:
+            return float('nan')
+        avg_gain = np.mean(self.gains.values)
+        avg_loss = np.mean(self.losses.values)
+        if avg_loss == 0:
+            return 100
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        if self.gains is not None:
+            self.gains.reset()
+            self.losses.reset()
+        self.previous_close = None
+        self.value = self.rsi_error = None
+
+
+class BollingerBands(Indicator):
+    def __init__(self, period: int, std_dev: float = 2) -> None:
+        """Constructor."""
+        self.std_dev = std_dev
+        self.stats = RollingMeanStd(period)
+        super().__init__(period, std_dev)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar."""
+        super().update(data_point)
+        stats = self.stats.update(data_point['close'])
+        if stats is not None:
+            ma, std_dev = stats
+            self.ma = ma
+            self.upper_band = ma + self.std_dev * std_dev
+            self.lower_band = ma - self.std_dev * std_dev
+            # bound on the difference between the bands and the ones of `recompute()`
+            factor = abs(self.std_dev)
+            self.error = self.stats.mean_error + factor * self.stats.std_error + 4 * EPSILON * (abs(ma) + factor * std_dev)
+
+    def recompute(self) -> tuple[float, float, float]:
+        """Returns `(ma, upper_band, lower_band)` recomputed from the window in O(period) with the formula of `BollingerBandsStrategy` (`np.mean`, `np.std`), rounding included."""
+        prices = np.array(self.stats.values)
+        ma = np.mean(prices)
+        std_dev = np.std(prices)
+        return ma, ma + self.std_dev * std_dev, ma - self.std_dev * std_dev
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        self.stats.reset()
+        self.ma = self.upper_band = self.lower_band = None
+        self.error = 0.0
+
+
+class StochasticOscillator(Indicator):
+    def __init__(self, period: int) -> None:
+        """Constructor.
+
+        Like `StochasticOscillatorStrategy`, every %K value is measured against the high/low range of the
+        latest `period` bars, so only the last four closes are needed for the two latest %K/%D pairs.
+        """
+        self.period = period
+        self.highest_high = RollingMax(period)
+        self.lowest_low = RollingMin(period)
+        super().__init__(period)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar."""
+        super().update(data_point)
+        highest_high = self.highest_high.update(data_point['high'])
+        lowest_low = self.lowest_low.update(data_point['low'])
+        self.closes.append(data_point['close'])
+
+        if self.count < self.period + 4:
+            return
+        price_range = np.float64(highest_high - lowest_low)
+        k = [((close - lowest_low) / price_range) * 100 for close in self.closes]
+        self.prev_k, self.k = k[-2], k[-1]
+        self.prev_d = (k[0] + k[1] + k[2]) / 3
+        self.d = (k[1] + k[2] + k[3]) / 3
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        self.highest_high.reset()
+        self.lowest_low.reset()
+        self.closes = deque(maxlen=4)
+        self.k = self.prev_k = self.d = self.prev_d = None
+
+
+class MACD(Indicator):
+    def __init__(self, short_window: int = 12, long_window: int = 26, signal_window: int = 9) -> None:
+        """Constructor."""
+        self.short_ema = ExponentialMovingAverage(short_window)
+        self.long_ema = ExponentialMovingAverage(long_window)
+        self.signal_ema = ExponentialMovingAverage(signal_window)
+        super().__init__(short_window, long_window, signal_window)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar.
+
+        MACD values before both averages are seeded depend on the seeds, so closes are buffered until then and
+        replayed into the signal line in one go. `MACDStrategy` reads the MACD once the long average is seeded; if the
+        short one is not (`short_window > long_window`), its seed is the mean of every close so far, as in a MACD of the
+        whole history, and the values of those bars are recomputed from the buffered closes.
+        """
+        super().update(data_point)
+        close = data_point['close']
+        short = self.short_ema.update(close)
+        long = self.long_ema.update(close)
+        if self.warmup is None:
+            self._push(short - long)
+            return
+        self.warmup.append(close)
+        if long is None:
+            return
+        macd_line = vectorized.ema(self.warmup, self.short_ema.window) - vectorized.ema(self.warmup, self.long_ema.window)
+        if short is None:
+            signal_line = vectorized.ema(macd_line, self.signal_ema.window)
+            self.macd, self.signal = float(macd_line[-1]), float(signal_line[-1])
+            if len(macd_line) > 1:
+                self.prev_macd, self.prev_signal = float(macd_line[-2]), float(signal_line[-2])
+            return
+        self.macd = self.prev_macd = None
+        for value in macd_line.tolist():
+            self._push(value)
+        self.warmup = None
+
+    def _push(self, macd: float) -> None:
+        """Appends one MACD value and updates the signal line."""
+        self.prev_macd = self.macd
+        self.macd = macd
+        self.signal = self.signal_ema.update(macd)
+        self.prev_signal = self.signal_ema.previous
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        self.short_ema.reset()
+        self.long_ema.reset()
+        self.signal_ema.reset()
+        self.warmup = []
+        self.macd = self.prev_macd = self.signal = self.prev_signal = None
+
+
+class ADX(Indicator):
+    def __init__(self, period: int = 14) -> None:
+        """Constructor. Uses Wilder smoothing seeded with the mean of the first `period` values, like `ADXStrategy`."""
+        self.period = period
+        self.atr = WilderSmoothing(period)
+        self.pdm = WilderSmoothing(period)
+        self.mdm = WilderSmoothing(period)
+        self.dx = WilderSmoothing(period)
+        super().__init__(period)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar."""
+        high, low, close = data_point['high'], data_point['low'], data_point['close']
+        if self.count == 0:
+            tr = pdm = mdm = 0
+        else:
+            up = high - self.previous_high
+            down = self.previous_low - low
+            tr = max(high - low, abs(high - self.previous_close), abs(low - self.previous_close))
+            pdm = up if up > down else 0
+            mdm = down if down > up else 0
+        self.previous_high, self.previous_low, self.previous_close = high, low, close
+        super().update(data_point)
+
+        atr = self.atr.update(tr)
+        pdm = self.pdm.update(pdm)
+        mdm = self.mdm.update(mdm)
+        if atr is None:
+            return
+        self.pdi = (pdm / atr) * 100
+        self.mdi = (mdm / atr) * 100
+        dx = np.abs((self.pdi - self.mdi) / (self.pdi + self.mdi)) * 100
+        # the first `period` DX values all derive from the smoothing seeds
+        for _ in range(self.period if self.dx.value is None else 1):
+            self.adx = self.dx.update(dx)
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        self.atr.reset()
+        self.pdm.reset()
+        self.mdm.reset()
+        self.dx.reset()
+        self.previous_high = self.previous_low = self.previous_close = None
+        self.adx = self.pdi = self.mdi = None
+
+
+class IchimokuCloud(Indicator):
+    def __init__(self, tenkan_window: int = 9, kijun_window: int = 26, senkou_b_window: int = 52) -> None:
+        """Constructor."""
+        self.windows = (tenkan_window, kijun_window, senkou_b_window)
+        self.highs = [RollingMax(window) for window in self.windows]
+        self.lows = [RollingMin(window) for window in self.windows]
+        super().__init__(*self.windows)
+
+    def update(self, data_point: dict) -> None:
+        """Consumes one bar."""
+        super().update(data_point)
+        averages = []
+        for highest, lowest in zip(self.highs, self.lows):
+            highest_high = highest.update(data_point['high'])
+            lowest_low = lowest.update(data_point['low'])
+            averages.append(None if highest_high is None else (highest_high + lowest_low) / 2)
+        self.tenkan_sen, self.kijun_sen, self.senkou_b = averages
+        if self.tenkan_sen is not None and self.kijun_sen is not None:
+            self.senkou_a = (self.tenkan_sen + self.kijun_sen) / 2
+
+    def reset(self) -> None:
+        """Resets the indicator to its initial state."""
+        super().reset()
+        for rolling in self.highs + self.lows:
+            rolling.reset()
+        self.tenkan_sen = self.kijun_sen = self.senkou_a = self.senkou_b = None
+
+
+class IndicatorCache:
+    def __init__(self) -> None:
+        """Constructor. The cache shares indicators between the strategies of a run, so each distinct indicator is updated once per bar."""
+        self.indicators = {}
+
+    def get(self, data: list, indicator: Indicator) -> Indicator:
+        """Returns the shared indicator equal to `indicator` (same class and parameters) fed with `data`, registering `indicator` if there is none yet.
+
+        Entries are keyed by the identity of `data` and keep a reference to it, so the key cannot be reused by another list.
+        """
+        key = (indicator.key, id(data))
+        entry = self.indicators.get(key)
+        if entry is None:
+            entry = self.indicators[key] = (indicator, data)
+        return entry[0]
@@ -0,0 +1,410 @@
+import contextlib
+import functools
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# number of windows reduced at once, bounds the temporaries of `np.std` & co on long series
+CHUNK_SIZE = 1 << 16
+
+# length of the blocks of the prefix sums of rolling windows (see `prefix_sums`), windows up to this size share them
+BLOCK_SIZE = 256
+
+# unit roundoff of float64, the largest relative error of one rounded operation
+EPSILON = 2.0 ** -53
+
+# results of the `@shared` functions while `shared_computations` is active, None otherwise
+_shared_results = None
+
+
+@contextlib.contextmanager
+def shared_computations():
+    """Context manager: within the block, every `@shared` indicator called again on the same input arrays with the same
+    parameters returns the array computed the first time instead of recomputing it.
+
+    Used by parameter sweeps, where many strategies read the same series (e.g. one RSI for every threshold pair).
+    The returned arrays are shared, callers must not modify them.
+    """
+    global _shared_results
+    previous, _shared_results = _shared_results, {}
+    try:
+        yield
+    finally:
+        _shared_results = previous
+
+
+def shared(function):
+    """Decorator making an indicator reuse its results inside `shared_computations` (arrays are keyed by identity)."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _shared_results is None:
+            return function(*args, **kwargs)
+        key = (function.__name__, tuple(id(arg) if isinstance(arg, np.ndarray) else arg for arg in args), tuple(sorted(kwargs.items())))
+        if key not in _shared_results:
+            # the arguments are kept alive along with the result, so that their ids cannot be reused by other arrays
+            _shared_results[key] = (function(*args, **kwargs), args)
+        return _shared_results[key][0]
+    return wrapper
+
+
+def rolling(values: np.ndarray, window: int, reducer) -> np.ndarray:
+    """Applies `reducer(windows, axis=-1)` to every window of `window` consecutive values along the last axis.
+
+    Returns an array aligned with `values`, NaN where fewer than `window` values are available.
+    Windows are zero-copy views and are reduced in chunks of `CHUNK_SIZE` windows in total (all rows together).
+    Costs O(n * window): rolling sums are better computed with `rolling_moments`.
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.full(values.shape, np.nan)
+    length = values.shape[-1]
+    if window < 1 or length < window:
+        return result
+    windows = sliding_window_view(values, window, axis=-1)
+    count = windows.shape[-2]
+    step = max(CHUNK_SIZE // max(values.size // length, 1), 1)
+    for start in range(0, count, step):
+        chunk = windows[..., start:start + step, :]
+        result[..., window - 1 + start:window - 1 + start + chunk.shape[-2]] = reducer(chunk, axis=-1)
+    return result
+
+
+def block_size(window: int) -> int:
+    """Returns the length of the blocks of the prefix sums of windows of `window` values: `BLOCK_SIZE`, or the next power of two for longer windows."""
+    return max(BLOCK_SIZE, 1 << (window - 1).bit_length())
+
+
+@shared
+def prefix_sums(values: np.ndarray, block: int) -> dict:
+    """Prefix sums of every row of `values`, restarted every `block` values, from which `rolling_moments` computes the sums of all windows up to `block` values.
+
+    Values are shifted by the mean of their row to avoid cancellation, missing values (NaN) count as the shift. The mean
+    only sums the values present, in order, so a row gives the same results wherever its missing values are (e.g. a
+    symbol's bars packed in a panel, see `pack`, and the same bars alone).
+    Returns `shift` (one per row), the `sums` and `squares` prefix sums of the shifted values and of their squares, the sums
+    of their absolute values over every block (`magnitudes`, `magnitudes_sq`, for the error bounds), and the running counts
+    of missing and of nonzero values (`missing`, `nonzero`, with a leading 0).
+    The same prefix sums serve every window size, restarting them keeps their rounding errors proportional to `block`.
+    """
+    values = np.asarray(values, dtype=float)
+    length = values.shape[-1]
+    missing = np.isnan(values)
+    present = (~missing).sum(axis=-1)
+    if missing.any():
+        rows = zip(values.reshape(-1, length), missing.reshape(-1, length))
+        totals = np.array([row[~row_missing].sum() for row, row_missing in rows]).reshape(values.shape[:-1])
+    else:
+        totals = values.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.where(present > 0, totals / present, 0)
+    padded = np.zeros(values.shape[:-1] + (-(-length // block) * block,))
+    padded[..., :length] = np.where(missing, 0, values - shift[..., None])
+    blocks = padded.reshape(values.shape[:-1] + (-1, block))
+    squared = blocks * blocks
+
+    def running_count(mask):
+        return np.concatenate((np.zeros(values.shape[:-1] + (1,), dtype=np.int64), np.cumsum(mask, axis=-1)), axis=-1)
+
+    return {
+        'shift': shift,
+        'sums': np.cumsum(blocks, axis=-1).reshape(padded.shape),
+        'squares': np.cumsum(squared, axis=-1).reshape(padded.shape),
+        'magnitudes': np.abs(blocks).sum(axis=-1),
+        'magnitudes_sq': squared.sum(axis=-1),
+        'missing': running_count(missing),
+        'nonzero': running_count(values != 0),
+    }
+
+
+@shared
+def rolling_moments(values: np.ndarray, window: int) -> dict:
+    """Rolling mean and population standard deviation of the last `window` values along the last axis, with error bounds, in O(n) from `prefix_sums`.
+
+    Returns `mean`, `std`, `mean_error` and `std_error`, aligned like `rolling` (NaN where the window is not full or holds
+    a missing value). The errors bound the differences with the window summed in any order (`sum(values) / window`,
+    `np.mean`, `np.std`), like the errors of `streaming.RollingMeanStd`: a prefix sum of a block of `b` values went through
+    `b` roundings of partial sums no larger than the magnitude of the block, a window covers at most two blocks, and any
+    summation of the window goes through `window` roundings. Windows of zeros are exactly 0.
+    """
+    values = np.asarray(values, dtype=float)
+    moments = {name: np.full(values.shape, np.nan) for name in ('mean', 'std', 'mean_error', 'std_error')}
+    length = values.shape[-1]
+    if window < 1 or length < window:
+        return moments
+    block = block_size(window)
+    prefix = prefix_sums(values, block)
+    ends = np.arange(window - 1, length)
+    # last position before the window, -1 for the first one
+    starts = ends - window
+    same_block = (starts >= 0) & (starts // block == ends // block)
+    first = starts < 0
+    before = np.maximum(starts, 0)
+    block_end = np.where(same_block | first, before, (before // block + 1) * block - 1)
+    magnitude = prefix['magnitudes'][..., ends // block] + np.where(same_block | first, 0, prefix['magnitudes'][..., before // block])
+    magnitude_sq = prefix['magnitudes_sq'][..., ends // block] + np.where(same_block | first, 0, prefix['magnitudes_sq'][..., before // block])
+
+    def window_sums(sums):
+        # the prefix of the last block, minus the values before the window in the same block or plus the end of the previous block
+        left = np.where(first, 0, np.where(same_block, 0, sums[..., block_end]) - sums[..., before])
+        return left + sums[..., ends]
+
+    shift = np.abs(prefix['shift'])[..., None]
+    mean = window_sums(prefix['sums']) / window
+    variance = np.maximum(window_sums(prefix['squares']) / window - mean * mean, 0)
+    std = np.sqrt(variance)
+    mean_error = (2 * block + 10) * EPSILON * magnitude / window
+    absolute_mean = np.abs(mean + prefix['shift'][..., None])
+    # a summation of the window (in any order) rounds up to `window` partial sums of the unshifted values
+    base_error = EPSILON * (magnitude + window * shift + absolute_mean)
+    variance_error = ((2 * block + 14) * EPSILON * magnitude_sq / window + 2 * np.abs(mean) * mean_error + mean_error * mean_error
+                      + 2 * EPSILON * (variance + mean * mean) + (window + 3) * EPSILON * (variance + base_error * base_error) + base_error * base_error)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std_error = np.minimum(np.sqrt(2 * variance_error), np.where(std > 0, 2 * variance_error / std, np.inf)) + 2 * EPSILON * std
+    mean_error = 2 * (mean_error + base_error + 2 * EPSILON * absolute_mean)
+
+    zeros = (prefix['nonzero'][..., ends + 1] - prefix['nonzero'][..., ends + 1 - window]) == 0
+    incomplete = (prefix['missing'][..., ends + 1] - prefix['missing'][..., ends + 1 - window]) > 0
+    for name, value in (('mean', mean + prefix['shift'][..., None]), ('std', std), ('mean_error', mean_error), ('std_error', std_error)):
+        moments[name][..., window - 1:] = np.where(incomplete, np.nan, np.where(zeros, 0, value))
+    return moments
+
+
+@shared
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling mean of the last `window` values (see `rolling_moments`, `rolling_mean_error` bounds its rounding)."""
+    return rolling_moments(values, window)['mean']
+
+
+@shared
+def rolling_mean_error(values: np.ndarray, window: int) -> np.ndarray:
+    """Bound on the difference between `rolling_mean` and the mean of every window summed in any order."""
+    return rolling_moments(values, window)['mean_error']
+
+
+@shared
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling population standard deviation of the last `window` values (see `rolling_moments`)."""
+    return rolling_moments(values, window)['std']
+
+
+def windows_at(values: np.ndarray, window: int, positions: np.ndarray):
+    """Yields the index of every position where `positions` is True, with the window of `window` values of `values` ending there.
+
+    Used to recompute the few values that are within rounding error of a decision with the formula of a strategy.
+    """
+    values = np.asarray(values, dtype=float)
+    for index in zip(*np.nonzero(positions)):
+        yield index, values[index[:-1] + (slice(index[-1] - window + 1, index[-1] + 1),)]
+
+
+def rolling_extreme(values: np.ndarray, window: int, operator: np.ufunc) -> np.ndarray:
+    """Rolling max (`operator=np.maximum`) or min (`np.minimum`) of the last `window` values along the last axis, aligned like `rolling`.
+
+    Uses the van Herk/Gil-Werman algorithm: the series is cut into blocks of `window` values, and every window is
+    covered by the suffix of one block and the prefix of the next, so each value costs a few comparisons whatever the window.
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.full(values.shape, np.nan)
+    length = values.shape[-1]
+    if window < 1 or length < window:
+        return result
+    padded = np.concatenate((values, np.zeros(values.shape[:-1] + (-length % window,))), axis=-1)
+    blocks = padded.reshape(values.shape[:-1] + (-1, window))
+    prefix = operator.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = operator.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    result[..., window - 1:] = operator(suffix[..., :length - window + 1], prefix[..., window - 1:length])
+    return result
+
+
+@shared
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling max of the last `window` values."""
+    return rolling_extreme(values, window, np.maximum)
+
+
+@shared
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling min of the last `window` values."""
+    return rolling_extreme(values, window, np.minimum)
+
+
+@shared
+def ema(values: np.ndarray, window: int, alpha: float | None = None) -> np.ndarray:
+    """Exponential moving average seeded with the mean of the first `window` values (the first `window` positions hold the seed).
+
+    The recursion is sequential by nature: a single series runs as a plain float loop, the rows of a 2-D array
+    (e.g. simulated paths) advance together one bar at a time.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape)
+    alpha = 2 / (window + 1) if alpha is None else alpha
+    if values.ndim > 1:
+        smoothed = np.empty(values.shape)
+        value = np.mean(values[..., :window], axis=-1)
+        smoothed[..., :window] = value[..., None]
+        for bar in range(window, values.shape[-1]):
+            value = alpha * values[..., bar] + (1 - alpha) * value
+            smoothed[..., bar] = value
+        return smoothed
+    value = float(np.mean(values[:window]))
+    smoothed = [value] * min(window, len(values))
+    for x in values[window:].tolist():
+        value = alpha * x + (1 - alpha) * value
+        smoothed.append(value)
+    return np.array(smoothed)
+
+
+def wilder_smoothing(values: np.ndarray, window: int) -> np.ndarray:
+    """Wilder's smoothed moving average (`alpha = 1 / window`)."""
+    return ema(values, window, alpha=1 / window)
+
+
+@shared
+def rsi_with_error(close: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray]:
+    """RSI of every bar, averaging the last `period - 1` price changes like `RSIStrategy` (NaN for the first `period` bars), and a bound on its rounding.
+
+    The bound follows from the errors of the rolling means of the gains and losses, like `streaming.RSI.error`
+    (0 where there is no loss and the RSI is exactly 100).
+    """
+    close = np.asarray(close, dtype=float)
+    result = np.full(close.shape, np.nan)
+    error = np.full(close.shape, np.nan)
+    if period < 2 or close.shape[-1] < period + 1:
+        return result, error
+    deltas = np.diff(close, axis=-1)
+    gains = np.where(deltas < 0, 0, deltas)
+    losses = np.abs(np.where(deltas > 0, 0, deltas))
+    # the window ending at delta i - 1 (the change into bar i) belongs to bar i
+    gain_moments, loss_moments = rolling_moments(gains, period - 1), rolling_moments(losses, period - 1)
+    avg_gain = gain_moments['mean'][..., period - 1:]
+    avg_loss = loss_moments['mean'][..., period - 1:]
+    errors = gain_moments['mean_error'][..., period - 1:] + loss_moments['mean_error'][..., period - 1:]
+    total = avg_gain + avg_loss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        result[..., period:] = np.where(avg_loss == 0, 100, 100 - (100 / (1 + rs)))
+        error[..., period:] = np.where(avg_loss == 0, 0, np.where(total > 0, 100 * errors / total + 1000 * EPSILON, np.inf))
+    return result, error
+
+
+@shared
+def rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """RSI of every bar, averaging the last `period - 1` price changes like `RSIStrategy` (NaN for the first `period` bars)."""
+    return rsi_with_error(close, period)[0]
+
+
+@shared
+def bollinger_bands(close: np.ndarray, period: int, std_dev: float = 2) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Moving average, upper band and lower band of every bar."""
+    ma = rolling_mean(close, period)
+    deviation = rolling_std(close, period)
+    return ma, ma + std_dev * deviation, ma - std_dev * deviation
+
+
+@shared
+def bollinger_bands_error(close: np.ndarray, period: int, std_dev: float = 2) -> np.ndarray:
+    """Bound on the difference between the bands of `bollinger_bands` and the bands of `BollingerBandsStrategy` (`np.mean`, `np.std`), like `streaming.BollingerBands.error`."""
+    moments = rolling_moments(close, period)
+    factor = abs(std_dev)
+    return moments['mean_error'] + factor * moments['std_error'] + 4 * EPSILON * (np.abs(moments['mean']) + factor * moments['std'])
+
+
+@shared
+def stochastic_oscillator(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Returns `(k, d, prev_k, prev_d)` for every bar, as seen by `StochasticOscillatorStrategy`.
+
+    All %K values of a bar are measured against that bar's `period` high/low range, so `prev_k`/`prev_d`
+    are the previous close's values under the current range, not the previous bar's %K/%D.
+    Values are NaN until `period + 4` bars are available.
+    """
+    close = np.asarray(close, dtype=float)
+    n = close.shape[-1]
+    k, d, prev_k, prev_d = (np.full(close.shape, np.nan) for _ in range(4))
+    start = period + 3
+    if n <= start:
+        return k, d, prev_k, prev_d
+    highest_high = rolling_max(high, period)[..., start:]
+    lowest_low = rolling_min(low, period)[..., start:]
+    price_range = highest_high - lowest_low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k0, k1, k2, k3 = (((close[..., start - lag:n - lag] - lowest_low) / price_range) * 100 for lag in range(4))
+    k[..., start:] = k0
+    prev_k[..., start:] = k1
+    d[..., start:] = (k2 + k1 + k0) / 3
+    prev_d[..., start:] = (k3 + k2 + k1) / 3
+    return k, d, prev_k, prev_d
+
+
+@shared
+def macd(close: np.ndarray, short_window: int = 12, long_window: int = 26, signal_window: int = 9) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram of every bar."""
+    macd_line = ema(close, short_window) - ema(close, long_window)
+    signal_line = ema(macd_line, signal_window)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+@shared
+def adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ADX, +DI and -DI of every bar."""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    tr = np.zeros(close.shape)
+    pdm = np.zeros(close.shape)
+    mdm = np.zeros(close.shape)
+    if close.shape[-1] > 1:
+        up = high[..., 1:] - high[..., :-1]
+        down = low[..., :-1] - low[..., 1:]
+        tr[..., 1:] = np.maximum(np.maximum(high[..., 1:] - low[..., 1:], np.abs(high[..., 1:] - close[..., :-1])), np.abs(low[..., 1:] - close[..., :-1]))
+        pdm[..., 1:] = np.where(up > down, up, 0)
+        mdm[..., 1:] = np.where(down > up, down, 0)
+
+    atr = wilder_smoothing(tr, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pdi = (wilder_smoothing(pdm, period) / atr) * 100
+        mdi = (wilder_smoothing(mdm, period) / atr) * 100
+        dx = np.abs((pdi - mdi) / (pdi + mdi)) * 100
+    return wilder_smoothing(dx, period), pdi, mdi
+
+
+@shared
+def ichimoku_cloud(high: np.ndarray, low: np.ndarray, tenkan_window: int = 9, kijun_window: int = 26, senkou_b_window: int = 52) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Tenkan-sen, kijun-sen, senkou span A and senkou span B of every bar (unshifted, like `IchimokuCloudStrategy`)."""
+    tenkan_sen, kijun_sen, senkou_b = ((rolling_max(high, window) + rolling_min(low, window)) / 2 for window in (tenkan_window, kijun_window, senkou_b_window))
+    return tenkan_sen, kijun_sen, (tenkan_sen + kijun_sen) / 2, senkou_b
+
+
+def pack(values: np.ndarray, valid: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Moves the valid values of every row of a panel (`valid` marks the bars a symbol has) to the start of the row, in order.
+
+    The indicators being causal, computing them on the packed rows gives every symbol the values it would get from
+    its own bars alone, missing sessions being skipped instead of breaking the windows. Returns the packed rows (NaN
+    after the last valid value) and the order to pass to `unpack`.
+    """
+    order = np.argsort(~valid, axis=-1, kind='stable')
+    packed = np.take_along_axis(np.asarray(values, dtype=float), order, axis=-1)
+    packed[~np.take_along_axis(valid, order, axis=-1)] = np.nan
+    return packed, order
+
+
+def unpack(packed: np.ndarray, order: np.ndarray, valid: np.ndarray, fill: float = np.nan) -> np.ndarray:
+    """Moves the values of packed rows (see `pack`) back to the bars they belong to, the missing sessions holding `fill`."""
+    values = np.empty(packed.shape, dtype=packed.dtype)
+    np.put_along_axis(values, order, packed, axis=-1)
+    values[~valid] = fill
+    return values
+
+
+def cross_sectional_rank(values: np.ndarray) -> np.ndarray:
+    """Ranks the rows of a panel (one row per symbol) on every bar, from 0 (lowest value) to 1 (highest), NaN values being left out.
+
+    Ties are ranked in row order. Bars with a single value rank it 0.5, missing values stay NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    # NaN sorts last, so the ranks of the values present are 0 .. count - 1
+    ranks = np.argsort(np.argsort(values, axis=0, kind='stable'), axis=0, kind='stable').astype(float)
+    counts = (~missing).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranks = np.where(counts > 1, ranks / (counts - 1), 0.5)
+    ranks[missing] = np.nan
+    return ranks
@@ -0,0 +1,208 @@
+import enum
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+import numpy as np
+
+# pandas is only imported to convert unusual dates and to export DataFrames
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class TradeSide(enum.IntEnum):
+    BUY = 0
+    SELL = 1
+
+    def __str__(self) -> str:
+        """Returns the side as written in the transaction dictionaries (`buy` or `sell`)."""
+        return self.name.lower()
+
+
+class TradeStatus(enum.IntEnum):
+    SUCCESS = 0
+    INSUFFICIENT_FUNDS = 1
+    NOT_ENOUGH_ASSETS = 2
+
+    def __str__(self) -> str:
+        """Returns the status as written in the transaction dictionaries (e.g. `failure (insufficient funds)`)."""
+        return STATUS_LABELS[self]
+
+
+STATUS_LABELS = {
+    TradeStatus.SUCCESS: 'success',
+    TradeStatus.INSUFFICIENT_FUNDS: 'failure (insufficient funds)',
+    TradeStatus.NOT_ENOUGH_ASSETS: 'failure (not enough assets)',
+}
+
+# dtype of every column of the ledger, 38 bytes per transaction
+COLUMNS = {
+    'time': 'datetime64[ns]',
+    'side': np.uint8,
+    'symbol': np.int32,
+    'price': np.float64,
+    'volume': np.float64,
+    'status': np.uint8,
+    'fee': np.float64,
+}
+
+
+def to_datetime64(time) -> np.datetime64:
+    """Converts a bar date (string, datetime, Timestamp or datetime64, None for unknown) to a UTC datetime64, NaT if unknown or not a date (e.g. a label such as `bar15`)."""
+    if time is None:
+        return np.datetime64('NaT', 'ns')
+    if isinstance(time, str):
+        try:
+            moment = datetime.fromisoformat(time)
+        except ValueError:
+            moment = None
+        if moment is not None:
+            if moment.tzinfo is not None:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+            return np.datetime64(moment, 'ns')
+    import pandas as pd
+    try:
+        timestamp = pd.Timestamp(time)
+    except (ValueError, TypeError, OverflowError):
+        return np.datetime64('NaT', 'ns')
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_datetime64()
+
+
+class TransactionLedger(Sequence):
+    def __init__(self, capacity: int = 64) -> None:
+        """Constructor. Transactions are stored in one typed array per column (see `COLUMNS`), grown by doubling.
+
+        Symbols are stored as indices into `self.symbols`. The ledger is a sequence of transaction dictionaries
+        (`time`, `type`, `symbol`, `price`, `volume`, `status`, `fee`) created on access, so code written for the former list of
+        dictionaries keeps working, while `to_numpy`/`to_dataframe` export whole columns at once.
+        """
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.length = 0
+        self.symbols = []
+        self.symbol_ids = {}
+
+    def _symbol_id(self, symbol: str) -> int:
+        """Returns the index of `symbol` in `self.symbols`, adding it if needed."""
+        if symbol not in self.symbol_ids:
+            self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_ids[symbol]
+
+    def _reserve(self, count: int) -> None:
+        """Makes room for `count` more transactions."""
+        capacity = len(self.columns['price'])
+        if self.length + count <= capacity:
+            return
+        capacity = max(capacity * 2, self.length + count, 1)
+        for name, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.length] = values[:self.length]
+            self.columns[name] = grown
+
+    def append(self, side: TradeSide, symbol: str, price: float, volume: float, status: TradeStatus, time=None, fee: float = 0.0) -> None:
+        """Records one transaction, `time` being the date of the bar it happened on (None if unknown) and `fee` the commission paid."""
+        self._reserve(1)
+        row = self.length
+        self.columns['time'][row] = to_datetime64(time)
+        self.columns['side'][row] = side
+        self.columns['symbol'][row] = self._symbol_id(symbol)
+        self.columns['price'][row] = price
+        self.columns['volume'][row] = volume
+        self.columns['status'][row] = status
+        self.columns['fee'][row] = fee
+        self.length += 1
+
+    def extend(self, sides, symbol: str, prices, volumes, statuses, times=None, fees=0.0) -> None:
+        """Records a batch of transactions on one symbol, each argument but `symbol` holding one value per transaction.
+
+        `times` is a `datetime64` array (UTC), a sequence of bar dates (labels that are not dates are recorded as unknown), or None if unknown. `fees` may be a single value for all transactions.
+        """
+        count = len(prices)
+        self._reserve(count)
+        rows = slice(self.length, self.length + count)
+        if times is None:
+            self.columns['time'][rows] = np.datetime64('NaT', 'ns')
+        elif isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+            self.columns['time'][rows] = times
+        else:
+            import pandas as pd
+            try:
+                self.columns['time'][rows] = pd.to_datetime(list(times), utc=True, format='ISO8601').tz_localize(None).to_numpy(dtype='datetime64[ns]')
+            except (ValueError, TypeError, OverflowError):
+                # other formats are parsed one by one, labels that are not dates are recorded as unknown
+                self.columns['time'][rows] = [to_datetime64(time) for time in times]
+        self.columns['side'][rows] = sides
+        self.columns['symbol'][rows] = self._symbol_id(symbol)
+        self.columns['price'][rows] = prices
+        self.columns['volume'][rows] = volumes
+        self.columns['status'][rows] = statuses
+        self.columns['fee'][rows] = fees
+        self.length += count
+
+    def __len__(self) -> int:
+        """Returns the number of transactions."""
+        return self.length
+
+    def __getitem__(self, position: int | slice) -> dict | list[dict]:
+        """Returns the transaction at `position` as a dictionary (a list of them for a slice)."""
+        if isinstance(position, slice):
+            return [self[row] for row in range(*position.indices(self.length))]
+        row = position + self.length if position < 0 else position
+        if not 0 <= row < self.length:
+            raise IndexError("transaction index out of range")
+        time = self.columns['time'][row]
+        if np.isnat(time):
+            time = None
+        else:
+            import pandas as pd
+            time = pd.Timestamp(time, tz='UTC')
+        return {
+            'time': time,
+            'type': str(TradeSide(self.columns['side'][row])),
+            'symbol': self.symbols[self.columns['symbol'][row]],
+            'price': float(self.columns['price'][row]),
+            'volume': float(self.columns['volume'][row]),
+            'status': str(TradeStatus(self.columns['status'][row])),
+            'fee': float(self.columns['fee'][row]),
+        }
+
+    def __eq__(self, other) -> bool:
+        """Compares the transactions with another ledger or a list of transaction dictionaries."""
+        if isinstance(other, (TransactionLedger, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __getstate__(self) -> dict:
+        """Pickles only the used part of the columns (e.g. results sent back by `ParallelBacktester` workers)."""
+        state = self.__dict__.copy()
+        state['columns'] = {name: values[:self.length].copy() for name, values in self.columns.items()}
+        return state
+
+    def __repr__(self) -> str:
+        return f"TransactionLedger({self.length} transactions)"
+
+    def to_numpy(self) -> np.ndarray:
+        """Returns the transactions as a NumPy structured array, with `side` and `status` as `TradeSide`/`TradeStatus` values and `symbol` as strings."""
+        symbols = np.array(self.symbols if self.symbols else [''])
+        dtype = [(name, symbols.dtype if name == 'symbol' else values.dtype) for name, values in self.columns.items()]
+        records = np.empty(self.length, dtype=dtype)
+        for name, values in self.columns.items():
+            records[name] = symbols[values[:self.length]] if name == 'symbol' else values[:self.length]
+        return records
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        """Returns the transactions as a DataFrame with the columns of the transaction dictionaries (`type`, `symbol` and `status` as categoricals)."""
+        import pandas as pd
+        rows = slice(0, self.length)
+        return pd.DataFrame({
+            'time': pd.DatetimeIndex(self.columns['time'][rows]).tz_localize('UTC'),
+            'type': pd.Categorical.from_codes(self.columns['side'][rows], [str(side) for side in TradeSide]),
+            'symbol': pd.Categorical.from_codes(self.columns['symbol'][rows], self.symbols),
+            'price': self.columns['price'][rows],
+            'volume': self.columns['volume'][rows],
+            'status': pd.Categorical.from_codes(self.columns['status'][rows], [str(status) for status in TradeStatus]),
+            'fee': self.columns['fee'][rows],
+        })
@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import copy
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+
+from backtester import Backtester
+from indicators.streaming import IndicatorCache
+from portfolio import portfolio_stats
+from strategy import TradingStrategy
+
+# Alpaca market data stream (v2), free IEX feed
+ALPACA_URL = 'wss://stream.data.alpaca.markets/v2/iex'
+# subscription channels of the stream and the type (`T`) of their events
+CHANNELS = {'bars': 'b', 'quotes': 'q', 'trades': 't'}
+
+
+def to_data_point(event: dict) -> tuple[str, dict] | None:
+    """Converts a market data event of the stream (Alpaca v2 format) to `(symbol, data point)`, None for other events.
+
+    Bars (`T: b`) become data points as is. Quotes (`T: q`) become a bar at the mid price without volume, trades (`T: t`)
+    a bar at the trade price with its size as volume. The `date` is the event's timestamp (RFC 3339, UTC).
+
+    Raises:
+        ValueError: If the event is an error sent by the stream.
+    """
+    kind = event.get('T')
+    if kind == 'b':
+        return event['S'], {'open': event['o'], 'high': event['h'], 'low': event['l'], 'close': event['c'], 'volume': event['v'], 'date': event['t']}
+    if kind == 'q':
+        price = (event['bp'] + event['ap']) / 2
+        return event['S'], {'open': price, 'high': price, 'low': price, 'close': price, 'volume': 0.0, 'date': event['t']}
+    if kind == 't':
+        price = event['p']
+        return event['S'], {'open': price, 'high': price, 'low': price, 'close': price, 'volume': event['s'], 'date': event['t']}
+    if kind == 'error':
+        raise ValueError(f"Stream error {event.get('code')}: {event.get('msg')}")
+    return None
+
+
+class LatencyHistogram:
+    def __init__(self, smallest: float = 1e-6, largest: float = 10.0, buckets_per_decade: int = 20) -> None:
+        """Constructor. Counts latencies (in seconds) in logarithmic buckets from `smallest` to `largest`, in constant memory.
+
+        With 20 buckets per decade, a bucket spans 12% of its lower bound, which bounds the error of the percentiles.
+        Recording is one logarithm and one increment, cheap enough for every tick.
+        """
+        self.smallest = smallest
+        self.buckets_per_decade = buckets_per_decade
+        self.counts = [0] * (math.ceil(math.log10(largest / smallest) * buckets_per_decade) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Adds a latency."""
+        bucket = int(math.log10(seconds / self.smallest) * self.buckets_per_decade) if seconds > self.smallest else 0
+        self.counts[min(bucket, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """Returns the latency below which `percent`% of the recorded ones are (the upper bound of its bucket), 0 if none was recorded."""
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        bucket = int(np.searchsorted(np.cumsum(self.counts), max(rank, 1)))
+        return min(self.smallest * 10 ** ((bucket + 1) / self.buckets_per_decade), self.maximum)
+
+    def report(self) -> dict:
+        """Returns the number of latencies recorded, their mean, p50, p90, p99 and maximum (seconds)."""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.maximum,
+        }
+
+
+class LiveTrader:
+    def __init__(self, strategies: list[TradingStrategy], symbols: list[str], initial_balance: float = 10000, multiplier: float = 10,
+                 max_lag: float = 0.25, on_lag: str = 'drop', log=print) -> None:
+        """Constructor. Paper trades `strategies` on the `symbols` of a live market data stream (see `run`).
+
+        Every strategy trades every symbol through its own copy (fresh indicators and history), all the copies of a
+        strategy sharing one paper `Broker` and its cash, like `PortfolioBacktester`; decisions are made by the same
+        per-bar step as backtests. The time each strategy takes to decide on a data point is recorded in its own
+        `LatencyHistogram` (`self.latency`), and the end-to-end latency, from the reception of a message to the last
+        decision on one of its data points, in `self.end_to_end`.
+        The trader refuses to fall behind the feed: a message that waited more than `max_lag` seconds before being
+        processed is dropped (`on_lag='drop'`, counted in the results), or stops the session (`on_lag='stop'`).
+
+        Raises:
+            ValueError: If `on_lag` is not `drop` or `stop`.
+        """
+        if on_lag not in ('drop', 'stop'):
+            raise ValueError(f"Invalid on_lag: {on_lag} (expected drop or stop)")
+        self.symbols = symbols
+        self.initial_balance = initial_balance
+        self.multiplier = multiplier
+        self.max_lag = max_lag
+        self.on_lag = on_lag
+        self.log = log
+        self.sessions = []
+        for strategy in strategies:
+            copies = {}
+            for symbol in symbols:
+                trader = copy.deepcopy(strategy)
+                trader.reset()
+                trader.share_indicators(IndicatorCache())
+                copies[symbol] = (trader, Backtester._history([trader]))
+            self.sessions.append((strategy.name, Backtester(initial_balance), copies))
+        self.latency = {strategy.name: LatencyHistogram() for strategy in strategies}
+        self.end_to_end = LatencyHistogram()
+        self.last_prices = {}
+        self.messages = 0
+        self.data_points = 0
+        self.dropped = 0
+        self.worst_lag = 0.0
+        self.stopped = None
+
+    def on_data_point(self, symbol: str, data_point: dict, received: float) -> None:
+        """Feeds a data point to every strategy and executes their decisions, `received` being the `time.perf_counter` of its reception."""
+        if symbol not in self.symbols:
+            return
+        self.data_points += 1
+        self.last_prices[symbol] = data_point['close']
+        for name, backtester, copies in self.sessions:
+            strategy, history = copies[symbol]
+            started = time.perf_counter()
+            history.append(data_point)
+            backtester._step(strategy, backtester.broker, history, data_point, symbol, self.multiplier)
+            self.latency[name].record(time.perf_counter() - started)
+        self.end_to_end.record(time.perf_counter() - received)
+
+    async def run(self, url: str = ALPACA_URL, key: str | None = None, secret: str | None = None, channel: str = 'bars',
+                  duration: float | None = None, record: str | None = None) -> dict:
+        """Connects to a market data stream speaking the Alpaca v2 protocol (Alpaca itself or a `MockFeed`), subscribes to a `channel` of the symbols and trades until the stream closes or `duration` seconds passed.
+
+        Messages are received by a separate task, which timestamps them, while this one processes them in order and
+        yields to it after each one. With `record`, the received messages are appended to that file (one per line),
+        for `MockFeed.from_recording`. Returns `results`.
+
+        Raises:
+            ValueError: If the channel is unknown, or the stream rejects the authentication or the subscription.
+        """
+        import websockets
+        if channel not in CHANNELS:
+            raise ValueError(f"Invalid channel: {channel} (expected one of {', '.join(CHANNELS)})")
+        deadline = None if duration is None else time.monotonic() + duration
+        recording = open(record, 'a') if record else None
+        try:
+            # messages are queued by the receiver, the connection must keep reading to see a close frame
+            async with websockets.connect(url, max_size=None, max_queue=None) as websocket:
+                await self._subscribe(websocket, key, secret, channel)
+                queue = asyncio.Queue()
+                receiver = asyncio.create_task(self._receive(websocket, queue, recording))
+                try:
+                    while True:
+                        timeout = None if deadline is None else deadline - time.monotonic()
+                        if timeout is not None and timeout <= 0:
+                            break
+                        try:
+                            message = await asyncio.wait_for(queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                        if message is None:
+                            break
+                        if not self._process(*message):
+                            break
+                        # lets the receiver timestamp the messages that arrived meanwhile
+                        await asyncio.sleep(0)
+                finally:
+                    receiver.cancel()
+        finally:
+            if recording is not None:
+                recording.close()
+        return self.results()
+
+    async def _subscribe(self, websocket, key: str | None, secret: str | None, channel: str) -> None:
+        """Authenticates and subscribes to `channel` of the symbols, as the Alpaca v2 protocol requires.
+
+        Raises:
+            ValueError: If the stream answers with an error.
+        """
+        for event in json.loads(await websocket.recv()):
+            to_data_point(event)
+        await websocket.send(json.dumps({'action': 'auth', 'key': key or '', 'secret': secret or ''}))
+        for event in json.loads(await websocket.recv()):
+            to_data_point(event)
+        await websocket.send(json.dumps({'action': 'subscribe', channel: self.symbols}))
+        for event in json.loads(await websocket.recv()):
+            to_data_point(event)
+        self.log(f"Subscribed to the {channel} of {', '.join(self.symbols)}")
+
+    async def _receive(self, websocket, queue: asyncio.Queue, recording) -> None:
+        """Puts every message of the stream in `queue` with its reception time and decoded events, then None when the stream closes."""
+        import websockets
+        try:
+            async for message in websocket:
+                received = time.perf_counter()
+                if recording is not None:
+                    recording.write(message if isinstance(message, str) else message.decode())
+                    recording.write('\n')
+                queue.put_nowait((received, json.loads(message)))
+        except websockets.ConnectionClosedError as e:
+            self.log(f"Stream closed: {e}")
+        finally:
+            queue.put_nowait(None)
+
+    def _process(self, received: float, events: list) -> bool:
+        """Processes a message unless it waited more than `max_lag`, returns False if the session must stop."""
+        self.messages += 1
+        lag = time.perf_counter() - received
+        self.worst_lag = max(self.worst_lag, lag)
+        if lag > self.max_lag:
+            if self.on_lag == 'stop':
+                self.stopped = f"fell {lag * 1000:.1f} ms behind the feed"
+                self.log(f"Stopping: {self.stopped}")
+                return False
+            self.dropped += len(events)
+            return True
+        for event in events:
+            parsed = to_data_point(event)
+            if parsed is not None:
+                self.on_data_point(*parsed, received)
+        return True
+
+    def results(self) -> dict:
+        """Returns `strategy name -> stats` (see `portfolio.portfolio_stats`) with each strategy's decision `latency` (`LatencyHistogram.report`), and the `feed` stats: messages, data points, dropped events, worst lag (seconds), end-to-end `latency` and why the session stopped early, if it did."""
+        results = {}
+        for name, backtester, _ in self.sessions:
+            results[name] = {**portfolio_stats(backtester.broker, self.initial_balance, dict(self.last_prices)), 'latency': self.latency[name].report()}
+        feed = {'messages': self.messages, 'data_points': self.data_points, 'dropped': self.dropped, 'worst_lag': self.worst_lag,
+                'latency': self.end_to_end.report(), 'stopped': self.stopped}
+        return {'strategies': results, 'feed': feed}
+
+
+class MockFeed:
+    def __init__(self, messages: list[tuple[int, list[dict]]], speed: float = 1.0) -> None:
+        """Constructor. A local websocket server speaking the Alpaca v2 market data protocol, replaying recorded `messages` (`(timestamp in ns, events)`, sorted).
+
+        Messages are sent at the pace of their timestamps divided by `speed` (60: an hour of bars in a minute, 0: as
+        fast as the client reads them), keeping only the events of the channel and symbols the client subscribed to.
+        Any key and secret are accepted. Every connection replays the data from the start.
+        """
+        self.messages = messages
+        self.speed = speed
+
+    @classmethod
+    def from_bars(cls, bars: dict, speed: float = 1.0) -> 'MockFeed':
+        """Creates a feed replaying bars (`symbol -> BarSeries`) as bar events, the bars of all symbols at a same timestamp in one message."""
+        index = np.concatenate([series.index for series in bars.values()])
+        symbols = np.concatenate([np.full(len(series), symbol, dtype=object) for symbol, series in bars.items()])
+        rows = {field: np.concatenate([series[field] for series in bars.values()]).tolist() for field in ('open', 'high', 'low', 'close', 'volume')}
+        order = np.argsort(index, kind='stable')
+        timestamps = index[order].view(np.int64)
+        # RFC 3339 like the stream, with microseconds only for ticks
+        dates = np.datetime_as_string(index[order], unit='s' if not (timestamps % 10**9).any() else 'us', timezone='UTC').tolist()
+        timestamps = timestamps.tolist()
+        messages = []
+        for position, row in enumerate(order.tolist()):
+            event = {'T': 'b', 'S': symbols[row], 'o': rows['open'][row], 'h': rows['high'][row], 'l': rows['low'][row], 'c': rows['close'][row], 'v': rows['volume'][row], 't': dates[position]}
+            if messages and messages[-1][0] == timestamps[position]:
+                messages[-1][1].append(event)
+            else:
+                messages.append((timestamps[position], [event]))
+        return cls(messages, speed)
+
+    @classmethod
+    def from_recording(cls, path: str, speed: float = 1.0) -> 'MockFeed':
+        """Creates a feed replaying a file recorded by `LiveTrader.run(record=...)`, paced by the timestamp of the first event of each message."""
+        messages = []
+        with open(path) as file:
+            for line in file:
+                events = [event for event in json.loads(line) if event.get('T') in CHANNELS.values()]
+                if events:
+                    messages.append((int(np.datetime64(events[0]['t'].rstrip('Z'), 'ns').view(np.int64)), events))
+        return cls(messages, speed)
+
+    async def handle(self, websocket, path: str | None = None) -> None:
+        """Serves one client: connection, authentication and subscription messages, then the replay."""
+        await websocket.send(json.dumps([{'T': 'success', 'msg': 'connected'}]))
+        json.loads(await websocket.recv())
+        await websocket.send(json.dumps([{'T': 'success', 'msg': 'authenticated'}]))
+        request = json.loads(await websocket.recv())
+        channels = {name: list(request.get(name, [])) for name in CHANNELS}
+        await websocket.send(json.dumps([{'T': 'subscription', **channels}]))
+        wanted = {(CHANNELS[name], symbol) for name, symbols in channels.items() for symbol in symbols}
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        first = self.messages[0][0] if self.messages else 0
+        for timestamp, events in self.messages:
+            events = [event for event in events if (event['T'], event['S']) in wanted]
+            if not events:
+                continue
+            if self.speed > 0:
+                delay = start + (timestamp - first) / 1e9 / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.send(json.dumps(events))
+        await websocket.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8766):
+        """Starts the server and returns it (a `websockets` server, to `close`); `port` 0 picks a free port."""
+        import websockets
+        return await websockets.serve(self.handle, host, port, max_size=None)
+
+
+def _print_results(results: dict) -> None:
+    """Prints the stats and decision times of every strategy and the feed stats, with the end-to-end latency."""
+    for name, stats in results['strategies'].items():
+        latency = stats['latency']
+        print(f"{name}: profit {stats['profit_with_stocks']:.2f}, {stats['trades']} trades, {latency['count']} decisions, "
+              f"decision p50 {latency['p50'] * 1e6:.0f} us, p99 {latency['p99'] * 1e6:.0f} us, max {latency['max'] * 1e6:.0f} us")
+    feed = results['feed']
+    latency = feed['latency']
+    print(f"Feed: {feed['messages']} messages, {feed['data_points']} data points, {feed['dropped']} events dropped, worst lag {feed['worst_lag'] * 1000:.2f} ms, "
+          f"end-to-end p50 {latency['p50'] * 1e6:.0f} us, p99 {latency['p99'] * 1e6:.0f} us"
+          + (f", stopped: {feed['stopped']}" if feed['stopped'] else ""))
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """Command line entry point.
+
+    `python live.py trade --strategy rsi --symbols AAPL` paper trades on the Alpaca stream (keys in `APCA_API_KEY_ID`
+    and `APCA_API_SECRET_KEY`) or on `--url` of a mock feed, started with e.g.
+    `python live.py serve --symbols AAPL MSFT --start 2024-01-01 --end 2024-02-01 --speed 60` (or `--recording FILE`).
+    """
+    parser = argparse.ArgumentParser(description="Paper trades strategies on a live market data stream, or serves a mock stream replaying recorded data.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    trade = commands.add_parser('trade', help="paper trade on a stream")
+    trade.add_argument('--url', default=ALPACA_URL, help="stream URL (default: Alpaca's IEX feed)")
+    trade.add_argument('--strategy', action='append', dest='strategies', required=True, metavar='NAME[:PARAM=VALUE,...]', help="strategy to trade, repeatable (see main.py)")
+    trade.add_argument('--symbols', nargs='+', required=True)
+    trade.add_argument('--channel', choices=list(CHANNELS), default='bars')
+    trade.add_argument('--initial-balance', type=float, default=10000)
+    trade.add_argument('--multiplier', type=float, default=10)
+    trade.add_argument('--max-lag', type=float, default=0.25, help="seconds a message may wait before being processed")
+    trade.add_argument('--on-lag', choices=['drop', 'stop'], default='drop', help="what to do with messages waiting longer than --max-lag")
+    trade.add_argument('--duration', type=float, help="seconds to trade (default: until the stream closes)")
+    trade.add_argument('--record', help="file to append the received messages to, for `serve --recording`")
+    serve = commands.add_parser('serve', help="serve a mock stream")
+    serve.add_argument('--recording', help="file recorded by `trade --record` (default: bars fetched like main.py)")
+    serve.add_argument('--symbols', nargs='+')
+    serve.add_argument('--start', default="2024-01-01")
+    serve.add_argument('--end', default="2024-05-30")
+    serve.add_argument('--source', default='yfinance')
+    serve.add_argument('--source-options', type=json.loads, default={}, help="JSON options of the source, e.g. '{\"directory\": \"data\"}'")
+    serve.add_argument('--cache-dir', default='.cache/bars')
+    serve.add_argument('--speed', type=float, default=1.0, help="replay speed, 0 for as fast as possible")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8766)
+    options = parser.parse_args(arguments)
+
+    if options.command == 'serve':
+        if options.recording:
+            feed = MockFeed.from_recording(options.recording, options.speed)
+        else:
+            from data_handler import DataFetcher
+            if not options.symbols:
+                parser.error("serve needs --recording or --symbols")
+            fetcher = DataFetcher(options.source, cache_dir=options.cache_dir, **options.source_options)
+            bars, errors = fetcher.fetch_many(options.symbols, options.start, options.end)
+            for symbol, error in errors.items():
+                print(f"Error fetching data for {symbol}: {error}")
+            feed = MockFeed.from_bars(bars, options.speed)
+
+        async def serve_forever():
+            server = await feed.serve(options.host, options.port)
+            print(f"Replaying {len(feed.messages)} messages on ws://{options.host}:{options.port}")
+            await server.wait_closed()
+
+        try:
+            asyncio.run(serve_forever())
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    from main import parse_strategy
+    trader = None
+    try:
+        strategies = [parse_strategy(spec) for spec in options.strategies]
+        trader = LiveTrader(strategies, options.symbols, options.initial_balance, options.multiplier, options.max_lag, options.on_lag)
+        results = asyncio.run(trader.run(options.url, os.environ.get('APCA_API_KEY_ID'), os.environ.get('APCA_API_SECRET_KEY'),
+                                         options.channel, options.duration, options.record))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        # interrupted before trading started, there is nothing to report
+        if trader is None:
+            return 1
+        results = trader.results()
+    _print_results(results)
+    return 0 if results['feed']['stopped'] is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
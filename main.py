@@ -1,112 +1,142 @@
+import argparse
+import ast
+
 from data_handler import DataFetcher, DataStorage
+from registry import STRATEGIES
+from strategy import TradingStrategy
+from runner import ParallelBacktester
+from result_store import ResultStore
+
+# example values
+SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'PFE', 'MRNA', 'BNTX', 'JNJ', 'NVAX']
+# SYMBOLS = [
+#     "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "NVDA", "INTC", "AMD", "IBM", "ORCL",
+#     "ZM", "PYPL", "NFLX", "META", "ADBE", "CSCO", "CRM", "SHOP", "SQ", "TWLO",
+#     "UBER", "LYFT", "ABNB", "SNAP", "BABA", "TSM", "V", "MA", "JPM", "BAC",
+#     "WFC", "GS", "MS", "C", "T", "VZ", "KO", "PEP", "NKE", "HD",
+#     "WMT", "COST", "MCD", "SBUX", "DIS", "BA", "CAT", "XOM", "CVX", "BP",
+#     "PFE", "MRNA", "JNJ", "BNTX", "MRK", "ABBV", "GILD", "CVS", "UNH", "TMO",
+#     "UPS", "FDX", "DE", "GM", "F", "RIVN", "LCID", "RCL", "CCL", "DAL",
+#     "AAL", "UAL", "LUV", "GE", "HON", "MMM", "DOW", "GLW", "APD", "BK",
+#     "TROW", "VFC", "AMAT", "QCOM", "MU", "TXN", "FSLR", "RUN", "PLUG",
+#     "COP", "SLB", "HAL", "MRO", "EOG", "LMT", "RTX", "GD", "NOC", "PYPL",
+#     "ADSK", "EA", "TTWO", "MTCH", "BKNG", "DPZ", "MAR", "HAS", "MAT"
+# ]
+
+
+def example_strategies() -> list[TradingStrategy]:
+    """Returns the strategies backtested when none is given on the command line."""
+    return [
+        STRATEGIES.create('MovingAverageStrategy', short_window=5, long_window=40),
+        STRATEGIES.create('RSIStrategy', period=14, overbought=70, oversold=30),
+        STRATEGIES.create('BollingerBandsStrategy', period=20, std_dev=2),
+        STRATEGIES.create('StochasticOscillatorStrategy', period=20, overbought=80, oversold=20),
+        STRATEGIES.create('MACDStrategy', short_window=12, long_window=26, signal_window=9),
+        STRATEGIES.create('ADXStrategy', period=20),
+        STRATEGIES.create('IchimokuCloudStrategy'),
+        STRATEGIES.create('HybridStrategy', [STRATEGIES.create('IchimokuCloudStrategy'), STRATEGIES.create('ADXStrategy', period=20)], weights=[0.5, 0.5], name="Ichimoku + ADX"),
+        STRATEGIES.create('CustomStrategy', [STRATEGIES.create('IchimokuCloudStrategy'), STRATEGIES.create('ADXStrategy', period=20)], buy_merging_function=lambda x: x[0] * x[1], sell_merging_function=lambda x: x[0] * x[1], name="Ichimoku * ADX"),
+    ]
 
-from strategies.basic.moving_average import MovingAverageStrategy
-from strategies.basic.RSI import RSIStrategy
-from strategies.basic.bollinger_bands import BollingerBandsStrategy
-from strategies.basic.stochastic_oscillator import StochasticOscillatorStrategy
-from strategies.basic.macd import MACDStrategy
-from strategies.basic.ichimoku_cloud import IchimokuCloudStrategy
-from strategies.basic.adx import ADXStrategy
 
-from strategies.hybrid.basic import HybridStrategy
-from strategies.hybrid.custom import CustomStrategy
+def parse_strategy(spec: str) -> TradingStrategy:
+    """Creates a strategy from a command line spec, its name (see `StrategyRegistry.resolve`) and optional parameters, e.g. `rsi:period=14,overbought=75`.
 
-from strategy import TradingStrategy
-from broker import Broker
-from backtester import Backtester
-from tqdm import tqdm
-
-
-def main():
-    """Entry point of the application."""
-
-    symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'PFE', 'MRNA', 'BNTX', 'JNJ', 'NVAX'] # Example values
-    # symbols = [
-    #     "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "NVDA", "INTC", "AMD", "IBM", "ORCL",
-    #     "ZM", "PYPL", "NFLX", "META", "ADBE", "CSCO", "CRM", "SHOP", "SQ", "TWLO",
-    #     "UBER", "LYFT", "ABNB", "SNAP", "BABA", "TSM", "V", "MA", "JPM", "BAC",
-    #     "WFC", "GS", "MS", "C", "T", "VZ", "KO", "PEP", "NKE", "HD",
-    #     "WMT", "COST", "MCD", "SBUX", "DIS", "BA", "CAT", "XOM", "CVX", "BP",
-    #     "PFE", "MRNA", "JNJ", "BNTX", "MRK", "ABBV", "GILD", "CVS", "UNH", "TMO",
-    #     "UPS", "FDX", "DE", "GM", "F", "RIVN", "LCID", "RCL", "CCL", "DAL",
-    #     "AAL", "UAL", "LUV", "GE", "HON", "MMM", "DOW", "GLW", "APD", "BK",
-    #     "TROW", "VFC", "AMAT", "QCOM", "MU", "TXN", "FSLR", "RUN", "PLUG",
-    #     "COP", "SLB", "HAL", "MRO", "EOG", "LMT", "RTX", "GD", "NOC", "PYPL",
-    #     "ADSK", "EA", "TTWO", "MTCH", "BKNG", "DPZ", "MAR", "HAS", "MAT"
-    # ]
-
-    symbols = sorted(symbols)
+    Raises:
+        ValueError: If the strategy is unknown, a parameter is not `name=value` or the parameters don't match the strategy's constructor.
+    """
+    name, _, arguments = spec.partition(':')
+    parameters = {}
+    for argument in filter(None, arguments.split(',')):
+        key, separator, value = argument.partition('=')
+        if not separator:
+            raise ValueError(f"Invalid strategy parameter: {argument} (expected name=value)")
+        try:
+            parameters[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            parameters[key.strip()] = value.strip()
+    try:
+        return STRATEGIES.create(name.strip(), **parameters)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for {name.strip()}: {e}")
+
+
+def parse_arguments(arguments: list[str] | None = None) -> argparse.Namespace:
+    """Parses the command line. Without arguments, the example strategies are backtested on the example symbols."""
+    parser = argparse.ArgumentParser(description="Backtests trading strategies on historical bars.")
+    parser.add_argument('--strategy', action='append', dest='strategies', metavar='NAME[:PARAM=VALUE,...]',
+                        help="strategy to backtest by class or short name, repeatable, e.g. rsi:period=14 (default: the example strategies)")
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS, help="symbols to backtest")
+    parser.add_argument('--start', default="2024-01-01", help="first date, YYYY-MM-DD")
+    parser.add_argument('--end', default="2024-05-30", help="end date (excluded), YYYY-MM-DD")
+    parser.add_argument('--vectorized', action='store_true', help="use the vectorized backtest mode")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default: number of CPUs)")
+    parser.add_argument('--details', action='store_true', help="print the results of every run")
+    parser.add_argument('--history', action='store_true', help="print the transaction history of every run (with --details)")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str] | None = None):
+    """Entry point of the application.
+
+    Strategies are looked up in the registry and only their modules are imported, the data sources load their
+    libraries (pandas, yfinance) when they have to fetch bars, so a short run on cached bars starts fast.
+    """
+    options = parse_arguments(arguments)
+    symbols = sorted(options.symbols)
     
     max_symbols_length = max([len(symbol) for symbol in symbols]) + 2
 
-    print_details = False
-    print_history = False
-
-    gains = {}
+    print_details = options.details
+    print_history = options.history
 
-    movingAverageStrategy = MovingAverageStrategy(short_window=5, long_window=40)
-    rsiStrategy = RSIStrategy(period=14, overbought=70, oversold=30)
-    bollingerBandsStrategy = BollingerBandsStrategy(period=20, std_dev=2)
-    stochasticOscillatorStrategy = StochasticOscillatorStrategy(period=20, overbought=80, oversold=20)
-    macdStrategy = MACDStrategy(short_window=12, long_window=26, signal_window=9)
-    ichimokuCloudStrategy = IchimokuCloudStrategy()
-    adxStrategy = ADXStrategy(period=20)
-
-    ichimokuADX = HybridStrategy([IchimokuCloudStrategy(), ADXStrategy(period=20)], weights=[0.5, 0.5], name="Ichimoku + ADX")
-    ichimokuADX2 = CustomStrategy([IchimokuCloudStrategy(), ADXStrategy(period=20)], buy_merging_function=lambda x: x[0] * x[1], sell_merging_function=lambda x: x[0] * x[1], name="Ichimoku * ADX")
-
-    strategies : list[TradingStrategy] = [
-        movingAverageStrategy,
-        rsiStrategy,
-        bollingerBandsStrategy,
-        stochasticOscillatorStrategy,
-        macdStrategy,
-        adxStrategy,
-        ichimokuCloudStrategy,
-        ichimokuADX,
-        ichimokuADX2
-    ]
+    try:
+        strategies : list[TradingStrategy] = [parse_strategy(spec) for spec in options.strategies] if options.strategies else example_strategies()
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
 
     max_name_length = max([len(strategy.name) for strategy in strategies])
 
-    for symbol in tqdm(symbols):
-        # Create instances
-        data_fetcher = DataFetcher()
-        data_storage = DataStorage()
-        for strategy in strategies:
-            strategy.reset()
-        backtester = Backtester(initial_balance=10000) # Example value
-        
-        # Fetch data
-        try:
-            data = data_fetcher.fetch_historical_data(symbol=symbol, start_date="2024-01-01", end_date="2024-05-30") # Example dates
-            data_storage.store_data(symbol=symbol, data=data)
-            data = data_storage.get_data(symbol=symbol)
-        except ValueError as e:
-            print(f"Error fetching data: {e}")
-            return
-        
+    # Fetch data, several symbols at once, a symbol that cannot be fetched is reported and skipped
+    data_fetcher = DataFetcher(cache_dir=".cache/bars") # Warm runs read the bars from disk
+    data_storage = DataStorage()
+    fetched, errors = data_fetcher.fetch_many(symbols, start_date=options.start, end_date=options.end)
+    for symbol, error in errors.items():
+        print(f"Error fetching data for {symbol}: {error}")
+
+    bars = {}
+    for symbol, data in fetched.items():
         if len(data) == 0:
             print(f"No data found for symbol: {symbol}")
             continue
-        
-        # Run backtest
-        for strategy in strategies:
-            results = backtester.run_backtest(strategy, data, multiplier=2, symbol=symbol)
+        data_storage.store_data(symbol=symbol, data=data)
+        bars[symbol] = data_storage.get_bars(symbol=symbol)
 
-            if not strategy.name in gains:
-                gains[strategy.name] = {}
-            gains[strategy.name][symbol] = results['profit_with_stocks']
+    if not bars:
+        print("No data to backtest")
+        return
 
+    # Run backtests, every (symbol, strategy) pair in its own context, spread over all CPU cores
+    # Results are stored by their inputs, unchanged runs are read from the store instead of being run again
+    store = ResultStore(".cache/results.db")
+    backtester = ParallelBacktester(strategies, initial_balance=10000, multiplier=2, vectorized=options.vectorized, max_workers=options.workers, keep_history=print_history, store=store) # Example value
+    all_results = backtester.run(bars)
+
+    for strategy_name, symbol_results in all_results.items():
+        for symbol, results in symbol_results.items():
             # Print results
             if print_details:
-                print("Backtest Results for", strategy.name)
+                print("Backtest Results for", strategy_name, "on", symbol)
                 print(f"  Initial Balance: {results['initial_balance']}")
                 print(f"  Final Balance: {results['final_balance']}")
                 print(f"  Final Balance with Stocks: {results['final_balance_with_stocks']}")
                 print(f"  Profit: {results['profit']}")
                 print(f"  Profit with Stocks: {results['profit_with_stocks']}")
                 print(f"  Number of Trades: {results['trades']}")
+                print(f"  Sharpe Ratio: {results['sharpe']:.2f}  Sortino Ratio: {results['sortino']:.2f}")
+                print(f"  Max Drawdown: {results['max_drawdown']:.2%} over {results['max_drawdown_duration']} bars")
+                print(f"  Exposure: {results['exposure']:.2%}  Turnover: {results['turnover']:.2f}  Win Rate: {results['win_rate']:.2%}")
                 if print_history:
                     print("Transaction History:")
                     for transaction in results['transaction_history']:
@@ -114,6 +144,23 @@ def main():
 
     
 
+    # Gains of this run, queried from the store (strategies that cannot be stored, like ones with lambdas, are taken from the results)
+    keys = {}
+    for symbol, series in bars.items():
+        for strategy in strategies:
+            try:
+                keys[ResultStore.key(series, strategy, backtester.initial_balance, backtester.multiplier)] = strategy.name, symbol
+            except ValueError:
+                pass
+    stored = store.get_many(list(keys))
+    gains = {}
+    for key, (strategy_name, symbol) in keys.items():
+        if key in stored:
+            gains.setdefault(strategy_name, {})[symbol] = stored[key]['profit_with_stocks']
+    for strategy_name, symbol_results in all_results.items():
+        if strategy_name not in gains:
+            gains[strategy_name] = {symbol: results['profit_with_stocks'] for symbol, results in symbol_results.items()}
+
     print()
     for strategy, results in sorted(gains.items(), key=lambda x: sum(x[1].values()), reverse=True):
         if print_details:
@@ -0,0 +1,139 @@
+import numpy as np
+
+from ledger import TradeSide, TradeStatus
+
+# metrics of `performance_metrics`, added to the stats of every backtest
+METRICS = ('sharpe', 'sortino', 'max_drawdown', 'max_drawdown_duration', 'exposure', 'turnover', 'win_rate')
+
+
+class EquityCurve:
+    def __init__(self, initial_balance: float, capacity: int = 1024) -> None:
+        """Constructor. Records the value of the account (cash plus stocks at the close) and the stocks held after every bar of a backtest.
+
+        Values are written in preallocated arrays of `capacity` bars (the number of bars when known), doubled when full.
+        """
+        self.initial_balance = initial_balance
+        self.values = np.empty(max(capacity, 1))
+        self.held = np.empty(max(capacity, 1))
+        self.length = 0
+
+    @classmethod
+    def from_trades(cls, initial_balance: float, close: np.ndarray, bars: np.ndarray, cash_flows: np.ndarray, volumes: np.ndarray) -> 'EquityCurve':
+        """Creates the curve of a backtest from its successful trades: the bar of each one, the cash it moved and the stocks it bought (negative if sold).
+
+        Balances are accumulated in bar order (`np.cumsum` adds sequentially), so the curve is identical to the one
+        recorded bar by bar with the same trades.
+        """
+        curve = cls(initial_balance, len(close))
+        cash = np.zeros(len(close) + 1)
+        cash[0] = initial_balance
+        cash[1:][bars] = cash_flows
+        held = np.zeros(len(close))
+        held[bars] = volumes
+        curve.held[:len(close)] = np.cumsum(held)
+        curve.values[:len(close)] = np.cumsum(cash)[1:] + curve.held[:len(close)] * close
+        curve.length = len(close)
+        return curve
+
+    def append(self, value: float, held: float) -> None:
+        """Records the account value and the stocks held after a bar."""
+        if self.length == len(self.values):
+            self.values = np.concatenate((self.values, np.empty(len(self.values))))
+            self.held = np.concatenate((self.held, np.empty(len(self.held))))
+        self.values[self.length] = value
+        self.held[self.length] = held
+        self.length += 1
+
+    @property
+    def equity(self) -> np.ndarray:
+        """Account value after every bar (a view, no copy)."""
+        return self.values[:self.length]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """Stocks held after every bar (a view, no copy)."""
+        return self.held[:self.length]
+
+    def __len__(self) -> int:
+        """Returns the number of bars."""
+        return self.length
+
+    def __eq__(self, other) -> bool:
+        """True if both curves have the same starting balance and values."""
+        if not isinstance(other, EquityCurve):
+            return NotImplemented
+        return self.initial_balance == other.initial_balance and np.array_equal(self.equity, other.equity) and np.array_equal(self.positions, other.positions)
+
+    def __getstate__(self) -> dict:
+        """Pickles only the recorded bars, not the spare capacity."""
+        return {**self.__dict__, 'values': self.equity.copy(), 'held': self.positions.copy()}
+
+    def __repr__(self) -> str:
+        return f"EquityCurve({len(self)} bars)"
+
+
+def performance_metrics(curve: EquityCurve, transactions: np.ndarray, periods_per_year: float = 252, metrics: tuple = METRICS) -> dict:
+    """Returns the performance metrics of a backtest from its equity curve and its transactions (`TransactionLedger.to_numpy` records).
+
+    `sharpe` and `sortino`: mean return per bar over its standard deviation (over its downside deviation), annualized
+    with `periods_per_year` bars per year and no risk-free rate. `max_drawdown`: largest drop from a peak of the account
+    value, as a fraction; `max_drawdown_duration`: longest number of bars below a previous peak. `exposure`: fraction
+    of bars ending with stocks held. `turnover`: value of the successful trades over the average account value.
+    `win_rate`: fraction of the round trips (from no stocks back to no stocks) ending with a profit.
+    Undefined metrics (no bars, no variation, no round trip) are 0. Every metric is computed in a few passes over the arrays,
+    only the ones in `metrics` are computed and returned.
+    """
+    equity = curve.equity
+    length = len(equity)
+    if length == 0:
+        return {metric: 0 for metric in metrics}
+
+    results = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'sharpe' in metrics or 'sortino' in metrics:
+            previous = np.concatenate(([curve.initial_balance], equity[:-1]))
+            returns = np.where(previous != 0, equity / previous - 1, 0)
+            mean = returns.mean()
+            scale = np.sqrt(periods_per_year)
+            if 'sharpe' in metrics:
+                deviation = returns.std()
+                results['sharpe'] = float(mean / deviation * scale if deviation > 0 else 0.0)
+            if 'sortino' in metrics:
+                downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+                results['sortino'] = float(mean / downside * scale if downside > 0 else 0.0)
+
+        if 'max_drawdown' in metrics or 'max_drawdown_duration' in metrics:
+            peak = np.maximum.accumulate(np.concatenate(([curve.initial_balance], equity)))[1:]
+            if 'max_drawdown' in metrics:
+                results['max_drawdown'] = float(np.where(peak > 0, 1 - equity / peak, 0).max())
+            if 'max_drawdown_duration' in metrics:
+                bars = np.arange(length)
+                # position of the last peak, -1 when it is the initial balance
+                last_peak = np.maximum.accumulate(np.where(equity >= peak, bars, -1))
+                results['max_drawdown_duration'] = int((bars - last_peak).max())
+
+    if 'exposure' in metrics:
+        results['exposure'] = float(np.mean(curve.positions != 0))
+
+    if 'turnover' in metrics or 'win_rate' in metrics:
+        succeeded = transactions[transactions['status'] == TradeStatus.SUCCESS]
+        signed = np.where(succeeded['side'] == TradeSide.BUY, succeeded['volume'], -succeeded['volume'])
+        traded = succeeded['price'] * succeeded['volume']
+        if 'turnover' in metrics:
+            average_equity = equity.mean()
+            results['turnover'] = float(traded.sum() / average_equity if average_equity > 0 else 0.0)
+        if 'win_rate' in metrics:
+            # trades of no stocks neither open nor close a round trip
+            moved = signed != 0
+            volumes, values = signed[moved], traded[moved]
+            held = np.cumsum(volumes)
+            # a round trip starts with a trade from no stocks and ends with the trade back to none
+            trips = np.cumsum((held - volumes) == 0) - 1
+            closing = trips[held == 0]
+            if len(closing):
+                trip_results = np.bincount(trips, weights=np.where(volumes > 0, -values, values))
+                results['win_rate'] = float(np.mean(trip_results[closing] > 0))
+            else:
+                results['win_rate'] = 0.0
+
+    return {metric: results[metric] for metric in METRICS if metric in metrics}
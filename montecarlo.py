@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from data_handler import to_columns
+from strategy import TradingStrategy
+
+
+def simulate_trades(buy: np.ndarray, sell: np.ndarray, close: np.ndarray, initial_balance: float = 10000, multiplier: float = 10) -> dict:
+    """Applies the signals of many paths (2-D arrays, one row per path) to one broker per path, like `Broker.execute_trades` would on each row.
+
+    All paths advance together one bar at a time, trading at the close. Returns arrays with one value per path:
+    `final_balance`, `final_balance_with_stocks`, `profit`, `profit_with_stocks`, `trades` (transactions recorded,
+    failed ones included) and `max_drawdown` (largest drop of the account value from its running peak, as a fraction).
+    """
+    paths, length = close.shape
+    buying = buy > 0
+    signals = buying | (sell > 0)
+    volumes = np.where(buying, multiplier * buy // 1, multiplier * sell // 1)
+    balance = np.full(paths, float(initial_balance))
+    position = np.zeros(paths)
+    held = np.zeros(paths, dtype=bool)
+    peak = balance.copy()
+    max_drawdown = np.zeros(paths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for bar in range(length):
+            price = close[:, bar]
+            if signals[:, bar].any():
+                volume = volumes[:, bar]
+                cost = price * volume
+                bought = buying[:, bar] & (balance >= cost)
+                sold = signals[:, bar] & ~buying[:, bar] & held & (position >= volume)
+                balance = balance - np.where(bought, cost, 0) + np.where(sold, cost, 0)
+                position = position + np.where(bought, volume, 0) - np.where(sold, volume, 0)
+                held |= bought
+            equity = balance + position * price
+            np.maximum(peak, equity, out=peak)
+            np.maximum(max_drawdown, np.where(peak > 0, 1 - equity / peak, 0), out=max_drawdown)
+
+    final_balance_with_stocks = balance + position * close[:, -1]
+    return {
+        'final_balance': balance,
+        'final_balance_with_stocks': final_balance_with_stocks,
+        'profit': balance - initial_balance,
+        'profit_with_stocks': final_balance_with_stocks - initial_balance,
+        'trades': signals.sum(axis=1),
+        'max_drawdown': max_drawdown,
+    }
+
+
+class MonteCarlo:
+    def __init__(self, paths: int = 1000, length: int | None = None, block_size: int = 1, seed: int | None = None, initial_balance: float = 10000, multiplier: float = 10, batch_size: int = 2000) -> None:
+        """Constructor.
+
+        Every simulated path is made of `length` bars (default: as many as the history) drawn from the history of a
+        symbol: bars are kept as their open, high, low and close relative to the previous close (and their volume), and
+        drawn with replacement in blocks of `block_size` consecutive bars (1 resamples single bars, longer blocks keep
+        some of the autocorrelation of the returns). Paths start at the first close of the history.
+        Paths are simulated `batch_size` at a time, which bounds the memory used.
+        """
+        if paths < 1 or block_size < 1 or batch_size < 1:
+            raise ValueError(f"Invalid Monte Carlo settings: {paths} paths, blocks of {block_size} bars, batches of {batch_size} paths")
+        self.paths = paths
+        self.length = length
+        self.block_size = block_size
+        self.seed = seed
+        self.initial_balance = initial_balance
+        self.multiplier = multiplier
+        self.batch_size = batch_size
+
+    def relative_bars(self, data) -> tuple[dict, float]:
+        """Returns the bars of `data` (list of data points, `BarSeries` or dictionary of columns) relative to their previous close, and the first close."""
+        columns = to_columns(data)
+        close = np.asarray(columns['close'], dtype=float)
+        if len(close) < self.block_size + 1:
+            raise ValueError(f"{len(close)} bars are too few to draw blocks of {self.block_size} bars")
+        previous = close[:-1]
+        relative = {field: np.asarray(columns[field], dtype=float)[1:] / previous for field in ('open', 'high', 'low', 'close')}
+        relative['volume'] = np.asarray(columns['volume'], dtype=float)[1:]
+        return relative, float(close[0])
+
+    def generate_paths(self, relative: dict, start_price: float, paths: int, rng: np.random.Generator) -> dict:
+        """Returns the columns of `paths` simulated paths as 2-D arrays `(paths, length)`, drawn from bars relative to their previous close (see `relative_bars`)."""
+        count = len(relative['close'])
+        length = self.length or count + 1
+        blocks = -(-length // self.block_size)
+        starts = rng.integers(0, count - self.block_size + 1, size=(paths, blocks))
+        drawn = (starts[:, :, None] + np.arange(self.block_size)).reshape(paths, -1)[:, :length]
+
+        close = start_price * np.cumprod(relative['close'][drawn], axis=1)
+        previous = np.empty_like(close)
+        previous[:, 0] = start_price
+        previous[:, 1:] = close[:, :-1]
+        columns = {field: relative[field][drawn] * previous for field in ('open', 'high', 'low')}
+        columns['close'] = close
+        columns['volume'] = relative['volume'][drawn]
+        return columns
+
+    def run(self, strategy: TradingStrategy, data) -> pd.DataFrame:
+        """Backtests `strategy` on every simulated path of `data` and returns one row per path (see `simulate_trades` for the columns).
+
+        The strategy computes its signals for a whole batch of paths at once (`generate_signals` on 2-D columns), so it
+        needs a vectorized mode. Distributions are then one call away, e.g. `results.quantile([0.05, 0.5, 0.95])`.
+
+        Raises:
+            NotImplementedError: If the strategy has no vectorized mode.
+        """
+        relative, start_price = self.relative_bars(data)
+        rng = np.random.default_rng(self.seed)
+        batches = []
+        for start in range(0, self.paths, self.batch_size):
+            columns = self.generate_paths(relative, start_price, min(self.batch_size, self.paths - start), rng)
+            buy, sell = strategy.generate_signals(columns)
+            batches.append(simulate_trades(buy, sell, columns['close'], self.initial_balance, self.multiplier))
+        return pd.DataFrame({key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]})
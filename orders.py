@@ -0,0 +1,169 @@
+import enum
+import heapq
+import itertools
+
+from ledger import TradeSide
+
+
+class OrderType(enum.IntEnum):
+    MARKET = 0
+    LIMIT = 1
+    STOP = 2
+    STOP_LIMIT = 3
+
+
+class Order:
+    def __init__(self, side: TradeSide | str, volume: float, order_type: OrderType = OrderType.LIMIT, limit_price: float | None = None, stop_price: float | None = None) -> None:
+        """Constructor. An order to buy or sell (`side`, a `TradeSide` or `'buy'`/`'sell'`) `volume` stocks.
+
+        A `LIMIT` order fills at `limit_price` or better, a `STOP` order becomes a market order once the price reaches
+        `stop_price` (above it for buys, below it for sells), a `STOP_LIMIT` order becomes a limit order at `limit_price`
+        once the price reaches `stop_price`. `MARKET` orders fill at the next bar's open.
+        `id` and `symbol` are set when the order is placed (see `Broker.place_order`), `remaining` is the volume still to fill.
+
+        Raises:
+            ValueError: If the volume is not positive or a price the order type needs is missing.
+        """
+        self.side = side if isinstance(side, TradeSide) else TradeSide[side.upper()]
+        self.volume = volume
+        self.order_type = OrderType(order_type)
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        if volume <= 0:
+            raise ValueError(f"Invalid order volume: {volume}")
+        if self.order_type in (OrderType.LIMIT, OrderType.STOP_LIMIT) and limit_price is None:
+            raise ValueError(f"{self.order_type.name} order without a limit price")
+        if self.order_type in (OrderType.STOP, OrderType.STOP_LIMIT) and stop_price is None:
+            raise ValueError(f"{self.order_type.name} order without a stop price")
+        self.id = None
+        self.symbol = None
+        self.remaining = volume
+        # once its stop is reached, a stop order waits as a market order and a stop-limit order as a limit order
+        self.triggered = False
+
+    def __repr__(self) -> str:
+        return f"Order({self.id}, {self.side}, {self.symbol}, {self.order_type.name}, {self.remaining}/{self.volume}, limit={self.limit_price}, stop={self.stop_price})"
+
+
+class OrderBook:
+    def __init__(self) -> None:
+        """Constructor. Keeps the pending orders of every symbol in four heaps keyed by the price that triggers them.
+
+        Buy limits are ordered by decreasing limit, sell limits by increasing limit, buy stops by increasing stop and
+        sell stops by decreasing stop, ties in the order they were placed. A bar only pops the orders its range reaches,
+        so matching costs O((k + 1) log n) for k triggered orders out of n. Cancelled orders are dropped when they surface,
+        or all at once when they make up half of the entries of a symbol's heaps (see `cancel`).
+        Market orders, and stop orders triggered but not completely filled, wait in a fifth heap, by placement only, until the next bar.
+        """
+        self.orders = {}
+        self.heaps = {}
+        # number of entries of cancelled orders still in the heaps of every symbol
+        self.cancelled = {}
+        self.ids = itertools.count(1)
+        self.sequence = itertools.count()
+
+    def __len__(self) -> int:
+        """Returns the number of pending orders."""
+        return len(self.orders)
+
+    def _heaps(self, symbol: str) -> dict:
+        """Returns the heaps of `symbol`."""
+        if symbol not in self.heaps:
+            self.heaps[symbol] = {'market': [], 'buy_limit': [], 'sell_limit': [], 'buy_stop': [], 'sell_stop': []}
+        return self.heaps[symbol]
+
+    def _push(self, order: Order) -> None:
+        """Adds an order to the heap it waits in, by its triggering price."""
+        heaps = self._heaps(order.symbol)
+        buying = order.side == TradeSide.BUY
+        if order.order_type == OrderType.MARKET or (order.order_type == OrderType.STOP and order.triggered):
+            heap, key = heaps['market'], 0
+        elif order.order_type == OrderType.LIMIT or order.triggered:
+            heap, key = (heaps['buy_limit'], -order.limit_price) if buying else (heaps['sell_limit'], order.limit_price)
+        else:
+            heap, key = (heaps['buy_stop'], order.stop_price) if buying else (heaps['sell_stop'], -order.stop_price)
+        heapq.heappush(heap, (key, next(self.sequence), order))
+
+    def add(self, order: Order, symbol: str) -> int:
+        """Adds an order on `symbol` and returns its id."""
+        order.id = next(self.ids)
+        order.symbol = symbol
+        self.orders[order.id] = order
+        self._push(order)
+        return order.id
+
+    def restore(self, order: Order) -> None:
+        """Puts back an order popped by `match` that is still pending (partially filled, or not filled on this bar)."""
+        self._push(order)
+
+    def cancel(self, order_id: int) -> bool:
+        """Cancels a pending order, returns False if there is none with this id.
+
+        Its heap entry stays until it surfaces, unless the entries of cancelled orders then make up half of the entries
+        of the symbol: its heaps are rebuilt without them, so orders placed and cancelled far from the market do not
+        accumulate (amortized O(1) per cancellation).
+        """
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+        symbol = order.symbol
+        self.cancelled[symbol] = self.cancelled.get(symbol, 0) + 1
+        heaps = self.heaps[symbol]
+        if 2 * self.cancelled[symbol] >= sum(len(heap) for heap in heaps.values()):
+            for name, heap in heaps.items():
+                heaps[name] = [entry for entry in heap if entry[2].id in self.orders]
+                heapq.heapify(heaps[name])
+            self.cancelled[symbol] = 0
+        return True
+
+    def remove(self, order: Order) -> None:
+        """Forgets a filled order."""
+        self.orders.pop(order.id, None)
+
+    def _pop_while(self, heap: list, reached) -> list[Order]:
+        """Pops the pending orders at the top of `heap` whose key satisfies `reached`, dropping the cancelled ones."""
+        popped = []
+        while heap and reached(heap[0][0]):
+            order = heapq.heappop(heap)[2]
+            if order.id in self.orders:
+                popped.append(order)
+            else:
+                self.cancelled[order.symbol] -= 1
+        return popped
+
+    def match(self, symbol: str, open_price: float, high: float, low: float) -> list[tuple[Order, float, bool]]:
+        """Pops the orders of `symbol` triggered by a bar and returns them with their fill price and whether it is a market fill (subject to slippage).
+
+        Market orders fill at the open. Stops trigger at the stop price, or at the open if the bar gaps through it, and
+        fill as market orders; a stop-limit order turns into a limit order there, which fills on the same bar if the
+        range reaches its limit. Limits fill at the limit, or at the open (the trigger price on the bar a stop-limit
+        order triggers) if it is better. Orders are returned market orders first, then stops, then limits.
+        The caller must `restore` or `remove` every returned order.
+        """
+        if symbol not in self.heaps:
+            return []
+        heaps = self.heaps[symbol]
+        fills = [(order, open_price, True) for order in self._pop_while(heaps['market'], lambda key: True)]
+        triggered = {}
+        for order in self._pop_while(heaps['buy_stop'], lambda key: key <= high):
+            self._trigger(order, max(open_price, order.stop_price), fills, triggered)
+        for order in self._pop_while(heaps['sell_stop'], lambda key: -key >= low):
+            self._trigger(order, min(open_price, order.stop_price), fills, triggered)
+        for order in self._pop_while(heaps['buy_limit'], lambda key: -key >= low):
+            fills.append((order, min(triggered.get(order.id, open_price), order.limit_price), False))
+        for order in self._pop_while(heaps['sell_limit'], lambda key: key <= high):
+            fills.append((order, max(triggered.get(order.id, open_price), order.limit_price), False))
+        return fills
+
+    def _trigger(self, order: Order, price: float, fills: list, triggered: dict) -> None:
+        """Handles a stop reached at `price`: a stop order fills at market, a stop-limit order becomes a limit order (noted in `triggered`).
+
+        Either way the order is marked triggered, so the part of a stop order that is not filled on this bar waits as a
+        market order for the next bar's open when it is restored, instead of waiting for its stop again.
+        """
+        order.triggered = True
+        if order.order_type == OrderType.STOP:
+            fills.append((order, price, True))
+        else:
+            triggered[order.id] = price
+            self._push(order)
@@ -0,0 +1,83 @@
+import numpy as np
+
+from data_handler import BarSeries, FIELDS
+from indicators import vectorized
+from strategy import TradingStrategy
+
+
+class BarPanel:
+    def __init__(self, symbols: list[str], index: np.ndarray, columns: dict, timezone=None) -> None:
+        """Constructor. `columns` maps each field to a 2-D float array `(symbols, bars)`, aligned on the UTC timestamps of `index`.
+
+        A bar a symbol doesn't have (missing session, not listed yet...) is NaN in every field. Indicators and signals
+        skip those bars, so a symbol gets the values it would get from its own bars alone (see `vectorized.pack`).
+        """
+        self.symbols = list(symbols)
+        self.index = np.asarray(index, dtype='datetime64[ns]')
+        self.columns = {field: np.asarray(values, dtype=float) for field, values in columns.items()}
+        self.timezone = timezone
+        self.valid = ~np.isnan(self.columns['close'])
+        self._packed = None
+
+    @classmethod
+    def from_bars(cls, bars: dict) -> 'BarPanel':
+        """Creates a panel from `symbol -> BarSeries`, on the union of their timestamps."""
+        series = list(bars.values())
+        index = np.unique(np.concatenate([bar_series.index for bar_series in series])) if series else np.array([], dtype='datetime64[ns]')
+        columns = {field: np.full((len(series), len(index)), np.nan) for field in FIELDS}
+        for row, bar_series in enumerate(series):
+            positions = np.searchsorted(index, bar_series.index)
+            for field in FIELDS:
+                columns[field][row, positions] = bar_series[field]
+        timezones = {bar_series.timezone for bar_series in series}
+        return cls(list(bars), index, columns, timezones.pop() if len(timezones) == 1 else None)
+
+    def __len__(self) -> int:
+        """Returns the number of bars."""
+        return len(self.index)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """Returns the `(symbols, bars)` array of a field."""
+        return self.columns[field]
+
+    @property
+    def packed(self) -> tuple[dict, np.ndarray]:
+        """The columns with the bars of every symbol moved to the start of its row, computed once, and the order to unpack them (see `vectorized.pack`)."""
+        if self._packed is None:
+            order = None
+            columns = {}
+            for field, values in self.columns.items():
+                columns[field], order = vectorized.pack(values, self.valid)
+            self._packed = columns, order
+        return self._packed
+
+    def indicator(self, function: callable, *fields: str, **parameters):
+        """Computes an indicator of `indicators.vectorized` for every symbol in one pass, e.g. `panel.indicator(vectorized.rsi, 'close', period=14)`.
+
+        Returns what `function` returns (an array or a tuple of arrays), as `(symbols, bars)` arrays with NaN on the missing bars.
+        """
+        columns, order = self.packed
+        results = function(*(columns[field] for field in fields), **parameters)
+        if isinstance(results, tuple):
+            return tuple(vectorized.unpack(result, order, self.valid) for result in results)
+        return vectorized.unpack(results, order, self.valid)
+
+    def generate_signals(self, strategy: TradingStrategy) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of `strategy` for every symbol and bar, 0 on the missing bars.
+
+        Raises:
+            NotImplementedError: If the strategy has no vectorized mode.
+        """
+        columns, order = self.packed
+        buy, sell = strategy.generate_signals(columns)
+        return vectorized.unpack(buy, order, self.valid, 0), vectorized.unpack(sell, order, self.valid, 0)
+
+    def rank(self, values: np.ndarray) -> np.ndarray:
+        """Ranks the symbols on every bar by `values` (a `(symbols, bars)` array, e.g. an indicator), see `vectorized.cross_sectional_rank`."""
+        return vectorized.cross_sectional_rank(values)
+
+    def series(self, symbol: str) -> BarSeries:
+        """Returns the bars of one symbol, without its missing bars."""
+        row = self.symbols.index(symbol)
+        valid = self.valid[row]
+        return BarSeries(self.index[valid], {field: values[row, valid] for field, values in self.columns.items()}, self.timezone)
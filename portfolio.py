@@ -0,0 +1,80 @@
+import copy
+import heapq
+
+from backtester import Backtester
+from broker import Broker
+from data_handler import BarSeries
+from indicators.streaming import IndicatorCache
+from strategy import TradingStrategy
+
+
+def stream_bars(order: int, bars: BarSeries, chunk_size: int = 64):
+    """Yields `(timestamp, order, row, data point)` for every bar of `bars`, the data points being created `chunk_size` at a time.
+
+    `order` breaks ties between symbols trading at the same timestamp, `row` between duplicated timestamps of a symbol.
+    """
+    timestamps = bars.index.view('int64')
+    for row, data_point in enumerate(bars.iter_bars(chunk_size)):
+        yield int(timestamps[row]), order, row, data_point
+
+
+class PortfolioBacktester:
+    def __init__(self, strategy: TradingStrategy, initial_balance: float = 10000, multiplier: float = 10) -> None:
+        """Constructor. Every symbol is traded by its own copy of `strategy`, all of them sharing one `Broker` and its cash."""
+        self.strategy = strategy
+        self.initial_balance = initial_balance
+        self.multiplier = multiplier
+
+    def run(self, bars: dict) -> dict:
+        """Backtests the strategy on every symbol of `bars` (`symbol -> BarSeries` or list of data points) in a single pass and returns the portfolio stats.
+
+        The bar streams are merged by timestamp with a heap, so symbols with different trading calendars interleave in
+        time order (ties in the order of `bars`) and memory does not grow with a symbols x dates grid. Each bar is handed
+        to its symbol's strategy, whose trades go through the shared broker: a buy fails if the cash was already spent on
+        other symbols. Only the strategy's `lookback` of bars is kept per symbol.
+        Returns the stats of `Backtester.run_backtest` for the whole portfolio (positions valued at their last close)
+        plus `positions` (`symbol -> volume`) and `last_prices` (`symbol -> last close`).
+        """
+        backtester = Backtester(self.initial_balance)
+        cache = IndicatorCache()
+        symbols = list(bars)
+        strategies = []
+        streams = []
+        for order, symbol in enumerate(symbols):
+            strategy = copy.deepcopy(self.strategy)
+            strategy.reset()
+            strategy.share_indicators(cache)
+            strategies.append(strategy)
+            series = bars[symbol] if isinstance(bars[symbol], BarSeries) else BarSeries.from_records(bars[symbol])
+            streams.append(stream_bars(order, series))
+
+        histories = [Backtester._history([strategy]) for strategy in strategies]
+        last_prices = {}
+        for _, order, _, data_point in heapq.merge(*streams):
+            symbol = symbols[order]
+            histories[order].append(data_point)
+            last_prices[symbol] = data_point['close']
+            backtester._step(strategies[order], backtester.broker, histories[order], data_point, symbol, self.multiplier)
+
+        return portfolio_stats(backtester.broker, self.initial_balance, last_prices)
+
+
+def portfolio_stats(broker: Broker, initial_balance: float, last_prices: dict) -> dict:
+    """Returns the stats of a broker trading several symbols, positions valued at their last close (`last_prices`, `symbol -> price`).
+
+    The stats of `Backtester.run_backtest` plus `positions` (`symbol -> volume`) and `last_prices`.
+    """
+    final_balance = broker.get_balance()
+    positions = {symbol: volume for symbol, volume in broker.get_portfolio().items() if volume}
+    final_balance_with_stocks = final_balance + sum(volume * last_prices[symbol] for symbol, volume in positions.items())
+    return {
+        'initial_balance': initial_balance,
+        'final_balance': final_balance,
+        'final_balance_with_stocks': final_balance_with_stocks,
+        'profit': final_balance - initial_balance,
+        'profit_with_stocks': final_balance_with_stocks - initial_balance,
+        'trades': len(broker.get_transaction_history()),
+        'positions': positions,
+        'last_prices': last_prices,
+        'transaction_history': broker.get_transaction_history(),
+    }
@@ -0,0 +1,163 @@
+import contextlib
+import time
+
+# frames naming what is being done, the other frames name strategies and indicators
+PHASES = ('update_historical_data', 'indicators', 'should_buy', 'should_sell', 'generate_signals', 'execute_trade', 'execute_trades')
+
+
+class Profiler:
+    def __init__(self) -> None:
+        """Constructor.
+
+        Timings are accumulated per call stack, a stack being a tuple of frames such as
+        `('backtest', 'Ichimoku + ADX', 'should_buy', 'ADX Strategy', 'should_buy')`, as `[calls, wall time, CPU time]`
+        including the time spent in the nested stacks.
+        """
+        self.stack = []
+        self.timings = {}
+        self.patched = []
+
+    def reset(self) -> None:
+        """Forgets the recorded timings."""
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def measure(self, *frames: str):
+        """Context manager timing its block as `frames` pushed on the current stack."""
+        self.stack.extend(frames)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            key = tuple(self.stack)
+            del self.stack[-len(frames):]
+            timing = self.timings.get(key)
+            if timing is None:
+                self.timings[key] = [1, wall, cpu]
+            else:
+                timing[0] += 1
+                timing[1] += wall
+                timing[2] += cpu
+
+    def patch(self, target, method: str, frames) -> None:
+        """Replaces `target.method` by a timed version until `unpatch`, `frames` being a tuple or a function of the call arguments returning one."""
+        if (id(target), method) in {(id(patched), name) for patched, name, _ in self.patched}:
+            return
+        function = getattr(target, method)
+        # a function set on the instance itself (rather than a method of its class) is put back by `unpatch`
+        shadowed = vars(target).get(method) if hasattr(target, '__dict__') else None
+        measure = self.measure
+        if callable(frames):
+            def timed(*args, **kwargs):
+                with measure(*frames(*args, **kwargs)):
+                    return function(*args, **kwargs)
+        else:
+            def timed(*args, **kwargs):
+                with measure(*frames):
+                    return function(*args, **kwargs)
+        # the instance attribute shadows the method, deleting it restores the method
+        setattr(target, method, timed)
+        self.patched.append((target, method, shadowed))
+
+    def unpatch(self) -> None:
+        """Removes all the timed versions installed by `patch`, restoring the instance attributes they replaced."""
+        for target, method, shadowed in reversed(self.patched):
+            if shadowed is None:
+                delattr(target, method)
+            else:
+                setattr(target, method, shadowed)
+        self.patched = []
+
+    def patch_strategy(self, strategy, methods: tuple, prefix: tuple = ()) -> None:
+        """Times `methods` of `strategy` under `prefix` and, for composite strategies, the same methods of every child under its name.
+
+        Indicator updates (`sync_indicator`) are timed as `('indicators', <indicator class>)` within `update_historical_data`.
+        """
+        for method in methods:
+            self.patch(strategy, method, prefix + (method,))
+        if 'update_historical_data' in methods:
+            self.patch(strategy, 'sync_indicator', lambda attribute, data: ('indicators', type(getattr(strategy, attribute)).__name__))
+        for child in getattr(strategy, 'strategies', []):
+            self.patch_strategy(child, methods, (child.name,))
+
+    @contextlib.contextmanager
+    def instrument(self, backtester, strategies: list, brokers: list, vectorized: bool = False):
+        """Context manager timing a run of `strategies` (trading with `brokers`, in the same order) by `backtester` as the stack `('backtest',)`.
+
+        In the per-bar loop every strategy is timed per bar under its name (`Backtester._step`), in vectorized mode its
+        methods are timed directly under its name. The original methods are restored when the block exits.
+        """
+        try:
+            if vectorized:
+                for strategy, broker in zip(strategies, brokers):
+                    self.patch_strategy(strategy, ('generate_signals',), (strategy.name,))
+                    self.patch(broker, 'execute_trades', (strategy.name, 'execute_trades'))
+            else:
+                self.patch(backtester, '_step', lambda strategy, *args: (strategy.name,))
+                for strategy, broker in zip(strategies, brokers):
+                    self.patch_strategy(strategy, ('update_historical_data', 'should_buy', 'should_sell'))
+                    self.patch(broker, 'execute_trade', ('execute_trade',))
+            with self.measure('backtest'):
+                yield
+        finally:
+            self.unpatch()
+
+    def self_timings(self) -> dict:
+        """Returns `stack -> (wall, cpu)` with the time spent in each stack itself, excluding its nested stacks."""
+        own = {key: [wall, cpu] for key, (_, wall, cpu) in self.timings.items()}
+        for key, (_, wall, cpu) in self.timings.items():
+            # stacks measured with several frames at once have their parent further up
+            parent = next((own[key[:end]] for end in range(len(key) - 1, 0, -1) if key[:end] in own), None)
+            if parent is not None:
+                parent[0] -= wall
+                parent[1] -= cpu
+        return {key: (max(wall, 0.0), max(cpu, 0.0)) for key, (wall, cpu) in own.items()}
+
+    def report(self) -> dict:
+        """Returns the recorded timings (seconds) as a dictionary.
+
+        `total`: wall and CPU time of the runs; `phases`: the time spent in each phase (see `PHASES`, `backtester` being the loop
+        itself); `strategies`: the time of every top-level strategy, children included; `stacks`: calls, total and self time of
+        every stack, most expensive first.
+        """
+        own = self.self_timings()
+        total = {'wall': 0.0, 'cpu': 0.0}
+        phases = {}
+        strategies = {}
+        stacks = []
+        for key, (calls, wall, cpu) in self.timings.items():
+            self_wall, self_cpu = own[key]
+            phase = next((frame for frame in reversed(key) if frame in PHASES), 'backtester')
+            phase_timing = phases.setdefault(phase, {'wall': 0.0, 'cpu': 0.0})
+            phase_timing['wall'] += self_wall
+            phase_timing['cpu'] += self_cpu
+            if len(key) == 1:
+                total['wall'] += wall
+                total['cpu'] += cpu
+            elif len(key) == 2 and key[1] not in PHASES:
+                strategy_timing = strategies.setdefault(key[1], {'wall': 0.0, 'cpu': 0.0})
+                strategy_timing['wall'] += wall
+                strategy_timing['cpu'] += cpu
+            stacks.append({'stack': ';'.join(key), 'calls': calls, 'wall': wall, 'cpu': cpu, 'self_wall': self_wall, 'self_cpu': self_cpu})
+
+        # strategies timed directly (vectorized mode) have no frame of their own
+        for key, (calls, wall, cpu) in self.timings.items():
+            if len(key) == 3 and (key[0], key[1]) not in self.timings and key[1] not in PHASES:
+                strategy_timing = strategies.setdefault(key[1], {'wall': 0.0, 'cpu': 0.0})
+                strategy_timing['wall'] += wall
+                strategy_timing['cpu'] += cpu
+
+        stacks.sort(key=lambda stack: stack['wall'], reverse=True)
+        return {'total': total, 'phases': phases, 'strategies': strategies, 'stacks': stacks}
+
+    def write_collapsed(self, path: str, clock: str = 'wall') -> None:
+        """Writes the self time of every stack, in microseconds of `clock` (`wall` or `cpu`), in the collapsed stack format of flame graph tools (`frame;frame;frame count` per line)."""
+        if clock not in ('wall', 'cpu'):
+            raise ValueError(f"Unknown clock: {clock}")
+        column = 0 if clock == 'wall' else 1
+        with open(path, 'w') as file:
+            for key, timing in sorted(self.self_timings().items()):
+                microseconds = round(timing[column] * 1e6)
+                if microseconds > 0:
+                    file.write(';'.join(frame.replace(';', ',') for frame in key) + f" {microseconds}\n")
@@ -0,0 +1,102 @@
+import ast
+import importlib
+import os
+
+# packages searched for strategies, relative to this file
+PACKAGES = ('strategies.basic', 'strategies.hybrid')
+
+
+def normalize(name: str) -> str:
+    """Returns the lookup form of a strategy name: lowercase, without underscores, dashes, spaces and `Strategy` suffix (`moving_average`, `MovingAverageStrategy` -> `movingaverage`)."""
+    name = name.lower()
+    for character in '_- ':
+        name = name.replace(character, '')
+    return name.removesuffix('strategy') or name
+
+
+class StrategyRegistry:
+    def __init__(self, packages: tuple[str, ...] = PACKAGES) -> None:
+        """Constructor. Finds the strategy classes of `packages` by reading their source files, without importing them.
+
+        A strategy is a class deriving from `TradingStrategy` (or from another strategy found), found by parsing the files
+        with `ast`. Its module is only imported when the strategy is used (`get`/`create`), so a run pays for the modules
+        of its strategies only.
+        """
+        self.packages = packages
+        self.locations = None
+        self.classes = {}
+
+    def _discover(self) -> dict:
+        """Returns `class name -> module name` of the strategies of the packages, parsed on first use."""
+        if self.locations is not None:
+            return self.locations
+        root = os.path.dirname(os.path.abspath(__file__))
+        bases = {}
+        for package in self.packages:
+            directory = os.path.join(root, *package.split('.'))
+            for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+                if not entry.name.endswith('.py') or not entry.is_file():
+                    continue
+                with open(entry.path, encoding='utf-8') as file:
+                    tree = ast.parse(file.read(), entry.path)
+                module = f"{package}.{entry.name[:-3]}"
+                for node in tree.body:
+                    if isinstance(node, ast.ClassDef):
+                        names = {base.id if isinstance(base, ast.Name) else base.attr for base in node.bases if isinstance(base, (ast.Name, ast.Attribute))}
+                        bases[node.name] = (module, names)
+
+        # strategies derive from `TradingStrategy`, directly or through other strategies
+        self.locations = {}
+        found = {'TradingStrategy'}
+        while True:
+            new = {name for name, (_, names) in bases.items() if name not in found and names & found}
+            if not new:
+                break
+            found |= new
+        for name, (module, _) in bases.items():
+            if name in found:
+                self.locations[name] = module
+        return self.locations
+
+    def names(self) -> list[str]:
+        """Returns the class names of the strategies found."""
+        return list(self._discover())
+
+    def resolve(self, name: str) -> str:
+        """Returns the class name of a strategy given its class name or a short form of it (e.g. `rsi`, `moving_average`, `Ichimoku Cloud`).
+
+        Raises:
+            ValueError: If no strategy, or several, match the name.
+        """
+        locations = self._discover()
+        if name in locations:
+            return name
+        matches = [class_name for class_name in locations if normalize(class_name) == normalize(name)]
+        if len(matches) != 1:
+            known = ', '.join(sorted(locations))
+            raise ValueError(f"{'Ambiguous' if matches else 'Unknown'} strategy: {name} (known strategies: {known})")
+        return matches[0]
+
+    def get(self, name: str) -> type:
+        """Returns the class of a strategy (see `resolve` for the names), importing its module if needed.
+
+        Raises:
+            ValueError: If no strategy matches the name.
+        """
+        class_name = self.resolve(name)
+        if class_name not in self.classes:
+            module = importlib.import_module(self._discover()[class_name])
+            self.classes[class_name] = getattr(module, class_name)
+        return self.classes[class_name]
+
+    def create(self, name: str, /, *args, **kwargs):
+        """Creates a strategy by name with the given constructor arguments, e.g. `STRATEGIES.create('rsi', period=14)`.
+
+        Raises:
+            ValueError: If no strategy matches the name.
+        """
+        return self.get(name)(*args, **kwargs)
+
+
+# registry of the strategies shipped in `strategies/basic` and `strategies/hybrid`
+STRATEGIES = StrategyRegistry()
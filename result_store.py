@@ -0,0 +1,218 @@
+import datetime
+import hashlib
+import inspect
+import json
+import os
+from typing import TYPE_CHECKING
+import numpy as np
+from peewee import CharField, DateTimeField, FloatField, IntegerField, Model, SqliteDatabase, TextField, fn
+from playhouse.migrate import SqliteMigrator, migrate
+
+import metrics
+from data_handler import BarSeries, FIELDS
+from strategy import TradingStrategy
+
+# pandas is only needed to return DataFrames
+if TYPE_CHECKING:
+    import pandas as pd
+
+# part of every key, to be increased when a change of the backtester alters the results of unchanged inputs
+VERSION = 2
+
+METRICS = ('final_balance', 'final_balance_with_stocks', 'profit', 'profit_with_stocks', 'trades') + metrics.METRICS
+
+
+def bars_hash(bars: BarSeries) -> str:
+    """Returns the SHA-256 of the timestamps and fields of `bars`, read in place."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(bars.index).view(np.int64).data)
+    for field in FIELDS:
+        digest.update(np.ascontiguousarray(bars[field], dtype=float).data)
+    return digest.hexdigest()
+
+
+def _code_digest(code) -> str:
+    """Returns a digest of a code object: its bytecode, names and constants (nested code objects included)."""
+    digest = hashlib.sha256(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for constant in code.co_consts:
+        digest.update((_code_digest(constant) if inspect.iscode(constant) else repr(constant)).encode())
+    return digest.hexdigest()
+
+
+def fingerprint(value):
+    """Returns a JSON-serializable description of a strategy and its parameters, nested strategies and functions included.
+
+    A strategy is described by its class and the attributes named like the arguments of its constructor, a function
+    by its name, code and the values it closes over.
+
+    Raises:
+        ValueError: If the value (or one of its parameters) cannot be described.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [fingerprint(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): fingerprint(item) for key, item in value.items()}
+    if isinstance(value, TradingStrategy):
+        parameters = {}
+        for name in list(inspect.signature(type(value).__init__).parameters)[1:]:
+            if not hasattr(value, name):
+                raise ValueError(f"{type(value).__name__} doesn't keep its `{name}` parameter")
+            parameters[name] = fingerprint(getattr(value, name))
+        return {'class': f"{type(value).__module__}.{type(value).__qualname__}", 'parameters': parameters}
+    if inspect.isfunction(value):
+        closure = [fingerprint(cell.cell_contents) for cell in value.__closure__ or ()]
+        return {'function': f"{value.__module__}.{value.__qualname__}", 'code': _code_digest(value.__code__), 'closure': closure}
+    raise ValueError(f"Cannot fingerprint {value!r}")
+
+
+class BacktestRun(Model):
+    key = CharField(max_length=64, unique=True)
+    symbol = CharField()
+    strategy = CharField()
+    strategy_class = CharField()
+    parameters = TextField()
+    bars_hash = CharField(max_length=64)
+    start = DateTimeField()
+    end = DateTimeField()
+    bars = IntegerField()
+    initial_balance = FloatField()
+    multiplier = FloatField()
+    final_balance = FloatField()
+    final_balance_with_stocks = FloatField()
+    profit = FloatField()
+    profit_with_stocks = FloatField()
+    trades = IntegerField()
+    sharpe = FloatField(default=0)
+    sortino = FloatField(default=0)
+    max_drawdown = FloatField(default=0)
+    max_drawdown_duration = IntegerField(default=0)
+    exposure = FloatField(default=0)
+    turnover = FloatField(default=0)
+    win_rate = FloatField(default=0)
+    created = DateTimeField()
+
+    class Meta:
+        indexes = (
+            (('symbol', 'profit_with_stocks'), False),
+            (('strategy', 'symbol'), False),
+        )
+
+
+class ResultStore:
+    def __init__(self, path: str = '.cache/results.db') -> None:
+        """Constructor. Keeps the results of backtests in the SQLite database at `path` (created if needed), keyed by their inputs.
+
+        A key is the hash of the bars, the strategy's class and parameters (see `fingerprint`), the initial balance and
+        the multiplier, so an unchanged run can be answered from the store. Transaction histories are not stored.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.database = SqliteDatabase(path, pragmas={'journal_mode': 'wal', 'synchronous': 'normal'})
+        with self.database.bind_ctx([BacktestRun]):
+            self.database.create_tables([BacktestRun])
+            # stores created by an older version lack the columns added since
+            existing = {column.name for column in self.database.get_columns(BacktestRun._meta.table_name)}
+            migrator = SqliteMigrator(self.database)
+            missing = [migrator.add_column(BacktestRun._meta.table_name, field.column_name, field) for field in BacktestRun._meta.sorted_fields if field.column_name not in existing]
+            if missing:
+                migrate(*missing)
+
+    @staticmethod
+    def key(bars: BarSeries, strategy: TradingStrategy, initial_balance: float, multiplier: float, digest: str | None = None) -> str:
+        """Returns the key of a backtest of `strategy` on `bars`, `digest` being `bars_hash(bars)` if already known.
+
+        Raises:
+            ValueError: If the strategy cannot be fingerprinted (it can't be cached then).
+        """
+        inputs = {
+            'version': VERSION,
+            'bars': digest or bars_hash(bars),
+            'strategy': fingerprint(strategy),
+            'initial_balance': initial_balance,
+            'multiplier': multiplier,
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Returns `key -> results` (the stats of `Backtester.run_backtest`, without transaction history) for the stored keys among `keys`."""
+        found = {}
+        keys = list(keys)
+        with self.database.bind_ctx([BacktestRun]):
+            # stays below SQLite's limit of bound parameters per query
+            for start in range(0, len(keys), 500):
+                for run in BacktestRun.select().where(BacktestRun.key.in_(keys[start:start + 500])):
+                    found[run.key] = {'initial_balance': run.initial_balance, **{metric: getattr(run, metric) for metric in METRICS}}
+        return found
+
+    def get(self, key: str) -> dict | None:
+        """Returns the stored results of `key`, None if unknown."""
+        return self.get_many([key]).get(key)
+
+    def save_many(self, runs: list[tuple]) -> None:
+        """Stores `(key, symbol, bars, strategy, results, multiplier)` runs in one transaction, replacing the runs with the same keys."""
+        created = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        rows = []
+        digests = {}
+        for key, symbol, bars, strategy, results, multiplier in runs:
+            if id(bars) not in digests:
+                digests[id(bars)] = bars_hash(bars)
+            rows.append({
+                'key': key,
+                'symbol': symbol,
+                'strategy': strategy.name,
+                'strategy_class': type(strategy).__qualname__,
+                'parameters': json.dumps(fingerprint(strategy)['parameters'], sort_keys=True),
+                'bars_hash': digests[id(bars)],
+                'start': bars.index[0].astype('datetime64[us]').item(),
+                'end': bars.index[-1].astype('datetime64[us]').item(),
+                'bars': len(bars),
+                'multiplier': multiplier,
+                'created': created,
+                'initial_balance': results['initial_balance'],
+                **{metric: results[metric] for metric in METRICS},
+            })
+        with self.database.bind_ctx([BacktestRun]), self.database.atomic():
+            for start in range(0, len(rows), 50):
+                BacktestRun.replace_many(rows[start:start + 50]).execute()
+
+    def runs(self, keys: list[str] | None = None, symbol: str | None = None, strategy: str | None = None) -> 'pd.DataFrame':
+        """Returns the stored runs (all of them, the ones of `keys`, or of a `symbol` and/or `strategy` name) as a DataFrame, one row per run."""
+        import pandas as pd
+        with self.database.bind_ctx([BacktestRun]):
+            query = BacktestRun.select()
+            if symbol is not None:
+                query = query.where(BacktestRun.symbol == symbol)
+            if strategy is not None:
+                query = query.where(BacktestRun.strategy == strategy)
+            if keys is None:
+                rows = list(query.dicts())
+            else:
+                keys = list(keys)
+                rows = [row for start in range(0, len(keys), 500) for row in query.where(BacktestRun.key.in_(keys[start:start + 500])).dicts()]
+        return pd.DataFrame(rows, columns=list(BacktestRun._meta.fields)).drop(columns='id')
+
+    def best_per_symbol(self, metric: str = 'profit_with_stocks') -> 'pd.DataFrame':
+        """Returns the best stored run of every symbol according to `metric`, one row per symbol.
+
+        Raises:
+            ValueError: If `metric` is not one of `METRICS`.
+        """
+        import pandas as pd
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        field = getattr(BacktestRun, metric)
+        with self.database.bind_ctx([BacktestRun]):
+            ranked = BacktestRun.select(BacktestRun, fn.ROW_NUMBER().over(partition_by=[BacktestRun.symbol], order_by=[field.desc()]).alias('rank'))
+            rows = list(BacktestRun.select(ranked.c.symbol, ranked.c.strategy, ranked.c.parameters, ranked.c.start, ranked.c.end, getattr(ranked.c, metric))
+                        .from_(ranked).where(ranked.c.rank == 1).order_by(ranked.c.symbol).dicts())
+        return pd.DataFrame(rows, columns=['symbol', 'strategy', 'parameters', 'start', 'end', metric])
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self.database.close()
@@ -0,0 +1,198 @@
+import copy
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+from backtester import Backtester
+from data_handler import BarSeries, FIELDS
+from result_store import ResultStore, bars_hash
+from strategy import TradingStrategy
+
+
+class SharedBars:
+    def __init__(self, bars: dict) -> None:
+        """Constructor, copies the bars of every symbol (`symbol -> BarSeries`) into one shared memory block.
+
+        Each symbol takes `len(FIELDS) + 1` consecutive arrays of 8-byte values: the index (as int64) then one array per field.
+        """
+        total = sum(len(series) for series in bars.values())
+        self.memory = SharedMemory(create=True, size=max(total * (len(FIELDS) + 1) * 8, 1))
+        self.layout = {}
+        offset = 0
+        for symbol, series in bars.items():
+            length = len(series)
+            arrays = [series.index.view(np.int64)] + [series[field] for field in FIELDS]
+            for position, values in enumerate(arrays):
+                np.ndarray(length, dtype=values.dtype, buffer=self.memory.buf, offset=offset + position * length * 8)[:] = values
+            self.layout[symbol] = (offset, length, series.timezone)
+            offset += length * len(arrays) * 8
+
+    @property
+    def spec(self) -> tuple:
+        """Picklable description of the block, to be passed to `SharedBars.attach` in another process."""
+        return self.memory.name, self.layout
+
+    @staticmethod
+    def attach(spec: tuple, own_tracker: bool = False) -> tuple[SharedMemory, dict]:
+        """Attaches to a block created by another process and returns it with `symbol -> BarSeries` views on it (no copy).
+
+        The returned `SharedMemory` must be kept alive as long as the views are used. `own_tracker` tells that this process
+        has its own resource tracker (`spawn`/`forkserver` workers), which must then forget the block: the creating process
+        owns it, and the tracker would otherwise unlink it when the worker exits.
+        """
+        name, layout = spec
+        memory = SharedMemory(name=name)
+        if own_tracker:
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        bars = {}
+        for symbol, (offset, length, timezone) in layout.items():
+            index = np.ndarray(length, dtype=np.int64, buffer=memory.buf, offset=offset).view('datetime64[ns]')
+            columns = {
+                field: np.ndarray(length, dtype=np.float64, buffer=memory.buf, offset=offset + (position + 1) * length * 8)
+                for position, field in enumerate(FIELDS)
+            }
+            bars[symbol] = BarSeries(index, columns, timezone)
+        return memory, bars
+
+    def close(self) -> None:
+        """Releases and removes the shared memory block."""
+        self.memory.close()
+        self.memory.unlink()
+
+
+# state of a worker process, set once by `_init_worker`
+_worker = {}
+
+
+def _init_worker(spec: tuple, own_tracker: bool, strategies: list, initial_balance: float, multiplier: float, vectorized: bool, keep_history: bool) -> None:
+    """Initializes a worker process: attaches the shared bars and keeps the run settings."""
+    memory, bars = SharedBars.attach(spec, own_tracker)
+    _worker.update(
+        memory=memory, bars=bars, strategies=strategies, initial_balance=initial_balance,
+        multiplier=multiplier, vectorized=vectorized, keep_history=keep_history,
+    )
+
+
+def _run_task(task: tuple) -> list[dict]:
+    """Runs the backtests of one symbol and some strategy indices in their own context: fresh copies of the strategies and a new `Backtester`.
+
+    Several strategies run in a single pass with a new `Broker` each, sharing their indicators (`Backtester.run_backtests`).
+    """
+    symbol, strategy_indices = task
+    strategies = [copy.deepcopy(_worker['strategies'][index]) for index in strategy_indices]
+    for strategy in strategies:
+        strategy.reset()
+    backtester = Backtester(_worker['initial_balance'])
+
+    if _worker['vectorized']:
+        data = _worker['bars'][symbol]
+    else:
+        # data points are created chunk by chunk, the strategies only keep their lookback
+        data = _worker['bars'][symbol].iter_bars()
+
+    if len(strategies) == 1:
+        outcomes = [backtester.run_backtest(strategies[0], data, symbol=symbol, multiplier=_worker['multiplier'], vectorized=_worker['vectorized'])]
+    else:
+        outcomes = backtester.run_backtests(strategies, data, symbol=symbol, multiplier=_worker['multiplier'])
+    if not _worker['keep_history']:
+        for results in outcomes:
+            del results['transaction_history'], results['equity_curve']
+    return outcomes
+
+
+class ParallelBacktester:
+    def __init__(self, strategies: list[TradingStrategy], initial_balance: float = 10000, multiplier: float = 10, vectorized: bool = False, max_workers: int | None = None, keep_history: bool = False, share_indicators: bool = True, store: ResultStore | None = None) -> None:
+        """Constructor.
+
+        Every (symbol, strategy) run gets a fresh copy of the strategy and its own `Backtester`/`Broker`, so runs are isolated and can
+        be spread over `max_workers` processes (default: number of CPUs, 1 runs everything in this process, as does a single run).
+        With `share_indicators` (ignored in vectorized mode), the strategies of a symbol run together in one task and compute
+        each distinct indicator once per bar; otherwise every (symbol, strategy) pair is a separate task.
+        Strategies are handed to the workers when they start; with the `fork` start method (Linux default) they don't need
+        to be picklable, otherwise they do (a `CustomStrategy` with lambdas is not).
+        With a `store`, runs already stored for the same bars, strategy parameters and settings are not run again, and
+        new runs are saved to it (without `keep_history`, which needs the transaction histories, runs are not looked up).
+        """
+        self.strategies = strategies
+        self.initial_balance = initial_balance
+        self.multiplier = multiplier
+        self.vectorized = vectorized
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.keep_history = keep_history
+        self.share_indicators = share_indicators and not vectorized
+        self.store = store
+
+    def run(self, bars: dict) -> dict:
+        """Backtests every strategy on every symbol of `bars` (`symbol -> BarSeries`).
+
+        Returns `strategy name -> symbol -> results` (the dictionaries of `Backtester.run_backtest`, without the transaction
+        history unless `keep_history`), ordered like `self.strategies` and `bars` whatever the order runs finish in.
+        """
+        keys, cached = self._cached(bars)
+        missing = {symbol: tuple(index for index in range(len(self.strategies)) if (symbol, index) not in cached) for symbol in bars}
+        if self.share_indicators:
+            tasks = [(symbol, indices) for symbol, indices in missing.items() if indices]
+        else:
+            tasks = [(symbol, (index,)) for symbol, indices in missing.items() for index in indices]
+        outcomes = self._run_tasks({symbol: bars[symbol] for symbol, _ in tasks}, tasks) if tasks else []
+
+        results = {strategy.name: {} for strategy in self.strategies}
+        runs = []
+        for (symbol, strategy_indices), task_outcomes in zip(tasks, outcomes):
+            for index, outcome in zip(strategy_indices, task_outcomes):
+                cached[symbol, index] = outcome
+                if (symbol, index) in keys:
+                    runs.append((keys[symbol, index], symbol, bars[symbol], self.strategies[index], outcome, self.multiplier))
+        if runs:
+            self.store.save_many(runs)
+        for symbol in bars:
+            for index, strategy in enumerate(self.strategies):
+                results[strategy.name][symbol] = cached[symbol, index]
+        return results
+
+    def _cached(self, bars: dict) -> tuple[dict, dict]:
+        """Returns the store keys of the (symbol, strategy index) runs and the results already stored, keyed the same way.
+
+        Strategies that cannot be fingerprinted (see `result_store.fingerprint`) have no key and always run.
+        """
+        keys = {}
+        if self.store is None:
+            return keys, {}
+        for symbol, series in bars.items():
+            digest = bars_hash(series)
+            for index, strategy in enumerate(self.strategies):
+                try:
+                    keys[symbol, index] = ResultStore.key(series, strategy, self.initial_balance, self.multiplier, digest)
+                except ValueError:
+                    pass
+        if self.keep_history:
+            return keys, {}
+        stored = self.store.get_many(keys.values())
+        return keys, {run: stored[key] for run, key in keys.items() if key in stored}
+
+    def _run_tasks(self, bars: dict, tasks: list[tuple]) -> list[list[dict]]:
+        """Runs the tasks (`(symbol, strategy indices)`) and returns their outcomes, in the same order."""
+        shared = SharedBars(bars)
+        try:
+            settings = (self.strategies, self.initial_balance, self.multiplier, self.vectorized, self.keep_history)
+            # a single task is not worth starting processes for
+            if self.max_workers == 1 or len(tasks) == 1:
+                _init_worker(shared.spec, False, *settings)
+                try:
+                    outcomes = [_run_task(task) for task in tasks]
+                finally:
+                    memory = _worker.pop('memory')
+                    _worker.clear()
+                    memory.close()
+            else:
+                chunksize = max(1, len(tasks) // (self.max_workers * 4))
+                context = multiprocessing.get_context()
+                own_tracker = context.get_start_method() != 'fork'
+                with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context, initializer=_init_worker, initargs=(shared.spec, own_tracker, *settings)) as executor:
+                    outcomes = list(executor.map(_run_task, tasks, chunksize=chunksize))
+        finally:
+            shared.close()
+        return outcomes
@@ -1,5 +1,7 @@
 from strategy import TradingStrategy
 import numpy as np
+from indicators.streaming import RSI
+from indicators import vectorized
 
 class RSIStrategy(TradingStrategy):
     def __init__(self, period: int, overbought: int = 70, oversold: int = 30) -> None:
@@ -9,14 +11,14 @@ class RSIStrategy(TradingStrategy):
         self.overbought = overbought
         self.oversold = oversold
         self.historical_data = []
+        self.rsi = RSI(period)
 
     def should_buy(self, data_point: dict) -> float:
         """Implements the buy logic based on RSI."""
         if len(self.historical_data) < self.period + 1:
             return 0
 
-        rsi = self.calculate_rsi(self.historical_data)
-        if rsi < self.oversold:
+        if self._rsi(self.oversold) < self.oversold:
             return 1
         return 0
 
@@ -25,38 +27,52 @@ class RSIStrategy(TradingStrategy):
         if len(self.historical_data) < self.period + 1:
             return 0
 
-        rsi = self.calculate_rsi(self.historical_data)
-        if rsi > self.overbought:
+        if self._rsi(self.overbought) > self.overbought:
             return 1
         return 0
 
-    def calculate_rsi(self, data: list) -> float:
-        """Calculates the RSI for the given data list."""
-        if len(data) < self.period + 1:
-            return 50  # neutral value
+    def _rsi(self, threshold: float) -> float:
+        """Returns the RSI of the current bar, recomputed with the formula when it is within rounding error of `threshold`."""
+        rsi = self.rsi.value
+        if abs(rsi - threshold) <= self.rsi.error:
+            return self.rsi.recompute()
+        return rsi
 
-        prices = np.array([d['close'] for d in data[-self.period - 1:]])
-        deltas = np.diff(prices)
-        gains = deltas.copy()
-        losses = deltas.copy()
-        gains[gains < 0] = 0
-        losses[losses > 0] = 0
-        losses = np.abs(losses)
+    @property
+    def lookback(self) -> int:
+        """Number of latest bars the strategy reads (the RSI needs `period + 1` bars)."""
+        return self.period + 1
+
+    def generate_signals(self, columns: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of every bar at once.
 
-        avg_gain = np.mean(gains[1:])
-        avg_loss = np.mean(losses[1:])
+        Like `_rsi`, the values within rounding error of a threshold are recomputed with the formula.
+        """
+        rsi, error = vectorized.rsi_with_error(columns['close'], self.period)
+        near = (np.abs(rsi - self.oversold) <= error) | (np.abs(rsi - self.overbought) <= error)
+        if near.any():
+            rsi = rsi.copy()
+            for index, prices in vectorized.windows_at(columns['close'], self.period + 1, near):
+                rsi[index] = self._formula(prices)
+        return (rsi < self.oversold).astype(float), (rsi > self.overbought).astype(float)
 
+    @staticmethod
+    def _formula(prices: np.ndarray) -> float:
+        """Returns the RSI of the last `period + 1` prices with the `np.mean` of the gains and losses of their last `period - 1` changes, rounding included."""
+        deltas = np.diff(prices)
+        avg_gain = np.mean(np.where(deltas < 0, 0, deltas)[1:])
+        avg_loss = np.mean(np.abs(np.where(deltas > 0, 0, deltas))[1:])
         if avg_loss == 0:
             return 100
-
         rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return 100 - (100 / (1 + rs))
 
     def update_historical_data(self, data: list):
         """Updates the historical data used by the strategy."""
         self.historical_data = data
+        self.sync_indicator('rsi', data)
 
     def reset(self):
         """Resets the strategy."""
         self.historical_data = []
+        self.rsi.reset()
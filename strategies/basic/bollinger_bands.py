@@ -1,5 +1,7 @@
 from strategy import TradingStrategy
 import numpy as np
+from indicators.streaming import BollingerBands
+from indicators import vectorized
 
 class BollingerBandsStrategy(TradingStrategy):
     def __init__(self, period: int, std_dev: int = 2) -> None:
@@ -7,14 +9,14 @@ class BollingerBandsStrategy(TradingStrategy):
         super().__init__(name="Bollinger Bands Strategy")
         self.period = period
         self.std_dev = std_dev
+        self.bands = BollingerBands(period, std_dev)
 
     def should_buy(self, data_point: dict) -> float:
       """Implements the buy logic based on Bollinger Bands."""
       if len(self.historical_data) < self.period:
           return 0
 
-      ma, upper_band, lower_band = self.calculate_bollinger_bands(self.historical_data)
-      if data_point['close'] < lower_band:
+      if data_point['close'] < self._band(data_point['close'], 'lower_band'):
           return 1 # or you can use some scaling to return a value between 0 and 1
       return 0
 
@@ -23,33 +25,48 @@ class BollingerBandsStrategy(TradingStrategy):
         if len(self.historical_data) < self.period:
             return 0
 
-        ma, upper_band, lower_band = self.calculate_bollinger_bands(self.historical_data)
-        if data_point['close'] > upper_band:
+        if data_point['close'] > self._band(data_point['close'], 'upper_band'):
             return 1 # or you can use some scaling to return a value between 0 and 1
         return 0
 
-    def calculate_bollinger_bands(self, data: list) -> tuple[float, float, float]:
-        """Calculates the Bollinger Bands for a given data list."""
-        if len(data) < self.period:
-             if len(data) > 0:
-                return data[-1]['close'], data[-1]['close'], data[-1]['close']
-             else:
-                return 0,0,0
-
-        prices = np.array([d['close'] for d in data[-self.period:]])
-        ma = np.mean(prices)
-        std_dev = np.std(prices)
-        upper_band = ma + self.std_dev * std_dev
-        lower_band = ma - self.std_dev * std_dev
-
-        return ma, upper_band, lower_band
-    
+    def _band(self, close: float, name: str) -> float:
+        """Returns the band `name` (`upper_band` or `lower_band`) of the current bar, recomputed with the formula when `close` is within its rounding error."""
+        band = getattr(self.bands, name)
+        if abs(close - band) <= self.bands.error:
+            ma, upper_band, lower_band = self.bands.recompute()
+            return upper_band if name == 'upper_band' else lower_band
+        return band
+
+    @property
+    def lookback(self) -> int:
+        """Number of latest bars the strategy reads (the bands period)."""
+        return self.period
+
+    def generate_signals(self, columns: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of every bar at once.
+
+        Like `_band`, the bands within rounding error of the close are recomputed with the formula.
+        """
+        close = np.asarray(columns['close'], dtype=float)
+        ma, upper_band, lower_band = vectorized.bollinger_bands(close, self.period, self.std_dev)
+        error = vectorized.bollinger_bands_error(close, self.period, self.std_dev)
+        near = (np.abs(close - lower_band) <= error) | (np.abs(close - upper_band) <= error)
+        if near.any():
+            upper_band, lower_band = upper_band.copy(), lower_band.copy()
+            for index, prices in vectorized.windows_at(close, self.period, near):
+                ma = np.mean(prices)
+                deviation = np.std(prices)
+                upper_band[index], lower_band[index] = ma + self.std_dev * deviation, ma - self.std_dev * deviation
+        return (close < lower_band).astype(float), (close > upper_band).astype(float)
+
     def update_historical_data(self, data: list):
         """Updates the historical data used by the strategy."""
         self.historical_data = data
+        self.sync_indicator('bands', data)
 
     def reset(self):
         """Resets the strategy to its initial state."""
         self.historical_data = []
+        self.bands.reset()
 
     historical_data = []
\ No newline at end of file
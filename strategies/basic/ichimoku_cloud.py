@@ -1,23 +1,25 @@
 from strategy import TradingStrategy
 import numpy as np
+from indicators.streaming import IchimokuCloud
+from indicators import vectorized
 
 class IchimokuCloudStrategy(TradingStrategy):
     def __init__(self) -> None:
         """Constructor."""
         super().__init__(name="Ichimoku Cloud Strategy")
+        self.cloud = IchimokuCloud()
 
     def should_buy(self, data_point: dict) -> float:
         """Implements the buy logic based on Ichimoku Cloud."""
         if len(self.historical_data) < 52:
             return 0
         
-        tenkan_sen, kijun_sen, senkou_a, senkou_b, chikou_span = self.calculate_ichimoku_components(self.historical_data)
-        
+        cloud = self.cloud
         current_price = data_point['close']
-        cloud_top = senkou_a[-1]
-        cloud_bottom = senkou_b[-1]
+        cloud_top = cloud.senkou_a
+        cloud_bottom = cloud.senkou_b
 
-        if current_price > cloud_top and tenkan_sen[-1] > kijun_sen[-1]:
+        if current_price > cloud_top and cloud.tenkan_sen > cloud.kijun_sen:
           return 1
         
         return 0
@@ -27,54 +29,37 @@ class IchimokuCloudStrategy(TradingStrategy):
         if len(self.historical_data) < 52:
           return 0
         
-        tenkan_sen, kijun_sen, senkou_a, senkou_b, chikou_span = self.calculate_ichimoku_components(self.historical_data)
-        
+        cloud = self.cloud
         current_price = data_point['close']
-        cloud_top = senkou_a[-1]
-        cloud_bottom = senkou_b[-1]
-        if current_price < cloud_bottom and tenkan_sen[-1] < kijun_sen[-1]:
+        cloud_top = cloud.senkou_a
+        cloud_bottom = cloud.senkou_b
+        if current_price < cloud_bottom and cloud.tenkan_sen < cloud.kijun_sen:
           return 1
         return 0
 
 
-    def calculate_ichimoku_components(self, data: list) -> tuple[list[float], list[float], list[float], list[float], list[float]]:
-        """Calculates all Ichimoku Cloud components."""
-        if len(data) < 52:
-             if len(data) > 0:
-                close_price = data[-1]['close']
-                return [close_price], [close_price], [close_price], [close_price], [close_price]
-             else:
-                 return [0], [0], [0], [0], [0]
-
-        prices = np.array([d['close'] for d in data])
-        highs = np.array([d['high'] for d in data])
-        lows = np.array([d['low'] for d in data])
-        
-        tenkan_sen = self._calculate_average(highs, lows, 9)
-        kijun_sen = self._calculate_average(highs, lows, 26)
-        senkou_a = (tenkan_sen + kijun_sen) / 2
-        senkou_b = self._calculate_average(highs, lows, 52)
-        chikou_span = prices[-len(senkou_a):]
-
-        return tenkan_sen[-len(senkou_a):], kijun_sen[-len(senkou_a):], senkou_a, senkou_b[-len(senkou_a):], chikou_span
-
-    def _calculate_average(self, highs: np.ndarray, lows: np.ndarray, window: int) -> np.ndarray:
-        """Calculates the average of highs and lows over a given window."""
-        highest_high = np.zeros_like(highs, dtype=float)
-        lowest_low = np.zeros_like(lows, dtype=float)
-        
-        for i in range(window -1, len(highs)):
-            highest_high[i] = np.max(highs[i-window+1:i+1])
-            lowest_low[i] = np.min(lows[i-window+1:i+1])
+    @property
+    def lookback(self) -> int:
+        """Number of latest bars the strategy reads (the senkou span B window)."""
+        return 52
 
-        return (highest_high + lowest_low) / 2
+    def generate_signals(self, columns: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of every bar at once."""
+        close = np.asarray(columns['close'], dtype=float)
+        tenkan_sen, kijun_sen, senkou_a, senkou_b = vectorized.ichimoku_cloud(columns['high'], columns['low'])
+        valid = np.arange(close.shape[-1]) >= 51
+        buy = valid & (close > senkou_a) & (tenkan_sen > kijun_sen)
+        sell = valid & (close < senkou_b) & (tenkan_sen < kijun_sen)
+        return buy.astype(float), sell.astype(float)
 
     def update_historical_data(self, data: list):
         """Updates the historical data used by the strategy."""
         self.historical_data = data
+        self.sync_indicator('cloud', data)
 
     def reset(self):
         """Resets the strategy to its initial state."""
         self.historical_data = []
+        self.cloud.reset()
     
     historical_data = []
\ No newline at end of file
@@ -1,18 +1,25 @@
 from strategy import TradingStrategy
+from indicators.streaming import MovingAverage
+import numpy as np
+from indicators import vectorized
 
 class MovingAverageStrategy(TradingStrategy):
+    # should_buy/should_sell store the current averages as the previous ones
+    stateful_signals = True
+
     def __init__(self, short_window: int, long_window: int) -> None:
         """Constructor."""
         super().__init__(name="Moving Average Strategy")
         self.short_window = short_window
         self.long_window = long_window
+        self.short_ma = MovingAverage(short_window)
+        self.long_ma = MovingAverage(long_window)
 
     def should_buy(self, data_point: dict) -> bool:
         """Implements the buy logic based on moving averages."""
         if len(self.historical_data) < self.long_window:
             return 0
-        short_ma = self.calculate_moving_average(self.historical_data, self.short_window)
-        long_ma = self.calculate_moving_average(self.historical_data, self.long_window)
+        short_ma, long_ma = self._current_moving_averages()
 
         # print(f"  Short MA: {short_ma}, Long MA: {long_ma}, Prev Short MA: {self.prev_short_ma}, Prev Long MA: {self.prev_long_ma}")
 
@@ -29,8 +36,7 @@ class MovingAverageStrategy(TradingStrategy):
         """Implements the sell logic based on moving averages."""
         if len(self.historical_data) < self.long_window:
             return 0
-        short_ma = self.calculate_moving_average(self.historical_data, self.short_window)
-        long_ma = self.calculate_moving_average(self.historical_data, self.long_window)
+        short_ma, long_ma = self._current_moving_averages()
 
         # print(f"  Short MA: {short_ma}, Long MA: {long_ma}, Prev Short MA: {self.prev_short_ma}, Prev Long MA: {self.prev_long_ma}")
 
@@ -43,24 +49,64 @@ class MovingAverageStrategy(TradingStrategy):
            self.prev_long_ma = long_ma
            return 0
 
-    def calculate_moving_average(self, data: list, window: int) -> float:
-        """Calculates the moving average for a given data list."""
-        if len(data) < window:
-           if len(data) > 0:
-              # print(f"  Not enough data to calculate MA, data length: {len(data)}, window: {window}, returning last price: {data[-1]['close']}")
-              return data[-1]['close']
-           else:
-              # print(f"  Not enough data to calculate MA, data length: {len(data)}, window: {window}, returning 0")
-              return 0
-        prices = [d['close'] for d in data[-window:]]
-        ma = sum(prices) / window
-        return ma
-    
+    def _current_moving_averages(self) -> tuple[float, float]:
+        """Returns the short and long moving averages of the current bar from the streaming indicators.
+
+        Averages that are equal on paper (e.g. of prices on a tick grid) only differ by their rounding, which decides
+        the crossover, so averages closer than their error bounds are recomputed with the formula (`sum(prices) / window`).
+        """
+        short_ma = self.short_ma.value
+        long_ma = self.long_ma.value
+        if short_ma is None or long_ma is None or abs(short_ma - long_ma) <= self.short_ma.error + self.long_ma.error:
+            return self.short_ma.recompute(), self.long_ma.recompute()
+        return short_ma, long_ma
+
+    @property
+    def lookback(self) -> int:
+        """Number of latest bars the strategy reads (the long moving average window)."""
+        return self.long_window
+
+    def generate_signals(self, columns: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of every bar at once.
+
+        `should_sell` runs after `should_buy` has already stored the current averages as the previous ones,
+        so its crossover test compares the bar with itself and never fires; the sell signals are all zero.
+        """
+        close = np.asarray(columns['close'], dtype=float)
+        buy = np.zeros(close.shape)
+        sell = np.zeros(close.shape)
+        start = self.long_window - 1
+        if close.shape[-1] <= start:
+            return buy, sell
+        # like `_current_moving_averages`, a window longer than the history falls back to the last price, and averages
+        # closer than their error bounds are recomputed with the formula
+        short_ma = vectorized.rolling_mean(close, self.short_window)
+        long_ma = vectorized.rolling_mean(close, self.long_window)
+        short_error = np.nan_to_num(vectorized.rolling_mean_error(close, self.short_window))
+        long_error = np.nan_to_num(vectorized.rolling_mean_error(close, self.long_window))
+        short_ma = np.where(np.isnan(short_ma), close, short_ma)
+        long_ma = np.where(np.isnan(long_ma), close, long_ma)
+        near = np.abs(short_ma - long_ma) <= short_error + long_error
+        for moving_average, error, window in ((short_ma, short_error, self.short_window), (long_ma, long_error, self.long_window)):
+            for index, prices in vectorized.windows_at(close, window, near & (error > 0)):
+                moving_average[index] = sum(prices.tolist()) / window
+        short_ma = short_ma[..., start:]
+        long_ma = long_ma[..., start:]
+        first = np.zeros(short_ma.shape[:-1] + (1,))
+        prev_short_ma = np.concatenate((first, short_ma[..., :-1]), axis=-1)
+        prev_long_ma = np.concatenate((first, long_ma[..., :-1]), axis=-1)
+        buy[..., start:] = (short_ma > long_ma) & (prev_short_ma <= prev_long_ma)
+        return buy, sell
+
     def update_historical_data(self, data: list):
         self.historical_data = data
+        self.sync_indicator('short_ma', data)
+        self.sync_indicator('long_ma', data)
 
     def reset(self):
         self.historical_data = []
+        self.short_ma.reset()
+        self.long_ma.reset()
         self.prev_short_ma = 0
         self.prev_long_ma = 0
 
@@ -13,18 +13,55 @@ class HybridStrategy(TradingStrategy):
 
     def should_buy(self, data_point: dict) -> float:
         """Implements the buy logic based on the hybrid strategy."""
-        scores = [strategy.should_buy(data_point) for strategy in self.strategies]
         if self.weights is None:
-            return np.prod(scores)
+            return self._product(lambda strategy: strategy.should_buy(data_point))
+        scores = [strategy.should_buy(data_point) for strategy in self.strategies]
         return np.average(scores, weights=self.weights)
 
     def should_sell(self, data_point: dict) -> float:
         """Implements the sell logic based on the hybrid strategy."""
-        scores = [strategy.should_sell(data_point) for strategy in self.strategies]
         if self.weights is None:
-            return np.prod(scores)
+            return self._product(lambda strategy: strategy.should_sell(data_point))
+        scores = [strategy.should_sell(data_point) for strategy in self.strategies]
         return np.average(scores, weights=self.weights)
+
+    def _product(self, score: callable) -> float:
+        """Multiplies the scores of the strategies, skipping the remaining ones once a score is 0 (unless their signals update their state)."""
+        product = 1
+        for strategy in self.strategies:
+            if product == 0 and not strategy.stateful_signals:
+                continue
+            product *= score(strategy)
+        return product
     
+    def generate_signals(self, columns: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of every bar at once, combining the children's signals."""
+        signals = [strategy.generate_signals(columns) for strategy in self.strategies]
+        buy_scores = np.array([buy for buy, _ in signals])
+        sell_scores = np.array([sell for _, sell in signals])
+        if self.weights is None:
+            return np.prod(buy_scores, axis=0), np.prod(sell_scores, axis=0)
+        return np.average(buy_scores, axis=0, weights=self.weights), np.average(sell_scores, axis=0, weights=self.weights)
+
+    @property
+    def stateful_signals(self) -> bool:
+        """True if the signals of one of the strategies update its state."""
+        return any(strategy.stateful_signals for strategy in self.strategies)
+
+    @property
+    def lookback(self) -> int | None:
+        """Longest lookback of the strategies, None if one of them needs the whole history."""
+        lookbacks = [strategy.lookback for strategy in self.strategies]
+        if None in lookbacks:
+            return None
+        return max(lookbacks, default=0)
+
+    def share_indicators(self, cache) -> None:
+        """Makes the strategy and its children take their indicators from `cache`."""
+        super().share_indicators(cache)
+        for strategy in self.strategies:
+            strategy.share_indicators(cache)
+
     def update_historical_data(self, data: list):
         """Updates the historical data used by the strategy."""
         for strategy in self.strategies:
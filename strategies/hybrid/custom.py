@@ -1,4 +1,5 @@
 from strategy import TradingStrategy
+import numpy as np
 
 class CustomStrategy(TradingStrategy):
     def __init__(self, strategies: list [TradingStrategy], buy_merging_function: callable, sell_merging_function: callable, name:str=None) -> None:
@@ -21,6 +22,40 @@ class CustomStrategy(TradingStrategy):
         scores = [strategy.should_sell(data_point) for strategy in self.strategies]
         return self.sell_merging_function(scores)
 
+    def generate_signals(self, columns: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the buy and sell signals of every bar at once.
+
+        The merging functions take a list of scores, so they are applied bar by bar (and row by row for 2-D columns) to the children's signals.
+        """
+        signals = [strategy.generate_signals(columns) for strategy in self.strategies]
+        buy_scores = np.array([buy for buy, _ in signals])
+        sell_scores = np.array([sell for _, sell in signals])
+        shape = buy_scores.shape[1:]
+        buy_scores = np.moveaxis(buy_scores, 0, -1).reshape(-1, len(signals)).tolist()
+        sell_scores = np.moveaxis(sell_scores, 0, -1).reshape(-1, len(signals)).tolist()
+        buy = np.array([self.buy_merging_function(scores) for scores in buy_scores], dtype=float).reshape(shape)
+        sell = np.array([self.sell_merging_function(scores) for scores in sell_scores], dtype=float).reshape(shape)
+        return buy, sell
+
+    @property
+    def stateful_signals(self) -> bool:
+        """True if the signals of one of the strategies update its state."""
+        return any(strategy.stateful_signals for strategy in self.strategies)
+
+    @property
+    def lookback(self) -> int | None:
+        """Longest lookback of the strategies, None if one of them needs the whole history."""
+        lookbacks = [strategy.lookback for strategy in self.strategies]
+        if None in lookbacks:
+            return None
+        return max(lookbacks, default=0)
+
+    def share_indicators(self, cache) -> None:
+        """Makes the strategy and its children take their indicators from `cache`."""
+        super().share_indicators(cache)
+        for strategy in self.strategies:
+            strategy.share_indicators(cache)
+
     def update_historical_data(self, data: list):
         """Updates the historical data used by the strategy."""
         for strategy in self.strategies:
@@ -0,0 +1,72 @@
+from strategy import TradingStrategy
+from history import BarResampler
+
+class TimeframeStrategy(TradingStrategy):
+    def __init__(self, strategy: TradingStrategy, frequency: str, hold_signals: bool = True, name: str = None) -> None:
+        """Constructor. Runs `strategy` on bars of a coarser timeframe (`frequency`, e.g. `1h` or `1D`), built from the bars of the backtest as they arrive.
+
+        The strategy is evaluated once per coarser bar, when the first bar of the next period arrives (see `BarResampler`).
+        With `hold_signals`, its signals then hold until the next coarser bar is completed, which makes it a filter for
+        strategies on the finer bars (e.g. `HybridStrategy([TimeframeStrategy(IchimokuCloudStrategy(), '1h', hold_signals=False),
+        TimeframeStrategy(ADXStrategy(20), '1D')], weights=None)`: hourly Ichimoku signals gated by the daily ADX);
+        otherwise they are only given on the bar completing the period.
+        """
+        if name is None:
+            name = f"{strategy.name} ({frequency})"
+        super().__init__(name=name)
+        self.strategy = strategy
+        self.strategies = [strategy]
+        self.frequency = frequency
+        self.hold_signals = hold_signals
+        self.resampler = BarResampler(frequency, strategy.lookback)
+        self.reset()
+
+    def should_buy(self, data_point: dict) -> float:
+        """Returns the buy signal of the strategy on the coarser timeframe."""
+        return self.buy_signal
+
+    def should_sell(self, data_point: dict) -> float:
+        """Returns the sell signal of the strategy on the coarser timeframe."""
+        return self.sell_signal
+
+    def update_historical_data(self, data: list):
+        """Aggregates the new bars of `data` into the coarser bars, evaluating the strategy on every completed one.
+
+        Raises:
+            ValueError: If bars were dropped from a `BarHistory` before the strategy saw them.
+        """
+        total = getattr(data, 'total', len(data))
+        if data is not self.source or total < self.seen:
+            self.reset()
+            self.source = data
+        new_bars = total - self.seen
+        if new_bars > len(data):
+            raise ValueError(f"{new_bars} new bars but only the last {len(data)} are available")
+        self.seen = total
+        if not self.hold_signals and new_bars > 0:
+            self.buy_signal = self.sell_signal = 0
+        for data_point in data[len(data) - new_bars:]:
+            completed = self.resampler.update(data_point)
+            if completed is not None:
+                self.strategy.update_historical_data(self.resampler.bars)
+                self.buy_signal = self.strategy.should_buy(completed)
+                self.sell_signal = self.strategy.should_sell(completed)
+
+    @property
+    def lookback(self) -> int:
+        """Number of latest bars the strategy reads (only the new ones, the coarser bars are kept by the resampler)."""
+        return 1
+
+    def share_indicators(self, cache) -> None:
+        """Makes the strategy and the wrapped strategy take their indicators from `cache`."""
+        super().share_indicators(cache)
+        self.strategy.share_indicators(cache)
+
+    def reset(self):
+        """Resets the strategy to its default state."""
+        self.strategy.reset()
+        self.resampler.reset()
+        self.source = None
+        self.seen = 0
+        self.buy_signal = 0
+        self.sell_signal = 0
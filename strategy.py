@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
 
 class TradingStrategy(ABC):
+    # True when `should_buy`/`should_sell` update the strategy's state, composite strategies then always evaluate it
+    stateful_signals = False
+
     def __init__(self, name: str) -> None:
         """Constructor."""
         self.name = name
+        self.indicator_cache = None
 
     @abstractmethod
     def should_buy(self, data_point: dict) -> float:
@@ -23,4 +27,47 @@ class TradingStrategy(ABC):
     @abstractmethod
     def reset(self):
         """Abstract method, resets the strategy."""
-        pass
\ No newline at end of file
+        pass
+
+    @property
+    def lookback(self) -> int | None:
+        """Number of latest bars of the historical data the strategy reads, None if it needs the whole history (the default).
+
+        When every strategy of a run declares it, the backtester only keeps that many bars (see `history.BarHistory`).
+        """
+        return None
+
+    def orders(self, data_point: dict) -> list:
+        """Returns the pending orders (`orders.Order`) to place after this bar, none by default.
+
+        They fill on the following bars when the price reaches them (see `Broker.process_bar`), in the per-bar backtest only.
+        """
+        return []
+
+    def generate_signals(self, columns: dict) -> tuple:
+        """Returns the buy and sell signals of every bar at once, as two NumPy arrays, for the vectorized backtest mode.
+
+        `columns` maps `open`, `high`, `low`, `close` and `volume` to NumPy arrays. The signals must equal what
+        `should_buy`/`should_sell` return bar by bar in `Backtester.run_backtest`. Columns may also be 2-D arrays of
+        independent series (one per row, bars along the last axis, e.g. simulated paths), the signals then have the same shape.
+
+        Raises:
+            NotImplementedError: If the strategy has no vectorized mode.
+        """
+        raise NotImplementedError(f"{self.name} has no vectorized mode")
+
+    def share_indicators(self, cache) -> None:
+        """Makes the strategy take its indicators from `cache` (an `IndicatorCache`), shared with the other strategies of the run."""
+        self.indicator_cache = cache
+
+    def sync_indicator(self, attribute: str, data: list) -> None:
+        """Brings the indicator stored in `attribute` up to date with `data`.
+
+        With an indicator cache, the attribute is first switched to the cache's instance of the same indicator, which may
+        already have been updated for this bar by another strategy.
+        """
+        indicator = getattr(self, attribute)
+        if self.indicator_cache is not None:
+            indicator = self.indicator_cache.get(data, indicator)
+            setattr(self, attribute, indicator)
+        indicator.sync(data)
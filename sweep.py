@@ -0,0 +1,56 @@
+import itertools
+import pandas as pd
+
+from backtester import Backtester
+from data_handler import to_columns
+from indicators import vectorized
+
+
+class ParameterSweep:
+    def __init__(self, parameter_ranges: dict, constraint: callable = None, initial_balance: float = 10000, multiplier: float = 10) -> None:
+        """Constructor.
+
+        `parameter_ranges` maps a strategy class (or any factory taking keyword arguments) to a dictionary of
+        `parameter name -> iterable of values`, e.g. `{RSIStrategy: {'period': [7, 14], 'overbought': range(60, 90, 5)}}`.
+        Every combination is backtested, except the ones for which `constraint(strategy_class, parameters)` returns False
+        (e.g. to skip moving averages whose short window is not shorter than the long one).
+        """
+        self.parameter_ranges = parameter_ranges
+        self.constraint = constraint
+        self.initial_balance = initial_balance
+        self.multiplier = multiplier
+
+    def combinations(self) -> list[tuple]:
+        """Returns the `(strategy class, parameters)` pairs of the grid."""
+        combinations = []
+        for strategy_class, ranges in self.parameter_ranges.items():
+            names = list(ranges)
+            for values in itertools.product(*(list(ranges[name]) for name in names)):
+                parameters = dict(zip(names, values))
+                if self.constraint is None or self.constraint(strategy_class, parameters):
+                    combinations.append((strategy_class, parameters))
+        return combinations
+
+    def run(self, data, symbol: str = "ABCDEF", metric: str | None = None) -> pd.DataFrame:
+        """Backtests every combination on `data` (list of data points, `BarSeries` or dictionary of columns) and returns one row per combination.
+
+        Runs use the vectorized backtest mode inside `vectorized.shared_computations`, so an indicator series is computed
+        once and reused by every combination that needs it (one RSI per period for all thresholds, one set of prefix sums
+        for the rolling means of all windows, one EMA per window for all MACD combinations...).
+        Columns are `strategy`, the parameters and the stats of `Backtester.run_backtest` (performance metrics included),
+        or only `metric` (one of these stats, e.g. the score to optimize): the other stats are then not computed.
+
+        Raises:
+            ValueError: If `metric` is not a stat of `Backtester.run_backtest`.
+        """
+        stats = None if metric is None else (metric,)
+        columns = to_columns(data)
+        rows = []
+        with vectorized.shared_computations():
+            for strategy_class, parameters in self.combinations():
+                strategy = strategy_class(**parameters)
+                results = Backtester(self.initial_balance).run_vectorized_backtest(strategy, columns, symbol=symbol, multiplier=self.multiplier, stats=stats)
+                if stats is None:
+                    del results['transaction_history'], results['equity_curve']
+                rows.append({'strategy': strategy.name, **parameters, **results})
+        return pd.DataFrame(rows)
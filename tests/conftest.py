@@ -0,0 +1,24 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# the modules of the project are top-level modules of the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_bars
+
+
+@pytest.fixture
+def csv_directory(tmp_path):
+    """A directory of CSV files (`S0.csv` to `S2.csv`) of 150 daily synthetic bars from 2024-01-01, for the `csv` source."""
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    for seed in range(3):
+        bars = generate_bars(150, seed=seed, start='2024-01-01', frequency='1D')
+        lines = ['Date,Open,High,Low,Close,Volume']
+        dates = np.datetime_as_string(bars.index, unit='s')
+        for row, date in enumerate(dates):
+            lines.append(','.join([date] + [repr(float(bars[field][row])) for field in ('open', 'high', 'low', 'close', 'volume')]))
+        (directory / f"S{seed}.csv").write_text('\n'.join(lines) + '\n')
+    return directory
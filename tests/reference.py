@@ -0,0 +1,213 @@
+import functools
+import numpy as np
+
+from benchmarks.synthetic import generate_bars
+
+
+# The formulas of the basic strategies before they were ported to the streaming indicators, recomputed from the
+# whole history on every bar. The streaming and the vectorized strategies must give the same signals on every bar.
+
+def reference_moving_average(data, window):
+    if len(data) < window:
+        return data[-1]['close']
+    prices = [d['close'] for d in data[-window:]]
+    return sum(prices) / window
+
+
+def reference_rsi(data, period):
+    prices = np.array([d['close'] for d in data[-period - 1:]])
+    deltas = np.diff(prices)
+    gains = deltas.copy()
+    losses = deltas.copy()
+    gains[gains < 0] = 0
+    losses[losses > 0] = 0
+    losses = np.abs(losses)
+    avg_gain = np.mean(gains[1:])
+    avg_loss = np.mean(losses[1:])
+    if avg_loss == 0:
+        return 100
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def reference_bollinger_bands(data, period, std_dev):
+    prices = np.array([d['close'] for d in data[-period:]])
+    ma = np.mean(prices)
+    deviation = np.std(prices)
+    return ma, ma + std_dev * deviation, ma - std_dev * deviation
+
+
+def reference_stochastic_oscillator(data, period):
+    highest_high = np.max([d['high'] for d in data[-period:]])
+    lowest_low = np.min([d['low'] for d in data[-period:]])
+    k_values = [((data[i]['close'] - lowest_low) / (highest_high - lowest_low)) * 100 for i in range(period, len(data))]
+    d_values = [np.mean(k_values[i - 2:i + 1]) for i in range(2, len(k_values))]
+    if len(k_values) > 0 and len(d_values) == 0:
+        d_values = [k_values[-1]]
+    return k_values, d_values
+
+
+def reference_ema(values, window, alpha=None):
+    alpha = 2 / (window + 1) if alpha is None else alpha
+    ema = np.zeros_like(values, dtype=float)
+    ema[:window] = np.mean(values[:window])
+    for i in range(window, len(values)):
+        ema[i] = alpha * values[i] + (1 - alpha) * ema[i - 1]
+    return ema
+
+
+def reference_macd(data, short_window, long_window, signal_window):
+    prices = np.array([d['close'] for d in data])
+    macd_line = reference_ema(prices, short_window) - reference_ema(prices, long_window)
+    return macd_line, reference_ema(macd_line, signal_window)
+
+
+def reference_adx(data, period):
+    prices = np.array([d['close'] for d in data])
+    highs = np.array([d['high'] for d in data])
+    lows = np.array([d['low'] for d in data])
+    tr = np.zeros(len(data))
+    pdm = np.zeros(len(data))
+    mdm = np.zeros(len(data))
+    for i in range(1, len(data)):
+        tr[i] = max(highs[i] - lows[i], abs(highs[i] - prices[i - 1]), abs(lows[i] - prices[i - 1]))
+        pdm[i] = highs[i] - highs[i - 1] if (highs[i] - highs[i - 1]) > (lows[i - 1] - lows[i]) else 0
+        mdm[i] = lows[i - 1] - lows[i] if (lows[i - 1] - lows[i]) > (highs[i] - highs[i - 1]) else 0
+    atr = reference_ema(tr, period, 1 / period)
+    pdi = (reference_ema(pdm, period, 1 / period) / atr) * 100
+    mdi = (reference_ema(mdm, period, 1 / period) / atr) * 100
+    dx = np.abs((pdi - mdi) / (pdi + mdi)) * 100
+    return reference_ema(dx, period, 1 / period), pdi, mdi
+
+
+def reference_ichimoku_cloud(data):
+    highs = np.array([d['high'] for d in data])
+    lows = np.array([d['low'] for d in data])
+
+    def average(window):
+        highest_high = np.zeros_like(highs)
+        lowest_low = np.zeros_like(lows)
+        for i in range(window - 1, len(highs)):
+            highest_high[i] = np.max(highs[i - window + 1:i + 1])
+            lowest_low[i] = np.min(lows[i - window + 1:i + 1])
+        return (highest_high + lowest_low) / 2
+
+    tenkan_sen, kijun_sen = average(9), average(26)
+    return tenkan_sen, kijun_sen, (tenkan_sen + kijun_sen) / 2, average(52)
+
+
+class ReferenceSignals:
+    """The buy and sell decisions of the original strategies, bar by bar."""
+
+    def __init__(self, name, **parameters):
+        self.name = name
+        self.parameters = parameters
+        self.prev_short_ma = self.prev_long_ma = 0
+
+    def moving_average(self, data, short_window, long_window):
+        if len(data) < long_window:
+            return 0, 0
+        short_ma = reference_moving_average(data, short_window)
+        long_ma = reference_moving_average(data, long_window)
+        buy = short_ma > long_ma and self.prev_short_ma <= self.prev_long_ma
+        self.prev_short_ma, self.prev_long_ma = short_ma, long_ma
+        # the sell test runs after the buy test stored the current averages as the previous ones
+        sell = short_ma < long_ma and self.prev_short_ma >= self.prev_long_ma
+        return buy, sell
+
+    def rsi(self, data, period, overbought=70, oversold=30):
+        if len(data) < period + 1:
+            return 0, 0
+        rsi = reference_rsi(data, period)
+        return rsi < oversold, rsi > overbought
+
+    def bollinger_bands(self, data, period, std_dev=2):
+        if len(data) < period:
+            return 0, 0
+        _, upper_band, lower_band = reference_bollinger_bands(data, period, std_dev)
+        close = data[-1]['close']
+        return close < lower_band, close > upper_band
+
+    def stochastic_oscillator(self, data, period, overbought=80, oversold=20):
+        if len(data) < period:
+            return 0, 0
+        k, d = reference_stochastic_oscillator(data, period)
+        if len(k) < 2 or len(d) < 2:
+            return 0, 0
+        buy = k[-1] < oversold and k[-1] > d[-1] and k[-2] <= d[-2]
+        sell = k[-1] > overbought and k[-1] < d[-1] and k[-2] >= d[-2]
+        return buy, sell
+
+    def macd(self, data, short_window=12, long_window=26, signal_window=9):
+        if len(data) < long_window + signal_window - 1:
+            return 0, 0
+        macd, signal_line = reference_macd(data, short_window, long_window, signal_window)
+        buy = macd[-1] > signal_line[-1] and macd[-2] <= signal_line[-2]
+        sell = macd[-1] < signal_line[-1] and macd[-2] >= signal_line[-2]
+        return buy, sell
+
+    def adx(self, data, period=14):
+        if len(data) < period + 1:
+            return 0, 0
+        adx, pdi, mdi = reference_adx(data, period)
+        return adx[-1] > 25 and pdi[-1] > mdi[-1], adx[-1] > 25 and mdi[-1] > pdi[-1]
+
+    def ichimoku_cloud(self, data):
+        if len(data) < 52:
+            return 0, 0
+        tenkan_sen, kijun_sen, senkou_a, senkou_b = reference_ichimoku_cloud(data)
+        close = data[-1]['close']
+        buy = close > senkou_a[-1] and tenkan_sen[-1] > kijun_sen[-1]
+        sell = close < senkou_b[-1] and tenkan_sen[-1] < kijun_sen[-1]
+        return buy, sell
+
+    def __call__(self, data):
+        return getattr(self, self.name)(data, **self.parameters)
+
+
+STRATEGY_PARAMETERS = [
+    ('moving_average', {'short_window': 5, 'long_window': 40}),
+    ('moving_average', {'short_window': 3, 'long_window': 8}),
+    ('moving_average', {'short_window': 12, 'long_window': 5}),
+    ('rsi', {'period': 14}),
+    ('rsi', {'period': 5, 'overbought': 60, 'oversold': 40}),
+    ('bollinger_bands', {'period': 20, 'std_dev': 2}),
+    ('bollinger_bands', {'period': 5, 'std_dev': 1}),
+    ('stochastic_oscillator', {'period': 14}),
+    ('stochastic_oscillator', {'period': 5, 'overbought': 60, 'oversold': 40}),
+    ('macd', {'short_window': 12, 'long_window': 26, 'signal_window': 9}),
+    ('macd', {'short_window': 3, 'long_window': 5, 'signal_window': 12}),
+    ('macd', {'short_window': 5, 'long_window': 3, 'signal_window': 2}),
+    ('macd', {'short_window': 9, 'long_window': 4, 'signal_window': 3}),
+    ('adx', {'period': 14}),
+    ('adx', {'period': 5}),
+    ('ichimoku_cloud', {}),
+]
+
+
+def tick_rounded(bars, tick=0.01):
+    """Rounds the prices of `bars` to `tick`, so that averages of different windows often coincide."""
+    for field in ('open', 'high', 'low', 'close'):
+        bars[field][:] = np.round(bars[field] / tick) * tick
+    return bars
+
+
+SERIES = {
+    **{f"seed{seed}": (lambda seed=seed: generate_bars(300, seed=seed, frequency='1D')) for seed in range(3)},
+    **{f"ticks{seed}": (lambda seed=seed: tick_rounded(generate_bars(300, seed=seed, volatility=0.005, frequency='1D'))) for seed in range(3)},
+    'flat': lambda: tick_rounded(generate_bars(300, seed=7, volatility=0.0005, frequency='1D')),
+    # the 3 and 8 bar averages are equal on paper on two bars, summing them in another order flips their crossovers
+    'ticks48': lambda: tick_rounded(generate_bars(300, seed=48, volatility=0.002, frequency='1D')),
+}
+
+
+@functools.cache
+def reference_signals(series: str, name: str, parameters: tuple) -> list[tuple[int, int]]:
+    """The buy and sell decisions of the original strategy `name` (with the `parameters` items) on every bar of `SERIES[series]`."""
+    reference = ReferenceSignals(name, **dict(parameters))
+    history = []
+    signals = []
+    for data_point in SERIES[series]().to_list():
+        history.append(data_point)
+        signals.append(tuple(int(signal) for signal in reference(history)))
+    return signals
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from archive import BarArchive, main
+from benchmarks.synthetic import generate_bars
+from data_handler import FIELDS, ArchiveSource, DataFetcher
+
+
+def assert_same_bars(bars, expected):
+    assert np.array_equal(bars.index, expected.index)
+    for field in FIELDS:
+        assert np.array_equal(bars[field], expected[field]), field
+
+
+def test_append_and_open_round_trip(tmp_path):
+    bars = generate_bars(1000, seed=1, start='2024-01-02 14:30', frequency='1min')
+    archive = BarArchive(str(tmp_path))
+    for start in range(0, 1000, 300):
+        archive.append('A', bars.index[start:start + 300], {field: bars[field][start:start + 300] for field in FIELDS}, 'America/New_York')
+    # nothing to add
+    archive.append('A', bars.index[:0], {field: bars[field][:0] for field in FIELDS})
+    opened = archive.open('A')
+    assert_same_bars(opened, bars)
+    # read-only views of the mapped files
+    assert isinstance(opened['close'].base, np.memmap) and not opened['close'].flags.writeable
+    assert opened.timezone == 'America/New_York'
+    assert archive.meta('A') == {'length': 1000, 'fields': list(FIELDS), 'timezone': 'America/New_York', 'sorted': True, 'last': int(bars.index[-1].view(np.int64))}
+    assert archive.symbols() == ['A']
+
+
+def test_reopening_an_archive(tmp_path):
+    bars = generate_bars(500, seed=2, frequency='1h')
+    BarArchive(str(tmp_path)).append('A', bars.index[:200], {field: bars[field][:200] for field in FIELDS})
+    BarArchive(str(tmp_path)).append('B', bars.index, bars.columns)
+    reopened = BarArchive(str(tmp_path))
+    assert reopened.symbols() == ['A', 'B']
+    assert_same_bars(reopened.open('A'), bars[:200])
+    # appending to a reopened symbol continues it
+    reopened.append('A', bars.index[200:], {field: bars[field][200:] for field in FIELDS})
+    assert_same_bars(BarArchive(str(tmp_path)).open('A'), bars)
+    assert_same_bars(BarArchive(str(tmp_path)).open('B'), bars)
+    assert BarArchive(str(tmp_path / 'missing')).symbols() == []
+    with pytest.raises(ValueError):
+        reopened.open('C')
+
+
+def test_range_queries_across_chunk_boundaries(csv_directory, tmp_path):
+    archive = BarArchive(str(tmp_path / 'archive'))
+    # 150 bars read 16 rows at a time
+    assert archive.ingest_csv(str(csv_directory / 'S0.csv'), chunk_size=16) == {'S0': 150}
+    expected = generate_bars(150, seed=0, start='2024-01-01', frequency='1D')
+    bars = archive.open('S0')
+    assert_same_bars(bars, expected)
+    for start, end in [('2024-01-10', '2024-01-20'), ('2024-01-16', '2024-01-18'), ('2024-01-17', '2024-02-03'), ('2024-01-01', '2024-05-30'), ('2024-05-29', None), (None, '2024-01-17 00:00:01')]:
+        selected = bars.between(start, end)
+        assert_same_bars(selected, expected.between(start, end))
+        # a view of the mapped file
+        assert len(selected) == 0 or np.shares_memory(selected['close'], bars['close'])
+    source = ArchiveSource(str(tmp_path / 'archive'))
+    assert_same_bars(source.fetch('S0', '2024-01-15', '2024-02-20'), expected.between('2024-01-15', '2024-02-20'))
+    fetched = DataFetcher('archive', directory=str(tmp_path / 'archive')).fetch_bars('S0', '2024-01-15', '2024-02-20')
+    assert_same_bars(fetched, expected.between('2024-01-15', '2024-02-20'))
+
+
+def test_several_symbols_in_one_file(tmp_path):
+    bars = {symbol: generate_bars(60, seed=seed, start='2024-01-01', frequency='1h') for seed, symbol in enumerate(('A', 'B', 'C'))}
+    lines = ['Symbol,Date,Open,High,Low,Close,Volume']
+    for row in range(60):
+        for symbol, series in bars.items():
+            date = np.datetime_as_string(series.index[row], unit='s') + '+00:00'
+            lines.append(','.join([symbol, date] + [repr(float(series[field][row])) for field in FIELDS]))
+    path = tmp_path / 'bars.csv'
+    path.write_text('\n'.join(lines) + '\n')
+    archive = BarArchive(str(tmp_path / 'archive'))
+    # chunks of 25 rows split the symbols unevenly
+    assert archive.ingest_csv(str(path), symbol_column='Symbol', chunk_size=25) == {'A': 60, 'B': 60, 'C': 60}
+    for symbol, series in bars.items():
+        assert_same_bars(archive.open(symbol), series)
+
+
+def test_unsorted_appends_are_sorted_on_open(tmp_path):
+    archive = BarArchive(str(tmp_path))
+    index = np.array(['2024-01-03', '2024-01-01', '2024-01-02', '2024-01-01'], dtype='datetime64[ns]')
+    close = np.array([3.0, 1.0, 2.0, 1.5])
+    archive.append('A', index[:2], {'price': close[:2], 'volume': np.ones(2)})
+    archive.append('A', index[2:], {'price': close[2:], 'volume': np.ones(2)})
+    assert not archive.meta('A')['sorted']
+    ticks = archive.open('A')
+    assert archive.meta('A')['sorted']
+    # rows with the same timestamp keep the order they were appended in
+    assert ticks['close'].tolist() == [1.0, 1.5, 2.0, 3.0]
+    assert ticks.index.tolist() == sorted(index.tolist())
+    assert ticks.resample('1D')['volume'].tolist() == [2.0, 1.0, 1.0]
+
+
+def test_interrupted_append_is_discarded(tmp_path):
+    bars = generate_bars(100, seed=3, frequency='1D')
+    archive = BarArchive(str(tmp_path))
+    archive.append('A', bars.index[:50], {field: bars[field][:50] for field in FIELDS})
+    # rows written without their metadata, as by an append interrupted before its end
+    with open(tmp_path / 'A' / 'close.bin', 'ab') as file:
+        np.arange(7, dtype=np.float64).tofile(file)
+    assert_same_bars(archive.open('A'), bars[:50])
+    archive.append('A', bars.index[50:], {field: bars[field][50:] for field in FIELDS})
+    assert_same_bars(archive.open('A'), bars)
+    assert (tmp_path / 'A' / 'close.bin').stat().st_size == 100 * 8
+
+
+def test_invalid_appends_and_files(tmp_path):
+    archive = BarArchive(str(tmp_path))
+    bars = generate_bars(10, seed=4)
+    archive.append('A', bars.index, bars.columns)
+    with pytest.raises(ValueError):
+        archive.append('A', bars.index, {'price': bars['close'], 'volume': bars['volume']})
+    path = tmp_path / 'ticks.csv'
+    path.write_text('Date,Close\n2024-01-01,1.0\n')
+    with pytest.raises(ValueError):
+        archive.ingest_csv(str(path), ticks=True)
+
+
+def test_command_line(tmp_path, csv_directory, capsys):
+    directory = str(tmp_path / 'archive')
+    assert main([str(csv_directory / 'S1.csv'), str(csv_directory / 'S2.csv'), '--archive', directory, '--chunk-size', '40', '--timezone', 'UTC']) == 0
+    assert 'S1.csv: 150 rows added to S1' in capsys.readouterr().out
+    assert BarArchive(directory).symbols() == ['S1', 'S2']
+    assert_same_bars(BarArchive(directory).open('S2'), generate_bars(150, seed=2, start='2024-01-01', frequency='1D'))
+    assert main([str(tmp_path / 'missing.csv'), '--archive', directory]) == 1
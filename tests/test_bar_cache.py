@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+
+from benchmarks.synthetic import generate_bars
+from data_handler import BarCache
+
+# daily bars from 2023 to past the current day
+BARS = generate_bars(2000, seed=3, start='2023-01-01', frequency='1D')
+
+
+class CountingSource:
+    """Stub source serving `BARS`, recording the `(symbol, start, end)` of every fetch."""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __call__(self, symbol: str, start_date: str, end_date: str):
+        self.calls.append((symbol, start_date, end_date))
+        return BARS.between(start_date, end_date)
+
+
+def ranges(directory, symbol: str = 'A') -> list:
+    with open(directory / f"{symbol}.json") as file:
+        return json.load(file)['ranges']
+
+
+def assert_bars(bars, start: str, end: str) -> None:
+    expected = BARS.between(start, end)
+    assert np.array_equal(bars.index, expected.index)
+    assert np.array_equal(bars['close'], expected['close'])
+
+
+def test_cold_then_warm(tmp_path):
+    source = CountingSource()
+    assert_bars(BarCache(str(tmp_path), source).get('A', '2024-01-01', '2024-03-01'), '2024-01-01', '2024-03-01')
+    assert source.calls == [('A', '2024-01-01', '2024-03-01')]
+
+    # a new cache on the same directory needs no fetch for the same range or a range inside it
+    warm = CountingSource()
+    cache = BarCache(str(tmp_path), warm)
+    assert_bars(cache.get('A', '2024-01-01', '2024-03-01'), '2024-01-01', '2024-03-01')
+    assert_bars(cache.get('A', '2024-01-15', '2024-02-01'), '2024-01-15', '2024-02-01')
+    assert warm.calls == []
+    # cached bars are views on the memory-mapped files
+    bars, _ = cache.load('A')
+    assert isinstance(bars.index.base, np.memmap) and isinstance(bars['close'].base, np.memmap)
+
+
+def test_extended_range_fetches_only_the_missing_parts(tmp_path):
+    source = CountingSource()
+    cache = BarCache(str(tmp_path), source)
+    cache.get('A', '2024-01-01', '2024-03-01')
+    source.calls.clear()
+    assert_bars(cache.get('A', '2023-12-01', '2024-04-01'), '2023-12-01', '2024-04-01')
+    assert source.calls == [('A', '2023-12-01', '2024-01-01'), ('A', '2024-03-01', '2024-04-01')]
+    assert ranges(tmp_path) == [['2023-12-01', '2024-04-01']]
+
+
+def test_gap_between_cached_ranges_is_filled(tmp_path):
+    source = CountingSource()
+    cache = BarCache(str(tmp_path), source)
+    cache.get('A', '2024-01-01', '2024-02-01')
+    cache.get('A', '2024-03-01', '2024-04-01')
+    assert ranges(tmp_path) == [['2024-01-01', '2024-02-01'], ['2024-03-01', '2024-04-01']]
+    source.calls.clear()
+    assert_bars(cache.get('A', '2024-01-15', '2024-03-15'), '2024-01-15', '2024-03-15')
+    assert source.calls == [('A', '2024-02-01', '2024-03-01')]
+    assert ranges(tmp_path) == [['2024-01-01', '2024-04-01']]
+    # other symbols are cached separately
+    cache.get('B', '2024-01-01', '2024-02-01')
+    assert source.calls[-1] == ('B', '2024-01-01', '2024-02-01')
+
+
+def test_today_is_never_marked_fetched(tmp_path):
+    today = np.datetime64('today', 'D')
+    start, end = str(today - 10), str(today + 1)
+    source = CountingSource()
+    cache = BarCache(str(tmp_path), source)
+    cache.get('A', start, end)
+    assert ranges(tmp_path) == [[start, str(today)]]
+    # the current day is fetched again, the previous ones are not
+    cache.get('A', start, end)
+    assert source.calls == [('A', start, end), ('A', str(today), end)]
+
+
+def test_missing_and_merged_ranges():
+    day = lambda text: np.datetime64(text, 'D')
+    cached = [(day('2024-01-01'), day('2024-02-01')), (day('2024-03-01'), day('2024-04-01'))]
+    assert BarCache.missing_ranges(cached, day('2023-12-01'), day('2024-05-01')) == [
+        (day('2023-12-01'), day('2024-01-01')), (day('2024-02-01'), day('2024-03-01')), (day('2024-04-01'), day('2024-05-01'))]
+    assert BarCache.missing_ranges(cached, day('2024-01-10'), day('2024-01-20')) == []
+    overlapping = cached + [(day('2024-01-15'), day('2024-03-01')), (day('2024-06-01'), day('2024-06-01'))]
+    assert BarCache.merge_ranges(overlapping) == [(day('2024-01-01'), day('2024-04-01'))]
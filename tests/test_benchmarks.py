@@ -0,0 +1,30 @@
+import json
+
+from benchmarks.run import compare, main
+
+
+def test_missing_baseline_fails_the_check(tmp_path):
+    assert main(['--sizes', '1000', '--baseline', str(tmp_path / 'baseline.json'), '--no-memory']) == 1
+
+
+def test_check_against_a_saved_baseline(tmp_path):
+    path = str(tmp_path / 'baseline.json')
+    arguments = ['--sizes', '1000', '--scenarios', 'broker_execute_trade', '--baseline', path, '--no-memory']
+    assert main(arguments + ['--save-baseline']) == 0
+    assert main(arguments + ['--tolerance', '0.9']) == 0
+
+    # a baseline far faster than this machine is a regression
+    with open(path) as file:
+        baseline = json.load(file)
+    for sizes in baseline['results'].values():
+        for measurements in sizes.values():
+            measurements['bars_per_second'] *= 1000
+    with open(path, 'w') as file:
+        json.dump(baseline, file)
+    assert main(arguments) == 1
+
+
+def test_compare_reports_throughput_and_memory_regressions():
+    baseline = {'scenario': {'1000': {'bars_per_second': 1000.0, 'peak_memory': 10 * 2 ** 20}}}
+    assert compare({'scenario': {'1000': {'bars_per_second': 900.0, 'peak_memory': 10 * 2 ** 20}}}, baseline, 0.25) == []
+    assert len(compare({'scenario': {'1000': {'bars_per_second': 500.0, 'peak_memory': 20 * 2 ** 20}}}, baseline, 0.25)) == 2
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_bars
+from data_handler import FIELDS, BarSeries, DataStorage
+
+
+def records(count=5, start='2024-01-01'):
+    """Data points keyed by date, like `DataFetcher.fetch_historical_data`."""
+    dates = [str(day.date()) for day in pd.date_range(start, periods=count, freq='D')]
+    return {date: {'open': 10.0 + i, 'high': 11.5 + i, 'low': 9.25 + i, 'close': 10.5 + i, 'volume': 100.0 * (i + 1), 'date': date} for i, date in enumerate(dates)}
+
+
+def test_from_records_round_trips_through_to_list():
+    data = records()
+    bars = BarSeries.from_records(data)
+    assert len(bars) == 5
+    assert bars.index[0] == np.datetime64('2024-01-01T00:00', 'ns')
+    assert np.all(np.diff(bars.index) == np.timedelta64(1, 'D'))
+    assert bars['close'].tolist() == [10.5, 11.5, 12.5, 13.5, 14.5]
+    # the original dates are kept
+    assert bars.to_list() == list(data.values())
+    assert bars.to_dict() == data
+    assert BarSeries.from_records(list(data.values())).to_list() == list(data.values())
+
+
+def test_from_dataframe_converts_to_utc_and_renders_local_dates():
+    index = pd.date_range('2024-03-09 09:30', periods=4, freq='1D', tz='America/New_York')
+    frame = pd.DataFrame({field.capitalize(): np.arange(4.0) + offset for offset, field in enumerate(FIELDS)}, index=index)
+    bars = BarSeries.from_dataframe(frame)
+    assert np.array_equal(bars.index, index.tz_convert('UTC').tz_localize(None).to_numpy())
+    # the daylight saving time change on 2024-03-10 moves the UTC time, not the local one
+    assert bars.dates() == [str(timestamp) for timestamp in index]
+    assert bars['volume'].tolist() == [4.0, 5.0, 6.0, 7.0]
+    for point, (timestamp, row) in zip(bars.to_list(), frame.iterrows()):
+        assert point == {field: row[field.capitalize()] for field in FIELDS} | {'date': str(timestamp)}
+
+
+def test_to_list_round_trip_of_generated_bars():
+    bars = generate_bars(300, seed=1, start='2024-01-01', frequency='1h')
+    copy = BarSeries.from_records(bars.to_list())
+    assert np.array_equal(copy.index, bars.index)
+    assert all(np.array_equal(copy[field], bars[field]) for field in FIELDS)
+    assert list(bars.iter_bars(chunk_size=64)) == bars.to_list()
+
+
+def test_slices_are_views():
+    bars = BarSeries.from_records(records(10))
+    part = bars[2:6]
+    assert len(part) == 4 and part.dates() == bars.dates()[2:6]
+    assert np.shares_memory(part['close'], bars['close']) and np.shares_memory(part.index, bars.index)
+    assert part.to_list() == bars.to_list()[2:6]
+    assert len(bars[8:20]) == 2 and len(bars[6:2]) == 0
+    assert bars.tail(3).dates() == bars.dates()[-3:]
+    assert len(bars.tail(30)) == 10
+
+
+def test_between_finds_half_open_ranges():
+    bars = BarSeries.from_records(records(10))
+    dates = bars.dates()
+    assert bars.between('2024-01-03', '2024-01-06').dates() == dates[2:5]
+    assert bars.between('2024-01-03T12:00', None).dates() == dates[3:]
+    assert bars.between(None, datetime(2024, 1, 3)).dates() == dates[:2]
+    assert bars.between(np.datetime64('2024-01-09'), pd.Timestamp('2030-01-01')).dates() == dates[8:]
+    assert len(bars.between()) == 10
+    assert len(bars.between('2024-01-06', '2024-01-03')) == 0
+    assert len(bars.between('2023-01-01', '2023-12-31')) == 0
+    assert np.shares_memory(bars.between('2024-01-03', '2024-01-06')['open'], bars['open'])
+
+
+def test_between_reads_naive_dates_in_the_series_timezone():
+    bars = generate_bars(48, seed=2, start='2024-01-01', frequency='1h')
+    bars.timezone = 'Asia/Tokyo'
+    # midnight in Tokyo is 15:00 UTC the day before, so 2024-01-01 09:00 is the first bar
+    selected = bars.between('2024-01-01 09:00', '2024-01-01 12:00')
+    assert selected.index.tolist() == bars.index[:3].tolist()
+    assert selected.dates()[0] == '2024-01-01 09:00:00+09:00'
+    # aware dates are taken as they are
+    assert len(bars.between('2024-01-01T00:00+00:00', '2024-01-01T06:00+00:00')) == 6
+
+
+def test_empty_series():
+    empty = BarSeries.from_records({})
+    assert len(empty) == 0
+    assert empty.to_list() == [] and empty.to_dict() == {} and list(empty.iter_bars()) == []
+    assert len(empty.between('2024-01-01', '2025-01-01')) == 0 and len(empty.tail(5)) == 0
+    assert len(empty.resample('1D')) == 0
+    assert len(BarSeries.from_dataframe(pd.DataFrame(columns=[field.capitalize() for field in FIELDS]))) == 0
+    sliced = generate_bars(10, seed=0)[5:5]
+    assert len(sliced) == 0 and sliced.to_list() == [] and set(sliced.columns) == set(FIELDS)
+
+
+def test_data_storage():
+    storage = DataStorage()
+    data = records(10)
+    storage.store_data('A', data)
+    assert storage.get_data('A') == list(data.values())
+    assert storage.get_data('A', 3) == list(data.values())[-3:]
+    assert storage.get_bars('A', '2024-01-05', '2024-01-07').dates() == ['2024-01-05', '2024-01-06']
+    assert storage.get_data('B') == [] and storage.get_bars('B') is None
+    bars = generate_bars(10, seed=0)
+    storage.store_data('C', bars)
+    assert storage.get_bars('C') is not bars and np.shares_memory(storage.get_bars('C')['close'], bars['close'])
+
+
+def test_unknown_field():
+    with pytest.raises(KeyError):
+        BarSeries.from_records(records())['price']
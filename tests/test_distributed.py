@@ -0,0 +1,140 @@
+import json
+import threading
+
+from distributed import Coordinator, Worker
+from experiment import DEFAULTS, Checkpoint, ExperimentRunner
+
+
+def settings(directory) -> dict:
+    """Settings of a small experiment on the CSV bars of `directory`: 3 symbols x 2 multipliers x 3 strategies."""
+    return {
+        **DEFAULTS,
+        'symbols': ['S0', 'S1', 'S2'],
+        'start': '2024-01-01',
+        'end': '2024-06-01',
+        'multiplier': [2, 10],
+        'source': 'csv',
+        'source_options': {'directory': str(directory)},
+        'cache_dir': None,
+        'strategies': [{'strategy': 'rsi', 'grid': {'period': [7, 14]}}, {'strategy': 'macd'}],
+    }
+
+
+def quiet(message: str) -> None:
+    pass
+
+
+def run_workers(url: str, workers: list[Worker]) -> list[int]:
+    """Runs workers in threads until the coordinator is done, returns the number of units each one ran."""
+    counts = [0] * len(workers)
+
+    def work(position: int) -> None:
+        counts[position] = workers[position].run()
+
+    threads = [threading.Thread(target=work, args=(position,)) for position in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    return counts
+
+
+def serve(coordinator: Coordinator) -> str:
+    host, port = coordinator.start('127.0.0.1', 0)
+    return f"http://{host}:{port}"
+
+
+def test_workers_complete_every_unit_like_a_local_run(csv_directory, tmp_path):
+    experiment = settings(csv_directory)
+    coordinator = Coordinator(experiment, Checkpoint(str(tmp_path / 'checkpoint.json')), log=quiet)
+    url = serve(coordinator)
+    try:
+        counts = run_workers(url, [Worker(url, f"worker-{number}", cache_dir=None, log=quiet) for number in range(3)])
+        assert coordinator.wait(timeout=10)
+    finally:
+        coordinator.stop()
+
+    assert sum(counts) == len(coordinator.units) == 18
+    assert coordinator.failed == {}
+    local = Checkpoint(str(tmp_path / 'local.json'))
+    ExperimentRunner(experiment, local, max_workers=1, log=quiet).run()
+    assert coordinator.checkpoint.completed == local.completed
+    # the checkpoint file holds the same results
+    with open(tmp_path / 'checkpoint.json') as file:
+        assert json.load(file)['completed'] == local.completed
+
+
+def test_coordinator_resumes_from_its_checkpoint(csv_directory, tmp_path):
+    experiment = settings(csv_directory)
+    path = str(tmp_path / 'checkpoint.json')
+    coordinator = Coordinator(experiment, Checkpoint(path), log=quiet)
+    url = serve(coordinator)
+    try:
+        run_workers(url, [Worker(url, 'worker', cache_dir=None, log=quiet)])
+    finally:
+        coordinator.stop()
+    completed = dict(coordinator.checkpoint.completed)
+
+    # a stopped coordinator that had completed all but 4 units
+    checkpoint = Checkpoint(path)
+    removed = list(checkpoint.completed)[:4]
+    for unit_id in removed:
+        del checkpoint.completed[unit_id]
+    checkpoint.save()
+
+    resumed = Coordinator(experiment, Checkpoint(path), log=quiet)
+    assert list(resumed.pending) == [unit_id for unit_id in resumed.units if unit_id in removed]
+    url = serve(resumed)
+    try:
+        counts = run_workers(url, [Worker(url, f"worker-{number}", cache_dir=None, log=quiet) for number in range(2)])
+        assert resumed.wait(timeout=10)
+    finally:
+        resumed.stop()
+    assert sum(counts) == 4
+    assert resumed.checkpoint.completed == completed
+
+    # nothing is left to run
+    assert Coordinator(experiment, Checkpoint(path), log=quiet).finished.is_set()
+
+
+class Died(BaseException):
+    """Stands for the death of a worker process: it escapes `Worker.run` without reporting the unit."""
+
+
+class DyingWorker(Worker):
+    """A worker that dies while running its first unit, and whose heartbeats stop with it."""
+
+    def _execute(self, task: dict) -> dict:
+        self.leased = task['id']
+        raise Died()
+
+
+def test_unit_of_a_dead_worker_is_leased_again(csv_directory, tmp_path):
+    coordinator = Coordinator(settings(csv_directory), Checkpoint(str(tmp_path / 'checkpoint.json')), lease_seconds=1, log=quiet)
+    url = serve(coordinator)
+    try:
+        dying = DyingWorker(url, 'dying', cache_dir=None, log=quiet)
+        try:
+            dying.run()
+        except Died:
+            pass
+        assert coordinator.status()['workers'] == {'dying': 1}
+
+        counts = run_workers(url, [Worker(url, f"worker-{number}", cache_dir=None, log=quiet) for number in range(2)])
+        assert coordinator.wait(timeout=10)
+    finally:
+        coordinator.stop()
+
+    assert sum(counts) == len(coordinator.units)
+    assert coordinator.failed == {}
+    assert dying.leased in coordinator.checkpoint.completed
+    assert coordinator.attempts[dying.leased] == 2
+
+
+def test_abandon_fails_the_units_left(csv_directory, tmp_path):
+    coordinator = Coordinator(settings(csv_directory), Checkpoint(str(tmp_path / 'checkpoint.json')), log=quiet)
+    coordinator.lease('gone')
+    assert not coordinator.wait(timeout=0.1)
+    coordinator.abandon("every worker exited")
+    assert coordinator.wait(timeout=0.1)
+    assert len(coordinator.failed) == len(coordinator.units)
@@ -0,0 +1,45 @@
+import pytest
+
+from experiment import build_strategy, expand_strategies, load_experiment
+
+
+def write(tmp_path, text: str) -> str:
+    path = tmp_path / 'experiment.yaml'
+    path.write_text(text)
+    return str(path)
+
+
+def test_load_experiment_expands_and_builds_nested_specs(tmp_path):
+    settings = load_experiment(write(tmp_path, """
+symbols: [S0]
+start: 2024-01-01
+strategies:
+  - strategy: rsi
+    parameters: {overbought: 75}
+    grid: {period: [7, 14]}
+  - strategy: hybrid
+    parameters:
+      strategies: [{strategy: ichimoku_cloud}, {strategy: adx, parameters: {period: 20}}]
+      weights: [0.5, 0.5]
+"""))
+    assert settings['start'] == '2024-01-01'
+    specs = expand_strategies(settings['strategies'])
+    assert [spec['parameters'].get('period') for spec in specs] == [7, 14, None]
+    hybrid = build_strategy(specs[2])
+    assert [type(child).__name__ for child in hybrid.strategies] == ['IchimokuCloudStrategy', 'ADXStrategy']
+
+
+@pytest.mark.parametrize('entry', [
+    "{strategy: macd, parameters: {fast: 3}}",
+    "{strategy: rsi}",
+    "{strategy: rsi, grid: {period: [7], foo: [1]}}",
+    "{strategy: hybrid, parameters: {strategies: [{strategy: adx}]}}",
+])
+def test_load_experiment_rejects_parameters_not_matching_the_constructor(tmp_path, entry):
+    with pytest.raises(ValueError, match="Invalid parameters"):
+        load_experiment(write(tmp_path, f"symbols: [S0]\nstrategies:\n  - {entry}\n"))
+
+
+def test_load_experiment_rejects_unknown_strategies(tmp_path):
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        load_experiment(write(tmp_path, "symbols: [S0]\nstrategies:\n  - {strategy: nope}\n"))
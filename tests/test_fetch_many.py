@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import generate_bars
+from data_handler import DataFetcher, MemorySource
+
+SYMBOLS = [f"S{number}" for number in range(8)]
+
+
+def source(latency: float = 0, failures: dict | None = None) -> MemorySource:
+    bars = {symbol: generate_bars(100, seed=seed, start='2024-01-01', frequency='1D') for seed, symbol in enumerate(SYMBOLS)}
+    return MemorySource(bars, latency=latency, failures=failures)
+
+
+def test_failed_fetches_are_retried():
+    stub = source(failures={'S1': 2})
+    bars, errors = DataFetcher(stub).fetch_many(SYMBOLS, '2024-01-01', '2024-03-01', retries=3, backoff=0.01)
+    assert errors == {}
+    assert list(bars) == SYMBOLS
+    assert stub.calls['S1'] == 3 and stub.calls['S0'] == 1
+    assert np.array_equal(bars['S1'].index, stub.bars['S1'].between('2024-01-01', '2024-03-01').index)
+
+
+def test_a_failing_symbol_does_not_affect_the_others():
+    stub = source(failures={'S2': 10})
+    bars, errors = DataFetcher(stub).fetch_many(SYMBOLS + ['UNKNOWN'], '2024-01-01', '2024-03-01', retries=2, backoff=0.01)
+    assert list(bars) == [symbol for symbol in SYMBOLS if symbol != 'S2']
+    assert list(errors) == ['S2', 'UNKNOWN']
+    assert 'simulated failure' in errors['S2'] and 'unknown symbol' in errors['UNKNOWN']
+    # the first fetch and `retries` more
+    assert stub.calls['S2'] == 3 and stub.calls['UNKNOWN'] == 3
+
+
+def test_retries_back_off_exponentially_up_to_a_maximum():
+    started = time.perf_counter()
+    DataFetcher(source(failures={'S0': 2})).fetch_many(['S0'], '2024-01-01', '2024-03-01', retries=2, backoff=0.1)
+    # waits of 0.1 and 0.2 seconds, each randomly shortened by at most half
+    assert 0.15 <= time.perf_counter() - started < 0.6
+
+    started = time.perf_counter()
+    DataFetcher(source(failures={'S0': 3})).fetch_many(['S0'], '2024-01-01', '2024-03-01', retries=3, backoff=10, max_backoff=0.05)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_total_time_is_close_to_the_slowest_fetch():
+    fetcher = DataFetcher(source(latency=0.2))
+    started = time.perf_counter()
+    bars, errors = fetcher.fetch_many(SYMBOLS, '2024-01-01', '2024-03-01', max_workers=8)
+    assert len(bars) == 8 and errors == {}
+    assert time.perf_counter() - started < 0.45
+
+    # at most `max_workers` fetches run at once
+    started = time.perf_counter()
+    fetcher.fetch_many(SYMBOLS, '2024-01-01', '2024-03-01', max_workers=2)
+    assert time.perf_counter() - started >= 0.8
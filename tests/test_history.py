@@ -0,0 +1,80 @@
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from history import BarHistory
+from indicators.streaming import MovingAverage
+from reference import SERIES, STRATEGY_PARAMETERS
+from registry import STRATEGIES
+
+SLICES = [slice(None), slice(1, None), slice(None, -1), slice(-2, None), slice(None, None, 2), slice(None, None, -1), slice(5, 1, -2), slice(10, 20)]
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        BarHistory(0)
+
+
+def test_wrap_around():
+    history = BarHistory(3)
+    for value in range(7):
+        history.append({'close': value})
+    assert len(history) == 3 and history.total == 7
+    # the buffer wrapped twice, the oldest retained bar is not at the start of the underlying list
+    assert history.start == 1
+    assert [bar['close'] for bar in history] == [4, 5, 6]
+    assert [history[position]['close'] for position in (0, 1, 2, -1, -2, -3)] == [4, 5, 6, 6, 5, 4]
+    assert [bar['close'] for bar in history[1:]] == [5, 6]
+    assert [bar['close'] for bar in history[::-1]] == [6, 5, 4]
+    for position in (3, -4):
+        with pytest.raises(IndexError):
+            history[position]
+
+
+@pytest.mark.parametrize('capacity', [1, 2, 5, 8])
+def test_history_reads_like_the_tail_of_an_unbounded_list(capacity):
+    history = BarHistory(capacity)
+    bars = []
+    for value in range(3 * capacity + 2):
+        bar = {'close': value}
+        history.append(bar)
+        bars.append(bar)
+        tail = bars[-capacity:]
+        # never more than `capacity` bars, the same objects as the list's latest ones
+        assert len(history) == len(tail) <= capacity and history.total == len(bars)
+        assert list(history) == tail
+        assert all(history[position] is tail[position] for position in range(-len(tail), len(tail)))
+        assert all(history[key] == tail[key] for key in SLICES)
+
+
+def test_indicators_need_the_bars_they_have_not_seen():
+    bars = generate_bars(10, seed=0).to_list()
+    history = BarHistory(3)
+    indicator = MovingAverage(3)
+    for bar in bars[:5]:
+        history.append(bar)
+        indicator.sync(history)
+    assert indicator.value == pytest.approx(sum(bar['close'] for bar in bars[2:5]) / 3)
+    for bar in bars[5:9]:
+        history.append(bar)
+    with pytest.raises(ValueError):
+        indicator.sync(history)
+
+
+def strategies():
+    strategies = [(f"{name}-{'-'.join(map(str, parameters.values()))}", lambda name=name, parameters=parameters: STRATEGIES.create(name, **parameters)) for name, parameters in STRATEGY_PARAMETERS]
+    strategies.append(('hybrid', lambda: STRATEGIES.create('hybrid', [STRATEGIES.create('rsi', period=14), STRATEGIES.create('macd', short_window=12, long_window=26, signal_window=9)], weights=[0.5, 0.5])))
+    strategies.append(('timeframe', lambda: STRATEGIES.create('timeframe', STRATEGIES.create('moving_average', short_window=2, long_window=5), '3D')))
+    return strategies
+
+
+@pytest.mark.parametrize('name, create', strategies(), ids=[name for name, _ in strategies()])
+def test_bounded_history_backtests_match_unbounded_ones(name, create, monkeypatch):
+    bars = SERIES['seed1']()
+    assert isinstance(Backtester._history([create()]), BarHistory)
+    bounded = Backtester(10000).run_backtest(create(), bars.iter_bars(), multiplier=3)
+    monkeypatch.setattr(Backtester, '_history', staticmethod(lambda strategies: []))
+    unbounded = Backtester(10000).run_backtest(create(), bars.iter_bars(), multiplier=3)
+    assert bounded['trades'] > 0
+    assert bounded['transaction_history'] == unbounded['transaction_history']
+    assert bounded['final_balance_with_stocks'] == unbounded['final_balance_with_stocks']
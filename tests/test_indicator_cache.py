@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from data_handler import to_columns
+from indicators.streaming import RSI, IndicatorCache
+from reference import SERIES, STRATEGY_PARAMETERS
+from registry import STRATEGIES
+
+
+def create(name, **parameters):
+    return STRATEGIES.create(name, **parameters)
+
+
+def product(*strategies):
+    return STRATEGIES.create('hybrid', list(strategies), weights=None)
+
+
+def overlapping():
+    """Strategies computing the same indicators, alone and inside composites."""
+    return [create(name, **parameters) for name, parameters in STRATEGY_PARAMETERS] + [
+        create('rsi', period=14, overbought=60, oversold=40),
+        STRATEGIES.create('hybrid', [create('adx', period=14), create('rsi', period=14)], weights=[0.5, 0.5]),
+        product(create('moving_average', short_window=5, long_window=40), create('bollinger_bands', period=20, std_dev=2)),
+        STRATEGIES.create('custom', [create('rsi', period=5), create('macd', short_window=12, long_window=26, signal_window=9)], min, max),
+    ]
+
+
+def signals(strategies, data, cache):
+    """The buy and sell scores of every strategy on every data point of `data`, all strategies reading one history."""
+    for strategy in strategies:
+        strategy.share_indicators(cache)
+    history = []
+    scores = [[] for _ in strategies]
+    for data_point in data:
+        history.append(data_point)
+        for strategy, strategy_scores in zip(strategies, scores):
+            strategy.update_historical_data(history)
+            strategy_scores.append((strategy.should_buy(data_point), strategy.should_sell(data_point)))
+    return scores
+
+
+def recording(strategy, data, calls):
+    """Records the bar and the score of every call of the signals of `strategy` in `calls`."""
+    bars = {id(data_point): bar for bar, data_point in enumerate(data)}
+    for position, method in enumerate(('should_buy', 'should_sell')):
+        def recorded(data_point, signal=getattr(strategy, method), position=position):
+            score = signal(data_point)
+            calls[position][bars[id(data_point)]] = score
+            return score
+        setattr(strategy, method, recorded)
+    return strategy
+
+
+def test_cache_hands_out_one_indicator_per_parameters_and_history():
+    cache = IndicatorCache()
+    history, other = [], []
+    first = RSI(14)
+    assert cache.get(history, first) is first
+    assert cache.get(history, RSI(14)) is first
+    assert cache.get(history, RSI(5)) is not first
+    assert cache.get(other, RSI(14)) is not first
+
+
+@pytest.mark.parametrize('series', ['seed0', 'seed2', 'ticks1', 'ticks48'])
+def test_shared_cache_gives_the_signals_of_separate_caches(series):
+    bars = SERIES[series]()
+    strategies = overlapping()
+    data = bars.to_list()
+    shared = signals(strategies, data, IndicatorCache())
+    separate = [signals([strategy], data, IndicatorCache())[0] for strategy in overlapping()]
+    assert shared == separate
+    # the RSI(14) of the basic strategy is the one of the composite and of the other thresholds
+    rsi = strategies[3].rsi
+    assert strategies[-4].rsi is rsi and strategies[-3].strategies[1].rsi is rsi
+    assert strategies[-3].strategies[0].adx is strategies[13].adx
+
+
+def test_backtests_sharing_a_cache_match_separate_backtests():
+    bars = SERIES['seed1']()
+    results = Backtester(10000).run_backtests(overlapping(), bars.to_list())
+    expected = [Backtester(10000).run_backtest(strategy, bars.iter_bars()) for strategy in overlapping()]
+    assert any(result['trades'] for result in results)
+    assert [result['transaction_history'] for result in results] == [result['transaction_history'] for result in expected]
+    assert [result['equity_curve'] for result in results] == [result['equity_curve'] for result in expected]
+
+
+@pytest.mark.parametrize('children', [
+    lambda: [create('rsi', period=14), create('bollinger_bands', period=10, std_dev=1)],
+    # a child whose signals update its state is called even after a score of 0
+    lambda: [create('rsi', period=5, overbought=60, oversold=40), create('moving_average', short_window=3, long_window=8)],
+    lambda: [create('moving_average', short_window=3, long_window=8), create('stochastic_oscillator', period=5, overbought=60, oversold=40)],
+    lambda: [create('bollinger_bands', period=10, std_dev=1), product(create('rsi', period=5, overbought=60, oversold=40), create('moving_average', short_window=5, long_window=12))],
+], ids=['rsi-bollinger', 'rsi-moving-average', 'moving-average-stochastic', 'nested'])
+@pytest.mark.parametrize('series', ['seed0', 'seed2', 'ticks48'])
+def test_short_circuited_product_equals_the_full_product(children, series):
+    data = SERIES[series]().to_list()
+    calls = ({}, {})
+    strategies = children()
+    hybrid = product(strategies[0], recording(strategies[1], data, calls))
+    scores = signals([hybrid], data, IndicatorCache())[0]
+    # every child evaluated on every bar
+    full = signals(children(), data, IndicatorCache())
+    expected = [tuple(np.prod(bar, axis=0)) for bar in zip(*full)]
+    assert scores == expected
+    # the vectorized signals multiply every child too
+    buy, sell = product(*children()).generate_signals(to_columns(data))
+    assert list(zip(buy.tolist(), sell.tolist())) == expected
+    for position, called in enumerate(calls):
+        # the second child is skipped after a score of 0, unless its signals update its state, and otherwise scores as alone
+        assert called == {bar: scores[position] for bar, scores in enumerate(full[1]) if full[0][bar][position] or strategies[1].stateful_signals}
+        assert len(called) == len(data) if strategies[1].stateful_signals else len(called) < len(data)
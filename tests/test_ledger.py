@@ -0,0 +1,31 @@
+import numpy as np
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from ledger import TransactionLedger, TradeSide, TradeStatus, to_datetime64
+from main import parse_strategy
+
+
+def test_to_datetime64_converts_dates_to_utc():
+    assert to_datetime64('2024-01-02 09:30:00-05:00') == np.datetime64('2024-01-02T14:30:00', 'ns')
+    assert to_datetime64('01/03/2024') == np.datetime64('2024-01-03', 'ns')
+    assert np.isnat(to_datetime64(None))
+
+
+def test_labels_that_are_not_dates_are_recorded_as_unknown():
+    assert np.isnat(to_datetime64('bar15'))
+    ledger = TransactionLedger()
+    ledger.append(TradeSide.BUY, 'A', 10.0, 1, TradeStatus.SUCCESS, time='bar15')
+    ledger.extend(np.array([TradeSide.SELL] * 2), 'A', [11.0, 12.0], [1.0, 1.0], np.array([TradeStatus.SUCCESS] * 2), times=['bar16', '2024-01-02'])
+    assert [transaction['time'] for transaction in ledger][:2] == [None, None]
+    assert ledger.to_numpy()['time'][2] == np.datetime64('2024-01-02', 'ns')
+
+
+def test_backtest_on_labeled_bars():
+    bars = generate_bars(300, seed=1).to_list()
+    for position, data_point in enumerate(bars):
+        data_point['date'] = f"bar{position}"
+    loop = Backtester(10000).run_backtest(parse_strategy('rsi:period=14'), bars)
+    vectorized = Backtester(10000).run_backtest(parse_strategy('rsi:period=14'), bars, vectorized=True)
+    assert loop['trades'] == vectorized['trades'] > 0
+    assert loop['final_balance'] == vectorized['final_balance']
@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_bars
+from live import LatencyHistogram, LiveTrader, MockFeed, to_data_point
+from main import parse_strategy
+from portfolio import PortfolioBacktester
+
+SPECS = ['rsi:period=14', 'macd', 'bollinger_bands:period=20']
+
+
+@pytest.fixture
+def bars():
+    return {f"S{seed}": generate_bars(200, seed=seed, start='2024-01-01', frequency='1D') for seed in range(3)}
+
+
+def quiet(message: str) -> None:
+    pass
+
+
+def trade(feed: MockFeed, trader: LiveTrader, **options) -> dict:
+    """Serves `feed` on a free localhost port and runs `trader` on it until the replay ends."""
+    async def session() -> dict:
+        server = await feed.serve('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await trader.run(f"ws://127.0.0.1:{port}", **options)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(session())
+
+
+def test_latency_histogram_percentiles():
+    latencies = np.random.default_rng(0).lognormal(-8, 1, 20000)
+    histogram = LatencyHistogram()
+    for latency in latencies:
+        histogram.record(float(latency))
+    report = histogram.report()
+    assert report['count'] == len(latencies)
+    assert report['max'] == latencies.max()
+    for percent in (50, 90, 99):
+        exact = np.percentile(latencies, percent)
+        # the upper bound of a bucket is at most 10 ** (1 / 20) - 1 = 12% above its values
+        assert exact * 0.99 <= report[f"p{percent}"] <= exact * 1.13
+    assert LatencyHistogram().report() == {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+
+
+def test_to_data_point():
+    assert to_data_point({'T': 'b', 'S': 'A', 'o': 1, 'h': 2, 'l': 0.5, 'c': 1.5, 'v': 100, 't': '2024-01-02T00:00:00Z'}) == \
+        ('A', {'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': 100, 'date': '2024-01-02T00:00:00Z'})
+    assert to_data_point({'T': 'q', 'S': 'A', 'bp': 1.0, 'ap': 1.2, 'bs': 1, 'as': 2, 't': 'x'})[1]['close'] == pytest.approx(1.1)
+    assert to_data_point({'T': 't', 'S': 'A', 'p': 3.0, 's': 7, 't': 'x'})[1]['volume'] == 7
+    assert to_data_point({'T': 'success', 'msg': 'connected'}) is None
+    with pytest.raises(ValueError, match="auth failed"):
+        to_data_point({'T': 'error', 'code': 402, 'msg': 'auth failed'})
+
+
+def test_replay_trades_like_a_portfolio_backtest(bars, tmp_path):
+    symbols = ['S0', 'S2']
+    trader = LiveTrader([parse_strategy(spec) for spec in SPECS], symbols, max_lag=60, log=quiet)
+    recording = str(tmp_path / 'stream.jsonl')
+    results = trade(MockFeed.from_bars(bars, speed=0), trader, record=recording)
+
+    # only the subscribed symbols are sent
+    assert results['feed']['data_points'] == 400
+    assert results['feed']['dropped'] == 0 and results['feed']['stopped'] is None
+    assert results['feed']['latency']['count'] == 400
+    for spec in SPECS:
+        strategy = parse_strategy(spec)
+        expected = PortfolioBacktester(strategy).run({symbol: bars[symbol] for symbol in symbols})
+        stats = results['strategies'][strategy.name]
+        assert stats['trades'] == expected['trades'] > 0
+        assert stats['final_balance_with_stocks'] == pytest.approx(expected['final_balance_with_stocks'])
+        assert stats['latency']['count'] == 400
+
+    # the recorded stream replays the same session
+    again = LiveTrader([parse_strategy(spec) for spec in SPECS], symbols, max_lag=60, log=quiet)
+    replayed = trade(MockFeed.from_recording(recording, speed=0), again)
+    for name, stats in results['strategies'].items():
+        assert replayed['strategies'][name]['final_balance_with_stocks'] == stats['final_balance_with_stocks']
+
+
+def test_replay_speed_paces_the_messages(bars):
+    # 4 daily bars at 4 days per second take 0.75 s
+    feed = MockFeed.from_bars({'S0': bars['S0'].between('2024-01-01', '2024-01-05')}, speed=4 * 86400)
+    trader = LiveTrader([parse_strategy('macd')], ['S0'], max_lag=60, log=quiet)
+    started = time.perf_counter()
+    results = trade(feed, trader)
+    elapsed = time.perf_counter() - started
+    assert results['feed']['data_points'] == 400
+    assert results['feed']['dropped'] == 0 and results['feed']['stopped'] is None
+    assert results['feed']['latency']['count'] == 400
+    for spec in SPECS:
+        strategy = parse_strategy(spec)
+        expected = PortfolioBacktester(strategy).run({symbol: bars[symbol] for symbol in symbols})
+        stats = results['strategies'][strategy.name]
+        assert stats['trades'] == expected['trades'] > 0
+        assert stats['final_balance_with_stocks'] == pytest.approx(expected['final_balance_with_stocks'])
+        assert stats['latency']['count'] == 400
+
+    # the recorded stream replays the same session
+    again = LiveTrader([parse_strategy(spec) for spec in SPECS], symbols, max_lag=60, log=quiet)
+    replayed = trade(MockFeed.from_recording(recording, speed=0), again)
+    for name, stats in results['strategies'].items():
+        assert replayed['strategies'][name]['final_balance_with_stocks'] == stats['final_balance_with_stocks']
+
+
+def test_replay_speed_paces_the_messages(bars):
+    # 4 daily bars at 4 days per second take 0.75 s
+    feed = MockFeed.from_bars({'S0': bars['S0'].between('2024-01-01', '2024-01-05')}, speed=4 * 86400)
+    trader = LiveTrader([parse_strategy('macd')], ['S0'], max_lag=60, log=quiet)
+    started = asyncio.get_event_loop_policy().new_event_loop().time()
+    loop = asyncio.new_event_loop()
+    try:
+        started = loop.time()
+        server = loop.run_until_complete(feed.serve('127.0.0.1', 0))
+        port = server.sockets[0].getsockname()[1]
+        results = loop.run_until_complete(trader.run(f"ws://127.0.0.1:{port}"))
+        elapsed = loop.time() - started
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+    finally:
+        loop.close()
+    assert results['feed']['data_points'] == 4
+    assert 0.7 <= elapsed < 2
+
+
+def test_messages_behind_the_feed_are_dropped(bars):
+    trader = LiveTrader([parse_strategy('macd')], ['S0'], max_lag=0, on_lag='drop', log=quiet)
+    results = trade(MockFeed.from_bars(bars, speed=0), trader)
+    assert results['feed']['dropped'] == 200
+    assert results['feed']['data_points'] == 0
+    assert results['strategies']['MACD Strategy']['trades'] == 0
+
+
+def test_falling_behind_the_feed_stops_the_session(bars):
+    trader = LiveTrader([parse_strategy('macd')], ['S0'], max_lag=0, on_lag='stop', log=quiet)
+    results = trade(MockFeed.from_bars(bars, speed=0), trader)
+    assert results['feed']['stopped'] is not None
+    assert results['feed']['messages'] == 1
+    assert results['feed']['data_points'] == 0
+
+
+def test_invalid_lag_policy():
+    with pytest.raises(ValueError):
+        LiveTrader([parse_strategy('macd')], ['S0'], on_lag='wait')
@@ -0,0 +1,21 @@
+import pytest
+
+from main import parse_strategy
+
+
+def test_parse_strategy_with_parameters():
+    strategy = parse_strategy('rsi:period=7,overbought=75')
+    assert type(strategy).__name__ == 'RSIStrategy'
+    assert strategy.period == 7 and strategy.overbought == 75
+
+
+@pytest.mark.parametrize('spec', ['rsi', 'rsi:period=14,foo=1'])
+def test_parse_strategy_rejects_parameters_not_matching_the_constructor(spec):
+    with pytest.raises(ValueError, match="Invalid parameters for rsi"):
+        parse_strategy(spec)
+
+
+@pytest.mark.parametrize('spec', ['nope', 'rsi:period'])
+def test_parse_strategy_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_strategy(spec)
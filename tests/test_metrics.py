@@ -0,0 +1,120 @@
+import math
+import warnings
+
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from broker import Broker
+from ledger import TransactionLedger
+from metrics import METRICS, EquityCurve, performance_metrics
+from registry import STRATEGIES
+
+NO_TRADES = TransactionLedger().to_numpy()
+
+
+def curve(values, initial_balance=100, held=None):
+    equity_curve = EquityCurve(initial_balance, capacity=1)
+    for position, value in enumerate(values):
+        equity_curve.append(value, 0 if held is None else held[position])
+    return equity_curve
+
+
+def from_returns(returns, initial_balance=100):
+    return curve(initial_balance * np.cumprod(1 + np.array(returns)), initial_balance)
+
+
+def metrics(equity_curve, transactions=NO_TRADES, **options):
+    # any division by zero or invalid operation fails the test
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        return performance_metrics(equity_curve, transactions, **options)
+
+
+def test_sharpe_and_sortino_of_known_returns():
+    results = metrics(from_returns([0.02, -0.01, 0.02, -0.01]))
+    # mean 0.005, standard deviation 0.015, downside deviation sqrt((0.01² + 0.01²) / 4)
+    assert results['sharpe'] == pytest.approx(0.005 / 0.015 * math.sqrt(252))
+    assert results['sortino'] == pytest.approx(0.005 / math.sqrt(0.0001 / 2) * math.sqrt(252))
+    hourly = metrics(from_returns([0.02, -0.01, 0.02, -0.01]), periods_per_year=252 * 7)
+    assert hourly['sharpe'] == pytest.approx(results['sharpe'] * math.sqrt(7))
+    assert metrics(from_returns([-0.02, 0.01, -0.02, 0.01]))['sharpe'] == pytest.approx(-results['sharpe'])
+
+
+def test_returns_without_losses_have_no_sortino():
+    results = metrics(from_returns([0.01, 0.02, 0.0, 0.01]))
+    assert results['sharpe'] > 0 and results['sortino'] == 0
+
+
+def test_max_drawdown_and_duration():
+    results = metrics(curve([100, 120, 90, 110, 115, 130, 65, 70]))
+    # from 130 to 65, and 3 bars under the peak of 120
+    assert results['max_drawdown'] == pytest.approx(0.5)
+    assert results['max_drawdown_duration'] == 3
+    # a curve starting below the initial balance is in a drawdown from the first bar
+    results = metrics(curve([90, 95, 100, 80]))
+    assert results['max_drawdown'] == pytest.approx(0.2)
+    assert results['max_drawdown_duration'] == 2
+    rising = metrics(curve([101, 102, 103]))
+    assert rising['max_drawdown'] == 0 and rising['max_drawdown_duration'] == 0
+
+
+def test_flat_equity_curve():
+    results = metrics(curve([100] * 50))
+    assert results == {metric: 0 for metric in METRICS}
+    # an account worth nothing
+    assert metrics(curve([0] * 5, initial_balance=0)) == {metric: 0 for metric in METRICS}
+    assert metrics(curve([])) == {metric: 0 for metric in METRICS}
+
+
+def test_win_rate_and_turnover_of_round_trips():
+    broker = Broker(1000)
+    # a winning round trip
+    broker.execute_trade('buy', 'A', 10, 10)
+    broker.execute_trade('sell', 'A', 12, 10)
+    # failed trades count for nothing
+    broker.execute_trade('sell', 'A', 12, 10)
+    broker.execute_trade('buy', 'A', 10, 1000)
+    # a losing round trip closed in two sells
+    broker.execute_trade('buy', 'A', 10, 5)
+    broker.execute_trade('sell', 'A', 9, 3)
+    broker.execute_trade('sell', 'A', 8, 2)
+    # still open
+    broker.execute_trade('buy', 'A', 5, 1)
+    transactions = broker.get_transaction_history().to_numpy()
+    equity_curve = curve([1000, 1020, 1020, 1010, 1010], initial_balance=1000, held=[10, 0, 5, 0, 1])
+    results = metrics(equity_curve, transactions)
+    assert results['win_rate'] == 0.5
+    traded = 100 + 120 + 50 + 27 + 16 + 5
+    assert results['turnover'] == pytest.approx(traded / np.mean([1000, 1020, 1020, 1010, 1010]))
+    assert results['exposure'] == pytest.approx(3 / 5)
+
+
+def test_no_trades_have_no_win_rate():
+    results = metrics(from_returns([0.01, -0.01, 0.0]), NO_TRADES)
+    assert results['win_rate'] == 0 and results['turnover'] == 0 and results['exposure'] == 0
+    # a position never closed is no round trip
+    broker = Broker(1000)
+    broker.execute_trade('buy', 'A', 10, 1)
+    assert metrics(curve([1000, 1001], 1000, held=[1, 1]), broker.get_transaction_history().to_numpy())['win_rate'] == 0
+
+
+def test_only_the_requested_metrics_are_computed():
+    equity_curve = from_returns([0.02, -0.01, 0.03])
+    everything = metrics(equity_curve)
+    assert list(everything) == list(METRICS)
+    subset = metrics(equity_curve, metrics=('max_drawdown', 'sharpe'))
+    assert subset == {'sharpe': everything['sharpe'], 'max_drawdown': everything['max_drawdown']}
+    assert list(subset) == ['sharpe', 'max_drawdown']
+
+
+def test_equity_curve_from_trades_matches_the_recorded_one():
+    bars = generate_bars(500, seed=3, frequency='1D')
+    recorded = Backtester(10000).run_backtest(STRATEGIES.create('rsi', period=14), bars.iter_bars())
+    vectorized = Backtester(10000).run_vectorized_backtest(STRATEGIES.create('rsi', period=14), bars)
+    assert recorded['trades'] > 0
+    # the vectorized curve is built at once from the trades, the other one bar by bar
+    assert recorded['equity_curve'] == vectorized['equity_curve']
+    assert len(recorded['equity_curve']) == 500
+    assert all(recorded[metric] == vectorized[metric] for metric in METRICS)
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from data_handler import BarSeries
+from montecarlo import MonteCarlo, simulate_trades
+from registry import STRATEGIES
+
+BARS = generate_bars(250, seed=1, frequency='1D')
+
+
+def rsi():
+    return STRATEGIES.create('rsi', period=14)
+
+
+def constant_growth(count, rate):
+    """Bars whose close grows by `rate` every bar, with the open, high and low at the same ratios of the previous close."""
+    close = 100 * (1 + rate) ** np.arange(count)
+    previous = np.concatenate(([100 / (1 + rate)], close[:-1]))
+    columns = {'open': previous * 1.001, 'high': previous * (1 + rate) * 1.01, 'low': previous * 0.99, 'close': close, 'volume': np.full(count, 1000.0)}
+    return BarSeries(np.datetime64('2024-01-01', 'ns') + np.arange(count) * np.timedelta64(1, 'D'), columns)
+
+
+def test_invalid_settings():
+    for settings in ({'paths': 0}, {'block_size': 0}, {'batch_size': 0}):
+        with pytest.raises(ValueError):
+            MonteCarlo(**settings)
+    with pytest.raises(ValueError):
+        MonteCarlo(block_size=10).run(rsi(), BARS[:10])
+
+
+def test_seeded_runs_are_reproducible():
+    results = MonteCarlo(paths=60, seed=3).run(rsi(), BARS)
+    assert len(results) == 60
+    assert results.equals(MonteCarlo(paths=60, seed=3).run(rsi(), BARS))
+    # batches draw from the same stream, so the batch size does not change the paths
+    assert results.equals(MonteCarlo(paths=60, seed=3, batch_size=7).run(rsi(), BARS))
+    assert not results.equals(MonteCarlo(paths=60, seed=4).run(rsi(), BARS))
+    # the paths differ from each other
+    assert results['final_balance_with_stocks'].nunique() > 30
+
+
+def test_paths_are_drawn_from_the_history():
+    monte_carlo = MonteCarlo(block_size=5, length=103)
+    relative, start_price = monte_carlo.relative_bars(BARS)
+    columns = monte_carlo.generate_paths(relative, start_price, 20, np.random.default_rng(0))
+    assert all(values.shape == (20, 103) for values in columns.values())
+    returns = columns['close'] / np.concatenate((np.full((20, 1), start_price), columns['close'][:, :-1]), axis=1)
+    # every bar is a bar of the history, blocks of 5 consecutive ones
+    drawn = np.array([[np.argmin(np.abs(relative['close'] - value)) for value in path] for path in returns])
+    assert np.allclose(relative['close'][drawn], returns, rtol=1e-12, atol=0)
+    assert np.array_equal(relative['volume'][drawn], columns['volume'])
+    assert (np.diff(drawn.reshape(20, -1)[:, :100].reshape(20, 20, 5), axis=2) == 1).all()
+    assert np.all(columns['high'] >= np.maximum(columns['open'], columns['close']) * (1 - 1e-12))
+    assert np.all(columns['low'] <= np.minimum(columns['open'], columns['close']) * (1 + 1e-12))
+
+
+def test_constant_returns_give_one_equity_curve():
+    bars = constant_growth(120, 0.01)
+    results = MonteCarlo(paths=200, seed=5, block_size=3).run(STRATEGIES.create('moving_average', short_window=3, long_window=10), bars)
+    # every draw is the same bar (up to the rounding of the ratios), so every path is the history one bar later
+    for column in results:
+        assert np.ptp(results[column]) <= 1e-9 * abs(results[column]).max(), column
+    expected = Backtester(10000).run_vectorized_backtest(STRATEGIES.create('moving_average', short_window=3, long_window=10), constant_growth(121, 0.01)[1:])
+    assert results['final_balance'][0] == pytest.approx(expected['final_balance'], rel=1e-9)
+    assert results['trades'][0] == expected['trades'] > 0
+    flat = MonteCarlo(paths=50, seed=5).run(rsi(), constant_growth(60, 0.0))
+    assert (flat['final_balance_with_stocks'] == 10000).all() and (flat['max_drawdown'] == 0).all()
+
+
+def test_whole_history_blocks_reproduce_the_backtest():
+    # a single block start: every path is the history after its first close
+    results = MonteCarlo(paths=10, seed=0, length=len(BARS) - 1, block_size=len(BARS) - 1).run(rsi(), BARS)
+    expected = Backtester(10000).run_vectorized_backtest(rsi(), BARS[1:])
+    for column in ('final_balance', 'final_balance_with_stocks', 'trades', 'max_drawdown'):
+        assert np.allclose(results[column], expected[column], rtol=1e-9, atol=1e-9), column
+
+
+def test_simulated_trades_match_the_broker():
+    monte_carlo = MonteCarlo()
+    relative, start_price = monte_carlo.relative_bars(BARS)
+    columns = monte_carlo.generate_paths(relative, start_price, 8, np.random.default_rng(2))
+    buy, sell = rsi().generate_signals(columns)
+    simulated = simulate_trades(buy, sell, columns['close'], multiplier=7)
+    for path in range(8):
+        expected = Backtester(10000).run_vectorized_backtest(rsi(), {field: values[path] for field, values in columns.items()}, multiplier=7)
+        for key, values in simulated.items():
+            assert values[path] == expected[key], (path, key)
+
+
+def test_bootstrap_distribution_is_centered_on_the_history():
+    results = MonteCarlo(paths=2000, seed=6, batch_size=500).run(rsi(), BARS)
+    relative, _ = MonteCarlo().relative_bars(BARS)
+    log_returns = np.log(relative['close'])
+    # the final close of a path is the start price times the product of its drawn returns: its log is a sum of
+    # independent draws, with the history's mean and variance per bar
+    columns = MonteCarlo().generate_paths(relative, 1.0, 2000, np.random.default_rng(6))
+    totals = np.log(columns['close'][:, -1])
+    count = columns['close'].shape[1]
+    assert abs(totals.mean() - count * log_returns.mean()) < 4 * np.sqrt(count / 2000) * log_returns.std()
+    assert totals.std() == pytest.approx(np.sqrt(count) * log_returns.std(), rel=0.1)
+    assert (results['max_drawdown'] >= 0).all() and (results['max_drawdown'] < 1).all()
+    assert results['profit_with_stocks'].equals(results['final_balance_with_stocks'] - 10000)
@@ -0,0 +1,182 @@
+import pytest
+
+from broker import Broker
+from costs import FixedCommission, FixedSlippage
+from orders import Order, OrderBook, OrderType
+
+
+def bar(open_price, high, low, volume=1000):
+    return {'open': open_price, 'high': high, 'low': low, 'close': open_price, 'volume': volume}
+
+
+def trades(broker):
+    """The transactions of `broker` as (type, price, volume, status) tuples."""
+    return [(t['type'], t['price'], t['volume'], t['status']) for t in broker.get_transaction_history()]
+
+
+def test_orders_need_their_prices():
+    with pytest.raises(ValueError):
+        Order('buy', 0, OrderType.MARKET)
+    with pytest.raises(ValueError):
+        Order('buy', 1, OrderType.LIMIT)
+    with pytest.raises(ValueError):
+        Order('sell', 1, OrderType.STOP_LIMIT, stop_price=10)
+
+
+def test_market_order_fills_at_the_next_open():
+    broker = Broker(1000)
+    broker.place_order(Order('buy', 2, OrderType.MARKET), 'A')
+    assert broker.process_bar('A', bar(10, 12, 9)) == 1
+    assert trades(broker) == [('buy', 10, 2, 'success')]
+    assert broker.get_balance() == 980
+    assert len(broker.order_book) == 0
+
+
+def test_limit_orders_wait_for_their_price():
+    broker = Broker(1000)
+    broker.place_order(Order('buy', 1, OrderType.LIMIT, limit_price=9), 'A')
+    assert broker.process_bar('A', bar(10, 11, 9.5)) == 0
+    assert broker.process_bar('A', bar(10, 10.5, 8.5)) == 1
+    broker.place_order(Order('sell', 1, OrderType.LIMIT, limit_price=11), 'A')
+    assert broker.process_bar('A', bar(10, 10.8, 9.5)) == 0
+    assert broker.process_bar('A', bar(10, 11.2, 9.5)) == 1
+    assert trades(broker) == [('buy', 9, 1, 'success'), ('sell', 11, 1, 'success')]
+
+
+def test_limit_orders_fill_at_the_open_when_the_bar_gaps_through():
+    broker = Broker(1000)
+    broker.place_order(Order('buy', 1, OrderType.LIMIT, limit_price=9), 'A')
+    broker.process_bar('A', bar(8, 8.5, 7.5))
+    broker.place_order(Order('sell', 1, OrderType.LIMIT, limit_price=11), 'A')
+    broker.process_bar('A', bar(12, 12.5, 11.5))
+    assert trades(broker) == [('buy', 8, 1, 'success'), ('sell', 12, 1, 'success')]
+
+
+def test_stop_orders_trigger_at_the_stop_or_the_gap_open():
+    broker = Broker(1000)
+    broker.place_order(Order('buy', 1, OrderType.STOP, stop_price=11), 'A')
+    assert broker.process_bar('A', bar(10, 10.9, 9.5)) == 0
+    assert broker.process_bar('A', bar(10, 11.5, 9.5)) == 1
+    broker.place_order(Order('sell', 1, OrderType.STOP, stop_price=9), 'A')
+    assert broker.process_bar('A', bar(10, 10.5, 9.1)) == 0
+    # gaps below the stop: fills at the open, not at the stop
+    assert broker.process_bar('A', bar(8, 8.5, 7.5)) == 1
+    assert trades(broker) == [('buy', 11, 1, 'success'), ('sell', 8, 1, 'success')]
+
+
+def test_stop_limit_order_becomes_a_limit_order():
+    broker = Broker(1000)
+    broker.place_order(Order('buy', 1, OrderType.STOP_LIMIT, limit_price=11.2, stop_price=11), 'A')
+    # the stop triggers but the bar opens above the limit and never comes back to it after the trigger price
+    assert broker.process_bar('A', bar(11.5, 12, 11.3)) == 0
+    assert len(broker.order_book) == 1
+    # a triggered stop-limit order waits as a limit order, the stop no longer matters
+    assert broker.process_bar('A', bar(11.4, 11.6, 11.1)) == 1
+    assert trades(broker) == [('buy', 11.2, 1, 'success')]
+
+
+def test_stop_limit_order_fills_on_the_bar_it_triggers():
+    broker = Broker(1000)
+    broker.place_order(Order('sell', 1, OrderType.STOP_LIMIT, limit_price=8.8, stop_price=9), 'A')
+    broker.execute_trade('buy', 'A', 10, 1)
+    assert broker.process_bar('A', bar(10, 10.2, 8.5)) == 1
+    # fills at the trigger price, better than the limit
+    assert trades(broker)[-1] == ('sell', 9, 1, 'success')
+
+
+def test_fees_and_slippage():
+    broker = Broker(1000, commission=FixedCommission(1), slippage=FixedSlippage(0.5))
+    broker.place_order(Order('buy', 2, OrderType.MARKET), 'A')
+    broker.process_bar('A', bar(10, 11, 9))
+    broker.place_order(Order('sell', 2, OrderType.LIMIT, limit_price=12), 'A')
+    broker.process_bar('A', bar(11, 12.5, 10.5))
+    history = broker.get_transaction_history()
+    # slippage moves market fills only, the commission applies to both
+    assert trades(broker) == [('buy', 10.5, 2, 'success'), ('sell', 12, 2, 'success')]
+    assert [transaction['fee'] for transaction in history] == [1, 1]
+    assert broker.get_balance() == 1000 - 21 - 1 + 24 - 1
+
+
+def test_volume_limit_fills_partially_and_carries_over():
+    broker = Broker(1000, volume_limit=0.1)
+    broker.place_order(Order('buy', 25, OrderType.LIMIT, limit_price=10), 'A')
+    broker.place_order(Order('buy', 5, OrderType.LIMIT, limit_price=9.5), 'A')
+    # 10 stocks available: the best limit goes first
+    assert broker.process_bar('A', bar(10, 10.5, 9, volume=100)) == 1
+    assert trades(broker) == [('buy', 10, 10, 'success')]
+    # the second order gets nothing on this bar and waits as well
+    assert len(broker.order_book) == 2
+    assert broker.process_bar('A', bar(10, 10.5, 9, volume=120)) == 1
+    assert broker.process_bar('A', bar(10, 10.5, 9, volume=100)) == 2
+    assert trades(broker)[1:] == [('buy', 10, 12, 'success'), ('buy', 10, 3, 'success'), ('buy', 9.5, 5, 'success')]
+    assert len(broker.order_book) == 0
+    assert broker.get_portfolio()['A'] == 30
+
+
+def test_bar_without_volume_fills_nothing():
+    broker = Broker(1000, volume_limit=0.5)
+    broker.place_order(Order('buy', 1, OrderType.MARKET), 'A')
+    assert broker.process_bar('A', bar(10, 11, 9, volume=0)) == 0
+    assert broker.process_bar('A', bar(10, 11, 9, volume=10)) == 1
+
+
+def test_partially_filled_stop_order_fills_the_rest_at_market():
+    broker = Broker(10000, volume_limit=0.1)
+    broker.place_order(Order('buy', 15, OrderType.STOP, stop_price=11), 'A')
+    assert broker.process_bar('A', bar(10, 11.5, 9.5, volume=100)) == 1
+    assert trades(broker) == [('buy', 11, 10, 'success')]
+    # the price falls back below the stop: the rest fills at the open as a market order
+    assert broker.process_bar('A', bar(10, 10.5, 9.5, volume=100)) == 1
+    assert trades(broker)[1] == ('buy', 10, 5, 'success')
+    assert len(broker.order_book) == 0
+
+
+def test_triggered_stop_order_on_a_bar_without_volume_fills_at_market():
+    broker = Broker(10000, volume_limit=0.1)
+    broker.place_order(Order('sell', 1, OrderType.STOP, stop_price=9), 'A')
+    broker.execute_trade('buy', 'A', 10, 1)
+    assert broker.process_bar('A', bar(10, 10, 8.5, volume=0)) == 0
+    assert broker.process_bar('A', bar(9.5, 10, 9.2, volume=100)) == 1
+    assert trades(broker)[-1] == ('sell', 9.5, 1, 'success')
+
+
+def test_failed_orders_are_cancelled():
+    broker = Broker(15)
+    broker.place_order(Order('buy', 2, OrderType.MARKET), 'A')
+    broker.place_order(Order('sell', 1, OrderType.MARKET), 'A')
+    assert broker.process_bar('A', bar(10, 11, 9)) == 0
+    assert trades(broker) == [('buy', 10, 2, 'failure (insufficient funds)'), ('sell', 10, 1, 'failure (not enough assets)')]
+    assert len(broker.order_book) == 0
+    assert broker.process_bar('A', bar(10, 11, 9)) == 0
+    assert broker.get_balance() == 15
+
+
+def test_cancel():
+    broker = Broker(1000)
+    order_id = broker.place_order(Order('buy', 1, OrderType.LIMIT, limit_price=9), 'A')
+    kept = broker.place_order(Order('buy', 1, OrderType.LIMIT, limit_price=8), 'A')
+    assert broker.cancel_order(order_id)
+    assert not broker.cancel_order(order_id)
+    assert not broker.cancel_order(12345)
+    assert broker.process_bar('A', bar(10, 10, 7)) == 1
+    assert trades(broker) == [('buy', 8, 1, 'success')]
+    assert not broker.cancel_order(kept)
+
+
+def test_orders_of_other_symbols_are_untouched():
+    broker = Broker(1000)
+    broker.place_order(Order('buy', 1, OrderType.MARKET), 'A')
+    assert broker.process_bar('B', bar(10, 11, 9)) == 0
+    assert broker.process_bar('A', bar(10, 11, 9)) == 1
+
+
+def test_cancelled_orders_do_not_accumulate_in_the_heaps():
+    book = OrderBook()
+    kept = book.add(Order('buy', 1, OrderType.LIMIT, limit_price=1), 'A')
+    for step in range(1000):
+        book.cancel(book.add(Order('sell', 1, OrderType.STOP, stop_price=1 - step / 1000), 'A'))
+        book.cancel(book.add(Order('buy', 1, OrderType.LIMIT, limit_price=0.5), 'A'))
+    assert len(book) == 1
+    assert sum(len(heap) for heap in book.heaps['A'].values()) <= 4
+    matched = book.match('A', 1, 1, 0.5)
+    assert [order.id for order, price, market in matched] == [kept]
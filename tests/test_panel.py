@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_bars
+from data_handler import FIELDS, BarSeries
+from indicators import vectorized
+from panel import BarPanel
+from reference import STRATEGY_PARAMETERS
+from registry import STRATEGIES
+
+
+def select(bars, mask):
+    return BarSeries(bars.index[mask], {field: values[mask] for field, values in bars.columns.items()})
+
+
+def make_bars():
+    full = generate_bars(300, seed=0, start='2024-01-01', frequency='1D')
+    holes = generate_bars(300, seed=1, start='2024-01-01', frequency='1D')
+    missing = np.random.default_rng(2).random(300) < 0.25
+    return {
+        'FULL': full,
+        # random missing sessions
+        'HOLES': select(holes, ~missing),
+        # listed late, delisted early
+        'LATE': generate_bars(150, seed=3, start='2024-03-15', frequency='1D'),
+        'EARLY': generate_bars(100, seed=4, start='2024-01-01', frequency='1D'),
+        # trades on days the others don't
+        'SHIFTED': generate_bars(200, seed=5, start='2024-01-01 12:00', frequency='1D'),
+    }
+
+
+BARS = make_bars()
+PANEL = BarPanel.from_bars(BARS)
+
+INDICATORS = [
+    (vectorized.rolling_mean, ('close',), {'window': 20}),
+    (vectorized.rolling_std, ('close',), {'window': 10}),
+    (vectorized.rolling_max, ('high',), {'window': 15}),
+    (vectorized.rolling_min, ('low',), {'window': 15}),
+    (vectorized.ema, ('close',), {'window': 12}),
+    (vectorized.rsi, ('close',), {'period': 14}),
+    (vectorized.bollinger_bands, ('close',), {'period': 20, 'std_dev': 2}),
+    (vectorized.stochastic_oscillator, ('high', 'low', 'close'), {'period': 14}),
+    (vectorized.macd, ('close',), {'short_window': 12, 'long_window': 26, 'signal_window': 9}),
+    (vectorized.adx, ('high', 'low', 'close'), {'period': 14}),
+    (vectorized.ichimoku_cloud, ('high', 'low'), {}),
+]
+
+
+def test_panel_layout():
+    assert PANEL.symbols == list(BARS)
+    assert len(PANEL) == len(np.unique(np.concatenate([bars.index for bars in BARS.values()])))
+    assert PANEL['close'].shape == (5, len(PANEL))
+    assert PANEL.valid.sum(axis=1).tolist() == [len(bars) for bars in BARS.values()]
+    for symbol, bars in BARS.items():
+        series = PANEL.series(symbol)
+        assert np.array_equal(series.index, bars.index)
+        assert all(np.array_equal(series[field], bars[field]) for field in FIELDS)
+
+
+def test_pack_round_trip():
+    values = PANEL['close']
+    packed, order = vectorized.pack(values, PANEL.valid)
+    for row, bars in enumerate(BARS.values()):
+        assert np.array_equal(packed[row, :len(bars)], bars['close'])
+        assert np.isnan(packed[row, len(bars):]).all()
+    assert np.array_equal(vectorized.unpack(packed, order, PANEL.valid), values, equal_nan=True)
+    assert np.array_equal(vectorized.unpack(packed, order, PANEL.valid, 0), np.where(PANEL.valid, values, 0))
+
+
+@pytest.mark.parametrize('function, fields, parameters', INDICATORS, ids=[function.__name__ for function, _, _ in INDICATORS])
+def test_panel_indicators_equal_the_per_symbol_results(function, fields, parameters):
+    results = PANEL.indicator(function, *fields, **parameters)
+    results = results if isinstance(results, tuple) else (results,)
+    for row, bars in enumerate(BARS.values()):
+        expected = function(*(bars[field] for field in fields), **parameters)
+        expected = expected if isinstance(expected, tuple) else (expected,)
+        valid = PANEL.valid[row]
+        for result, values in zip(results, expected):
+            assert np.array_equal(result[row, valid], values, equal_nan=True), PANEL.symbols[row]
+            assert np.isnan(result[row, ~valid]).all()
+
+
+@pytest.mark.parametrize('name, parameters', STRATEGY_PARAMETERS, ids=[f"{name}-{'-'.join(map(str, parameters.values()))}" for name, parameters in STRATEGY_PARAMETERS])
+def test_panel_signals_equal_the_per_symbol_signals(name, parameters):
+    buy, sell = PANEL.generate_signals(STRATEGIES.create(name, **parameters))
+    for row, bars in enumerate(BARS.values()):
+        expected_buy, expected_sell = STRATEGIES.create(name, **parameters).generate_signals(bars.columns)
+        valid = PANEL.valid[row]
+        assert np.array_equal(buy[row, valid], expected_buy) and np.array_equal(sell[row, valid], expected_sell), PANEL.symbols[row]
+        assert not buy[row, ~valid].any() and not sell[row, ~valid].any()
+
+
+def test_cross_sectional_rank():
+    values = np.array([
+        [1.0, 5.0, np.nan, 2.0],
+        [3.0, 5.0, np.nan, np.nan],
+        [2.0, 1.0, 7.0, np.nan],
+    ])
+    ranks = PANEL.rank(values)
+    expected = np.array([
+        [0.0, 0.5, np.nan, 0.5],
+        [1.0, 1.0, np.nan, np.nan],
+        [0.5, 0.0, 0.5, np.nan],
+    ])
+    # ties rank in row order, a lone value ranks 0.5
+    assert np.array_equal(ranks, expected, equal_nan=True)
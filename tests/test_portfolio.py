@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from data_handler import BarSeries
+from portfolio import PortfolioBacktester
+from registry import STRATEGIES
+from strategy import TradingStrategy
+
+
+class Recorder(TradingStrategy):
+    """Buys `volume` stocks on every bar and records, in the class-level `log`, the bars and histories each copy sees."""
+
+    log = []
+
+    def __init__(self, volume: float = 0) -> None:
+        super().__init__(name="Recorder")
+        self.volume = volume
+        self.history = []
+
+    def should_buy(self, data_point: dict) -> float:
+        Recorder.log.append((id(self), data_point['date'], [d['date'] for d in self.history]))
+        return self.volume
+
+    def should_sell(self, data_point: dict) -> int:
+        return 0
+
+    def update_historical_data(self, data: list):
+        self.history = data
+
+    def reset(self):
+        self.history = []
+
+
+def select(bars, mask):
+    return BarSeries(bars.index[mask], {field: values[mask] for field, values in bars.columns.items()}, bars.timezone)
+
+
+def flat(dates, price=100.0):
+    return [{'open': price, 'high': price, 'low': price, 'close': price, 'volume': 1000.0, 'date': date} for date in dates]
+
+
+@pytest.fixture
+def recorded():
+    Recorder.log = []
+    yield Recorder.log
+    Recorder.log = []
+
+
+def test_misaligned_calendars_are_merged_in_time_order(recorded):
+    days = generate_bars(60, seed=0, start='2024-01-01', frequency='1D')
+    weekdays = select(days, (days.index.astype('datetime64[D]').view('int64') - 4) % 7 < 5)
+    bars = {
+        'WEEKDAYS': weekdays,
+        'LATE': generate_bars(30, seed=1, start='2024-01-20', frequency='1D'),
+        'HALF_DAYS': generate_bars(40, seed=2, start='2024-01-10 12:00', frequency='12h'),
+    }
+    results = PortfolioBacktester(Recorder()).run(bars)
+    assert results['trades'] == 0
+    assert len(recorded) == sum(len(series) for series in bars.values())
+
+    # the copy of the strategy of each symbol, found by the date of the symbol's first bar
+    first_dates = [series.dates()[0] for series in bars.values()]
+    copies = [next(copy for copy, date, _ in recorded if date == first) for first in first_dates]
+    assert len(set(copies)) == 3
+
+    # the bars reach the strategies in time order, ties in the order of the symbols
+    merged = [(np.datetime64(date.replace('+00:00', ''), 'ns'), copies.index(copy)) for copy, date, _ in recorded]
+    assert merged == sorted(merged)
+    assert merged != sorted(merged, key=lambda entry: entry[1])
+
+    # every copy sees its own symbol's bars only, each one with the whole history of that symbol up to it
+    for copy, series in zip(copies, bars.values()):
+        seen = [(date, history) for strategy, date, history in recorded if strategy == copy]
+        dates = series.dates()
+        assert [date for date, _ in seen] == dates
+        assert all(history == dates[:position + 1] for position, (_, history) in enumerate(seen))
+    assert results['last_prices'] == {symbol: series['close'][-1] for symbol, series in bars.items()}
+
+
+def test_symbols_share_the_cash():
+    dates = ['2024-01-01', '2024-01-02', '2024-01-03']
+    bars = {'A': flat(dates), 'B': flat(dates)}
+    results = PortfolioBacktester(Recorder(volume=1), initial_balance=250, multiplier=1).run(bars)
+    statuses = [(t['symbol'], t['status']) for t in results['transaction_history']]
+    # both symbols buy on the first day, the cash left cannot pay for a third stock on any symbol
+    assert statuses == [('A', 'success'), ('B', 'success')] + [('A', 'failure (insufficient funds)'), ('B', 'failure (insufficient funds)')] * 2
+    assert results['positions'] == {'A': 1, 'B': 1}
+    assert results['final_balance'] == 50
+    assert results['final_balance_with_stocks'] == 250
+    # alone, a symbol buys twice
+    alone = PortfolioBacktester(Recorder(volume=1), initial_balance=250, multiplier=1).run({'A': flat(dates)})
+    assert alone['positions'] == {'A': 2}
+
+
+@pytest.mark.parametrize('name, create', [
+    ('rsi', lambda: STRATEGIES.create('rsi', period=14)),
+    ('moving_average', lambda: STRATEGIES.create('moving_average', short_window=5, long_window=30)),
+    ('hybrid', lambda: STRATEGIES.create('hybrid', [STRATEGIES.create('rsi', period=14), STRATEGIES.create('bollinger_bands', period=20)], weights=[0.5, 0.5])),
+])
+def test_a_single_trading_symbol_matches_its_own_backtest(name, create):
+    traded = generate_bars(400, seed=7, start='2024-01-01', frequency='1D')
+    # too few bars for any signal, interleaved with the traded bars
+    idle = generate_bars(10, seed=8, start='2024-03-01 12:00', frequency='1D')
+    results = PortfolioBacktester(create(), multiplier=3).run({'IDLE': idle, 'TRADED': traded})
+    expected = Backtester(10000).run_backtest(create(), traded.iter_bars(), symbol='TRADED', multiplier=3)
+    assert expected['trades'] > 0
+    assert all(transaction['symbol'] == 'TRADED' for transaction in results['transaction_history'])
+    assert results['transaction_history'] == expected['transaction_history']
+    for stat in ('final_balance', 'final_balance_with_stocks', 'profit', 'profit_with_stocks', 'trades'):
+        assert results[stat] == expected[stat], stat
@@ -0,0 +1,132 @@
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from profiler import PHASES, Profiler
+from registry import STRATEGIES
+
+BARS = generate_bars(300, seed=2, frequency='1D')
+
+METHODS = ('update_historical_data', 'should_buy', 'should_sell', 'sync_indicator', 'generate_signals', 'execute_trade', 'execute_trades', '_step')
+
+
+def hybrid(weights=(0.5, 0.5)):
+    return STRATEGIES.create('hybrid', [STRATEGIES.create('rsi', period=14), STRATEGIES.create('bollinger_bands', period=10, std_dev=1)], weights=None if weights is None else list(weights))
+
+
+def strategies_of(strategy):
+    yield strategy
+    for child in getattr(strategy, 'strategies', []):
+        yield from strategies_of(child)
+
+
+def assert_unpatched(*targets):
+    for target in targets:
+        assert not set(METHODS) & set(vars(target)), target
+
+
+def assert_totals_add_up(report):
+    total = report['total']
+    for clock in ('wall', 'cpu'):
+        # self times of nested stacks never exceed their parent, so the phases split the total exactly
+        assert sum(phase[clock] for phase in report['phases'].values()) == pytest.approx(total[clock], rel=1e-9, abs=1e-12)
+        assert sum(stack['self_' + clock] for stack in report['stacks']) == pytest.approx(total[clock], rel=1e-9, abs=1e-12)
+        assert sum(strategy[clock] for strategy in report['strategies'].values()) <= total[clock] * (1 + 1e-9)
+        assert all(0 <= stack['self_' + clock] <= stack[clock] for stack in report['stacks'])
+
+
+@pytest.mark.parametrize('weights', [(0.5, 0.5), None], ids=['average', 'product'])
+def test_profiled_hybrid_gives_the_same_results(weights):
+    backtester = Backtester(10000, profile=True)
+    strategy = hybrid(weights)
+    profiled = backtester.run_backtest(strategy, BARS.iter_bars())
+    expected = Backtester(10000).run_backtest(hybrid(weights), BARS.iter_bars())
+    assert profiled['trades'] > 0
+    assert profiled['transaction_history'] == expected['transaction_history']
+    assert profiled['equity_curve'] == expected['equity_curve']
+
+    assert_unpatched(backtester, backtester.broker, *strategies_of(strategy))
+    assert backtester.profiler.patched == []
+    report = backtester.profiler.report()
+    assert_totals_add_up(report)
+    assert set(report['phases']) <= set(PHASES) | {'backtester'}
+    assert {'update_historical_data', 'indicators', 'should_buy', 'should_sell', 'execute_trade'} <= set(report['phases'])
+    assert list(report['strategies']) == [strategy.name]
+    calls = {tuple(stack['stack'].split(';')): stack['calls'] for stack in report['stacks']}
+    assert calls[('backtest',)] == 1
+    assert calls[('backtest', strategy.name)] == calls[('backtest', strategy.name, 'should_buy')] == len(BARS)
+    # the children are timed under their names, their indicators under their updates
+    assert calls[('backtest', strategy.name, 'should_buy', 'RSI Strategy', 'should_buy')] == len(BARS)
+    assert calls[('backtest', strategy.name, 'update_historical_data', 'Bollinger Bands Strategy', 'update_historical_data', 'indicators', 'BollingerBands')] == len(BARS)
+    # a product skips the second child once the first one scores 0
+    child_calls = calls.get(('backtest', strategy.name, 'should_buy', 'Bollinger Bands Strategy', 'should_buy'), 0)
+    assert (child_calls == len(BARS)) if weights else (0 < child_calls < len(BARS))
+    assert calls[('backtest', strategy.name, 'execute_trade')] == profiled['trades']
+
+
+def test_vectorized_profiling():
+    backtester = Backtester(10000, profile=True)
+    strategy = hybrid()
+    profiled = backtester.run_vectorized_backtest(strategy, BARS)
+    expected = Backtester(10000).run_vectorized_backtest(hybrid(), BARS)
+    assert profiled['transaction_history'] == expected['transaction_history']
+    assert_unpatched(backtester, backtester.broker, *strategies_of(strategy))
+    report = backtester.profiler.report()
+    assert_totals_add_up(report)
+    assert {'generate_signals', 'execute_trades'} <= set(report['phases'])
+    assert list(report['strategies']) == [strategy.name]
+
+
+def test_several_strategies_are_timed_separately():
+    backtester = Backtester(10000, profile=True)
+    strategies = [STRATEGIES.create('rsi', period=14), hybrid()]
+    results = backtester.run_backtests(strategies, BARS.to_list())
+    expected = [Backtester(10000).run_backtest(strategy, BARS.iter_bars()) for strategy in (STRATEGIES.create('rsi', period=14), hybrid())]
+    assert [result['transaction_history'] for result in results] == [result['transaction_history'] for result in expected]
+    assert_unpatched(backtester, *(strategy for top in strategies for strategy in strategies_of(top)))
+    report = backtester.profiler.report()
+    assert_totals_add_up(report)
+    assert set(report['strategies']) == {strategy.name for strategy in strategies}
+
+
+def test_patches_are_removed_when_the_run_fails():
+    backtester = Backtester(10000, profile=True)
+    strategy = hybrid()
+
+    def fail(data_point):
+        raise RuntimeError("strategy failure")
+
+    strategy.strategies[1].should_sell = fail
+    with pytest.raises(RuntimeError):
+        backtester.run_backtest(strategy, BARS.iter_bars())
+    # the failing method was an instance attribute before the run, it is left in place
+    assert vars(strategy.strategies[1])['should_sell'] is fail
+    del strategy.strategies[1].should_sell
+    assert_unpatched(backtester, backtester.broker, *strategies_of(strategy))
+    assert backtester.profiler.stack == []
+
+
+def test_profiling_accumulates_and_resets():
+    backtester = Backtester(10000, profile=True)
+    backtester.run_backtest(hybrid(), BARS.iter_bars())
+    backtester.run_backtest(hybrid(), BARS.iter_bars())
+    calls = {stack['stack']: stack['calls'] for stack in backtester.profiler.report()['stacks']}
+    assert calls['backtest'] == 2
+    backtester.profiler.reset()
+    assert backtester.profiler.report() == {'total': {'wall': 0.0, 'cpu': 0.0}, 'phases': {}, 'strategies': {}, 'stacks': []}
+
+
+def test_write_collapsed(tmp_path):
+    backtester = Backtester(10000, profile=True)
+    backtester.run_backtest(hybrid(), BARS.iter_bars())
+    path = tmp_path / 'profile.folded'
+    backtester.profiler.write_collapsed(str(path))
+    lines = path.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert stack.split(';')[0] == 'backtest' and int(count) > 0
+    total = sum(int(line.rsplit(' ', 1)[1]) for line in lines)
+    assert total == pytest.approx(backtester.profiler.report()['total']['wall'] * 1e6, abs=len(lines))
+    with pytest.raises(ValueError):
+        Profiler().write_collapsed(str(path), clock='gpu')
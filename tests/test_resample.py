@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_bars
+from data_handler import FIELDS, BarSeries
+from history import BarResampler
+from registry import STRATEGIES
+from strategy import TradingStrategy
+
+HOURLY = BarSeries(
+    np.datetime64('2024-01-01T00:00', 'ns') + np.arange(7) * np.timedelta64(1, 'h'),
+    {
+        'open': np.array([10.0, 11, 12, 13, 14, 15, 16]),
+        'high': np.array([12.0, 15, 13, 14, 19, 16, 17]),
+        'low': np.array([9.0, 10, 8, 12, 13, 11, 15]),
+        'close': np.array([11.0, 12, 13, 14, 15, 16, 16.5]),
+        'volume': np.array([100.0, 200, 300, 400, 500, 600, 700]),
+    },
+)
+
+
+class Spy(TradingStrategy):
+    """Records every coarser bar it is evaluated on, buys on even bars and sells on odd ones."""
+
+    def __init__(self) -> None:
+        super().__init__(name="Spy")
+        self.reset()
+
+    def should_buy(self, data_point: dict) -> float:
+        self.seen.append(data_point)
+        return float(len(self.seen) % 2 == 0)
+
+    def should_sell(self, data_point: dict) -> float:
+        return float(len(self.seen) % 2 == 1)
+
+    def update_historical_data(self, data: list):
+        self.history = data
+
+    def reset(self):
+        self.seen = []
+        self.history = []
+
+    @property
+    def lookback(self) -> int:
+        return 2
+
+
+def pandas_resample(bars, frequency):
+    index = pd.DatetimeIndex(bars.index).tz_localize('UTC')
+    if bars.timezone is not None:
+        index = index.tz_convert(bars.timezone)
+    frame = pd.DataFrame(bars.columns, index=index)
+    aggregated = frame.resample(frequency).agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+    return aggregated[frame['open'].resample(frequency).count() > 0]
+
+
+def test_ohlcv_aggregation():
+    bars = HOURLY.resample('3h')
+    assert bars.dates() == ['2024-01-01 00:00:00', '2024-01-01 03:00:00', '2024-01-01 06:00:00']
+    assert bars['open'].tolist() == [10, 13, 16]
+    assert bars['high'].tolist() == [15, 19, 17]
+    assert bars['low'].tolist() == [8, 11, 15]
+    assert bars['close'].tolist() == [13, 16, 16.5]
+    # the last bucket only has one bar
+    assert bars['volume'].tolist() == [600, 1500, 700]
+    assert HOURLY.resample('1D').to_list() == [{'open': 10, 'high': 19, 'low': 8, 'close': 16.5, 'volume': 2800, 'date': '2024-01-01 00:00:00'}]
+    assert HOURLY.resample('1h').to_list() == HOURLY.to_list()
+
+
+def test_empty_periods_have_no_bar():
+    gapped = BarSeries(HOURLY.index + np.array([0, 0, 0, 5, 5, 5, 5]) * np.timedelta64(1, 'h'), HOURLY.columns)
+    bars = gapped.resample('2h')
+    assert bars.dates() == ['2024-01-01 00:00:00', '2024-01-01 02:00:00', '2024-01-01 08:00:00', '2024-01-01 10:00:00']
+    assert bars['volume'].tolist() == [300, 300, 900, 1300]
+
+
+@pytest.mark.parametrize('frequency', ['5min', '1h', '1D'])
+def test_resample_matches_pandas_across_a_daylight_saving_time_change(frequency):
+    minutes = generate_bars(3 * 24 * 60, seed=4, start='2024-03-09 12:00', frequency='1min')
+    keep = np.random.default_rng(0).random(len(minutes)) > 0.3
+    bars = BarSeries(minutes.index[keep], {field: values[keep] for field, values in minutes.columns.items()}, 'America/New_York')
+    resampled = bars.resample(frequency)
+    expected = pandas_resample(bars, frequency)
+    assert resampled.dates() == [str(timestamp) for timestamp in expected.index]
+    for field in FIELDS:
+        assert np.array_equal(resampled[field], expected[field].to_numpy()), field
+
+
+def test_ticks_resample_into_bars():
+    index = np.datetime64('2024-01-01T09:30', 'ns') + np.array([0, 10, 50, 70, 130]) * np.timedelta64(1, 's')
+    ticks = BarSeries.from_ticks(index, [10.0, 10.5, 9.8, 10.1, 10.2], [5, 1, 2, 3, 4])
+    assert ticks.resample('1min').to_list() == [
+        {'open': 10.0, 'high': 10.5, 'low': 9.8, 'close': 9.8, 'volume': 8.0, 'date': '2024-01-01 09:30:00'},
+        {'open': 10.1, 'high': 10.1, 'low': 10.1, 'close': 10.1, 'volume': 3.0, 'date': '2024-01-01 09:31:00'},
+        {'open': 10.2, 'high': 10.2, 'low': 10.2, 'close': 10.2, 'volume': 4.0, 'date': '2024-01-01 09:32:00'},
+    ]
+
+
+@pytest.mark.parametrize('timezone', [None, 'America/New_York'])
+@pytest.mark.parametrize('capacity', [None, 3])
+def test_streaming_resampler_matches_resample(timezone, capacity):
+    bars = generate_bars(2000, seed=5, start='2024-03-09 20:00', frequency='7min')
+    bars.timezone = timezone
+    expected = bars.resample('1h').to_list()
+    resampler = BarResampler('1h', capacity)
+    completed = [bar for bar in map(resampler.update, bars.to_list()) if bar is not None]
+    # the partial last bucket is still being formed
+    assert completed == expected[:-1]
+    assert resampler.current == expected[-1]
+    assert list(resampler.bars) == completed[-(capacity or len(completed)):]
+
+
+def test_timeframe_strategy_has_no_lookahead():
+    bars = generate_bars(300, seed=6, start='2024-01-01 09:00', frequency='25min')
+    points = bars.to_list()
+    strategy = STRATEGIES.create('timeframe', Spy(), '2h', hold_signals=False)
+    history = []
+    signals = []
+    for position, data_point in enumerate(points):
+        history.append(data_point)
+        seen = len(strategy.strategy.seen)
+        strategy.update_historical_data(history)
+        signals.append((strategy.should_buy(data_point), strategy.should_sell(data_point)))
+        if len(strategy.strategy.seen) > seen:
+            # the coarser bar completed by this bar is made of the earlier bars only
+            assert strategy.strategy.seen[-1] == bars[:position].resample('2h').to_list()[-1]
+        else:
+            assert signals[-1] == (0, 0)
+    assert len(strategy.strategy.seen) == len(bars.resample('2h')) - 1
+
+    # changing the future bars does not change the signals up to them
+    changed = generate_bars(300, seed=6, start='2024-01-01 09:00', frequency='25min')
+    for field in FIELDS:
+        changed[field][150:] = changed[field][150:][::-1] * 1.1
+    original, modified = (timeframe_signals(series, lambda: STRATEGIES.create('moving_average', short_window=2, long_window=4)) for series in (bars, changed))
+    assert any(signal != (0, 0) for signal in original[:150]) and original[:150] == modified[:150]
+    assert original[150:] != modified[150:]
+
+
+def timeframe_signals(bars, create):
+    """The signals of `create()` on 2-hour bars, bar by bar on `bars`."""
+    strategy = STRATEGIES.create('timeframe', create(), '2h', hold_signals=False)
+    history = []
+    signals = []
+    for data_point in bars.to_list():
+        history.append(data_point)
+        strategy.update_historical_data(history)
+        signals.append((strategy.should_buy(data_point), strategy.should_sell(data_point)))
+    return signals
+
+
+def test_held_signals_last_until_the_next_coarser_bar():
+    bars = generate_bars(48, seed=7, start='2024-01-01', frequency='30min')
+    held = STRATEGIES.create('timeframe', Spy(), '2h')
+    once = STRATEGIES.create('timeframe', Spy(), '2h', hold_signals=False)
+    history = []
+    expected = (0, 0)
+    for position, data_point in enumerate(bars.to_list()):
+        history.append(data_point)
+        held.update_historical_data(history)
+        once.update_historical_data(history)
+        # a coarser bar completes on the first bar of every 2 hours, from the second period on
+        if position % 4 == 0 and position > 0:
+            assert (held.should_buy(data_point), held.should_sell(data_point)) == (once.should_buy(data_point), once.should_sell(data_point)) != (0, 0)
+            expected = (held.should_buy(data_point), held.should_sell(data_point))
+        else:
+            assert (once.should_buy(data_point), once.should_sell(data_point)) == (0, 0)
+            assert (held.should_buy(data_point), held.should_sell(data_point)) == expected
@@ -0,0 +1,201 @@
+import datetime
+import json
+
+import numpy as np
+import pytest
+from peewee import CharField, DateTimeField, FloatField, IntegerField, Model, SqliteDatabase, TextField
+
+import result_store
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from data_handler import BarSeries
+from registry import STRATEGIES
+from result_store import METRICS, ResultStore, bars_hash, fingerprint
+from strategy import TradingStrategy
+
+BARS = generate_bars(200, seed=0, start='2024-01-01', frequency='1D')
+
+
+class BacktestRunV1(Model):
+    """The table of a store created before the performance metrics were stored (`VERSION = 1`)."""
+
+    key = CharField(max_length=64, unique=True)
+    symbol = CharField()
+    strategy = CharField()
+    strategy_class = CharField()
+    parameters = TextField()
+    bars_hash = CharField(max_length=64)
+    start = DateTimeField()
+    end = DateTimeField()
+    bars = IntegerField()
+    initial_balance = FloatField()
+    multiplier = FloatField()
+    final_balance = FloatField()
+    final_balance_with_stocks = FloatField()
+    profit = FloatField()
+    profit_with_stocks = FloatField()
+    trades = IntegerField()
+    created = DateTimeField()
+
+    class Meta:
+        table_name = 'backtestrun'
+
+
+class Unkept(TradingStrategy):
+    """Doesn't keep its constructor parameter, so it cannot be fingerprinted."""
+
+    def __init__(self, period: int) -> None:
+        super().__init__(name="Unkept")
+
+    def should_buy(self, data_point: dict) -> float:
+        return 0
+
+    def should_sell(self, data_point: dict) -> int:
+        return 0
+
+    def update_historical_data(self, data: list):
+        pass
+
+    def reset(self):
+        pass
+
+
+def hybrid(period=14, weights=(0.5, 0.5)):
+    return STRATEGIES.create('hybrid', [STRATEGIES.create('rsi', period=period), STRATEGIES.create('adx', period=14)], weights=list(weights))
+
+
+def custom(threshold):
+    return STRATEGIES.create('custom', [STRATEGIES.create('rsi', period=14)], lambda scores: float(min(scores) > threshold), lambda scores: float(max(scores) > threshold))
+
+
+def key(bars=BARS, strategy=None, initial_balance=10000, multiplier=10):
+    return ResultStore.key(bars, strategy or hybrid(), initial_balance, multiplier)
+
+
+def run(store, symbol, strategy, bars=BARS, multiplier=10):
+    results = Backtester(10000).run_backtest(strategy, bars.iter_bars(), symbol=symbol, multiplier=multiplier)
+    store.save_many([(key(bars, strategy, 10000, multiplier), symbol, bars, strategy, results, multiplier)])
+    return results
+
+
+def test_fingerprint_describes_nested_strategies():
+    description = fingerprint(hybrid())
+    assert description['class'] == 'strategies.hybrid.basic.HybridStrategy'
+    assert description['parameters']['weights'] == [0.5, 0.5]
+    assert description['parameters']['strategies'] == [
+        {'class': 'strategies.basic.RSI.RSIStrategy', 'parameters': {'period': 14, 'overbought': 70, 'oversold': 30}},
+        {'class': 'strategies.basic.adx.ADXStrategy', 'parameters': {'period': 14}},
+    ]
+    assert json.loads(json.dumps(fingerprint(custom(0.5))))['parameters']['buy_merging_function']['closure'] == [0.5]
+    assert fingerprint(np.float64(0.5)) == 0.5 and fingerprint({1: (2, None)}) == {'1': [2, None]}
+    for value in (Unkept(3), object(), custom(object())):
+        with pytest.raises(ValueError):
+            fingerprint(value)
+
+
+def test_keys_are_stable():
+    assert key() == key() == key(bars=BarSeries(BARS.index.copy(), {field: values.copy() for field, values in BARS.columns.items()}))
+    # running a strategy doesn't change its key
+    strategy = hybrid()
+    before = key(strategy=strategy)
+    Backtester(10000).run_backtest(strategy, BARS.iter_bars())
+    assert key(strategy=strategy) == before
+    # neither does the timezone used to render the dates
+    zoned = BARS[:]
+    zoned.timezone = 'Asia/Tokyo'
+    assert key(bars=zoned) == before
+    assert key(strategy=custom(0.5)) == key(strategy=custom(0.5))
+
+
+def test_changed_inputs_give_new_keys():
+    changed_close = BARS[:]
+    changed_close.columns = dict(BARS.columns, close=BARS['close'].copy())
+    changed_close['close'][100] = np.nextafter(changed_close['close'][100], np.inf)
+    shifted = BarSeries(BARS.index + np.timedelta64(1, 'h'), BARS.columns)
+    keys = [
+        key(),
+        key(bars=changed_close),
+        key(bars=shifted),
+        key(bars=BARS[:-1]),
+        key(strategy=hybrid(period=15)),
+        key(strategy=hybrid(weights=(0.4, 0.6))),
+        key(strategy=STRATEGIES.create('hybrid', [STRATEGIES.create('adx', period=14), STRATEGIES.create('rsi', period=14)], weights=[0.5, 0.5])),
+        key(initial_balance=20000),
+        key(multiplier=5),
+        # functions differ by the values they close over
+        key(strategy=custom(0.5)),
+        key(strategy=custom(0.25)),
+    ]
+    assert len(set(keys)) == len(keys)
+    assert bars_hash(BARS) != bars_hash(changed_close)
+
+
+def test_a_new_version_gives_new_keys(monkeypatch):
+    current = key()
+    monkeypatch.setattr(result_store, 'VERSION', 1)
+    assert key() != current
+
+
+def test_save_and_get(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    results = run(store, 'A', hybrid())
+    stored = store.get(key())
+    assert stored == {'initial_balance': 10000, **{metric: results[metric] for metric in METRICS}}
+    assert store.get('unknown') is None
+    assert list(store.get_many([key(), 'unknown'])) == [key()]
+    # saving the same key again replaces the run
+    run(store, 'A', hybrid())
+    assert len(store.runs()) == 1
+    row = store.runs().iloc[0]
+    assert (row['symbol'], row['strategy_class'], row['bars'], row['bars_hash']) == ('A', 'HybridStrategy', 200, bars_hash(BARS))
+    assert json.loads(row['parameters'])['weights'] == [0.5, 0.5]
+    store.close()
+
+
+def test_best_per_symbol(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    strategies = [STRATEGIES.create('rsi', period=period) for period in (5, 10, 14, 20)]
+    results = {}
+    for symbol, seed in (('A', 1), ('B', 2)):
+        bars = generate_bars(300, seed=seed, start='2024-01-01', frequency='1D')
+        for strategy in strategies:
+            results[symbol, strategy.name, strategy.period] = run(store, symbol, strategy, bars)
+    assert len(store.runs()) == 8 and len(store.runs(symbol='A')) == 4
+    for metric in ('profit_with_stocks', 'sharpe', 'win_rate'):
+        best = store.best_per_symbol(metric)
+        assert best['symbol'].tolist() == ['A', 'B']
+        for symbol, row in zip(('A', 'B'), best.itertuples()):
+            expected = max(outcome[metric] for (name, _, _), outcome in results.items() if name == symbol)
+            assert getattr(row, metric) == expected
+            period = json.loads(row.parameters)['period']
+            assert results[symbol, row.strategy, period][metric] == expected
+    with pytest.raises(ValueError):
+        store.best_per_symbol('transaction_history')
+    store.close()
+
+
+def test_version_1_stores_are_migrated(tmp_path):
+    path = str(tmp_path / 'results.db')
+    database = SqliteDatabase(path)
+    created = datetime.datetime(2024, 1, 1)
+    with database.bind_ctx([BacktestRunV1]):
+        database.create_tables([BacktestRunV1])
+        BacktestRunV1.create(key='old', symbol='A', strategy='RSI Strategy', strategy_class='RSIStrategy', parameters='{"period": 14}',
+                             bars_hash=bars_hash(BARS), start=created, end=created, bars=200, initial_balance=10000, multiplier=10,
+                             final_balance=9000, final_balance_with_stocks=11000, profit=-1000, profit_with_stocks=1000, trades=4, created=created)
+    database.close()
+
+    store = ResultStore(path)
+    # the metric columns were added, with their defaults for the old run
+    assert store.get('old') == {'initial_balance': 10000, 'final_balance': 9000, 'final_balance_with_stocks': 11000, 'profit': -1000,
+                                'profit_with_stocks': 1000, 'trades': 4, **{metric: 0 for metric in METRICS[5:]}}
+    # new runs go along the old ones
+    results = run(store, 'A', hybrid())
+    assert store.get(key())['sharpe'] == results['sharpe']
+    assert set(store.runs()['key']) == {'old', key()}
+    assert store.best_per_symbol('profit_with_stocks')['profit_with_stocks'].tolist() == [max(1000, results['profit_with_stocks'])]
+    store.close()
+    # reopening a migrated store changes nothing
+    store = ResultStore(path)
+    assert len(store.runs()) == 2
+    store.close()
@@ -0,0 +1,114 @@
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import pytest
+
+import runner
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from data_handler import FIELDS
+from registry import STRATEGIES
+from runner import ParallelBacktester, SharedBars
+from strategy import TradingStrategy
+
+
+class FailingStrategy(TradingStrategy):
+    """Fails on the first bar it is asked about."""
+
+    def __init__(self) -> None:
+        super().__init__(name="Failing Strategy")
+
+    def should_buy(self, data_point: dict) -> float:
+        raise RuntimeError("strategy failure")
+
+    def should_sell(self, data_point: dict) -> int:
+        return 0
+
+    def update_historical_data(self, data: list):
+        pass
+
+    def reset(self):
+        pass
+
+
+def strategies():
+    return [
+        STRATEGIES.create('rsi', period=14),
+        STRATEGIES.create('moving_average', short_window=5, long_window=30),
+        STRATEGIES.create('hybrid', [STRATEGIES.create('ichimoku_cloud'), STRATEGIES.create('adx', period=14)], weights=[0.5, 0.5]),
+    ]
+
+
+@pytest.fixture(scope='module')
+def bars():
+    return {f"S{seed}": generate_bars(400 + 50 * seed, seed=seed, start='2022-01-01', frequency='1D') for seed in range(3)}
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """The shared memory blocks created during the test."""
+    blocks = []
+    original = SharedBars.__init__
+
+    def init(self, bars):
+        original(self, bars)
+        blocks.append(self.memory.name)
+
+    monkeypatch.setattr(runner.SharedBars, '__init__', init)
+    return blocks
+
+
+def unlinked(name):
+    try:
+        SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+
+def test_shared_bars_round_trip(bars):
+    zoned = generate_bars(50, seed=9, start='2022-01-01', frequency='1h')
+    zoned.timezone = 'America/New_York'
+    bars = {**bars, 'zoned': zoned, 'empty': bars['S0'][:0]}
+    shared = SharedBars(bars)
+    try:
+        memory, views = SharedBars.attach(shared.spec)
+        for symbol, series in bars.items():
+            view = views[symbol]
+            assert np.array_equal(view.index, series.index)
+            assert all(np.array_equal(view[field], series[field]) for field in FIELDS)
+            assert str(view.timezone) == str(series.timezone)
+        del view, views
+        memory.close()
+    finally:
+        shared.close()
+    assert unlinked(shared.memory.name)
+
+
+@pytest.mark.parametrize('options', [
+    {'max_workers': 2},
+    {'max_workers': 2, 'share_indicators': False},
+    {'max_workers': 2, 'vectorized': True},
+    {'max_workers': 1},
+], ids=['shared-indicators', 'separate-tasks', 'vectorized', 'serial'])
+def test_parallel_runs_match_serial_backtests(bars, created, options):
+    results = ParallelBacktester(strategies(), multiplier=3, keep_history=True, **options).run(bars)
+    assert list(results) == [strategy.name for strategy in strategies()]
+    for strategy_position, name in enumerate(results):
+        assert list(results[name]) == list(bars)
+        for symbol, series in bars.items():
+            expected = Backtester(10000).run_backtest(strategies()[strategy_position], series.iter_bars(), symbol=symbol, multiplier=3)
+            assert results[name][symbol] == expected
+    assert created and all(unlinked(name) for name in created)
+
+
+def test_results_without_history(bars):
+    results = ParallelBacktester(strategies()[:1], max_workers=2).run(bars)
+    for outcome in results['RSI Strategy'].values():
+        assert 'transaction_history' not in outcome and 'equity_curve' not in outcome and outcome['trades'] > 0
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_shared_memory_is_unlinked_after_a_worker_failure(bars, created, max_workers):
+    with pytest.raises(RuntimeError, match="strategy failure"):
+        ParallelBacktester([STRATEGIES.create('rsi', period=14), FailingStrategy()], max_workers=max_workers, share_indicators=False).run(bars)
+    assert created and all(unlinked(name) for name in created)
@@ -0,0 +1,81 @@
+import math
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from indicators.streaming import RollingMean, RollingMeanStd
+from reference import SERIES, STRATEGY_PARAMETERS, ReferenceSignals, reference_signals, tick_rounded
+from registry import STRATEGIES
+
+
+@pytest.mark.parametrize('series', SERIES)
+@pytest.mark.parametrize('name, parameters', STRATEGY_PARAMETERS, ids=[f"{name}-{'-'.join(map(str, parameters.values()))}" for name, parameters in STRATEGY_PARAMETERS])
+def test_streaming_signals_match_the_whole_history_formulas(series, name, parameters):
+    strategy = STRATEGIES.create(name, **parameters)
+    expected = reference_signals(series, name, tuple(parameters.items()))
+    history = []
+    for bar, data_point in enumerate(SERIES[series]().to_list()):
+        history.append(data_point)
+        strategy.update_historical_data(history)
+        signals = (strategy.should_buy(data_point), strategy.should_sell(data_point))
+        assert signals == expected[bar], f"bar {bar}"
+
+
+def test_macd_with_a_short_window_longer_than_the_long_window():
+    bars = generate_bars(300, seed=0, frequency='1D')
+    results = Backtester(10000).run_backtest(STRATEGIES.create('macd', short_window=5, long_window=3, signal_window=2), bars.iter_bars())
+    assert results['trades'] > 0
+
+
+def test_moving_average_crossover_of_equal_averages_on_a_tick_grid():
+    # at bar 105 both averages are 98.944 on paper, the running sums give 98.944 and 98.94399999999999
+    bars = tick_rounded(generate_bars(300, seed=1, volatility=0.005, frequency='1D')).to_list()
+    strategy = STRATEGIES.create('moving_average', short_window=5, long_window=40)
+    reference = ReferenceSignals('moving_average', short_window=5, long_window=40)
+    history = []
+    for data_point in bars[:106]:
+        history.append(data_point)
+        strategy.update_historical_data(history)
+        signals = (strategy.should_buy(data_point), strategy.should_sell(data_point))
+        assert signals == tuple(int(signal) for signal in reference(history))
+    assert strategy.short_ma.value > strategy.long_ma.value
+    assert strategy.prev_short_ma == strategy.prev_long_ma == 98.944
+
+
+@pytest.mark.parametrize('scale', [1.0, 1e6])
+def test_rolling_mean_error_bounds_any_summation(scale):
+    generator = np.random.default_rng(0)
+    # a large level followed by small values: the running sum keeps the rounding of the large partial sums until the next resync
+    values = np.concatenate((generator.normal(100, 1, 500) * scale, generator.normal(0, 1, 500), np.round(generator.normal(100, 1, 500), 2)))
+    for window in (1, 3, 20, 64):
+        mean = RollingMean(window)
+        for bar, value in enumerate(values.tolist()):
+            result = mean.update(value)
+            if result is None:
+                continue
+            window_values = values[bar - window + 1:bar + 1]
+            for reference in (sum(window_values.tolist()) / window, np.mean(window_values), math.fsum(window_values) / window):
+                assert abs(result - reference) <= mean.error
+
+
+def test_rolling_mean_of_zeros_is_exact():
+    mean = RollingMean(3)
+    for value in (1e6, 0.1, 0.2, 0.0, 0.0, 0.0):
+        mean.update(value)
+    assert mean.value == 0.0 and mean.error == 0.0
+
+
+@pytest.mark.parametrize('scale', [1.0, 1e6])
+def test_rolling_mean_std_errors_bound_numpy(scale):
+    generator = np.random.default_rng(1)
+    values = np.concatenate((generator.normal(100, 1, 400) * scale, np.full(50, 3.3), np.round(generator.normal(100, 0.01, 400), 2)))
+    for window in (1, 5, 20):
+        stats = RollingMeanStd(window)
+        for bar, value in enumerate(values.tolist()):
+            result = stats.update(value)
+            if result is None:
+                continue
+            window_values = values[bar - window + 1:bar + 1]
+            assert abs(result[0] - np.mean(window_values)) <= stats.mean_error
+            assert abs(result[1] - np.std(window_values)) <= stats.std_error
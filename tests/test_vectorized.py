@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from indicators import vectorized
+from reference import SERIES, STRATEGY_PARAMETERS, reference_signals
+from registry import STRATEGIES
+from sweep import ParameterSweep
+
+SEEDS = range(4)
+
+# strategy factories, with short and long parameters so that signals change often
+STRATEGY_FACTORIES = {
+    'moving_average': lambda: STRATEGIES.create('moving_average', short_window=5, long_window=40),
+    'moving_average_inverted': lambda: STRATEGIES.create('moving_average', short_window=12, long_window=5),
+    'rsi': lambda: STRATEGIES.create('rsi', period=14),
+    'rsi_short': lambda: STRATEGIES.create('rsi', period=5, overbought=60, oversold=40),
+    'bollinger_bands': lambda: STRATEGIES.create('bollinger_bands', period=20, std_dev=2),
+    'bollinger_bands_narrow': lambda: STRATEGIES.create('bollinger_bands', period=10, std_dev=1),
+    'stochastic_oscillator': lambda: STRATEGIES.create('stochastic_oscillator', period=20),
+    'stochastic_oscillator_short': lambda: STRATEGIES.create('stochastic_oscillator', period=5, overbought=60, oversold=40),
+    'macd': lambda: STRATEGIES.create('macd', short_window=12, long_window=26, signal_window=9),
+    'macd_fast': lambda: STRATEGIES.create('macd', short_window=3, long_window=5, signal_window=12),
+    'ichimoku_cloud': lambda: STRATEGIES.create('ichimoku_cloud'),
+    'adx': lambda: STRATEGIES.create('adx', period=20),
+    'adx_short': lambda: STRATEGIES.create('adx', period=5),
+    'hybrid': lambda: STRATEGIES.create('hybrid', [STRATEGIES.create('ichimoku_cloud'), STRATEGIES.create('adx', period=20)], weights=[0.5, 0.5]),
+    'hybrid_unweighted': lambda: STRATEGIES.create('hybrid', [STRATEGIES.create('rsi', period=5, overbought=60, oversold=40), STRATEGIES.create('bollinger_bands', period=10, std_dev=1)], weights=None),
+    'custom': lambda: STRATEGIES.create('custom', [STRATEGIES.create('ichimoku_cloud'), STRATEGIES.create('adx', period=20)],
+                                        buy_merging_function=lambda x: x[0] * x[1], sell_merging_function=lambda x: max(x)),
+}
+
+
+@pytest.fixture(scope='module', params=SEEDS)
+def bars(request):
+    return generate_bars(800, seed=request.param, start='2020-01-01', frequency='1D')
+
+
+@pytest.mark.parametrize('name', STRATEGY_FACTORIES)
+def test_vectorized_backtest_matches_the_per_bar_loop(bars, name):
+    factory = STRATEGY_FACTORIES[name]
+    loop = Backtester(10000).run_backtest(factory(), bars.iter_bars(), multiplier=3)
+    vectorized = Backtester(10000).run_backtest(factory(), bars, multiplier=3, vectorized=True)
+
+    assert vectorized['trades'] == loop['trades']
+    assert vectorized['transaction_history'] == loop['transaction_history']
+    for stat in ('final_balance', 'final_balance_with_stocks', 'profit', 'profit_with_stocks'):
+        assert vectorized[stat] == loop[stat]
+    assert vectorized == loop
+
+
+@pytest.mark.parametrize('series', SERIES)
+@pytest.mark.parametrize('name, parameters', STRATEGY_PARAMETERS, ids=[f"{name}-{'-'.join(map(str, parameters.values()))}" for name, parameters in STRATEGY_PARAMETERS])
+def test_vectorized_signals_match_the_whole_history_formulas(series, name, parameters):
+    # the tick-rounded series have averages equal on paper, whose rounding decides the signals
+    buy, sell = STRATEGIES.create(name, **parameters).generate_signals(SERIES[series]().columns)
+    expected = reference_signals(series, name, tuple(parameters.items()))
+    assert list(zip(buy.astype(int).tolist(), sell.astype(int).tolist())) == expected
+
+
+def test_synthetic_bars_trade():
+    # the comparison is only meaningful if the strategies trade
+    bars = generate_bars(800, seed=0, start='2020-01-01', frequency='1D')
+    trades = [Backtester(10000).run_backtest(factory(), bars, multiplier=3, vectorized=True)['trades'] for factory in STRATEGY_FACTORIES.values()]
+    assert sum(trade > 0 for trade in trades) >= len(trades) - 2
+
+
+@pytest.mark.parametrize('scale', [1e-3, 1, 100, 1e5])
+def test_rolling_moments_error_bounds_any_summation(scale):
+    rng = np.random.default_rng(3)
+    values = scale * np.exp(np.cumsum(rng.normal(0, 0.02, 1500)))
+    values[::7] = np.round(values[::7], 2)
+    # windows within a block, on both sides of `BLOCK_SIZE` and with a block of their own
+    for window in (1, 2, 5, 14, 100, vectorized.BLOCK_SIZE, vectorized.BLOCK_SIZE + 1, 700):
+        moments = vectorized.rolling_moments(values, window)
+        windows = sliding_window_view(values, window)
+        mean, mean_error = moments['mean'][window - 1:], moments['mean_error'][window - 1:]
+        assert np.isnan(moments['mean'][:window - 1]).all()
+        assert np.all(np.abs(mean - [sum(prices) / window for prices in windows.tolist()]) <= mean_error)
+        assert np.all(np.abs(mean - [np.mean(prices) for prices in windows]) <= mean_error)
+        assert np.all(np.abs(moments['std'][window - 1:] - [np.std(prices) for prices in windows]) <= moments['std_error'][window - 1:])
+        assert np.all(mean_error <= 1e-9 * np.abs(mean))
+
+
+def test_rolling_moments_of_zeros_and_missing_values():
+    values = np.array([[0.0] * 6 + [1.0, 2.0, 3.0], [1.0, 2.0, 3.0, 4.0, np.nan, 5.0, 6.0, 7.0, 8.0]])
+    moments = vectorized.rolling_moments(values, 3)
+    assert moments['mean'][0, 2:6].tolist() == [0.0] * 4 and moments['mean_error'][0, 2:6].tolist() == [0.0] * 4
+    # a window holding a missing value is missing
+    assert np.isnan(moments['mean'][1, 4:7]).all()
+    assert moments['mean'][1, [2, 3, 7, 8]] == pytest.approx([2, 3, 6, 7])
+    assert moments['std'][1, 8] == pytest.approx(np.std([6, 7, 8]))
+
+
+def test_prefix_sums_are_shared_by_all_windows():
+    close = generate_bars(300, seed=0)['close']
+    with vectorized.shared_computations():
+        for window in (5, 20, 50):
+            vectorized.rolling_mean(close, window)
+        assert len([key for key in vectorized._shared_results if key[0] == 'prefix_sums']) == 1
+
+
+def test_sweep_of_one_metric_matches_the_full_sweep():
+    bars = generate_bars(600, seed=2)
+    sweep = ParameterSweep({STRATEGIES.get('moving_average'): {'short_window': [3, 10], 'long_window': [20, 50]},
+                            STRATEGIES.get('rsi'): {'period': [5, 14], 'oversold': [30, 40]}})
+    full = sweep.run(bars)
+    for metric in ('profit_with_stocks', 'sharpe', 'win_rate'):
+        scores = sweep.run(bars, metric=metric)
+        assert metric in scores and 'trades' not in scores
+        assert scores[metric].tolist() == full[metric].tolist()
+    with pytest.raises(ValueError):
+        sweep.run(bars, metric='profit_with_bonds')
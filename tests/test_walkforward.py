@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from benchmarks.synthetic import generate_bars
+from registry import STRATEGIES
+from walkforward import WalkForwardOptimizer
+
+GRID = {STRATEGIES.get('rsi'): {'period': [5, 14], 'oversold': [30, 45]}, STRATEGIES.get('moving_average'): {'short_window': [3, 10], 'long_window': [20]}}
+
+
+@pytest.fixture(scope='module')
+def bars():
+    return generate_bars(500, seed=4, start='2020-01-01', frequency='1D')
+
+
+def test_bar_series_position_slices_are_views(bars):
+    window = bars[100:200]
+    assert len(window) == 100
+    assert window.index[0] == bars.index[100] and window['close'][-1] == bars['close'][199]
+    assert np.shares_memory(window['close'], bars['close'])
+    assert len(bars[490:600]) == 10 and len(bars[300:100]) == 0
+    assert window[10:20]['open'].tolist() == bars['open'][110:120].tolist()
+
+
+@pytest.mark.parametrize('anchored', [False, True])
+def test_folds_cover_the_history_without_overlap(anchored):
+    optimizer = WalkForwardOptimizer(GRID, train_size=100, test_size=30, anchored=anchored)
+    folds = optimizer.folds(365)
+    assert folds[0] == (0, 100, 130)
+    for (train_start, test_start, test_end), following in zip(folds, folds[1:] + [None]):
+        # the train window ends where the test window starts
+        assert train_start == (0 if anchored else test_start - 100)
+        assert train_start < test_start < test_end
+        if following is not None:
+            assert test_end - test_start == 30 and following[1] == test_end
+    # the last test window is shortened to the end of the history
+    assert folds[-1] == (0 if anchored else 240, 340, 365)
+    assert optimizer.folds(100) == [] and optimizer.folds(101) == [(0, 100, 101)]
+
+
+def test_invalid_windows():
+    with pytest.raises(ValueError):
+        WalkForwardOptimizer(GRID, train_size=0, test_size=10)
+    with pytest.raises(ValueError):
+        WalkForwardOptimizer(GRID, train_size=100, test_size=10, max_workers=1).run(generate_bars(100, seed=0))
+
+
+def test_each_fold_trades_the_best_parameters_of_its_train_window(bars):
+    optimizer = WalkForwardOptimizer(GRID, train_size=200, test_size=100, objective='profit_with_stocks', max_workers=1)
+    combinations = optimizer.sweep.combinations()
+    results = optimizer.run(bars)
+    folds = optimizer.folds(len(bars))
+    assert len(results['folds']) == len(folds) == 3
+
+    for (train_start, test_start, test_end), (_, row) in zip(folds, results['folds'].iterrows()):
+        scores = [Backtester(10000).run_vectorized_backtest(strategy_class(**parameters), bars[train_start:test_start], multiplier=10)['profit_with_stocks']
+                  for strategy_class, parameters in combinations]
+        strategy_class, parameters = combinations[int(np.argmax(scores))]
+        assert row['train_objective'] == max(scores)
+        assert row['strategy'] == strategy_class(**parameters).name
+        assert all(row[name] == value for name, value in parameters.items())
+        # the test window is traded after warming the strategy up on the train window
+        test = Backtester(10000).run_vectorized_backtest(strategy_class(**parameters), bars[train_start:test_end], multiplier=10, start=test_start - train_start)
+        assert row['test_profit'] == test['profit_with_stocks']
+        assert row['train_end'] < row['test_start']
+
+    equity = results['equity']
+    assert len(equity) == len(bars) - 200
+    assert equity.index[0] == results['folds']['test_start'].iloc[0]
+    assert results['final_balance'] == equity.iloc[-1]
+
+
+def test_parallel_folds_match_serial_folds(bars):
+    serial = WalkForwardOptimizer(GRID, train_size=200, test_size=100, max_workers=1).run(bars)
+    parallel = WalkForwardOptimizer(GRID, train_size=200, test_size=100, max_workers=2).run(bars)
+    assert parallel['folds'].equals(serial['folds'])
+    assert parallel['equity'].equals(serial['equity'])
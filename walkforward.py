@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from data_handler import BarSeries
+from runner import SharedBars
+from sweep import ParameterSweep
+
+
+# state of a worker process, set once by `_init_worker`
+_worker = {}
+
+
+def _init_worker(spec: tuple, own_tracker: bool, optimizer: 'WalkForwardOptimizer', symbol: str) -> None:
+    """Initializes a worker process: attaches the shared bars and keeps the optimizer settings."""
+    memory, bars = SharedBars.attach(spec, own_tracker)
+    _worker.update(memory=memory, bars=bars[symbol], optimizer=optimizer, symbol=symbol)
+
+
+def _run_fold(fold: tuple) -> dict:
+    """Tunes the parameters on the train window of `fold` and trades them on its test window."""
+    return _worker['optimizer'].run_fold(_worker['bars'], fold, _worker['symbol'])
+
+
+class WalkForwardOptimizer:
+    def __init__(self, parameter_ranges: dict, train_size: int, test_size: int, anchored: bool = False, objective: str = 'profit_with_stocks', constraint: callable = None, initial_balance: float = 10000, multiplier: float = 10, max_workers: int | None = None) -> None:
+        """Constructor.
+
+        The history is split into folds of `train_size` bars followed by `test_size` out-of-sample bars, the next fold
+        starting `test_size` bars later so the test windows follow each other. With `anchored`, every train window starts
+        at the first bar and grows instead of rolling.
+        On each train window, the grid of `parameter_ranges` (see `ParameterSweep`, strategies need a vectorized mode) is
+        backtested and the combination with the highest `objective` (a column of `ParameterSweep.run`) is kept.
+        Folds are spread over `max_workers` processes (default: number of CPUs, 1 runs everything in this process).
+
+        Raises:
+            ValueError: If a window size is not positive.
+        """
+        if train_size < 1 or test_size < 1:
+            raise ValueError(f"Invalid window sizes: {train_size} train bars, {test_size} test bars")
+        self.sweep = ParameterSweep(parameter_ranges, constraint, initial_balance, multiplier)
+        self.train_size = train_size
+        self.test_size = test_size
+        self.anchored = anchored
+        self.objective = objective
+        self.initial_balance = initial_balance
+        self.multiplier = multiplier
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def folds(self, length: int) -> list[tuple[int, int, int]]:
+        """Returns the `(train start, test start, test end)` bar positions of the folds of a history of `length` bars.
+
+        The last test window is shortened to the end of the history.
+        """
+        folds = []
+        for test_start in range(self.train_size, length, self.test_size):
+            train_start = 0 if self.anchored else test_start - self.train_size
+            folds.append((train_start, test_start, min(test_start + self.test_size, length)))
+        return folds
+
+    def run_fold(self, bars: BarSeries, fold: tuple, symbol: str = "ABCDEF") -> dict:
+        """Runs one fold of `bars`: tunes the parameters on the train window, then trades the best ones on the test window.
+
+        The strategy is fed the train window before the test one, so its indicators are warmed up when trading starts.
+        Returns the chosen strategy and parameters, the train objective, the test results (see `Backtester.run_backtest`,
+        without the transaction history and equity curve; its metrics include the train bars, where nothing is traded) and
+        the test equity curve.
+        """
+        train_start, test_start, test_end = fold
+        scores = self.sweep.run(bars[train_start:test_start], symbol, metric=self.objective)
+        best = int(np.argmax(scores[self.objective].to_numpy()))
+        strategy_class, parameters = self.sweep.combinations()[best]
+
+        strategy = strategy_class(**parameters)
+        window = bars[train_start:test_end]
+        offset = test_start - train_start
+        results = Backtester(self.initial_balance).run_vectorized_backtest(strategy, window, symbol=symbol, multiplier=self.multiplier, start=offset)
+        del results['transaction_history']
+        equity = results.pop('equity_curve').equity[offset:]
+        return {
+            'strategy': strategy.name,
+            'parameters': parameters,
+            'train_objective': scores[self.objective].iloc[best],
+            'test_results': results,
+            'equity': equity,
+        }
+
+    def run(self, bars: BarSeries, symbol: str = "ABCDEF") -> dict:
+        """Walks forward over the bars of one symbol and returns the out-of-sample performance.
+
+        `folds` is a DataFrame with one row per fold: its train and test dates, the chosen strategy and parameters, the train
+        objective and the test profit. `equity` is the out-of-sample equity curve (a Series indexed by the test dates): every
+        fold trades from `initial_balance` and its returns are compounded on the value reached at the end of the previous one.
+        `final_balance` and `total_return` sum it up.
+
+        Raises:
+            ValueError: If `bars` is too short for one fold.
+        """
+        folds = self.folds(len(bars))
+        if not folds:
+            raise ValueError(f"{len(bars)} bars are too few for a {self.train_size} bar train window")
+
+        if self.max_workers == 1:
+            outcomes = [self.run_fold(bars, fold, symbol) for fold in folds]
+        else:
+            shared = SharedBars({symbol: bars})
+            try:
+                context = multiprocessing.get_context()
+                own_tracker = context.get_start_method() != 'fork'
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(folds)), mp_context=context, initializer=_init_worker, initargs=(shared.spec, own_tracker, self, symbol)) as executor:
+                    outcomes = list(executor.map(_run_fold, folds))
+            finally:
+                shared.close()
+
+        dates = pd.DatetimeIndex(bars.index).tz_localize('UTC')
+        if bars.timezone is not None:
+            dates = dates.tz_convert(bars.timezone)
+        rows = []
+        curves = []
+        balance = self.initial_balance
+        for (train_start, test_start, test_end), outcome in zip(folds, outcomes):
+            curves.append(outcome['equity'] / self.initial_balance * balance)
+            balance = curves[-1][-1]
+            rows.append({
+                'train_start': dates[train_start],
+                'train_end': dates[test_start - 1],
+                'test_start': dates[test_start],
+                'test_end': dates[test_end - 1],
+                'strategy': outcome['strategy'],
+                **outcome['parameters'],
+                'train_objective': outcome['train_objective'],
+                'test_profit': outcome['test_results']['profit_with_stocks'],
+                'test_trades': outcome['test_results']['trades'],
+            })
+
+        equity = pd.Series(np.concatenate(curves), index=dates[folds[0][1]:folds[-1][2]], name='equity')
+        return {
+            'folds': pd.DataFrame(rows),
+            'equity': equity,
+            'final_balance': balance,
+            'total_return': balance / self.initial_balance - 1,
+        }